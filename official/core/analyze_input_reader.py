@@ -0,0 +1,82 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+r"""Analyzes the input pipeline of an experiment and recommends reader knobs.
+
+Usage:
+
+  python3 -m official.core.analyze_input_reader \
+    --experiment=retinanet_resnetfpn_coco \
+    --config_file=path/to/config.yaml \
+    --data=train_data \
+    --num_batches=100 \
+    --search
+"""
+
+from absl import app
+from absl import flags
+from absl import logging
+
+from official.common import flags as tfm_flags
+from official.common import registry_imports  # pylint: disable=unused-import
+from official.core import input_reader_analyzer
+from official.core import task_factory
+from official.core import train_utils
+
+FLAGS = flags.FLAGS
+
+_DATA = flags.DEFINE_string(
+    'data', 'train_data',
+    'The attribute of the task config holding the `DataConfig` to analyze, '
+    'e.g. `train_data` or `validation_data`.')
+_NUM_BATCHES = flags.DEFINE_integer(
+    'num_batches', 100, 'The number of batches to measure each stage on.')
+_NUM_WARMUP_BATCHES = flags.DEFINE_integer(
+    'num_warmup_batches', 10, 'The number of batches to read before measuring.')
+_SEARCH = flags.DEFINE_bool(
+    'search', False,
+    'Whether to search the reader knobs for the highest throughput.')
+
+
+def main(_):
+  params = train_utils.parse_configuration(FLAGS, lock_return=False)
+  task = task_factory.get_task(params.task)
+  data_config = getattr(params.task, _DATA.value)
+
+  report = input_reader_analyzer.analyze(
+      task.build_inputs,
+      data_config,
+      num_batches=_NUM_BATCHES.value,
+      num_warmup_batches=_NUM_WARMUP_BATCHES.value)
+  print(report)
+
+  if _SEARCH.value:
+    recommended = input_reader_analyzer.search(
+        task.build_inputs,
+        data_config,
+        num_batches=_NUM_BATCHES.value,
+        num_warmup_batches=_NUM_WARMUP_BATCHES.value)
+    examples_per_second = recommended.pop('examples_per_second')
+    logging.info('Recommended config reaches %.1f examples/sec.',
+                 examples_per_second)
+    print('Recommended `task.%s` overrides (%.1f examples/sec):' %
+          (_DATA.value, examples_per_second))
+    for name, value in recommended.items():
+      print('  %s: %s' % (name, value))
+
+
+if __name__ == '__main__':
+  tfm_flags.define_flags()
+  flags.mark_flags_as_required(['experiment'])
+  app.run(main)
@@ -463,7 +463,20 @@ class Trainer(_AsyncTrainer):
     return {**passthrough_logs, **logs}
 
   def eval_end(self, aggregated_logs=None):
-    """Processes evaluation results."""
+    """Processes evaluation results.
+
+    If `trainer.async_eval` is set, the reduction of the aggregated logs by the
+    task (e.g. COCO metrics) is deferred: a callable computing the logs is
+    returned, that the controller may run while training continues. This is
+    not supported with a best checkpoint exporter, which needs the reduced logs
+    before training continues.
+
+    Args:
+      aggregated_logs: the aggregated logs returned by `eval_reduce`.
+
+    Returns:
+      A dictionary of logs, or a callable returning it.
+    """
     self.join()
     logs = {}
     for metric in self.validation_metrics:
@@ -474,6 +487,18 @@ class Trainer(_AsyncTrainer):
       # `self.validation_loss` metric was not updated, because the validation
       # loss was not returned from the task's `validation_step` method.
       logging.info("The task did not report validation loss.")
+
+    if (aggregated_logs and self.config.trainer.async_eval and
+        not self._checkpoint_exporter):
+      # Swaps back weights now, as training may resume before the deferred
+      # reduction runs.
+      if self.optimizer and isinstance(self.optimizer,
+                                       optimization.ExponentialMovingAverage):
+        self.optimizer.swap_weights()
+      return functools.partial(self._reduce_aggregated_logs, logs,
+                               aggregated_logs,
+                               tf.identity(self.global_step))
+
     if aggregated_logs:
       metrics = self.task.reduce_aggregated_logs(
           aggregated_logs, global_step=self.global_step)
@@ -494,5 +519,12 @@ class Trainer(_AsyncTrainer):
       self.optimizer.swap_weights()
     return logs
 
+  def _reduce_aggregated_logs(self, logs, aggregated_logs, global_step):
+    """Adds the reduced `aggregated_logs` to `logs` for deferred evaluation."""
+    logs.update(
+        self.task.reduce_aggregated_logs(
+            aggregated_logs, global_step=global_step))
+    return logs
+
   def eval_reduce(self, state=None, step_outputs=None):
     return self.task.aggregate_logs(state, step_outputs)
@@ -273,6 +273,25 @@ class TrainerTest(tf.test.TestCase, parameterized.TestCase):
       self.assertEqual(logs['counter'], 5. * distribution.num_replicas_in_sync)
       self.assertIn('validation_loss', logs)
 
+  def test_trainer_validate_with_async_eval(self):
+    config = cfg.ExperimentConfig(
+        trainer=cfg.TrainerConfig(
+            async_eval=True,
+            optimizer_config=cfg.OptimizationConfig({
+                'optimizer': {
+                    'type': 'sgd'
+                },
+                'learning_rate': {
+                    'type': 'constant'
+                }
+            })))
+    trainer = self.create_test_trainer(config)
+    deferred_logs = trainer.evaluate(tf.convert_to_tensor(5, dtype=tf.int32))
+    self.assertTrue(callable(deferred_logs))
+    logs = deferred_logs()
+    self.assertEqual(logs['counter'], 5.)
+    self.assertIn('validation_loss', logs)
+
   @combinations.generate(all_strategy_combinations())
   def test_trainer_validate_without_loss(self, distribution):
 
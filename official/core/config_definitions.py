@@ -108,6 +108,18 @@ class DataConfig(base_config.Config):
       high.
     autotune_algorithm: If specified, use this algorithm for AUTOTUNE. See:
       https://www.tensorflow.org/api_docs/python/tf/data/experimental/AutotuneAlgorithm
+    snapshot_dir: An optional directory to save the decoded examples to. If
+      set, the first job reading `input_path` decodes all of its examples once
+      and saves them as a compressed snapshot, and the next epochs and jobs
+      read the snapshot instead of the input files, skipping `decoder_fn`. The
+      snapshot is invalidated when the input files or the decoder change.
+    snapshot_version: A str added to the key of the snapshot, to invalidate it
+      when the decoder changes in a way not captured by the key, e.g. when its
+      code changes, or when input files are rewritten in place with the same
+      size within the resolution of their modification time.
+    snapshot_num_shards: The number of files of a snapshot.
+    snapshot_max_size_gb: If set, the least recently used snapshots of
+      `snapshot_dir` are deleted when their total size exceeds this many GB.
   """
   input_path: Union[Sequence[str], str, base_config.Config] = ""
   tfds_name: Union[str, base_config.Config] = ""
@@ -134,6 +146,10 @@ class DataConfig(base_config.Config):
   seed: Optional[int] = None
   prefetch_buffer_size: Optional[int] = None
   autotune_algorithm: Optional[str] = None
+  snapshot_dir: str = ""
+  snapshot_version: str = ""
+  snapshot_num_shards: int = 16
+  snapshot_max_size_gb: Optional[float] = None
 
 
 @dataclasses.dataclass
@@ -229,6 +245,11 @@ class TrainerConfig(base_config.Config):
       checkpoints, if set to None, continuous eval will wait indefinitely. This
       is only used continuous_train_and_eval and continuous_eval modes. Default
       value is 1 hrs.
+    continuous_eval_num_workers: if positive, the continuous_eval mode
+      evaluates every checkpoint, dispatching them to this number of local
+      worker processes, instead of only evaluating the latest checkpoint. The
+      evaluated steps are recorded under `validation_summary_subdir`, so that
+      they are not evaluated again after a restart.
     train_steps: number of train steps.
     validation_steps: number of eval steps. If -1, the entire eval dataset is
       used.
@@ -245,6 +266,11 @@ class TrainerConfig(base_config.Config):
       trainer should compare the evaluation metrics. This can be either `higher`
       (higher the better) or `lower` (lower the better).
     validation_summary_subdir: A 'str', sub directory for saving eval summary.
+    async_eval: whether to reduce the aggregated evaluation logs (e.g. COCO
+      metrics) in a background thread while training continues, in the
+      `train_and_eval` mode. Summaries are still written at the step of the
+      evaluation. It has no effect if `best_checkpoint_export_subdir` is set,
+      or if the optimizer uses an exponential moving average.
     preemption_on_demand_checkpoint: whether or not to save on-demand
       checkpoints after a preemption.
   """
@@ -264,6 +290,7 @@ class TrainerConfig(base_config.Config):
   # Checkpoint manager.
   max_to_keep: int = 5
   continuous_eval_timeout: int = 60 * 60
+  continuous_eval_num_workers: int = 0
   # Train/Eval routines.
   train_steps: int = 0
   # Sets validation steps to be -1 to evaluate the entire dataset.
@@ -281,6 +308,7 @@ class TrainerConfig(base_config.Config):
   # we will retore the model states.
   recovery_max_trials: int = 0
   validation_summary_subdir: str = "validation"
+  async_eval: bool = False
   # Preemption on-demand checkpoint.
   preemption_on_demand_checkpoint: bool = True  # copybara-replace
 
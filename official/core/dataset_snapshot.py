@@ -0,0 +1,233 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""On-disk snapshots of decoded examples, used by `InputReader`.
+
+A snapshot holds the output of the `decoder_fn` of an `InputReader` for all
+the examples of its input files, saved with `tf.data.Dataset.save` as sharded
+and compressed files. Every snapshot lives in a subdirectory of the snapshot
+directory named after a key, which is a hash of the input files (including
+their size and modification time), of the decoder and of a user version.
+Changing any of them invalidates the snapshot, and the least recently used
+snapshots are evicted when the snapshot directory exceeds its maximum size.
+"""
+
+import functools
+import hashlib
+import os
+import time
+import uuid
+from typing import Any, Callable, List, Optional
+
+from absl import logging
+import tensorflow as tf, tf_keras
+
+_COMPRESSION = 'GZIP'
+# Written once a snapshot is complete. Its content is the time the snapshot
+# was last used, used for the least recently used eviction.
+_LAST_USED_FILENAME = 'LAST_USED'
+
+_MAX_SHUFFLED_SHARDS = 1024
+
+_PRIMITIVE_TYPES = (bool, int, float, str, bytes, type(None))
+
+
+def _fingerprint(value: Any) -> Any:
+  """Returns a hashable and stable description of a decoder.
+
+  Functions are described by their qualified name, `functools.partial` objects
+  by their function and arguments, and bound methods by their function and the
+  primitive attributes of their object, e.g. the config of a decoder class.
+  Other objects are described by their type only, since their `repr` may
+  contain memory addresses.
+
+  Args:
+    value: the decoder, or one of its arguments or attributes.
+  """
+  if isinstance(value, _PRIMITIVE_TYPES):
+    return value
+  if isinstance(value, (list, tuple)):
+    return tuple(_fingerprint(v) for v in value)
+  if isinstance(value, dict):
+    return tuple(
+        sorted((str(k), _fingerprint(v)) for k, v in value.items()))
+  if isinstance(value, functools.partial):
+    return ('partial', _fingerprint(value.func), _fingerprint(value.args),
+            _fingerprint(value.keywords))
+  if hasattr(value, '__self__') and hasattr(value, '__func__'):
+    attributes = {
+        k: v for k, v in vars(value.__self__).items()
+        if isinstance(v, _PRIMITIVE_TYPES + (list, tuple, dict))
+    } if hasattr(value.__self__, '__dict__') else {}
+    return ('method', _fingerprint(value.__func__), _fingerprint(attributes))
+  if hasattr(value, '__qualname__'):
+    return (getattr(value, '__module__', ''), value.__qualname__)
+  return (type(value).__module__, type(value).__qualname__)
+
+
+def snapshot_key(files: List[str],
+                 decoder_fn: Optional[Callable[..., Any]],
+                 version: str = '') -> str:
+  """Returns the key of the snapshot of decoded `files`.
+
+  Args:
+    files: the input files.
+    decoder_fn: the decoder applied to the examples of `files`.
+    version: a user provided version, to invalidate snapshots when the decoder
+      changes in a way not captured by its fingerprint.
+
+  Returns:
+    A hexadecimal string.
+  """
+  hasher = hashlib.sha256()
+  for path in sorted(files):
+    stat = tf.io.gfile.stat(path)
+    hasher.update(repr((path, stat.length, stat.mtime_nsec)).encode('utf-8'))
+  hasher.update(repr(_fingerprint(decoder_fn)).encode('utf-8'))
+  hasher.update(version.encode('utf-8'))
+  return hasher.hexdigest()[:32]
+
+
+def exists(path: str) -> bool:
+  """Returns whether a complete snapshot exists at `path`."""
+  return tf.io.gfile.exists(os.path.join(path, _LAST_USED_FILENAME))
+
+
+def _touch(path: str):
+  with tf.io.gfile.GFile(os.path.join(path, _LAST_USED_FILENAME), 'w') as f:
+    f.write(str(time.time()))
+
+
+def _last_used(path: str) -> float:
+  try:
+    with tf.io.gfile.GFile(os.path.join(path, _LAST_USED_FILENAME), 'r') as f:
+      return float(f.read())
+  except (tf.errors.NotFoundError, ValueError):
+    # Directories without a complete snapshot are evicted first.
+    return 0.0
+
+
+def _size(path: str) -> int:
+  size = 0
+  for dirname, _, filenames in tf.io.gfile.walk(path):
+    for filename in filenames:
+      size += tf.io.gfile.stat(os.path.join(dirname, filename)).length
+  return size
+
+
+def write(dataset: tf.data.Dataset, path: str, num_shards: int):
+  """Writes the elements of a finite `dataset` as a snapshot at `path`.
+
+  The snapshot is first written to a temporary directory and then renamed, so
+  that concurrent writers, e.g. several workers of the same job, and preempted
+  jobs never leave a partial snapshot at `path`.
+
+  Args:
+    dataset: the finite dataset of decoded examples.
+    path: the directory of the snapshot.
+    num_shards: the number of files to write the snapshot to.
+  """
+  tmp_path = '%s.tmp-%s' % (path, uuid.uuid4().hex)
+  logging.info('Writing a snapshot of decoded examples to %s.', path)
+  start = time.time()
+  dataset.enumerate().save(
+      tmp_path,
+      compression=_COMPRESSION,
+      shard_func=lambda index, _: index % num_shards)
+  _touch(tmp_path)
+  try:
+    tf.io.gfile.rename(tmp_path, path)
+  except tf.errors.OpError:
+    if not exists(path):
+      raise
+    logging.info('Snapshot %s was written concurrently.', path)
+    tf.io.gfile.rmtree(tmp_path)
+  logging.info('Wrote snapshot %s in %.1f seconds.', path, time.time() - start)
+
+
+def load(path: str,
+         num_shards: int,
+         input_context: Optional[tf.distribute.InputContext] = None,
+         sharding: bool = True,
+         shuffle_shards: bool = False,
+         seed: Optional[int] = None,
+         deterministic: Optional[bool] = None) -> tf.data.Dataset:
+  """Loads the decoded examples of the snapshot at `path`.
+
+  Args:
+    path: the directory of the snapshot.
+    num_shards: the number of shards the snapshot was written with.
+    input_context: an optional input context, to shard the snapshot between
+      the input pipelines.
+    sharding: whether to shard the snapshot between the input pipelines. The
+      shards of the snapshot are split if there are enough of them, otherwise
+      the examples are.
+    shuffle_shards: whether to shuffle the order of the shards.
+    seed: the seed of the shard shuffling. It must be the same in all the
+      input pipelines when the shards are split between them.
+    deterministic: whether to read the shards deterministically.
+
+  Returns:
+    A `tf.data.Dataset` of the decoded examples.
+  """
+  _touch(path)
+  num_pipelines = input_context.num_input_pipelines if input_context else 1
+  pipeline_id = input_context.input_pipeline_id if input_context else 0
+  shard_files = sharding and 1 < num_pipelines <= num_shards
+  shard_examples = sharding and num_pipelines > num_shards
+
+  def reader_func(shards):
+    if shuffle_shards:
+      shards = shards.shuffle(_MAX_SHUFFLED_SHARDS, seed=seed)
+    if shard_files:
+      shards = shards.shard(num_pipelines, pipeline_id)
+    return shards.interleave(
+        lambda shard: shard,
+        num_parallel_calls=tf.data.experimental.AUTOTUNE,
+        deterministic=deterministic)
+
+  dataset = tf.data.Dataset.load(
+      path, compression=_COMPRESSION, reader_func=reader_func)
+  if shard_examples:
+    dataset = dataset.shard(num_pipelines, pipeline_id)
+  return dataset.map(
+      lambda _, example: example,
+      num_parallel_calls=tf.data.experimental.AUTOTUNE)
+
+
+def evict(snapshot_dir: str, max_size_bytes: int, keep: str):
+  """Deletes the least recently used snapshots above a total size.
+
+  Args:
+    snapshot_dir: the directory holding the snapshots.
+    max_size_bytes: the maximum total size of the snapshots.
+    keep: the path of a snapshot never to delete, i.e. the one being used.
+  """
+  snapshots = []
+  total_size = 0
+  for name in tf.io.gfile.listdir(snapshot_dir):
+    path = os.path.join(snapshot_dir, name.rstrip('/'))
+    # Snapshots being written by `write` are not evicted.
+    if '.tmp-' in name or not tf.io.gfile.isdir(path):
+      continue
+    size = _size(path)
+    total_size += size
+    if path != keep:
+      snapshots.append((_last_used(path), size, path))
+  for _, size, path in sorted(snapshots):
+    if total_size <= max_size_bytes:
+      break
+    logging.info('Evicting snapshot %s of %d bytes.', path, size)
+    tf.io.gfile.rmtree(path)
+    total_size -= size
@@ -0,0 +1,176 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for dataset_snapshot."""
+
+import functools
+import os
+import types
+
+import tensorflow as tf, tf_keras
+
+from official.core import config_definitions as cfg
+from official.core import dataset_snapshot
+from official.core import input_reader
+
+
+class _Decoder:
+
+  def __init__(self, scale):
+    self._scale = scale
+    # Not a primitive attribute, so that it is not part of the snapshot key.
+    self._stats = types.SimpleNamespace(num_decoded=0)
+
+  @property
+  def num_decoded(self):
+    return self._stats.num_decoded
+
+  def _count(self, x):
+    self._stats.num_decoded += 1
+    return x
+
+  def decode(self, serialized):
+    x = tf.io.parse_single_example(
+        serialized, {'x': tf.io.FixedLenFeature([], tf.int64)})['x']
+    x = tf.py_function(self._count, [x], tf.int64)
+    x.set_shape([])
+    return {'x': x * self._scale}
+
+
+def _write_tfrecords(path, values):
+  with tf.io.TFRecordWriter(path) as writer:
+    for value in values:
+      example = tf.train.Example(
+          features=tf.train.Features(feature={
+              'x': tf.train.Feature(
+                  int64_list=tf.train.Int64List(value=[value]))
+          }))
+      writer.write(example.SerializeToString())
+
+
+class DatasetSnapshotTest(tf.test.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._data_dir = os.path.join(self.get_temp_dir(), 'data')
+    tf.io.gfile.makedirs(self._data_dir)
+    for i in range(2):
+      _write_tfrecords(
+          os.path.join(self._data_dir, 'data-%d.tfrecord' % i),
+          range(i * 8, (i + 1) * 8))
+    self._snapshot_dir = os.path.join(self.get_temp_dir(), 'snapshots')
+
+  def _read(self, decoder, **kwargs):
+    params = cfg.DataConfig(
+        input_path=os.path.join(self._data_dir, '*.tfrecord'),
+        global_batch_size=4,
+        is_training=False,
+        snapshot_dir=self._snapshot_dir,
+        snapshot_num_shards=3,
+        **kwargs)
+    dataset = input_reader.InputReader(
+        params, decoder_fn=decoder.decode,
+        parser_fn=lambda x: x['x']).read()
+    return sorted(x for batch in dataset.as_numpy_iterator() for x in batch)
+
+  def _snapshots(self):
+    return sorted(tf.io.gfile.listdir(self._snapshot_dir))
+
+  def test_warm_start_skips_decoding(self):
+    decoder = _Decoder(scale=2)
+    self.assertEqual(self._read(decoder), [2 * i for i in range(16)])
+    self.assertEqual(decoder.num_decoded, 16)
+    self.assertLen(self._snapshots(), 1)
+
+    decoder = _Decoder(scale=2)
+    self.assertEqual(self._read(decoder), [2 * i for i in range(16)])
+    self.assertEqual(decoder.num_decoded, 0)
+    self.assertLen(self._snapshots(), 1)
+
+  def test_invalidation(self):
+    self._read(_Decoder(scale=2))
+    # A different decoder config.
+    decoder = _Decoder(scale=3)
+    self.assertEqual(self._read(decoder), [3 * i for i in range(16)])
+    self.assertEqual(decoder.num_decoded, 16)
+    # A different version.
+    decoder = _Decoder(scale=3)
+    self._read(decoder, snapshot_version='v2')
+    self.assertEqual(decoder.num_decoded, 16)
+    # Modified input files.
+    _write_tfrecords(
+        os.path.join(self._data_dir, 'data-0.tfrecord'), range(1000, 1008))
+    decoder = _Decoder(scale=3)
+    self.assertEqual(
+        self._read(decoder, snapshot_version='v2'),
+        [3 * i for i in list(range(8, 16)) + list(range(1000, 1008))])
+    self.assertEqual(decoder.num_decoded, 16)
+    self.assertLen(self._snapshots(), 4)
+
+  def test_eviction(self):
+    self._read(_Decoder(scale=2))
+    first = self._snapshots()
+    self._read(_Decoder(scale=3))
+    self.assertLen(self._snapshots(), 2)
+    self._read(_Decoder(scale=4), snapshot_max_size_gb=1e-9)
+    snapshots = self._snapshots()
+    self.assertLen(snapshots, 1)
+    self.assertNotEqual(snapshots, first)
+
+  def test_training_sharded_read(self):
+    decoder = _Decoder(scale=1)
+    self._read(decoder)
+    params = cfg.DataConfig(
+        input_path=os.path.join(self._data_dir, '*.tfrecord'),
+        global_batch_size=4,
+        is_training=True,
+        shuffle_buffer_size=1,
+        seed=1,
+        snapshot_dir=self._snapshot_dir,
+        snapshot_num_shards=3)
+    values = []
+    for pipeline_id in range(2):
+      context = tf.distribute.InputContext(
+          num_input_pipelines=2, input_pipeline_id=pipeline_id)
+      dataset = input_reader.InputReader(
+          params, decoder_fn=decoder.decode,
+          parser_fn=lambda x: x['x']).read(context)
+      # Training datasets repeat forever.
+      for batch in dataset.take(8).as_numpy_iterator():
+        values.extend(batch)
+    self.assertEqual(decoder.num_decoded, 16)
+    self.assertCountEqual(set(values), range(16))
+
+  def test_fingerprint(self):
+    self.assertEqual(
+        dataset_snapshot._fingerprint(_Decoder(scale=2).decode),
+        dataset_snapshot._fingerprint(_Decoder(scale=2).decode))
+    self.assertNotEqual(
+        dataset_snapshot._fingerprint(_Decoder(scale=2).decode),
+        dataset_snapshot._fingerprint(_Decoder(scale=3).decode))
+    self.assertNotEqual(
+        dataset_snapshot._fingerprint(functools.partial(max, 1)),
+        dataset_snapshot._fingerprint(functools.partial(max, 2)))
+
+  def test_tfds_is_not_supported(self):
+    with self.assertRaisesRegex(ValueError, 'snapshot_dir'):
+      input_reader.InputReader(
+          cfg.DataConfig(
+              tfds_name='mnist',
+              tfds_split='train',
+              snapshot_dir=self._snapshot_dir))
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -0,0 +1,330 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""In-process dynamic batching of the requests to a serving function.
+
+`DynamicBatcher` wraps a serving function, e.g. a signature of an exported
+`ExportModule`, and serves single-example requests from many threads:
+
+  imported = tf.saved_model.load(export_dir)
+  batcher = dynamic_batching.DynamicBatcher(
+      imported.signatures['serving_default'],
+      max_batch_size=32,
+      batch_timeout_secs=0.005,
+      bucket_boundaries=[32, 64, 128],
+      bucketed_axes={'input_word_ids': [0], 'input_mask': [0],
+                     'input_type_ids': [0]},
+      sliced_output_axes={'sequence_output': {0: ('input_word_ids', 0)}})
+  batcher.start()
+  outputs = batcher.predict(dict(input_word_ids=..., input_mask=...,
+                                 input_type_ids=...))
+
+The requests are queued by shape bucket and a worker thread runs a batch when
+one bucket has `max_batch_size` requests, or when its oldest request has waited
+for `batch_timeout_secs`. The inputs are padded to the bucket shape and the
+batch to an allowed batch size, so that the serving function sees few distinct
+shapes, and the outputs are split back per request. The outputs keep the padded
+shape, except for the axes listed in `sliced_output_axes`, which are sliced
+back to the length of an input axis of the request.
+"""
+
+import bisect
+import collections
+from concurrent import futures
+import dataclasses
+import threading
+import time
+from typing import Any, Callable, Dict, Mapping, Optional, Sequence, Tuple
+
+from absl import logging
+import numpy as np
+import tensorflow as tf, tf_keras
+
+# The number of most recent request latencies kept for the metrics.
+_NUM_LATENCIES = 10000
+
+_BucketKey = Tuple[Tuple[str, Tuple[int, ...]], ...]
+# The output axes sliced back to the length of an (input name, input axis).
+_OutputAxes = Mapping[int, Tuple[str, int]]
+
+
+@dataclasses.dataclass
+class _Request:
+  inputs: Dict[str, np.ndarray]
+  future: futures.Future
+  enqueue_time: float
+
+
+class DynamicBatcher:
+  """Coalesces single-example requests into batches of a serving function."""
+
+  def __init__(self,
+               serving_fn: Callable[..., Mapping[str, tf.Tensor]],
+               max_batch_size: int,
+               batch_timeout_secs: float = 0.005,
+               allowed_batch_sizes: Optional[Sequence[int]] = None,
+               bucket_boundaries: Optional[Sequence[int]] = None,
+               bucketed_axes: Optional[Mapping[str, Sequence[int]]] = None,
+               padding_values: Optional[Mapping[str, Any]] = None,
+               sliced_output_axes: Optional[Mapping[str, _OutputAxes]] = None,
+               max_queue_size: Optional[int] = None):
+    """Initializes the batcher.
+
+    Args:
+      serving_fn: The function serving batches, called with the batched inputs
+        as keyword arguments and returning a dict of batched outputs, e.g. a
+        signature of a loaded SavedModel.
+      max_batch_size: The maximum number of requests of a batch.
+      batch_timeout_secs: The maximum time the oldest request of a bucket waits
+        for more requests.
+      allowed_batch_sizes: Optional increasing batch sizes, ending with
+        `max_batch_size`. The batches are padded to the smallest allowed size,
+        by repeating their first request, to limit the number of traced
+        shapes. If None, the batches are not padded.
+      bucket_boundaries: Optional increasing lengths the bucketed axes are
+        padded to. Lengths above the last boundary are not padded.
+      bucketed_axes: The axes, of the inputs without their batch dimension,
+        whose length varies across requests and which are padded to the
+        bucket boundaries. The other axes must have the same length for the
+        requests of a batch, or the requests are batched separately.
+      padding_values: Optional values the bucketed axes of the inputs are padded
+        with, 0 by default.
+      sliced_output_axes: Optional axes of the outputs, without their batch
+        dimension, that are sliced back to the unpadded length of an input
+        axis, e.g. `{'logits': {0: ('input_word_ids', 0)}}`. The other axes of
+        the outputs keep their padded length.
+      max_queue_size: Optional maximum number of queued requests, beyond which
+        `submit` raises a `RuntimeError`.
+    """
+    if allowed_batch_sizes is not None:
+      allowed_batch_sizes = list(allowed_batch_sizes)
+      if (allowed_batch_sizes != sorted(set(allowed_batch_sizes)) or
+          allowed_batch_sizes[-1] != max_batch_size):
+        raise ValueError(
+            '`allowed_batch_sizes` must be increasing and end with '
+            '`max_batch_size` %d, got %s.' %
+            (max_batch_size, allowed_batch_sizes))
+    if bucketed_axes and not bucket_boundaries:
+      raise ValueError('`bucketed_axes` requires `bucket_boundaries`.')
+    self._serving_fn = serving_fn
+    self._max_batch_size = max_batch_size
+    self._batch_timeout_secs = batch_timeout_secs
+    self._allowed_batch_sizes = allowed_batch_sizes
+    self._bucket_boundaries = sorted(bucket_boundaries or [])
+    self._bucketed_axes = {k: list(v) for k, v in (bucketed_axes or {}).items()}
+    self._padding_values = dict(padding_values or {})
+    self._sliced_output_axes = {
+        k: dict(v) for k, v in (sliced_output_axes or {}).items()
+    }
+    self._max_queue_size = max_queue_size
+
+    self._condition = threading.Condition()
+    # The queued requests of every bucket, in arrival order.
+    self._queues: Dict[_BucketKey, collections.deque] = {}
+    self._queue_depth = 0
+    self._worker = None
+    self._running = False
+
+    self._num_requests = 0
+    self._num_served_requests = 0
+    self._num_batches = 0
+    self._num_padding_requests = 0
+    self._max_queue_depth = 0
+    self._latencies = collections.deque(maxlen=_NUM_LATENCIES)
+
+  def _bucket_length(self, length: int) -> int:
+    index = bisect.bisect_left(self._bucket_boundaries, length)
+    if index == len(self._bucket_boundaries):
+      return length
+    return self._bucket_boundaries[index]
+
+  def _bucket_key(self, inputs: Mapping[str, np.ndarray]) -> _BucketKey:
+    """Returns the padded shapes of the inputs of a request."""
+    key = []
+    for name in sorted(inputs):
+      shape = list(inputs[name].shape)
+      for axis in self._bucketed_axes.get(name, []):
+        shape[axis] = self._bucket_length(shape[axis])
+      key.append((name, tuple(shape)))
+    return tuple(key)
+
+  def submit(self, inputs: Mapping[str, Any]) -> futures.Future:
+    """Queues a request.
+
+    Args:
+      inputs: The inputs of one example, without batch dimension.
+
+    Returns:
+      A future of the dict of outputs of the example.
+    """
+    inputs = {name: np.asarray(value) for name, value in inputs.items()}
+    key = self._bucket_key(inputs)
+    request = _Request(inputs, futures.Future(), time.perf_counter())
+    with self._condition:
+      if (self._max_queue_size is not None and
+          self._queue_depth >= self._max_queue_size):
+        raise RuntimeError('The queue has %d requests.' % self._queue_depth)
+      self._queues.setdefault(key, collections.deque()).append(request)
+      self._queue_depth += 1
+      self._num_requests += 1
+      self._max_queue_depth = max(self._max_queue_depth, self._queue_depth)
+      self._condition.notify()
+    return request.future
+
+  def predict(self, inputs: Mapping[str, Any]) -> Dict[str, np.ndarray]:
+    """Serves a request and waits for its outputs, see `submit`."""
+    return self.submit(inputs).result()
+
+  def start(self):
+    """Starts the worker thread."""
+    with self._condition:
+      if self._running:
+        return
+      self._running = True
+    self._worker = threading.Thread(target=self._run, daemon=True)
+    self._worker.start()
+
+  def stop(self):
+    """Serves the queued requests and stops the worker thread."""
+    with self._condition:
+      self._running = False
+      self._condition.notify()
+    if self._worker is not None:
+      self._worker.join()
+      self._worker = None
+
+  def __enter__(self):
+    self.start()
+    return self
+
+  def __exit__(self, *args):
+    self.stop()
+
+  def get_metrics(self) -> Dict[str, float]:
+    """Returns the counters and the latencies of the served requests."""
+    with self._condition:
+      latencies = np.array(self._latencies)
+      metrics = {
+          'num_requests': self._num_requests,
+          'num_batches': self._num_batches,
+          'num_padding_requests': self._num_padding_requests,
+          'queue_depth': self._queue_depth,
+          'max_queue_depth': self._max_queue_depth,
+      }
+      if self._num_batches:
+        metrics['mean_batch_size'] = (
+            self._num_served_requests / self._num_batches)
+    if latencies.size:
+      metrics['latency_p50_secs'] = np.percentile(latencies, 50)
+      metrics['latency_p99_secs'] = np.percentile(latencies, 99)
+    return metrics
+
+  def _next_batch(self) -> Optional[Sequence[_Request]]:
+    """Waits for a full or timed out bucket and dequeues its requests.
+
+    Returns:
+      The requests of the next batch, or None once stopped with an empty
+      queue.
+    """
+    with self._condition:
+      while True:
+        if not self._queue_depth:
+          if not self._running:
+            return None
+          self._condition.wait()
+          continue
+        now = time.perf_counter()
+        # The bucket with the oldest request.
+        key, queue = min(
+            self._queues.items(), key=lambda item: item[1][0].enqueue_time)
+        deadline = queue[0].enqueue_time + self._batch_timeout_secs
+        full_key = next((k for k, q in self._queues.items()
+                         if len(q) >= self._max_batch_size), None)
+        if full_key is not None:
+          key, queue = full_key, self._queues[full_key]
+        elif now < deadline and self._running:
+          self._condition.wait(deadline - now)
+          continue
+        batch = [
+            queue.popleft()
+            for _ in range(min(len(queue), self._max_batch_size))
+        ]
+        if not queue:
+          del self._queues[key]
+        self._queue_depth -= len(batch)
+        return batch
+
+  def _pad(self, name: str, value: np.ndarray,
+           shape: Sequence[int]) -> np.ndarray:
+    if value.shape == tuple(shape):
+      return value
+    return np.pad(
+        value, [(0, s - d) for s, d in zip(shape, value.shape)],
+        constant_values=self._padding_values.get(name, 0))
+
+  def _unpad(self, request: _Request, name: str,
+             value: np.ndarray) -> np.ndarray:
+    """Slices the output `name` of a request back to its unpadded length."""
+    axes = self._sliced_output_axes.get(name)
+    if not axes:
+      return value
+    slices = [slice(None)] * value.ndim
+    for axis, (input_name, input_axis) in axes.items():
+      slices[axis] = slice(request.inputs[input_name].shape[input_axis])
+    return value[tuple(slices)]
+
+  def _run_batch(self, batch: Sequence[_Request]):
+    """Pads and runs a batch, and splits its outputs per request."""
+    # Drops the requests cancelled while queued, the others can no longer be.
+    batch = [r for r in batch if r.future.set_running_or_notify_cancel()]
+    if not batch:
+      return
+    shapes = dict(self._bucket_key(batch[0].inputs))
+    batch_size = len(batch)
+    if self._allowed_batch_sizes is not None:
+      batch_size = self._allowed_batch_sizes[bisect.bisect_left(
+          self._allowed_batch_sizes, batch_size)]
+    inputs = {}
+    for name, shape in shapes.items():
+      values = [self._pad(name, r.inputs[name], shape) for r in batch]
+      values += values[:1] * (batch_size - len(batch))
+      inputs[name] = tf.convert_to_tensor(np.stack(values))
+    outputs = self._serving_fn(**inputs)
+    outputs = {name: np.asarray(value) for name, value in outputs.items()}
+    done = time.perf_counter()
+    for i, request in enumerate(batch):
+      request.future.set_result({
+          name: self._unpad(request, name, value[i])
+          for name, value in outputs.items()
+      })
+    with self._condition:
+      self._num_batches += 1
+      self._num_served_requests += len(batch)
+      self._num_padding_requests += batch_size - len(batch)
+      self._latencies.extend(done - r.enqueue_time for r in batch)
+
+  def _run(self):
+    while True:
+      batch = self._next_batch()
+      if batch is None:
+        return
+      try:
+        self._run_batch(batch)
+      except Exception as e:  # pylint: disable=broad-except
+        logging.exception('Failed to serve a batch of %d requests.',
+                          len(batch))
+        for request in batch:
+          # The requests cancelled or served before the error are done.
+          if not request.future.done():
+            request.future.set_exception(e)
@@ -0,0 +1,143 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+r"""Load tests the dynamic batcher with a synthetic request stream.
+
+Sends single-sequence requests with Poisson arrivals to the serving function of
+a randomly initialized BERT encoder, once calling it for every request and once
+through a `DynamicBatcher`. Reports the p50 and p99 latencies, the throughput
+and the batching counters.
+
+Usage:
+
+  python -m official.core.dynamic_batching_benchmark \
+    --num_requests=500 --request_rate=100 --max_batch_size=32
+"""
+
+from concurrent import futures
+import time
+
+from absl import app
+from absl import flags
+from absl import logging
+import numpy as np
+import tensorflow as tf, tf_keras
+
+from official.core import dynamic_batching
+from official.nlp.modeling import networks
+
+_NUM_REQUESTS = flags.DEFINE_integer('num_requests', 500,
+                                     'Number of requests.')
+_REQUEST_RATE = flags.DEFINE_float('request_rate', 100.0,
+                                   'Mean number of requests per second.')
+_MAX_BATCH_SIZE = flags.DEFINE_integer('max_batch_size', 32,
+                                       'Maximum batch size.')
+_BATCH_TIMEOUT_SECS = flags.DEFINE_float(
+    'batch_timeout_secs', 0.005, 'Maximum time a request waits for a batch.')
+_MAX_SEQ_LENGTH = flags.DEFINE_integer('max_seq_length', 128,
+                                       'Maximum length of the requests.')
+_NUM_LAYERS = flags.DEFINE_integer('num_layers', 2, 'Number of layers.')
+_HIDDEN_SIZE = flags.DEFINE_integer('hidden_size', 256, 'Hidden size.')
+_NUM_CLIENTS = flags.DEFINE_integer('num_clients', 64,
+                                    'Number of concurrent client threads.')
+
+_VOCAB_SIZE = 8000
+_INPUT_NAMES = ('input_word_ids', 'input_mask', 'input_type_ids')
+
+
+def _build_serving_fn():
+  encoder = networks.BertEncoderV2(
+      vocab_size=_VOCAB_SIZE,
+      hidden_size=_HIDDEN_SIZE.value,
+      num_layers=_NUM_LAYERS.value,
+      num_attention_heads=4,
+      inner_dim=4 * _HIDDEN_SIZE.value,
+      max_sequence_length=_MAX_SEQ_LENGTH.value)
+
+  @tf.function(input_signature=[
+      tf.TensorSpec([None, None], tf.int32, name) for name in _INPUT_NAMES
+  ])
+  def serving_fn(input_word_ids, input_mask, input_type_ids):
+    outputs = encoder(
+        dict(
+            input_word_ids=input_word_ids,
+            input_mask=input_mask,
+            input_type_ids=input_type_ids))
+    return dict(pooled_output=outputs['pooled_output'])
+
+  return serving_fn
+
+
+def _create_requests(rng):
+  """Returns the arrival times and the inputs of the requests."""
+  num_requests = _NUM_REQUESTS.value
+  arrival_times = np.cumsum(
+      rng.exponential(1.0 / _REQUEST_RATE.value, num_requests))
+  inputs = []
+  for length in rng.integers(8, _MAX_SEQ_LENGTH.value + 1, num_requests):
+    inputs.append(
+        dict(
+            input_word_ids=rng.integers(1, _VOCAB_SIZE, length, np.int32),
+            input_mask=np.ones([length], np.int32),
+            input_type_ids=np.zeros([length], np.int32)))
+  return arrival_times, inputs
+
+
+def _run(name, predict_fn, requests):
+  """Sends the requests at their arrival times and logs the latencies."""
+  arrival_times, inputs = requests
+  start = time.perf_counter()
+
+  def send(i):
+    time.sleep(max(0.0, arrival_times[i] - (time.perf_counter() - start)))
+    sent = time.perf_counter()
+    predict_fn(inputs[i])
+    return time.perf_counter() - sent
+
+  with futures.ThreadPoolExecutor(_NUM_CLIENTS.value) as executor:
+    latencies = list(executor.map(send, range(len(inputs))))
+  elapsed = time.perf_counter() - start
+  logging.info('%-16s p50 %8.1f ms  p99 %8.1f ms  %8.1f requests/sec', name,
+               1000 * np.percentile(latencies, 50),
+               1000 * np.percentile(latencies, 99), len(latencies) / elapsed)
+
+
+def main(_):
+  serving_fn = _build_serving_fn()
+  requests = _create_requests(np.random.default_rng(0))
+
+  def predict(inputs):
+    outputs = serving_fn(**{k: v[np.newaxis] for k, v in inputs.items()})
+    return {k: v.numpy()[0] for k, v in outputs.items()}
+
+  _run('per request', predict, requests)
+
+  max_batch_size = _MAX_BATCH_SIZE.value
+  bucket_boundaries = list(range(16, _MAX_SEQ_LENGTH.value + 1, 16))
+  batcher = dynamic_batching.DynamicBatcher(
+      serving_fn,
+      max_batch_size=max_batch_size,
+      batch_timeout_secs=_BATCH_TIMEOUT_SECS.value,
+      allowed_batch_sizes=[
+          2**i for i in range(max_batch_size.bit_length() - 1)
+      ] + [max_batch_size],
+      bucket_boundaries=bucket_boundaries,
+      bucketed_axes={name: [0] for name in _INPUT_NAMES})
+  with batcher:
+    _run('dynamic batching', batcher.predict, requests)
+  logging.info('Batching metrics: %s', batcher.get_metrics())
+
+
+if __name__ == '__main__':
+  app.run(main)
@@ -0,0 +1,184 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for official.core.dynamic_batching."""
+
+from concurrent import futures
+import time
+
+import numpy as np
+import tensorflow as tf, tf_keras
+
+from official.core import dynamic_batching
+
+
+class RecordingServingFn:
+  """Sums the ids and scales the features, recording the batch shapes."""
+
+  def __init__(self, delay_secs=0.0):
+    self.shapes = []
+    self._delay_secs = delay_secs
+
+  def __call__(self, ids, features):
+    self.shapes.append((tuple(ids.shape), tuple(features.shape)))
+    time.sleep(self._delay_secs)
+    return {
+        'sums': tf.reduce_sum(ids, axis=1),
+        'features': 2 * features,
+    }
+
+
+def _request(length, value):
+  return {
+      'ids': np.full([length], value, np.int32),
+      'features': np.full([3], value, np.float32),
+  }
+
+
+class DynamicBatcherTest(tf.test.TestCase):
+
+  def test_buckets_and_splits_batches(self):
+    serving_fn = RecordingServingFn()
+    batcher = dynamic_batching.DynamicBatcher(
+        serving_fn,
+        max_batch_size=4,
+        batch_timeout_secs=0.0,
+        allowed_batch_sizes=[2, 4],
+        bucket_boundaries=[4, 8],
+        bucketed_axes={'ids': [0]})
+    lengths = [1, 5, 3, 8, 2, 4, 6, 9, 1]
+    # Queued before the worker starts, so that the buckets fill up.
+    outputs = [
+        batcher.submit(_request(length, i))
+        for i, length in enumerate(lengths)
+    ]
+    with batcher:
+      outputs = [output.result() for output in outputs]
+
+    for i, (length, output) in enumerate(zip(lengths, outputs)):
+      self.assertEqual(output['sums'], i * length)
+      self.assertAllEqual(output['features'], [2 * i] * 3)
+    self.assertCountEqual(serving_fn.shapes, [
+        ((4, 4), (4, 3)),
+        ((2, 4), (2, 3)),
+        ((4, 8), (4, 3)),
+        ((2, 9), (2, 3)),
+    ])
+    metrics = batcher.get_metrics()
+    self.assertEqual(metrics['num_requests'], 9)
+    self.assertEqual(metrics['num_batches'], 4)
+    self.assertEqual(metrics['num_padding_requests'], 3)
+    self.assertEqual(metrics['queue_depth'], 0)
+    self.assertEqual(metrics['max_queue_depth'], 9)
+    self.assertEqual(metrics['mean_batch_size'], 9 / 4)
+
+  def test_synthetic_load(self):
+    batcher = dynamic_batching.DynamicBatcher(
+        RecordingServingFn(delay_secs=0.01),
+        max_batch_size=8,
+        batch_timeout_secs=0.002,
+        bucket_boundaries=[8, 16],
+        bucketed_axes={'ids': [0]})
+    rng = np.random.RandomState(0)
+    lengths = rng.randint(1, 17, size=200)
+
+    def send(i):
+      time.sleep(rng.exponential(0.001))
+      return batcher.predict(_request(lengths[i], i))
+
+    with batcher, futures.ThreadPoolExecutor(16) as executor:
+      outputs = list(executor.map(send, range(len(lengths))))
+
+    for i, (length, output) in enumerate(zip(lengths, outputs)):
+      self.assertEqual(output['sums'], i * length)
+    metrics = batcher.get_metrics()
+    self.assertEqual(metrics['num_requests'], 200)
+    self.assertGreater(metrics['mean_batch_size'], 1.0)
+    self.assertGreater(metrics['latency_p99_secs'], 0.0)
+
+  def test_serving_errors_fail_the_requests(self):
+
+    def serving_fn(ids, features):
+      del ids, features
+      raise ValueError('Serving failed.')
+
+    with dynamic_batching.DynamicBatcher(serving_fn, max_batch_size=2) as b:
+      with self.assertRaisesRegex(ValueError, 'Serving failed.'):
+        b.predict(_request(2, 1))
+
+  def test_sliced_output_axes(self):
+
+    def serving_fn(ids, features):
+      del features
+      return {'doubled_ids': 2 * ids, 'padded_ids': ids}
+
+    batcher = dynamic_batching.DynamicBatcher(
+        serving_fn,
+        max_batch_size=4,
+        bucket_boundaries=[4, 8],
+        bucketed_axes={'ids': [0]},
+        sliced_output_axes={'doubled_ids': {0: ('ids', 0)}})
+    with batcher:
+      outputs = [batcher.predict(_request(length, 1)) for length in (3, 6)]
+
+    self.assertAllEqual(outputs[0]['doubled_ids'], [2] * 3)
+    self.assertAllEqual(outputs[1]['doubled_ids'], [2] * 6)
+    # The outputs not in `sliced_output_axes` keep the bucket length.
+    self.assertAllEqual(outputs[0]['padded_ids'], [1, 1, 1, 0])
+    self.assertAllEqual(outputs[1]['padded_ids'], [1] * 6 + [0] * 2)
+
+  def test_errors_after_served_requests(self):
+
+    def serving_fn(ids, features):
+      del ids, features
+      # Only has outputs for the first request of the batch.
+      return {'outputs': tf.zeros([1])}
+
+    batcher = dynamic_batching.DynamicBatcher(
+        serving_fn, max_batch_size=2, batch_timeout_secs=0.0)
+    first = batcher.submit(_request(2, 1))
+    second = batcher.submit(_request(2, 1))
+    with batcher:
+      self.assertEqual(first.result()['outputs'], 0.0)
+      with self.assertRaises(IndexError):
+        second.result()
+      # The worker keeps serving.
+      self.assertEqual(batcher.predict(_request(2, 1))['outputs'], 0.0)
+
+  def test_cancelled_requests_are_dropped(self):
+    serving_fn = RecordingServingFn()
+    batcher = dynamic_batching.DynamicBatcher(
+        serving_fn, max_batch_size=2, batch_timeout_secs=0.0)
+    cancelled = batcher.submit(_request(2, 1))
+    served = batcher.submit(_request(2, 2))
+    self.assertTrue(cancelled.cancel())
+    with batcher:
+      self.assertEqual(served.result()['sums'], 4)
+    self.assertEqual(serving_fn.shapes, [((1, 2), (1, 3))])
+
+  def test_max_queue_size(self):
+    batcher = dynamic_batching.DynamicBatcher(
+        RecordingServingFn(), max_batch_size=2, max_queue_size=1)
+    batcher.submit(_request(2, 1))
+    with self.assertRaisesRegex(RuntimeError, 'The queue has 1 requests.'):
+      batcher.submit(_request(2, 1))
+
+  def test_invalid_allowed_batch_sizes(self):
+    with self.assertRaisesRegex(ValueError, 'allowed_batch_sizes'):
+      dynamic_batching.DynamicBatcher(
+          RecordingServingFn(), max_batch_size=8, allowed_batch_sizes=[2, 4])
+
+
+if __name__ == '__main__':
+  tf.test.main()
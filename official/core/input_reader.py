@@ -13,7 +13,9 @@
 # limitations under the License.
 
 """A common dataset reader."""
+import contextlib
 import dataclasses
+import os
 import random
 from typing import Any, Callable, Dict, List, Optional, Sequence, Text, Union
 
@@ -22,12 +24,46 @@ import tensorflow as tf, tf_keras
 import tensorflow_datasets as tfds
 
 from official.core import config_definitions as cfg
+from official.core import dataset_snapshot
+
+
+# Lists of (stage name, dataset) recorded by `InputReader.read` while within
+# `record_stages()`.
+_stage_recorders = []
 
 
 def _get_random_integer():
   return random.randint(0, (1 << 31) - 1)
 
 
+@contextlib.contextmanager
+def record_stages():
+  """Records the intermediate datasets built by `InputReader.read`.
+
+  This is meant for analyzing the throughput of the input pipeline stage by
+  stage, see `official.core.input_reader_analyzer`.
+
+  Yields:
+    A list, to which a `(stage name, dataset)` tuple is appended every time
+    `InputReader.read` finishes building a stage of the pipeline. The stages
+    are, in order and when enabled: `read`, `decode`, `parse`, `filter`,
+    `cache`, `batch`, `postprocess` and `prefetch`. Stages where the dataset
+    is a dictionary of datasets are not recorded.
+  """
+  stages = []
+  _stage_recorders.append(stages)
+  try:
+    yield stages
+  finally:
+    _stage_recorders.remove(stages)
+
+
+def _record_stage(name: str, dataset: Any):
+  if _stage_recorders and isinstance(dataset, tf.data.Dataset):
+    for stages in _stage_recorders:
+      stages.append((name, dataset))
+
+
 def _maybe_map_fn(dataset: tf.data.Dataset,
                   fn: Optional[Callable[..., Any]] = None) -> tf.data.Dataset:
   """Calls dataset.map if a valid function is passed in."""
@@ -313,6 +349,15 @@ class InputReader:
     self._autotune_algorithm = params.autotune_algorithm
     self._ram_budget = params.ram_budget
 
+    if params.snapshot_dir and not isinstance(self._matched_files,
+                                              (list, tuple)):
+      raise ValueError('`snapshot_dir` requires `input_path` to be a file '
+                       'path/pattern or a list of them.')
+    self._snapshot_dir = params.snapshot_dir
+    self._snapshot_version = params.snapshot_version
+    self._snapshot_num_shards = params.snapshot_num_shards
+    self._snapshot_max_size_gb = params.snapshot_max_size_gb
+
     # When tf.data service is enabled, each data service worker should get
     # different random seeds. Thus, we set `seed` to None.
     # Sharding should also be disabled because tf data service handles how
@@ -458,11 +503,54 @@ class InputReader:
 
     return dataset
 
+  def _read_snapshot(
+      self,
+      input_context: Optional[tf.distribute.InputContext] = None
+  ) -> tf.data.Dataset:
+    """Reads the decoded examples from a snapshot, writing it if needed."""
+    key = dataset_snapshot.snapshot_key(self._matched_files, self._decoder_fn,
+                                        self._snapshot_version)
+    path = os.path.join(self._snapshot_dir, key)
+    if not dataset_snapshot.exists(path):
+      tf.io.gfile.makedirs(self._snapshot_dir)
+      dataset = tf.data.Dataset.from_tensor_slices(
+          self._matched_files).interleave(
+              self._dataset_fn,
+              num_parallel_calls=tf.data.experimental.AUTOTUNE,
+              deterministic=True)
+      dataset_snapshot.write(
+          _maybe_map_fn(dataset, self._decoder_fn), path,
+          self._snapshot_num_shards)
+      if self._snapshot_max_size_gb:
+        dataset_snapshot.evict(
+            self._snapshot_dir,
+            int(self._snapshot_max_size_gb * 1024 * 1024 * 1024),
+            keep=path)
+
+    # Same as for files, the shards must be shuffled in the same order by all
+    # the input pipelines.
+    seed = self._seed
+    if self._is_training and self._sharding and seed is None:
+      seed = _get_random_integer()
+    dataset = dataset_snapshot.load(
+        path,
+        self._snapshot_num_shards,
+        input_context,
+        sharding=self._sharding,
+        shuffle_shards=self._is_training,
+        seed=seed,
+        deterministic=self._deterministic)
+    # If cache is enabled, we will call `repeat()` later after `cache()`.
+    if self._is_training and not self._cache:
+      dataset = dataset.repeat()
+    return dataset
+
   def _decode_and_parse_dataset(
       self,
       dataset: Union[tf.data.Dataset, Dict[Text, tf.data.Dataset]],
       batch_size: int,
-      input_context: Optional[tf.distribute.InputContext] = None
+      input_context: Optional[tf.distribute.InputContext] = None,
+      decode: bool = True,
   ) -> tf.data.Dataset:
     """Returns a tf.data.Dataset object after shuffling, decoding, and parsing."""
 
@@ -471,25 +559,30 @@ class InputReader:
       if self._is_training and not self._cache:
         ds = ds.shuffle(self._shuffle_buffer_size, seed=self._seed)
       # Decode
-      ds = _maybe_map_fn(ds, self._decoder_fn)
+      if decode:
+        ds = _maybe_map_fn(ds, self._decoder_fn)
       return ds
 
     dataset = tf.nest.map_structure(_shuffle_and_decode, dataset)
     if tf.nest.is_nested(dataset):
       dataset = self._combine_fn(dataset)
+    _record_stage('decode', dataset)
 
     if self._sample_fn is not None:
       dataset = dataset.apply(self._sample_fn)
     dataset = _maybe_map_fn(dataset, self._parser_fn)
+    _record_stage('parse', dataset)
 
     if self._filter_fn is not None:
       dataset = dataset.filter(self._filter_fn)
+      _record_stage('filter', dataset)
 
     if self._cache:
       dataset = dataset.cache()
       if self._is_training:
         dataset = dataset.repeat()
         dataset = dataset.shuffle(self._shuffle_buffer_size, seed=self._seed)
+      _record_stage('cache', dataset)
 
     # Applies tf.data service before batching operations. This is useful when
     # tf.data service is shared between parallel trainers, and batch size is
@@ -511,6 +604,7 @@ class InputReader:
           batch_size) if input_context else batch_size
       dataset = dataset.batch(
           per_replica_batch_size, drop_remainder=self._drop_remainder)
+    _record_stage('batch', dataset)
 
     return dataset
 
@@ -570,12 +664,20 @@ class InputReader:
            input_context: Optional[tf.distribute.InputContext] = None,
            dataset: Optional[tf.data.Dataset] = None) -> tf.data.Dataset:
     """Generates a tf.data.Dataset object."""
+    # The examples of a snapshot are already decoded.
+    decode = dataset is not None or not self._snapshot_dir
     if dataset is None:
-      dataset = self._read_data_source(self._matched_files, self._dataset_fn,
-                                       input_context)
-    dataset = self._decode_and_parse_dataset(dataset, self._global_batch_size,
-                                             input_context)
-    dataset = _maybe_map_fn(dataset, self._postprocess_fn)
+      if self._snapshot_dir:
+        dataset = self._read_snapshot(input_context)
+      else:
+        dataset = self._read_data_source(self._matched_files, self._dataset_fn,
+                                         input_context)
+    _record_stage('read', dataset)
+    dataset = self._decode_and_parse_dataset(
+        dataset, self._global_batch_size, input_context, decode=decode)
+    if self._postprocess_fn is not None:
+      dataset = _maybe_map_fn(dataset, self._postprocess_fn)
+      _record_stage('postprocess', dataset)
     if not (self._enable_shared_tf_data_service_between_parallel_trainers and
             self._apply_tf_data_service_before_batching):
       dataset = self._maybe_apply_data_service(dataset, input_context)
@@ -596,4 +698,6 @@ class InputReader:
       options.autotune.ram_budget = self._ram_budget * 1024 * 1024 * 1024
       dataset = dataset.with_options(options)
 
-    return dataset.prefetch(self._prefetch_buffer_size)
+    dataset = dataset.prefetch(self._prefetch_buffer_size)
+    _record_stage('prefetch', dataset)
+    return dataset
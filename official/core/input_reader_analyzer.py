@@ -0,0 +1,190 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Finds the bottleneck of an `InputReader` pipeline and tunes its knobs.
+
+`analyze` builds the pipeline of a `DataConfig`, then measures the throughput
+of every prefix of the pipeline: the source alone, the source followed by
+decoding, and so on until the final prefetched batches. The stage adding the
+most time per example is reported as the bottleneck.
+
+`search` measures the end-to-end throughput while varying the reader knobs of
+the `DataConfig` one at a time, and keeps the best value of each.
+
+Both take a `build_dataset_fn` mapping a `DataConfig` to a dataset, which must
+read it with an `InputReader`, e.g. `task.build_inputs`. See
+`official/core/analyze_input_reader.py` for the command line tool.
+"""
+
+import dataclasses
+import time
+from typing import Any, Callable, Dict, List, Mapping, Optional, Sequence
+
+from absl import logging
+import tensorflow as tf, tf_keras
+
+from official.core import config_definitions as cfg
+from official.core import input_reader
+
+BuildDatasetFn = Callable[[cfg.DataConfig], tf.data.Dataset]
+
+# The stages of `InputReader.read` producing batches instead of examples.
+_BATCHED_STAGES = ('batch', 'postprocess', 'prefetch')
+
+DEFAULT_SEARCH_GRID = {
+    'cycle_length': [None, 4, 16, 64],
+    'block_length': [1, 4, 16],
+    'shuffle_buffer_size': [100, 1000, 10000],
+    'ram_budget': [None, 4, 16],
+    'autotune_algorithm': [None, 'GRADIENT_DESCENT', 'MAX_PARALLELISM'],
+}
+
+
+@dataclasses.dataclass
+class StageReport:
+  """The throughput of the pipeline up to and including a stage.
+
+  Attributes:
+    name: the name of the stage, see `input_reader.record_stages`.
+    examples_per_second: the number of examples per second produced by the
+      pipeline up to this stage.
+    added_seconds_per_example: the time per example added by this stage.
+  """
+  name: str
+  examples_per_second: float
+  added_seconds_per_example: float
+
+
+@dataclasses.dataclass
+class AnalysisReport:
+  """The result of `analyze`."""
+  stages: List[StageReport]
+  bottleneck: str
+
+  def __str__(self):
+    lines = ['%-12s %14s %14s' % ('stage', 'examples/sec', 'added usec/ex')]
+    for stage in self.stages:
+      lines.append('%-12s %14.1f %14.1f' %
+                   (stage.name, stage.examples_per_second,
+                    stage.added_seconds_per_example * 1e6))
+    lines.append('bottleneck: %s' % self.bottleneck)
+    return '\n'.join(lines)
+
+
+def _elements_per_second(dataset: tf.data.Dataset, num_elements: int,
+                         num_warmup_elements: int) -> float:
+  """Measures the number of elements per second produced by `dataset`."""
+  iterator = iter(dataset.take(num_warmup_elements + num_elements))
+  for _ in range(num_warmup_elements):
+    next(iterator, None)
+  count = 0
+  start = time.perf_counter()
+  for _ in iterator:
+    count += 1
+  elapsed = time.perf_counter() - start
+  if not count:
+    raise ValueError('The dataset is exhausted after the warm-up elements.')
+  return count / elapsed
+
+
+def analyze(build_dataset_fn: BuildDatasetFn,
+            data_config: cfg.DataConfig,
+            num_batches: int = 100,
+            num_warmup_batches: int = 10) -> AnalysisReport:
+  """Measures the throughput after each stage of an input pipeline.
+
+  Args:
+    build_dataset_fn: a function building the dataset of a `DataConfig` with
+      an `InputReader`.
+    data_config: the config of the dataset to analyze.
+    num_batches: the number of batches to measure each stage on. Stages before
+      batching are measured on as many examples.
+    num_warmup_batches: the number of batches to read before measuring.
+
+  Returns:
+    An `AnalysisReport`.
+  """
+  with input_reader.record_stages() as stages:
+    build_dataset_fn(data_config)
+  if not stages:
+    raise ValueError('`build_dataset_fn` did not use an `InputReader`.')
+
+  batch_size = data_config.global_batch_size
+  reports = []
+  previous_seconds_per_example = 0.0
+  for name, dataset in stages:
+    if name in _BATCHED_STAGES:
+      examples_per_second = batch_size * _elements_per_second(
+          dataset, num_batches, num_warmup_batches)
+    else:
+      examples_per_second = _elements_per_second(
+          dataset, num_batches * batch_size, num_warmup_batches * batch_size)
+    seconds_per_example = 1.0 / examples_per_second
+    reports.append(
+        StageReport(
+            name=name,
+            examples_per_second=examples_per_second,
+            added_seconds_per_example=(
+                seconds_per_example - previous_seconds_per_example)))
+    previous_seconds_per_example = seconds_per_example
+    logging.info('Stage %s: %.1f examples/sec.', name, examples_per_second)
+
+  bottleneck = max(reports, key=lambda r: r.added_seconds_per_example).name
+  return AnalysisReport(stages=reports, bottleneck=bottleneck)
+
+
+def search(build_dataset_fn: BuildDatasetFn,
+           data_config: cfg.DataConfig,
+           grid: Optional[Mapping[str, Sequence[Any]]] = None,
+           num_batches: int = 100,
+           num_warmup_batches: int = 10) -> Dict[str, Any]:
+  """Searches the reader knobs giving the highest end-to-end throughput.
+
+  The knobs are searched one at a time, in the order of `grid`, keeping the
+  best value found so far for the previous ones.
+
+  Args:
+    build_dataset_fn: a function building the dataset of a `DataConfig` with
+      an `InputReader`.
+    data_config: the config of the dataset to tune.
+    grid: a mapping from `DataConfig` attribute names to the values to try.
+      Defaults to `DEFAULT_SEARCH_GRID`.
+    num_batches: the number of batches to measure each config on.
+    num_warmup_batches: the number of batches to read before measuring.
+
+  Returns:
+    A dictionary with the recommended value of each knob of `grid`, and the
+    measured throughput of the recommended config in `examples_per_second`.
+  """
+  grid = DEFAULT_SEARCH_GRID if grid is None else grid
+  best = {name: getattr(data_config, name) for name in grid}
+  measured = {}
+
+  def measure(overrides):
+    key = tuple(sorted(overrides.items()))
+    if key not in measured:
+      dataset = build_dataset_fn(data_config.replace(**overrides))
+      measured[key] = data_config.global_batch_size * _elements_per_second(
+          dataset, num_batches, num_warmup_batches)
+      logging.info('%s: %.1f examples/sec.', overrides, measured[key])
+    return measured[key]
+
+  best_examples_per_second = measure(best)
+  for name, values in grid.items():
+    for value in values:
+      candidate = dict(best, **{name: value})
+      examples_per_second = measure(candidate)
+      if examples_per_second > best_examples_per_second:
+        best, best_examples_per_second = candidate, examples_per_second
+  return dict(best, examples_per_second=best_examples_per_second)
@@ -0,0 +1,105 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for input_reader_analyzer."""
+
+import os
+import time
+
+import tensorflow as tf, tf_keras
+
+from official.core import config_definitions as cfg
+from official.core import input_reader
+from official.core import input_reader_analyzer
+
+
+def _decode(serialized):
+  return tf.io.parse_single_example(
+      serialized, {'x': tf.io.FixedLenFeature([], tf.int64)})
+
+
+def _slow_parse(example):
+
+  def _sleep(x):
+    time.sleep(0.002)
+    return x
+
+  x = tf.py_function(_sleep, [example['x']], tf.int64)
+  x.set_shape([])
+  return x
+
+
+class InputReaderAnalyzerTest(tf.test.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    path = os.path.join(self.get_temp_dir(), 'data.tfrecord')
+    with tf.io.TFRecordWriter(path) as writer:
+      for i in range(64):
+        example = tf.train.Example(
+            features=tf.train.Features(feature={
+                'x': tf.train.Feature(int64_list=tf.train.Int64List(value=[i]))
+            }))
+        writer.write(example.SerializeToString())
+    self._data_config = cfg.DataConfig(
+        input_path=path,
+        global_batch_size=4,
+        is_training=True,
+        shuffle_buffer_size=16,
+        deterministic=True)
+
+  def _build_dataset(self, data_config):
+    return input_reader.InputReader(
+        data_config, decoder_fn=_decode, parser_fn=_slow_parse).read()
+
+  def test_record_stages(self):
+    with input_reader.record_stages() as stages:
+      self._build_dataset(self._data_config)
+    self.assertEqual([name for name, _ in stages],
+                     ['read', 'decode', 'parse', 'batch', 'prefetch'])
+    self.assertEqual(next(iter(stages[-1][1])).shape, [4])
+
+  def test_analyze_finds_bottleneck(self):
+    report = input_reader_analyzer.analyze(
+        self._build_dataset,
+        self._data_config,
+        num_batches=8,
+        num_warmup_batches=2)
+    self.assertEqual([stage.name for stage in report.stages],
+                     ['read', 'decode', 'parse', 'batch', 'prefetch'])
+    self.assertEqual(report.bottleneck, 'parse')
+    self.assertIn('bottleneck: parse', str(report))
+
+  def test_search(self):
+    grid = {'block_length': [1, 2], 'shuffle_buffer_size': [8]}
+    recommended = input_reader_analyzer.search(
+        self._build_dataset,
+        self._data_config,
+        grid=grid,
+        num_batches=4,
+        num_warmup_batches=1)
+    self.assertCountEqual(
+        recommended, ['block_length', 'shuffle_buffer_size',
+                      'examples_per_second'])
+    self.assertIn(recommended['block_length'], [1, 2])
+    self.assertGreater(recommended['examples_per_second'], 0)
+
+  def test_analyze_requires_input_reader(self):
+    with self.assertRaisesRegex(ValueError, 'InputReader'):
+      input_reader_analyzer.analyze(
+          lambda _: tf.data.Dataset.range(10), self._data_config)
+
+
+if __name__ == '__main__':
+  tf.test.main()
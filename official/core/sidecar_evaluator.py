@@ -0,0 +1,266 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A pool of local worker processes evaluating checkpoints in parallel.
+
+`orbit.Controller.evaluate_continuously` evaluates the latest checkpoint once
+the previous evaluation is done, so the checkpoints written in the meantime are
+skipped. `SidecarEvaluatorPool` instead dispatches every new checkpoint to one
+of several worker processes, each of which restores and evaluates it with its
+own trainer. The evaluated steps are recorded in a JSON ledger next to the eval
+summaries, so that a restarted job does not evaluate them again, and the
+summaries are written in step order.
+"""
+
+import json
+import multiprocessing as mp
+import os
+import re
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from absl import logging
+import numpy as np
+import orbit
+import tensorflow as tf, tf_keras
+
+from official.core import base_task
+from official.core import config_definitions
+from official.core import train_utils
+
+_LEDGER_FILENAME = 'sidecar_eval_ledger.json'
+
+# The trainer of a worker process, built once by `_init_worker`.
+_worker_trainer = None
+
+
+def _init_worker(task_cls: Type[base_task.Task],
+                 params: config_definitions.ExperimentConfig, model_dir: str):
+  """Builds the trainer of a worker process."""
+  global _worker_trainer
+  task = task_cls(params.task, logging_dir=model_dir)
+  _worker_trainer = train_utils.create_trainer(
+      params, task, train=False, evaluate=True)
+
+
+def _evaluate_checkpoint(checkpoint_path: str,
+                         steps: int) -> Optional[Dict[str, Any]]:
+  """Restores and evaluates a checkpoint in a worker process.
+
+  Args:
+    checkpoint_path: the path of the checkpoint to evaluate.
+    steps: the number of evaluation steps to run, or -1.
+
+  Returns:
+    The evaluation logs as NumPy values, or `None` if the checkpoint was deleted
+    before it could be restored.
+  """
+  trainer = _worker_trainer
+  try:
+    trainer.checkpoint.restore(checkpoint_path).expect_partial()
+  except tf.errors.NotFoundError:
+    return None
+  logs = trainer.evaluate(tf.convert_to_tensor(steps, dtype=tf.int32))
+  if callable(logs):
+    logs = logs()
+  return tf.nest.map_structure(orbit.utils.get_value, logs or {})
+
+
+def _checkpoint_step(checkpoint_path: str) -> Optional[int]:
+  """Returns the step of a `CheckpointManager` checkpoint, e.g. `ckpt-100`."""
+  match = re.search(r'-(\d+)$', checkpoint_path)
+  return int(match.group(1)) if match else None
+
+
+def _to_json(value):
+  """Converts NumPy values of eval logs to JSON compatible ones."""
+  if isinstance(value, dict):
+    return {k: _to_json(v) for k, v in value.items()}
+  if isinstance(value, (np.ndarray, np.generic)):
+    return value.tolist()
+  return value
+
+
+class _Ledger:
+  """An on-disk record of the evaluated steps and their logs."""
+
+  def __init__(self, path: str):
+    self._path = path
+    self._entries = {}
+    if tf.io.gfile.exists(path):
+      with tf.io.gfile.GFile(path, 'r') as f:
+        self._entries = {int(k): v for k, v in json.load(f).items()}
+
+  def __contains__(self, step: int) -> bool:
+    return step in self._entries
+
+  @property
+  def steps(self) -> List[int]:
+    return sorted(self._entries)
+
+  def record(self, step: int, logs: Optional[Dict[str, Any]]):
+    self._entries[step] = _to_json(logs)
+    # Writes to a temporary file first, so that the ledger is never partially
+    # written if the job is preempted.
+    tmp_path = self._path + '.tmp'
+    with tf.io.gfile.GFile(tmp_path, 'w') as f:
+      json.dump({str(k): v for k, v in sorted(self._entries.items())}, f)
+    tf.io.gfile.rename(tmp_path, self._path, overwrite=True)
+
+
+class SidecarEvaluatorPool:
+  """Evaluates all the checkpoints of a model directory with worker processes.
+
+  Every worker builds its own trainer from `params`, so the evaluation must fit
+  on the devices visible to each process, e.g. one worker per GPU with
+  `CUDA_VISIBLE_DEVICES` set by the caller, or CPU-only evaluations. Best
+  checkpoint export and eval actions are not supported.
+
+  Example:
+
+  ```python
+  pool = SidecarEvaluatorPool(
+      task_cls=type(task), params=params, model_dir=model_dir, num_workers=4,
+      summary_manager=orbit.utils.SummaryManager(eval_dir, tf.summary.scalar))
+  pool.evaluate_continuously(steps=-1, timeout=3600)
+  ```
+  """
+
+  def __init__(self,
+               task_cls: Type[base_task.Task],
+               params: config_definitions.ExperimentConfig,
+               model_dir: str,
+               num_workers: int,
+               summary_manager: Optional[
+                   orbit.utils.SummaryManagerInterface] = None,
+               ledger_dir: Optional[str] = None):
+    """Initializes the pool.
+
+    Args:
+      task_cls: the class of the task, instantiated in every worker with
+        `task_cls(params.task, logging_dir=model_dir)`.
+      params: the experiment config.
+      model_dir: the directory holding the checkpoints to evaluate.
+      num_workers: the number of worker processes.
+      summary_manager: an optional summary manager to write the eval logs with.
+      ledger_dir: the directory of the ledger of evaluated steps. Defaults to
+        `model_dir`.
+    """
+    if num_workers < 1:
+      raise ValueError(
+          f'`num_workers` ({num_workers}) must be a positive integer.')
+    self._task_cls = task_cls
+    self._params = params
+    self._model_dir = model_dir
+    self._num_workers = num_workers
+    self._summary_manager = summary_manager
+    ledger_dir = ledger_dir or model_dir
+    tf.io.gfile.makedirs(ledger_dir)
+    self._ledger = _Ledger(os.path.join(ledger_dir, _LEDGER_FILENAME))
+
+  @property
+  def evaluated_steps(self) -> List[int]:
+    """The steps evaluated so far, including by previous runs."""
+    return self._ledger.steps
+
+  @property
+  def latest_evaluated_step(self) -> int:
+    """The latest evaluated step, or -1 if none was evaluated yet."""
+    steps = self._ledger.steps
+    return steps[-1] if steps else -1
+
+  def _new_checkpoints(self, skip_steps) -> List[Tuple[int, str]]:
+    """Returns the (step, path) of the checkpoints not evaluated yet."""
+    state = tf.train.get_checkpoint_state(self._model_dir)
+    if state is None:
+      return []
+    checkpoints = []
+    for path in state.all_model_checkpoint_paths:
+      step = _checkpoint_step(path)
+      if step is None:
+        logging.warning('Skipping checkpoint %s without a step.', path)
+      elif step not in self._ledger and step not in skip_steps:
+        checkpoints.append((step, path))
+    return sorted(checkpoints)
+
+  def _write(self, step: int, logs: Optional[Dict[str, Any]]):
+    """Records the logs of a step in the ledger and the summaries."""
+    self._ledger.record(step, logs)
+    if logs is None:
+      logging.warning('Checkpoint of step %d was deleted before it could be '
+                      'evaluated.', step)
+      return
+    logging.info('Sidecar eval | step: %6d | output: %s', step, logs)
+    if self._summary_manager is not None:
+      self._summary_manager.write_summaries(logs, step=step)
+      self._summary_manager.flush()
+
+  def evaluate_continuously(
+      self,
+      steps: int = -1,
+      timeout: Optional[float] = None,
+      timeout_fn: Optional[Callable[[], bool]] = None,
+      poll_interval_secs: float = 1.0) -> Dict[int, Dict[str, Any]]:
+    """Evaluates the new checkpoints of `model_dir` as they appear.
+
+    Args:
+      steps: the number of evaluation steps to run, or -1 to evaluate the whole
+        dataset.
+      timeout: the maximum number of seconds to wait for a new checkpoint once
+        all the evaluations are done. If `None`, waits indefinitely.
+      timeout_fn: optional callable called after a timeout. If it returns
+        `True`, no new checkpoints are expected and this method returns. Same
+        as for `tf.train.checkpoints_iterator`.
+      poll_interval_secs: the number of seconds between checks for new
+        checkpoints and finished evaluations.
+
+    Returns:
+      A dictionary mapping the steps evaluated by this call to their logs.
+    """
+    outputs = {}
+    pending = {}
+    finished = {}
+    last_activity = time.time()
+    context = mp.get_context('spawn')
+    with context.Pool(
+        self._num_workers,
+        initializer=_init_worker,
+        initargs=(self._task_cls, self._params, self._model_dir)) as pool:
+      while True:
+        for step, path in self._new_checkpoints(
+            set(pending) | set(finished)):
+          logging.info('Dispatching checkpoint %s for evaluation.', path)
+          pending[step] = pool.apply_async(_evaluate_checkpoint, (path, steps))
+          last_activity = time.time()
+
+        for step in [step for step, result in pending.items() if result.ready()]:
+          finished[step] = pending.pop(step).get()
+          last_activity = time.time()
+
+        # Only writes the steps before all the pending ones, so that summaries
+        # are written in step order.
+        first_pending_step = min(pending) if pending else None
+        for step in sorted(finished):
+          if first_pending_step is not None and step > first_pending_step:
+            break
+          outputs[step] = finished.pop(step)
+          self._write(step, outputs[step])
+
+        if (not pending and timeout is not None and
+            time.time() - last_activity > timeout):
+          if timeout_fn is None or timeout_fn():
+            break
+          last_activity = time.time()
+        time.sleep(poll_interval_secs)
+    return {step: logs for step, logs in outputs.items() if logs is not None}
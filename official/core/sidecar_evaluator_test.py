@@ -0,0 +1,102 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for sidecar_evaluator."""
+
+import os
+
+import orbit
+import tensorflow as tf, tf_keras
+
+from official.core import config_definitions as cfg
+from official.core import sidecar_evaluator
+from official.core import train_utils
+from official.utils.testing import mock_task
+
+
+class SidecarEvaluatorPoolTest(tf.test.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self._params = cfg.ExperimentConfig(
+        task=mock_task.MockTaskConfig(),
+        trainer=cfg.TrainerConfig(
+            validation_steps=2,
+            optimizer_config=cfg.OptimizationConfig({
+                'optimizer': {
+                    'type': 'sgd'
+                },
+                'learning_rate': {
+                    'type': 'constant'
+                }
+            })))
+
+  def _save_checkpoints(self, model_dir, steps):
+    task = mock_task.MockTask(self._params.task)
+    trainer = train_utils.create_trainer(
+        self._params, task, train=True, evaluate=False)
+    manager = tf.train.CheckpointManager(
+        trainer.checkpoint, model_dir, max_to_keep=None)
+    for step in steps:
+      trainer.global_step.assign(step)
+      manager.save(checkpoint_number=step)
+
+  def test_evaluates_all_checkpoints_in_order(self):
+    model_dir = self.get_temp_dir()
+    summary_dir = os.path.join(model_dir, 'validation')
+    self._save_checkpoints(model_dir, [10, 20, 30])
+
+    pool = sidecar_evaluator.SidecarEvaluatorPool(
+        task_cls=mock_task.MockTask,
+        params=self._params,
+        model_dir=model_dir,
+        num_workers=2,
+        summary_manager=orbit.utils.SummaryManager(summary_dir,
+                                                   tf.summary.scalar))
+    outputs = pool.evaluate_continuously(
+        steps=2, timeout=1, poll_interval_secs=0.1)
+
+    self.assertEqual(sorted(outputs), [10, 20, 30])
+    self.assertIn('counter', outputs[10])
+    self.assertEqual(pool.evaluated_steps, [10, 20, 30])
+    summary_steps = []
+    for path in tf.io.gfile.glob(os.path.join(summary_dir, 'events*')):
+      for event in tf.compat.v1.train.summary_iterator(path):
+        if any(value.tag == 'counter' for value in event.summary.value):
+          summary_steps.append(event.step)
+    self.assertEqual(summary_steps, [10, 20, 30])
+
+    # Evaluated steps are not evaluated again, e.g. after a restart.
+    self._save_checkpoints(model_dir, [40])
+    pool = sidecar_evaluator.SidecarEvaluatorPool(
+        task_cls=mock_task.MockTask,
+        params=self._params,
+        model_dir=model_dir,
+        num_workers=1)
+    outputs = pool.evaluate_continuously(
+        steps=2, timeout=1, poll_interval_secs=0.1)
+    self.assertEqual(sorted(outputs), [40])
+    self.assertEqual(pool.latest_evaluated_step, 40)
+
+  def test_invalid_num_workers(self):
+    with self.assertRaisesRegex(ValueError, 'num_workers'):
+      sidecar_evaluator.SidecarEvaluatorPool(
+          task_cls=mock_task.MockTask,
+          params=self._params,
+          model_dir=self.get_temp_dir(),
+          num_workers=0)
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -28,7 +28,9 @@ from official.core import actions
 from official.core import base_task
 from official.core import base_trainer
 from official.core import config_definitions
+from official.core import sidecar_evaluator
 from official.core import train_utils
+from official.modeling import optimization
 
 maybe_create_best_ckpt_exporter = train_utils.maybe_create_best_ckpt_exporter
 
@@ -219,6 +221,13 @@ class OrbitExperimentRunner:
       eval_actions += actions.get_eval_actions(self.params, evaluator,
                                                self.model_dir)
 
+    enable_async_eval = self.params.trainer.async_eval
+    if enable_async_eval and isinstance(
+        self.trainer.optimizer, optimization.ExponentialMovingAverage):
+      # The EMA checkpointing action swaps the model weights.
+      logging.warning('`async_eval` is not supported with an EMA optimizer.')
+      enable_async_eval = False
+
     if save_summary:
       eval_summary_dir = os.path.join(
           self.model_dir, self.params.trainer.validation_summary_subdir
@@ -234,6 +243,7 @@ class OrbitExperimentRunner:
         steps_per_loop=self.params.trainer.steps_per_loop,
         checkpoint_manager=self.checkpoint_manager,
         enable_async_checkpointing=enable_async_checkpointing,
+        enable_async_eval=enable_async_eval,
         summary_dir=os.path.join(self.model_dir, 'train')
         if (save_summary)
         else None,
@@ -252,6 +262,26 @@ class OrbitExperimentRunner:
     )
     return controller
 
+  def _evaluate_continuously_with_workers(self):
+    """Evaluates every new checkpoint with a pool of worker processes."""
+    params = self.params
+    if params.trainer.best_checkpoint_export_subdir:
+      logging.warning('Best checkpoint export is not supported with '
+                      '`continuous_eval_num_workers` > 0.')
+    pool = sidecar_evaluator.SidecarEvaluatorPool(
+        task_cls=type(self.trainer.task),
+        params=params,
+        model_dir=self.model_dir,
+        num_workers=params.trainer.continuous_eval_num_workers,
+        summary_manager=self.controller.eval_summary_manager,
+        ledger_dir=os.path.join(self.model_dir,
+                                params.trainer.validation_summary_subdir))
+    pool.evaluate_continuously(
+        steps=params.trainer.validation_steps,
+        timeout=params.trainer.continuous_eval_timeout,
+        timeout_fn=lambda: (  # pylint: disable=g-long-lambda
+            pool.latest_evaluated_step >= params.trainer.train_steps))
+
   def run(self) -> Tuple[tf_keras.Model, Mapping[str, Any]]:
     """Run experiments by mode.
 
@@ -275,16 +305,19 @@ class OrbitExperimentRunner:
       elif mode == 'eval':
         self.controller.evaluate(steps=params.trainer.validation_steps)
       elif mode == 'continuous_eval':
-
-        def timeout_fn():
-          if self.trainer.global_step.numpy() >= params.trainer.train_steps:
-            return True
-          return False
-
-        self.controller.evaluate_continuously(
-            steps=params.trainer.validation_steps,
-            timeout=params.trainer.continuous_eval_timeout,
-            timeout_fn=timeout_fn)
+        if params.trainer.continuous_eval_num_workers > 0:
+          self._evaluate_continuously_with_workers()
+        else:
+
+          def timeout_fn():
+            if self.trainer.global_step.numpy() >= params.trainer.train_steps:
+              return True
+            return False
+
+          self.controller.evaluate_continuously(
+              steps=params.trainer.validation_steps,
+              timeout=params.trainer.continuous_eval_timeout,
+              timeout_fn=timeout_fn)
       else:
         raise NotImplementedError('The mode is not implemented: %s' % mode)
 
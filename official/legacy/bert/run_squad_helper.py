@@ -88,6 +88,10 @@ def define_common_squad_flags():
       'The maximum length of an answer that can be generated. This is needed '
       'because the start and end predictions are not conditioned on one '
       'another.')
+  flags.DEFINE_integer(
+      'num_processes', 0,
+      'The number of processes featurizing and postprocessing the predict '
+      'examples with WordPiece tokenization. If 0, uses this process.')
 
   common_flags.define_common_bert_flags()
 
@@ -321,6 +325,10 @@ def prediction_output_squad(strategy, input_meta_data, tokenizer, squad_lib,
   # squad_lib_sp requires one more argument 'do_lower_case'.
   if squad_lib == squad_lib_sp:
     kwargs['do_lower_case'] = FLAGS.do_lower_case
+    postprocess_kwargs = {}
+  else:
+    kwargs['num_processes'] = FLAGS.num_processes
+    postprocess_kwargs = dict(num_processes=FLAGS.num_processes)
   dataset_size = squad_lib.convert_examples_to_features(**kwargs)
   eval_writer.close()
 
@@ -344,7 +352,8 @@ def prediction_output_squad(strategy, input_meta_data, tokenizer, squad_lib,
           FLAGS.do_lower_case,
           version_2_with_negative=version_2_with_negative,
           null_score_diff_threshold=FLAGS.null_score_diff_threshold,
-          verbose=FLAGS.verbose_logging))
+          verbose=FLAGS.verbose_logging,
+          **postprocess_kwargs))
 
   return all_predictions, all_nbest_json, scores_diff_json
 
@@ -50,6 +50,9 @@ class BertEncoderConfig(hyperparams.Config):
   return_word_embeddings: bool = False
   # Pre/Post-LN Transformer
   norm_first: bool = False
+  # Whether the inputs pack several sequences, see
+  # `official.nlp.data.sequence_packing`. Only supported by `bert_v2`.
+  pack_multiple_sequences: bool = False
 
 
 @dataclasses.dataclass
@@ -747,8 +750,13 @@ def build_encoder(config: EncoderConfig,
         embedding_layer=embedding_layer)
 
   bert_encoder_cls = networks.BertEncoder
+  kwargs = {}
   if encoder_type == "bert_v2":
     bert_encoder_cls = networks.BertEncoderV2
+    kwargs["pack_multiple_sequences"] = encoder_cfg.pack_multiple_sequences
+  elif encoder_cfg.pack_multiple_sequences:
+    raise ValueError("`pack_multiple_sequences` is only supported by the "
+                     "`bert_v2` encoder, got %s." % encoder_type)
 
   # Uses the default BERTEncoder configuration schema to create the encoder.
   # If it does not match, please add a switch branch by the encoder type.
@@ -772,4 +780,5 @@ def build_encoder(config: EncoderConfig,
       return_attention_scores=encoder_cfg.return_attention_scores,
       return_word_embeddings=encoder_cfg.return_word_embeddings,
       dict_outputs=True,
-      norm_first=encoder_cfg.norm_first)
+      norm_first=encoder_cfg.norm_first,
+      **kwargs)
@@ -15,14 +15,19 @@
 """Create masked LM/next sentence masked_lm TF examples for BERT."""
 
 import collections
+import contextlib
+import functools
 import itertools
+import multiprocessing as mp
 import random
+import time
 
 # Import libraries
 
 from absl import app
 from absl import flags
 from absl import logging
+import numpy as np
 import tensorflow as tf, tf_keras
 
 from official.nlp.tools import tokenization
@@ -100,10 +105,34 @@ flags.DEFINE_float(
     "Probability of creating sequences which are shorter than the "
     "maximum length.")
 
+flags.DEFINE_bool(
+    "streaming", False,
+    "Whether to stream the input files instead of loading them in memory. "
+    "The input files are split between the output files, which are written "
+    "in parallel, each by a single process.")
+
+flags.DEFINE_integer(
+    "num_processes", None,
+    "In streaming mode, the number of processes writing the output files. If "
+    "None, uses `os.cpu_count()`. If 0, disables multi-processing.")
+
+flags.DEFINE_integer(
+    "document_window_size", 10000,
+    "In streaming mode, the number of most recent documents to sample the "
+    "random next sentences from.")
+
+flags.DEFINE_integer(
+    "shuffle_buffer_size", 100000,
+    "In streaming mode, the number of instances buffered to shuffle them "
+    "before writing.")
+
 
 class TrainingInstance(object):
   """A single training instance (sentence pair)."""
 
+  __slots__ = ("tokens", "segment_ids", "is_random_next",
+               "masked_lm_positions", "masked_lm_labels")
+
   def __init__(self, tokens, segment_ids, masked_lm_positions, masked_lm_labels,
                is_random_next):
     self.tokens = tokens
@@ -129,6 +158,99 @@ class TrainingInstance(object):
     return self.__str__()
 
 
+class CompactTrainingInstance(object):
+  """A `TrainingInstance` holding token ids in NumPy arrays.
+
+  It takes a fraction of the memory of a `TrainingInstance`, whose tokens are
+  lists of Python strings, and is used to keep the instances of a whole corpus
+  in memory before shuffling them.
+  """
+
+  __slots__ = ("input_ids", "segment_ids", "is_random_next",
+               "masked_lm_positions", "masked_lm_ids")
+
+  def __init__(self, input_ids, segment_ids, masked_lm_positions,
+               masked_lm_ids, is_random_next):
+    self.input_ids = np.asarray(input_ids, dtype=np.int32)
+    self.segment_ids = np.asarray(segment_ids, dtype=np.int8)
+    self.masked_lm_positions = np.asarray(masked_lm_positions, dtype=np.int32)
+    self.masked_lm_ids = np.asarray(masked_lm_ids, dtype=np.int32)
+    self.is_random_next = is_random_next
+
+  @classmethod
+  def from_instance(cls, instance, tokenizer):
+    """Converts a `TrainingInstance` with the vocab of `tokenizer`."""
+    return cls(
+        input_ids=tokenizer.convert_tokens_to_ids(instance.tokens),
+        segment_ids=instance.segment_ids,
+        masked_lm_positions=instance.masked_lm_positions,
+        masked_lm_ids=tokenizer.convert_tokens_to_ids(
+            instance.masked_lm_labels),
+        is_random_next=instance.is_random_next)
+
+
+def _pad(values, length, dtype):
+  padded = np.zeros([length], dtype=dtype)
+  padded[:len(values)] = values
+  return padded
+
+
+def _create_features(instance, tokenizer, max_seq_length,
+                     max_predictions_per_seq, use_v2_feature_names):
+  """Creates the `tf.train.Feature`s of a `TrainingInstance`.
+
+  Args:
+    instance: a `TrainingInstance` or a `CompactTrainingInstance`.
+    tokenizer: the tokenizer converting the tokens of a `TrainingInstance`.
+    max_seq_length: the maximum sequence length.
+    max_predictions_per_seq: the maximum number of masked LM predictions per
+      sequence.
+    use_v2_feature_names: whether to use the feature names of the models.
+
+  Returns:
+    An `OrderedDict` of `tf.train.Feature`s.
+  """
+  if isinstance(instance, CompactTrainingInstance):
+    input_ids = instance.input_ids
+    masked_lm_ids = instance.masked_lm_ids
+  else:
+    input_ids = tokenizer.convert_tokens_to_ids(instance.tokens)
+    masked_lm_ids = tokenizer.convert_tokens_to_ids(instance.masked_lm_labels)
+  assert len(input_ids) <= max_seq_length
+
+  # The features are padded as arrays, then converted to lists of Python ints
+  # in a single `tolist` call each.
+  num_tokens = len(input_ids)
+  input_mask = _pad(np.ones([num_tokens], np.int64), max_seq_length, np.int64)
+  input_ids = _pad(input_ids, max_seq_length, np.int64)
+  segment_ids = _pad(instance.segment_ids, max_seq_length, np.int64)
+
+  num_predictions = len(masked_lm_ids)
+  masked_lm_positions = _pad(instance.masked_lm_positions,
+                             max_predictions_per_seq, np.int64)
+  masked_lm_ids = _pad(masked_lm_ids, max_predictions_per_seq, np.int64)
+  masked_lm_weights = _pad(
+      np.ones([num_predictions], np.float32), max_predictions_per_seq,
+      np.float32)
+
+  next_sentence_label = 1 if instance.is_random_next else 0
+
+  features = collections.OrderedDict()
+  if use_v2_feature_names:
+    features["input_word_ids"] = create_int_feature(input_ids)
+    features["input_type_ids"] = create_int_feature(segment_ids)
+  else:
+    features["input_ids"] = create_int_feature(input_ids)
+    features["segment_ids"] = create_int_feature(segment_ids)
+
+  features["input_mask"] = create_int_feature(input_mask)
+  features["masked_lm_positions"] = create_int_feature(masked_lm_positions)
+  features["masked_lm_ids"] = create_int_feature(masked_lm_ids)
+  features["masked_lm_weights"] = create_float_feature(masked_lm_weights)
+  features["next_sentence_labels"] = create_int_feature([next_sentence_label])
+  return features
+
+
 def write_instance_to_example_files(instances, tokenizer, max_seq_length,
                                     max_predictions_per_seq, output_files,
                                     gzip_compress, use_v2_feature_names):
@@ -143,45 +265,8 @@ def write_instance_to_example_files(instances, tokenizer, max_seq_length,
 
   total_written = 0
   for (inst_index, instance) in enumerate(instances):
-    input_ids = tokenizer.convert_tokens_to_ids(instance.tokens)
-    input_mask = [1] * len(input_ids)
-    segment_ids = list(instance.segment_ids)
-    assert len(input_ids) <= max_seq_length
-
-    while len(input_ids) < max_seq_length:
-      input_ids.append(0)
-      input_mask.append(0)
-      segment_ids.append(0)
-
-    assert len(input_ids) == max_seq_length
-    assert len(input_mask) == max_seq_length
-    assert len(segment_ids) == max_seq_length
-
-    masked_lm_positions = list(instance.masked_lm_positions)
-    masked_lm_ids = tokenizer.convert_tokens_to_ids(instance.masked_lm_labels)
-    masked_lm_weights = [1.0] * len(masked_lm_ids)
-
-    while len(masked_lm_positions) < max_predictions_per_seq:
-      masked_lm_positions.append(0)
-      masked_lm_ids.append(0)
-      masked_lm_weights.append(0.0)
-
-    next_sentence_label = 1 if instance.is_random_next else 0
-
-    features = collections.OrderedDict()
-    if use_v2_feature_names:
-      features["input_word_ids"] = create_int_feature(input_ids)
-      features["input_type_ids"] = create_int_feature(segment_ids)
-    else:
-      features["input_ids"] = create_int_feature(input_ids)
-      features["segment_ids"] = create_int_feature(segment_ids)
-
-    features["input_mask"] = create_int_feature(input_mask)
-    features["masked_lm_positions"] = create_int_feature(masked_lm_positions)
-    features["masked_lm_ids"] = create_int_feature(masked_lm_ids)
-    features["masked_lm_weights"] = create_float_feature(masked_lm_weights)
-    features["next_sentence_labels"] = create_int_feature([next_sentence_label])
-
+    features = _create_features(instance, tokenizer, max_seq_length,
+                                max_predictions_per_seq, use_v2_feature_names)
     tf_example = tf.train.Example(features=tf.train.Features(feature=features))
 
     writers[writer_index].write(tf_example.SerializeToString())
@@ -190,9 +275,13 @@ def write_instance_to_example_files(instances, tokenizer, max_seq_length,
     total_written += 1
 
     if inst_index < 20:
+      if isinstance(instance, CompactTrainingInstance):
+        tokens = tokenizer.convert_ids_to_tokens(instance.input_ids.tolist())
+      else:
+        tokens = instance.tokens
       logging.info("*** Example ***")
       logging.info("tokens: %s", " ".join(
-          [tokenization.printable_text(x) for x in instance.tokens]))
+          [tokenization.printable_text(x) for x in tokens]))
 
       for feature_name in features.keys():
         feature = features[feature_name]
@@ -210,12 +299,14 @@ def write_instance_to_example_files(instances, tokenizer, max_seq_length,
 
 
 def create_int_feature(values):
-  feature = tf.train.Feature(int64_list=tf.train.Int64List(value=list(values)))
+  feature = tf.train.Feature(
+      int64_list=tf.train.Int64List(value=np.asarray(values).tolist()))
   return feature
 
 
 def create_float_feature(values):
-  feature = tf.train.Feature(float_list=tf.train.FloatList(value=list(values)))
+  feature = tf.train.Feature(
+      float_list=tf.train.FloatList(value=np.asarray(values).tolist()))
   return feature
 
 
@@ -231,8 +322,30 @@ def create_training_instances(
     rng,
     do_whole_word_mask=False,
     max_ngram_size=None,
+    compact=False,
 ):
-  """Create `TrainingInstance`s from raw text."""
+  """Create `TrainingInstance`s from raw text.
+
+  Args:
+    input_files: the raw text files.
+    tokenizer: the tokenizer of the sentences.
+    processor_text_fn: the function preprocessing a line of text.
+    max_seq_length: the maximum sequence length.
+    dupe_factor: the number of times to duplicate the documents, with
+      different masks.
+    short_seq_prob: the probability of creating shorter sequences.
+    masked_lm_prob: the masked LM probability.
+    max_predictions_per_seq: the maximum number of masked LM predictions per
+      sequence.
+    rng: `random.Random` generator.
+    do_whole_word_mask: whether to use whole word masking.
+    max_ngram_size: the maximum size of the masked n-grams.
+    compact: whether to return `CompactTrainingInstance`s, which take a
+      fraction of the memory of `TrainingInstance`s.
+
+  Returns:
+    A shuffled list of `TrainingInstance`s or `CompactTrainingInstance`s.
+  """
   all_documents = [[]]
 
   # Input file format:
@@ -261,16 +374,256 @@ def create_training_instances(
   instances = []
   for _ in range(dupe_factor):
     for document_index in range(len(all_documents)):
-      instances.extend(
-          create_instances_from_document(
-              all_documents, document_index, max_seq_length, short_seq_prob,
-              masked_lm_prob, max_predictions_per_seq, vocab_words, rng,
-              do_whole_word_mask, max_ngram_size))
+      document_instances = create_instances_from_document(
+          all_documents, document_index, max_seq_length, short_seq_prob,
+          masked_lm_prob, max_predictions_per_seq, vocab_words, rng,
+          do_whole_word_mask, max_ngram_size)
+      if compact:
+        document_instances = [
+            CompactTrainingInstance.from_instance(instance, tokenizer)
+            for instance in document_instances
+        ]
+      instances.extend(document_instances)
 
   rng.shuffle(instances)
   return instances
 
 
+def _iterate_documents(input_files, tokenizer, processor_text_fn):
+  """Yields the tokenized documents of `input_files`, one at a time.
+
+  Same input format as for `create_training_instances`.
+
+  Args:
+    input_files: the raw text files.
+    tokenizer: the tokenizer of the sentences.
+    processor_text_fn: the function preprocessing a line of text.
+
+  Yields:
+    The documents, as lists of tokenized sentences.
+  """
+  document = []
+  for input_file in input_files:
+    with tf.io.gfile.GFile(input_file, "rb") as reader:
+      for line in reader:
+        line = processor_text_fn(line)
+
+        # Empty lines are used as document delimiters
+        if not line:
+          if document:
+            yield document
+          document = []
+        tokens = tokenizer.tokenize(line)
+        if tokens:
+          document.append(tokens)
+  if document:
+    yield document
+
+
+def create_training_instances_streaming(
+    documents,
+    vocab_words,
+    max_seq_length,
+    dupe_factor,
+    short_seq_prob,
+    masked_lm_prob,
+    max_predictions_per_seq,
+    rng,
+    do_whole_word_mask=False,
+    max_ngram_size=None,
+    document_window_size=10000,
+    shuffle_buffer_size=100000,
+):
+  """Yields shuffled `TrainingInstance`s from a stream of documents.
+
+  Unlike `create_training_instances`, only a bounded number of documents and
+  instances are kept in memory: the random next sentences are sampled from the
+  `document_window_size` most recent documents, and the instances are shuffled
+  with a buffer of `shuffle_buffer_size` instances. The `dupe_factor` copies of
+  the instances of a document are created when the document is read.
+
+  Args:
+    documents: an iterable of documents, as lists of tokenized sentences.
+    vocab_words: the vocab words, to sample the random masked tokens from.
+    max_seq_length: the maximum sequence length.
+    dupe_factor: the number of times to duplicate the documents, with
+      different masks.
+    short_seq_prob: the probability of creating shorter sequences.
+    masked_lm_prob: the masked LM probability.
+    max_predictions_per_seq: the maximum number of masked LM predictions per
+      sequence.
+    rng: `random.Random` generator.
+    do_whole_word_mask: whether to use whole word masking.
+    max_ngram_size: the maximum size of the masked n-grams.
+    document_window_size: the number of most recent documents to sample the
+      random next sentences from.
+    shuffle_buffer_size: the number of instances to shuffle.
+
+  Yields:
+    `TrainingInstance`s.
+  """
+  # A ring buffer of the most recent documents.
+  window = []
+  buffer = []
+  for index, document in enumerate(documents):
+    document_index = index % document_window_size
+    if len(window) < document_window_size:
+      window.append(document)
+    else:
+      window[document_index] = document
+
+    for _ in range(dupe_factor):
+      for instance in create_instances_from_document(
+          window, document_index, max_seq_length, short_seq_prob,
+          masked_lm_prob, max_predictions_per_seq, vocab_words, rng,
+          do_whole_word_mask, max_ngram_size):
+        if len(buffer) < shuffle_buffer_size:
+          buffer.append(instance)
+        else:
+          i = rng.randrange(shuffle_buffer_size)
+          yield buffer[i]
+          buffer[i] = instance
+
+  rng.shuffle(buffer)
+  yield from buffer
+
+
+def create_pretraining_shard(input_files,
+                             output_file,
+                             tokenizer_fn,
+                             processor_text_fn,
+                             seed,
+                             max_seq_length,
+                             max_predictions_per_seq,
+                             dupe_factor,
+                             short_seq_prob,
+                             masked_lm_prob,
+                             do_whole_word_mask=False,
+                             max_ngram_size=None,
+                             document_window_size=10000,
+                             shuffle_buffer_size=100000,
+                             gzip_compress=False,
+                             use_v2_feature_names=False):
+  """Streams input files into an output file of TF examples.
+
+  Args:
+    input_files: the raw text files of the shard.
+    output_file: the TFRecord file to write.
+    tokenizer_fn: a picklable function returning the tokenizer, called in the
+      process writing the shard.
+    processor_text_fn: a picklable function preprocessing a line of text.
+    seed: the seed of the shard, so that the output does not depend on the
+      other shards nor on the number of processes.
+    max_seq_length: the maximum sequence length.
+    max_predictions_per_seq: the maximum number of masked LM predictions per
+      sequence.
+    dupe_factor: the number of times to duplicate the documents, with
+      different masks.
+    short_seq_prob: the probability of creating shorter sequences.
+    masked_lm_prob: the masked LM probability.
+    do_whole_word_mask: whether to use whole word masking.
+    max_ngram_size: the maximum size of the masked n-grams.
+    document_window_size: the number of most recent documents to sample the
+      random next sentences from.
+    shuffle_buffer_size: the number of instances to shuffle.
+    gzip_compress: whether to write a GZIP compressed TFRecord file.
+    use_v2_feature_names: whether to use the feature names of the models.
+
+  Returns:
+    The number of instances written.
+  """
+  tokenizer = tokenizer_fn()
+  rng = random.Random(seed)
+  instances = create_training_instances_streaming(
+      _iterate_documents(input_files, tokenizer, processor_text_fn),
+      list(tokenizer.vocab.keys()),
+      max_seq_length,
+      dupe_factor,
+      short_seq_prob,
+      masked_lm_prob,
+      max_predictions_per_seq,
+      rng,
+      do_whole_word_mask=do_whole_word_mask,
+      max_ngram_size=max_ngram_size,
+      document_window_size=document_window_size,
+      shuffle_buffer_size=shuffle_buffer_size)
+
+  num_written = 0
+  with tf.io.TFRecordWriter(
+      output_file, options="GZIP" if gzip_compress else "") as writer:
+    for instance in instances:
+      features = _create_features(instance, tokenizer, max_seq_length,
+                                  max_predictions_per_seq,
+                                  use_v2_feature_names)
+      tf_example = tf.train.Example(
+          features=tf.train.Features(feature=features))
+      writer.write(tf_example.SerializeToString())
+      num_written += 1
+  return num_written
+
+
+def _create_pretraining_shard_from_kwargs(kwargs):
+  return kwargs["output_file"], create_pretraining_shard(**kwargs)
+
+
+def create_pretraining_data_streaming(input_files,
+                                      output_files,
+                                      random_seed,
+                                      num_processes=None,
+                                      **kwargs):
+  """Writes the output files in parallel, streaming the input files.
+
+  The input files are assigned round-robin to the output files, and every
+  output file is written by `create_pretraining_shard` in a single process,
+  with a seed derived from `random_seed` and its index. The output is thus
+  reproducible and independent of `num_processes`.
+
+  Args:
+    input_files: the raw text files.
+    output_files: the TFRecord files to write. There must not be more of them
+      than input files.
+    random_seed: the random seed of the data generation.
+    num_processes: the number of processes writing the output files. If None,
+      uses `os.cpu_count()`. If 0, disables multi-processing.
+    **kwargs: the other arguments of `create_pretraining_shard`.
+
+  Returns:
+    The total number of instances written.
+  """
+  if len(input_files) < len(output_files):
+    raise ValueError(
+        "Streaming requires at least as many input files as output files, "
+        "got %d input files and %d output files." %
+        (len(input_files), len(output_files)))
+  tasks = [
+      dict(
+          input_files=input_files[i::len(output_files)],
+          output_file=output_file,
+          seed="%d-%d" % (random_seed, i),
+          **kwargs) for i, output_file in enumerate(output_files)
+  ]
+
+  with contextlib.ExitStack() as stack:
+    if num_processes is None or num_processes > 0:
+      # The pool is terminated on exit, including when a worker failed.
+      pool = stack.enter_context(mp.Pool(processes=num_processes))
+      results = pool.imap_unordered(_create_pretraining_shard_from_kwargs,
+                                    tasks)
+    else:
+      results = map(_create_pretraining_shard_from_kwargs, tasks)
+
+    start = time.time()
+    total_written = 0
+    for output_file, num_written in results:
+      total_written += num_written
+      logging.info("Wrote %d instances to %s, %.1f instances/sec.",
+                   num_written, output_file,
+                   total_written / (time.time() - start))
+
+  logging.info("Wrote %d total instances", total_written)
+  return total_written
+
+
 def create_instances_from_document(
     all_documents, document_index, max_seq_length, short_seq_prob,
     masked_lm_prob, max_predictions_per_seq, vocab_words, rng,
@@ -655,27 +1008,32 @@ def truncate_seq_pair(tokens_a, tokens_b, max_num_tokens, rng):
       trunc_tokens.pop()
 
 
-def get_processor_text_fn(is_sentence_piece, do_lower_case):
-  def processor_text_fn(text):
-    text = tokenization.convert_to_unicode(text)
-    if is_sentence_piece:
-      # Additional preprocessing specific to the SentencePiece tokenizer.
-      text = tokenization.preprocess_text(text, lower=do_lower_case)
+def _process_text(is_sentence_piece, do_lower_case, text):
+  text = tokenization.convert_to_unicode(text)
+  if is_sentence_piece:
+    # Additional preprocessing specific to the SentencePiece tokenizer.
+    text = tokenization.preprocess_text(text, lower=do_lower_case)
+
+  return text.strip()
 
-    return text.strip()
 
-  return processor_text_fn
+def get_processor_text_fn(is_sentence_piece, do_lower_case):
+  # A partial, rather than a closure, so that it can be sent to the processes
+  # of the streaming mode.
+  return functools.partial(_process_text, is_sentence_piece, do_lower_case)
 
 
 def main(_):
   if FLAGS.tokenization == "WordPiece":
-    tokenizer = tokenization.FullTokenizer(
+    tokenizer_fn = functools.partial(
+        tokenization.FullTokenizer,
         vocab_file=FLAGS.vocab_file, do_lower_case=FLAGS.do_lower_case
     )
     processor_text_fn = get_processor_text_fn(False, FLAGS.do_lower_case)
   else:
     assert FLAGS.tokenization == "SentencePiece"
-    tokenizer = tokenization.FullSentencePieceTokenizer(FLAGS.sp_model_file)
+    tokenizer_fn = functools.partial(tokenization.FullSentencePieceTokenizer,
+                                     FLAGS.sp_model_file)
     processor_text_fn = get_processor_text_fn(True, FLAGS.do_lower_case)
 
   input_files = []
@@ -686,6 +1044,29 @@ def main(_):
   for input_file in input_files:
     logging.info("  %s", input_file)
 
+  if FLAGS.streaming:
+    create_pretraining_data_streaming(
+        input_files,
+        FLAGS.output_file.split(","),
+        FLAGS.random_seed,
+        num_processes=FLAGS.num_processes,
+        tokenizer_fn=tokenizer_fn,
+        processor_text_fn=processor_text_fn,
+        max_seq_length=FLAGS.max_seq_length,
+        max_predictions_per_seq=FLAGS.max_predictions_per_seq,
+        dupe_factor=FLAGS.dupe_factor,
+        short_seq_prob=FLAGS.short_seq_prob,
+        masked_lm_prob=FLAGS.masked_lm_prob,
+        do_whole_word_mask=FLAGS.do_whole_word_mask,
+        max_ngram_size=FLAGS.max_ngram_size,
+        document_window_size=FLAGS.document_window_size,
+        shuffle_buffer_size=FLAGS.shuffle_buffer_size,
+        gzip_compress=FLAGS.gzip_compress,
+        use_v2_feature_names=FLAGS.use_v2_feature_names)
+    return
+
+  tokenizer = tokenizer_fn()
+
   rng = random.Random(FLAGS.random_seed)
   instances = create_training_instances(
       input_files,
@@ -699,6 +1080,7 @@ def main(_):
       rng,
       FLAGS.do_whole_word_mask,
       FLAGS.max_ngram_size,
+      compact=True,
   )
 
   output_files = FLAGS.output_file.split(",")
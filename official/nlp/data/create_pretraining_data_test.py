@@ -13,11 +13,14 @@
 # limitations under the License.
 
 """Tests for official.nlp.data.create_pretraining_data."""
+import functools
+import os
 import random
 
 import tensorflow as tf, tf_keras
 
 from official.nlp.data import create_pretraining_data as cpd
+from official.nlp.tools import tokenization
 
 _VOCAB_WORDS = ["vocab_1", "vocab_2"]
 
@@ -123,6 +126,128 @@ class CreatePretrainingDataTest(tf.test.TestCase):
       self.assertLen(masked_labels, 76)
       self.assertTokens(tokens, output_tokens, masked_positions, masked_labels)
 
+  def _write_streaming_inputs(self):
+    temp_dir = self.get_temp_dir()
+    words = ["w%d" % i for i in range(20)]
+    vocab_file = os.path.join(temp_dir, "vocab.txt")
+    with tf.io.gfile.GFile(vocab_file, "w") as f:
+      f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] +
+                         words))
+    rng = random.Random(0)
+    input_files = []
+    for i in range(3):
+      input_file = os.path.join(temp_dir, "input%d.txt" % i)
+      with tf.io.gfile.GFile(input_file, "w") as f:
+        for _ in range(10):
+          for _ in range(rng.randint(1, 5)):
+            f.write(" ".join(
+                rng.choice(words) for _ in range(rng.randint(1, 12))) + "\n")
+          f.write("\n")
+      input_files.append(input_file)
+    return vocab_file, input_files
+
+  def _read_examples(self, path):
+    return [
+        tf.train.Example.FromString(record.numpy())
+        for record in tf.data.TFRecordDataset(path)
+    ]
+
+  def test_create_pretraining_data_streaming(self):
+    vocab_file, input_files = self._write_streaming_inputs()
+    outputs = {}
+    for num_processes in [0, 2]:
+      output_files = [
+          os.path.join(self.get_temp_dir(),
+                       "output%d-%d.tfrecord" % (num_processes, i))
+          for i in range(2)
+      ]
+      num_written = cpd.create_pretraining_data_streaming(
+          input_files,
+          output_files,
+          random_seed=1,
+          num_processes=num_processes,
+          tokenizer_fn=functools.partial(tokenization.FullTokenizer,
+                                         vocab_file=vocab_file),
+          processor_text_fn=cpd.get_processor_text_fn(False, True),
+          max_seq_length=16,
+          max_predictions_per_seq=3,
+          dupe_factor=2,
+          short_seq_prob=0.1,
+          masked_lm_prob=0.15,
+          document_window_size=4,
+          shuffle_buffer_size=8)
+      examples = [self._read_examples(path) for path in output_files]
+      self.assertEqual(num_written, sum(len(e) for e in examples))
+      outputs[num_processes] = examples
+
+    # The output only depends on the seed, not on the number of processes.
+    self.assertGreater(len(outputs[0][0]), 0)
+    self.assertEqual(outputs[0], outputs[2])
+    for example in outputs[0][0]:
+      self.assertLen(example.features.feature["input_ids"].int64_list.value,
+                     16)
+
+  def test_compact_training_instance(self):
+    vocab = {"[CLS]": 0, "[SEP]": 1, "[MASK]": 2, "a": 3, "b": 4}
+
+    class Tokenizer:
+
+      def convert_tokens_to_ids(self, tokens):
+        return [vocab[token] for token in tokens]
+
+    instance = cpd.TrainingInstance(
+        tokens=["[CLS]", "a", "[MASK]", "[SEP]", "b", "[SEP]"],
+        segment_ids=[0, 0, 0, 0, 1, 1],
+        masked_lm_positions=[2],
+        masked_lm_labels=["b"],
+        is_random_next=True)
+    compact = cpd.CompactTrainingInstance.from_instance(instance, Tokenizer())
+    self.assertAllEqual(compact.input_ids, [0, 3, 2, 1, 4, 1])
+    self.assertAllEqual(compact.masked_lm_ids, [4])
+    for use_v2_feature_names in [False, True]:
+      self.assertEqual(
+          cpd._create_features(compact, Tokenizer(), 8, 2,
+                               use_v2_feature_names),
+          cpd._create_features(instance, Tokenizer(), 8, 2,
+                               use_v2_feature_names))
+    features = cpd._create_features(compact, Tokenizer(), 8, 2, False)
+    self.assertEqual(features["input_mask"].int64_list.value,
+                     [1, 1, 1, 1, 1, 1, 0, 0])
+    self.assertEqual(features["masked_lm_weights"].float_list.value,
+                     [1.0, 0.0])
+
+  def test_create_pretraining_data_streaming_too_many_outputs(self):
+    with self.assertRaisesRegex(ValueError, "input files"):
+      cpd.create_pretraining_data_streaming(["a"], ["b", "c"], random_seed=1)
+
+  def test_create_training_instances_streaming(self):
+    documents = [[["d%d_s%d_t%d" % (d, s, t)
+                   for t in range(4)]
+                  for s in range(3)]
+                 for d in range(20)]
+    instances = list(
+        cpd.create_training_instances_streaming(
+            iter(documents),
+            vocab_words=_VOCAB_WORDS,
+            max_seq_length=12,
+            dupe_factor=2,
+            short_seq_prob=0.0,
+            masked_lm_prob=0.0,
+            max_predictions_per_seq=0,
+            rng=random.Random(1),
+            document_window_size=3,
+            shuffle_buffer_size=5))
+    self.assertNotEmpty(instances)
+    for instance in instances:
+      documents_in_instance = {
+          int(token.split("_")[0][1:])
+          for token in instance.tokens
+          if token not in ("[CLS]", "[SEP]")
+      }
+      # Random next sentences come from the window of the 3 last documents.
+      self.assertLess(max(documents_in_instance) - min(documents_in_instance),
+                      3)
+
 
 if __name__ == "__main__":
   tf.test.main()
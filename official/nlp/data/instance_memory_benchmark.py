@@ -0,0 +1,126 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+r"""Benchmarks the memory footprint of pretraining instances and SQuAD features.
+
+Compares the memory per instance of `TrainingInstance` and
+`CompactTrainingInstance` from `create_pretraining_data`, and of SQuAD
+`InputFeatures` with the plain lists and dictionaries they used to hold, on
+random data. The token strings are shared with the vocab, as they are when
+produced by the tokenizer.
+
+Usage:
+
+  python -m official.nlp.data.instance_memory_benchmark \
+    --num_instances=10000 --seq_length=384
+"""
+
+import random
+import tracemalloc
+import types
+
+from absl import app
+from absl import flags
+from absl import logging
+
+from official.nlp.data import create_pretraining_data
+from official.nlp.data import squad_lib
+
+_NUM_INSTANCES = flags.DEFINE_integer('num_instances', 10000,
+                                      'Number of instances to create.')
+_SEQ_LENGTH = flags.DEFINE_integer('seq_length', 384,
+                                   'Length of the sequences.')
+_VOCAB_SIZE = flags.DEFINE_integer('vocab_size', 30000, 'Size of the vocab.')
+
+
+class _Tokenizer:
+  """A minimal tokenizer, for `CompactTrainingInstance.from_instance`."""
+
+  def __init__(self, vocab):
+    self.vocab = vocab
+
+  def convert_tokens_to_ids(self, tokens):
+    return [self.vocab[token] for token in tokens]
+
+
+def _bytes_per_instance(create_fn, num_instances):
+  """Returns the memory allocated per instance by `create_fn`."""
+  tracemalloc.start()
+  instances = [create_fn(i) for i in range(num_instances)]
+  size, _ = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  del instances
+  return size / num_instances
+
+
+def main(_):
+  rng = random.Random(0)
+  vocab_words = ['[CLS]', '[SEP]', '[MASK]'] + [
+      'word%d' % i for i in range(_VOCAB_SIZE.value)]
+  vocab = {word: i for i, word in enumerate(vocab_words)}
+  tokenizer = _Tokenizer(vocab)
+  seq_length = _SEQ_LENGTH.value
+  num_predictions = int(seq_length * 0.15)
+
+  tokens = [rng.choice(vocab_words) for _ in range(seq_length)]
+  segment_ids = [0] * (seq_length // 2) + [1] * (seq_length - seq_length // 2)
+  positions = sorted(rng.sample(range(seq_length), num_predictions))
+  labels = [tokens[i] for i in positions]
+
+  def pretraining_instance(_):
+    return create_pretraining_data.TrainingInstance(
+        tokens=list(tokens),
+        segment_ids=list(segment_ids),
+        masked_lm_positions=list(positions),
+        masked_lm_labels=list(labels),
+        is_random_next=False)
+
+  def compact_pretraining_instance(i):
+    return create_pretraining_data.CompactTrainingInstance.from_instance(
+        pretraining_instance(i), tokenizer)
+
+  token_to_orig_map = {i: i // 2 for i in range(20, seq_length)}
+  token_is_max_context = {i: True for i in range(20, seq_length)}
+
+  def squad_kwargs(i):
+    return dict(
+        unique_id=i,
+        example_index=i,
+        doc_span_index=0,
+        tokens=list(tokens),
+        token_to_orig_map=dict(token_to_orig_map),
+        token_is_max_context=dict(token_is_max_context),
+        input_ids=[vocab[token] for token in tokens],
+        input_mask=[1] * seq_length,
+        segment_ids=list(segment_ids),
+        paragraph_mask=list(segment_ids),
+        class_index=0,
+        start_position=0,
+        end_position=0,
+        is_impossible=False)
+
+  benchmarks = [
+      ('TrainingInstance', pretraining_instance),
+      ('CompactTrainingInstance', compact_pretraining_instance),
+      ('InputFeatures (lists/dicts)',
+       lambda i: types.SimpleNamespace(**squad_kwargs(i))),
+      ('InputFeatures', lambda i: squad_lib.InputFeatures(**squad_kwargs(i))),
+  ]
+  for name, create_fn in benchmarks:
+    logging.info('%-28s %10.0f bytes/instance', name,
+                 _bytes_per_instance(create_fn, _NUM_INSTANCES.value))
+
+
+if __name__ == '__main__':
+  app.run(main)
@@ -25,6 +25,7 @@ from official.core import config_definitions as cfg
 from official.core import input_reader
 from official.nlp.data import data_loader
 from official.nlp.data import data_loader_factory
+from official.nlp.data import sequence_packing
 
 
 @dataclasses.dataclass
@@ -44,6 +45,13 @@ class BertPretrainDataConfig(cfg.DataConfig):
   # `input_word_ids` and `input_type_ids` as keys.
   use_v2_feature_names: bool = False
   file_type: str = 'tfrecord'
+  # Whether to pack several examples per sequence, see `sequence_packing`. The
+  # packed examples share the `max_predictions_per_seq` predictions of their
+  # sequence. It requires an encoder with `pack_multiple_sequences`.
+  pack_sequences: bool = False
+  max_sequences_per_pack: int = 8
+  # The number of consecutive examples packed together.
+  packing_window_size: int = 1000
 
 
 @data_loader_factory.register_data_loader_cls(BertPretrainDataConfig)
@@ -61,6 +69,9 @@ class BertPretrainDataLoader(data_loader.DataLoader):
     self._max_predictions_per_seq = params.max_predictions_per_seq
     self._use_next_sentence_label = params.use_next_sentence_label
     self._use_position_id = params.use_position_id
+    if params.pack_sequences and params.use_position_id:
+      raise ValueError('`use_position_id` is not supported with '
+                       '`pack_sequences`, which creates the position ids.')
 
   def _name_to_features(self):
     name_to_features = {
@@ -127,13 +138,34 @@ class BertPretrainDataLoader(data_loader.DataLoader):
 
     return x
 
+  def _pack_and_batch(
+      self,
+      dataset: tf.data.Dataset,
+      input_context: Optional[tf.distribute.InputContext] = None):
+    """Packs the examples into sequences and batches them."""
+    dataset = sequence_packing.pack_dataset(
+        dataset,
+        seq_length=self._seq_length,
+        token_keys=('input_word_ids', 'input_type_ids', 'input_mask'),
+        prediction_keys=('masked_lm_positions', 'masked_lm_ids',
+                         'masked_lm_weights'),
+        max_predictions_per_pack=self._max_predictions_per_seq,
+        max_sequences_per_pack=self._params.max_sequences_per_pack,
+        window_size=self._params.packing_window_size)
+    batch_size = self._params.global_batch_size
+    if input_context:
+      batch_size = input_context.get_per_replica_batch_size(batch_size)
+    return dataset.batch(batch_size, drop_remainder=self._params.drop_remainder)
+
   def load(self, input_context: Optional[tf.distribute.InputContext] = None):
     """Returns a tf.dataset.Dataset."""
     reader = input_reader.InputReader(
         params=self._params,
         dataset_fn=dataset_fn.pick_dataset_fn(self._params.file_type),
         decoder_fn=self._decode,
-        parser_fn=self._parse)
+        parser_fn=self._parse,
+        transform_and_batch_fn=(self._pack_and_batch
+                                if self._params.pack_sequences else None))
     return reader.read(input_context)
 
 
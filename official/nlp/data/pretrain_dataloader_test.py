@@ -139,6 +139,39 @@ class BertPretrainDataTest(tf.test.TestCase, parameterized.TestCase):
                      use_next_sentence_label)
     self.assertEqual("position_ids" in features, use_position_id)
 
+  def test_pack_sequences(self):
+    train_data_path = os.path.join(self.get_temp_dir(), "train.tf_record")
+    seq_length = 128
+    max_predictions_per_seq = 20
+    _create_fake_bert_dataset(
+        train_data_path,
+        seq_length,
+        max_predictions_per_seq,
+        use_next_sentence_label=True,
+        use_position_id=False)
+    data_config = pretrain_dataloader.BertPretrainDataConfig(
+        input_path=train_data_path,
+        max_predictions_per_seq=max_predictions_per_seq,
+        seq_length=seq_length,
+        global_batch_size=10,
+        is_training=True,
+        use_next_sentence_label=True,
+        pack_sequences=True,
+        max_sequences_per_pack=4)
+
+    dataset = pretrain_dataloader.BertPretrainDataLoader(data_config).load()
+    features = next(iter(dataset))
+    self.assertAllEqual([10, seq_length], features["position_ids"].shape)
+    self.assertAllEqual([10, seq_length],
+                        features["packed_example_ids"].shape)
+    self.assertAllEqual([10, max_predictions_per_seq],
+                        features["masked_lm_positions"].shape)
+    self.assertAllEqual([10, 4], features["packed_example_positions"].shape)
+    self.assertAllEqual([10, 4], features["next_sentence_labels"].shape)
+    # The fake examples fill their sequence.
+    self.assertAllEqual(tf.ones([10]),
+                        tf.reduce_sum(features["packed_example_weights"], 1))
+
   def test_v2_feature_names(self):
     train_data_path = os.path.join(self.get_temp_dir(), "train.tf_record")
     seq_length = 128
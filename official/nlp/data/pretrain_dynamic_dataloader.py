@@ -22,6 +22,7 @@ from official.core import config_definitions as cfg
 from official.core import input_reader
 from official.nlp.data import data_loader_factory
 from official.nlp.data import pretrain_dataloader
+from official.nlp.data import token_budget_batching
 
 
 @dataclasses.dataclass
@@ -35,6 +36,10 @@ class BertPretrainDataConfig(cfg.DataConfig):
   # tf.data service is disabled. Deprecate this flag once we always enable round
   # robin tf.data service.
   seq_bucket_window_scale: int = 8
+  # If set, the batches of every bucket have up to `max_tokens_per_batch`
+  # tokens in total over all replicas, padding included, instead of
+  # `global_batch_size` examples. See `token_budget_batching`.
+  max_tokens_per_batch: Optional[int] = None
   use_next_sentence_label: bool = True
   use_position_id: bool = False
   deterministic: bool = False
@@ -49,11 +54,12 @@ class PretrainingDynamicDataLoader(pretrain_dataloader.BertPretrainDataLoader):
   """Dataset loader for bert-style pretraining with dynamic sequenece length.
 
   Bucketizes the input id features by the seq_bucket_lengths and features are
-  padded to the bucket boundaries. The mask features are usually short than
-  input id features and can also be dynamic. We require the mask feature lengths
-  within a bucket must be the same. For example, with [128, 256] buckets,
-  the mask features for bucket 128 should always have the length as X and
-  features for bucket 256 should always have the length as Y.
+  padded to the bucket boundaries. The batches have either a fixed batch size
+  or, with `max_tokens_per_batch`, a batch size per bucket. The mask features
+  are usually short than input id features and can also be dynamic. We require
+  the mask feature lengths within a bucket must be the same. For example, with
+  [128, 256] buckets, the mask features for bucket 128 should always have the
+  length as X and features for bucket 256 should always have the length as Y.
 
   The dataloader does not filter out empty masks. Make sure to handle this
   in the model.
@@ -66,6 +72,7 @@ class PretrainingDynamicDataLoader(pretrain_dataloader.BertPretrainDataLoader):
     self._seq_bucket_lengths = params.seq_bucket_lengths
     self._seq_bucket_window_scale = params.seq_bucket_window_scale
     self._global_batch_size = params.global_batch_size
+    self._max_tokens_per_batch = params.max_tokens_per_batch
     self._use_next_sentence_label = params.use_next_sentence_label
     self._use_position_id = params.use_position_id
     self._drop_remainder = params.drop_remainder
@@ -144,63 +151,53 @@ class PretrainingDynamicDataLoader(pretrain_dataloader.BertPretrainDataLoader):
       dataset,
       input_context: Optional[tf.distribute.InputContext] = None):
     """Bucketize by sequence length and batch the datasets."""
-    per_replica_batch_size = input_context.get_per_replica_batch_size(
-        self._global_batch_size) if input_context else self._global_batch_size
-
-    def element_length_func(example, seq_len_dim):
-      return tf.shape(example['input_word_ids'])[seq_len_dim]
-
-    bucket_boundaries = [length + 1 for length in self._seq_bucket_lengths]
-    bucket_batch_sizes = [per_replica_batch_size] * (len(bucket_boundaries) + 1)
-
-    # Bucketize and batch the dataset with per replica batch size first.
-    dataset = dataset.apply(
-        tf.data.experimental.bucket_by_sequence_length(
-            lambda example: tf.cast(element_length_func(example, 0), tf.int32),
-            bucket_boundaries,
-            bucket_batch_sizes,
-            pad_to_bucket_boundary=True,
-            drop_remainder=self._drop_remainder))
-    if input_context:
-      window_size = input_context.num_replicas_in_sync
-      if self._enable_tf_data_service and (
-          not self._enable_round_robin_tf_data_service):
-        # If tf.data service is enabled but round-robin behavior is not enabled,
-        # different TPU workers may fetch data from one tf.data service worker
-        # in different speed. We set the window size to be
-        # `seq_bucket_window_scale` larger to leave buffer if some workers are
-        # fetching data faster than others, so all the data within the same
-        # global batch can still have more chances to be in the same bucket.
-        window_size *= self._seq_bucket_window_scale
-
-      # Group `num_replicas_in_sync` batches from same bucket together, so all
-      # replicas can get the same sequence length for one global step.
-      dataset = dataset.apply(
-          tf.data.experimental.group_by_window(
-              key_func=lambda example: tf.cast(  # pylint: disable=g-long-lambda
-                  element_length_func(example, 1), tf.int64),
-              reduce_func=lambda _, x: tf.data.Dataset.from_tensors(x),
-              window_size=window_size))
-      dataset = dataset.flat_map(lambda x: x)
+    window_scale = 1
+    if self._enable_tf_data_service and (
+        not self._enable_round_robin_tf_data_service):
+      # If tf.data service is enabled but round-robin behavior is not enabled,
+      # different TPU workers may fetch data from one tf.data service worker
+      # in different speed. We set the window size to be
+      # `seq_bucket_window_scale` larger to leave buffer if some workers are
+      # fetching data faster than others, so all the data within the same
+      # global batch can still have more chances to be in the same bucket.
+      window_scale = self._seq_bucket_window_scale
+
+    # Bucketize and batch the dataset with per replica batch sizes first, then
+    # group `num_replicas_in_sync` batches from same bucket together, so all
+    # replicas can get the same sequence length for one global step.
+    dataset = token_budget_batching.bucketize_and_batch(
+        dataset,
+        length_key='input_word_ids',
+        bucket_lengths=self._seq_bucket_lengths,
+        batch_size=(None if self._max_tokens_per_batch else
+                    self._global_batch_size),
+        max_tokens=self._max_tokens_per_batch,
+        drop_remainder=self._drop_remainder,
+        input_context=input_context,
+        window_scale=window_scale)
 
     def _remove_pads_from_bucketize(features):
       # All mask features must have the same effective length.
       # The real masked ids padding token is -1 and 0 comes from
       # bucket_by_sequence_length.
       mask = tf.math.not_equal(features['masked_lm_ids'], 0)
+      # The batch size depends on the bucket with a token budget.
+      batch_size = mask.shape[0]
+      if batch_size is None:
+        batch_size = tf.shape(mask)[0]
 
       mask_per_example = tf.math.reduce_sum(tf.cast(mask, tf.int32), axis=1)
       normalized = tf.cast(
           mask_per_example / tf.math.reduce_max(mask_per_example), tf.int32)
       assert_op = tf.debugging.assert_equal(
-          tf.math.reduce_sum(normalized), per_replica_batch_size,
+          tf.math.reduce_sum(normalized), batch_size,
           'Number of non padded mask tokens is not the same for each example '
           'in the same sequence length.')
       with tf.control_dependencies([assert_op]):
         for key in self._mask_keys:
           features[key] = tf.reshape(
               tf.boolean_mask(
-                  features[key], mask), [per_replica_batch_size, -1])
+                  features[key], mask), [batch_size, -1])
       # Revert masked_lm_ids to be 0-padded.
       mask = tf.math.not_equal(features['masked_lm_ids'], -1)
       features['masked_lm_ids'] = tf.where(
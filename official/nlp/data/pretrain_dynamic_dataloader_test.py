@@ -209,6 +209,36 @@ class PretrainDynamicDataLoaderTest(tf.test.TestCase, parameterized.TestCase):
     self.assertEqual(features['position_ids'].shape, (batch_size, 128))
     self.assertEqual(features['masked_lm_positions'].shape, (batch_size, 70))
 
+  def test_load_dataset_with_token_budget(self):
+    max_seq_length = 128
+    input_path_1 = os.path.join(self.get_temp_dir(), 'train_5.tf_record')
+    _create_fake_dataset(
+        input_path_1,
+        seq_length=60,
+        num_masked_tokens=20,
+        max_seq_length=max_seq_length,
+        num_examples=4)
+    input_path_2 = os.path.join(self.get_temp_dir(), 'train_6.tf_record')
+    _create_fake_dataset(
+        input_path_2,
+        seq_length=100,
+        num_masked_tokens=70,
+        max_seq_length=max_seq_length,
+        num_examples=2)
+    data_config = pretrain_dynamic_dataloader.BertPretrainDataConfig(
+        is_training=False,
+        input_path=','.join([input_path_1, input_path_2]),
+        seq_bucket_lengths=[64, 128],
+        max_tokens_per_batch=256,
+        deterministic=True)
+    dataset = pretrain_dynamic_dataloader.PretrainingDynamicDataLoader(
+        data_config).load()
+    shapes = sorted(
+        (tuple(features['input_word_ids'].shape),
+         tuple(features['masked_lm_positions'].shape))
+        for features in dataset)
+    self.assertEqual(shapes, [((2, 128), (2, 70)), ((4, 64), (4, 20))])
+
   def test_load_dataset_not_same_masks(self):
     max_seq_length = 128
     batch_size = 2
@@ -26,6 +26,8 @@ from official.core import input_reader
 from official.nlp import modeling
 from official.nlp.data import data_loader
 from official.nlp.data import data_loader_factory
+from official.nlp.data import sequence_packing
+from official.nlp.data import token_budget_batching
 
 LABEL_TYPES_MAP = {'int': tf.int64, 'float': tf.float32}
 
@@ -46,6 +48,21 @@ class SentencePredictionDataConfig(cfg.DataConfig):
   label_name: Optional[Tuple[str, str]] = None
   # Either tfrecord, sstable, or recordio.
   file_type: str = 'tfrecord'
+  # Whether to pack several examples per sequence, see `sequence_packing`. The
+  # labels then have shape [max_sequences_per_pack]. It requires an encoder
+  # with `pack_multiple_sequences`.
+  pack_sequences: bool = False
+  max_sequences_per_pack: int = 8
+  # The number of consecutive examples packed together.
+  packing_window_size: int = 1000
+  # If set, the examples are bucketized by length and padded to the length of
+  # their bucket instead of `seq_length`. The last bucket length must be at
+  # least `seq_length`.
+  seq_bucket_lengths: Tuple[int, ...] = ()
+  # If set with `seq_bucket_lengths`, the batches of every bucket have up to
+  # `max_tokens_per_batch` tokens in total over all replicas, instead of
+  # `global_batch_size` examples. See `token_budget_batching`.
+  max_tokens_per_batch: Optional[int] = None
 
 
 @data_loader_factory.register_data_loader_cls(SentencePredictionDataConfig)
@@ -61,6 +78,16 @@ class SentencePredictionDataLoader(data_loader.DataLoader):
       self._label_name_mapping = dict([params.label_name])
     else:
       self._label_name_mapping = dict()
+    if params.max_tokens_per_batch and not params.seq_bucket_lengths:
+      raise ValueError('`max_tokens_per_batch` requires `seq_bucket_lengths`.')
+    if params.seq_bucket_lengths:
+      if params.pack_sequences:
+        raise ValueError('`seq_bucket_lengths` is not supported with '
+                         '`pack_sequences`.')
+      if params.seq_bucket_lengths[-1] < params.seq_length:
+        raise ValueError('The last of `seq_bucket_lengths` must be at least '
+                         '`seq_length`, got %s and %d.' %
+                         (params.seq_bucket_lengths, params.seq_length))
 
   def name_to_features_spec(self):
     """Defines features to decode. Subclass may override to append features."""
@@ -110,13 +137,59 @@ class SentencePredictionDataLoader(data_loader.DataLoader):
 
     return ret
 
+  def _pack_and_batch(
+      self,
+      dataset: tf.data.Dataset,
+      input_context: Optional[tf.distribute.InputContext] = None):
+    """Packs the examples into sequences and batches them."""
+    dataset = sequence_packing.pack_dataset(
+        dataset,
+        seq_length=self._seq_length,
+        token_keys=('input_word_ids', 'input_type_ids', 'input_mask'),
+        max_sequences_per_pack=self._params.max_sequences_per_pack,
+        window_size=self._params.packing_window_size)
+    batch_size = self._params.global_batch_size
+    if input_context:
+      batch_size = input_context.get_per_replica_batch_size(batch_size)
+    return dataset.batch(batch_size, drop_remainder=self._params.drop_remainder)
+
+  def _bucketize_and_batch(
+      self,
+      dataset: tf.data.Dataset,
+      input_context: Optional[tf.distribute.InputContext] = None):
+    """Removes the padding of the examples, then bucketizes and batches them."""
+
+    def remove_padding(example):
+      length = tf.reduce_sum(example['input_mask'])
+      for key in ('input_word_ids', 'input_mask', 'input_type_ids'):
+        example[key] = example[key][:length]
+      return example
+
+    dataset = dataset.map(
+        remove_padding, num_parallel_calls=tf.data.experimental.AUTOTUNE)
+    max_tokens = self._params.max_tokens_per_batch
+    return token_budget_batching.bucketize_and_batch(
+        dataset,
+        length_key='input_word_ids',
+        bucket_lengths=self._params.seq_bucket_lengths,
+        batch_size=None if max_tokens else self._params.global_batch_size,
+        max_tokens=max_tokens,
+        drop_remainder=self._params.drop_remainder,
+        input_context=input_context)
+
   def load(self, input_context: Optional[tf.distribute.InputContext] = None):
     """Returns a tf.dataset.Dataset."""
+    transform_and_batch_fn = None
+    if self._params.pack_sequences:
+      transform_and_batch_fn = self._pack_and_batch
+    elif self._params.seq_bucket_lengths:
+      transform_and_batch_fn = self._bucketize_and_batch
     reader = input_reader.InputReader(
         dataset_fn=dataset_fn.pick_dataset_fn(self._params.file_type),
         params=self._params,
         decoder_fn=self._decode,
-        parser_fn=self._parse)
+        parser_fn=self._parse,
+        transform_and_batch_fn=transform_and_batch_fn)
     return reader.read(input_context)
 
 
@@ -142,6 +142,24 @@ class SentencePredictionDataTest(tf.test.TestCase, parameterized.TestCase):
     self.assertEqual(features['label_ids'].shape, (batch_size,))
     self.assertEqual(features['label_ids'].dtype, expected_label_type)
 
+  def test_load_dataset_with_token_budget(self):
+    input_path = os.path.join(self.get_temp_dir(), 'train.tf_record')
+    seq_length = 128
+    _create_fake_preprocessed_dataset(input_path, seq_length, 'int')
+    data_config = loader.SentencePredictionDataConfig(
+        input_path=input_path,
+        seq_length=seq_length,
+        global_batch_size=8,
+        label_type='int',
+        seq_bucket_lengths=(64, 128),
+        max_tokens_per_batch=512)
+    dataset = loader.SentencePredictionDataLoader(data_config).load()
+    features = next(iter(dataset))
+    # The fake examples have `seq_length` tokens.
+    self.assertEqual(features['input_word_ids'].shape, (4, seq_length))
+    self.assertEqual(features['input_mask'].shape, (4, seq_length))
+    self.assertEqual(features['label_ids'].shape, (4,))
+
   def test_load_dataset_with_label_mapping(self):
     input_path = os.path.join(self.get_temp_dir(), 'train.tf_record')
     batch_size = 10
@@ -0,0 +1,208 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Packs several short examples into each sequence of a BERT dataset.
+
+Padding every example to the sequence length wastes most of the compute on
+datasets of short texts. `pack_dataset` instead packs the examples of a window
+of the dataset into sequences with first-fit bin packing, and adds the
+features needed by the models to keep the packed examples independent:
+
+  * `position_ids`: the position of every token in its example.
+  * `packed_example_ids`: 1 for the tokens of the first example of a sequence,
+    2 for the second one and so on, 0 for padding. Tokens only attend to the
+    tokens with the same id, i.e. the attention mask is block-diagonal. The
+    mask is built on the accelerator from these ids, see
+    `pack_optimization.get_packed_attention_mask`, rather than sent as a
+    [seq_length, seq_length] tensor.
+  * `packed_example_positions`: the position of the first token, i.e. [CLS],
+    of every example, 0 for padding.
+  * `packed_example_weights`: 1.0 for every example, 0.0 for padding.
+
+The other features of the examples are packed as follows:
+
+  * token features, e.g. `input_word_ids`, are concatenated.
+  * prediction features, i.e. `masked_lm_positions`, `masked_lm_ids` and
+    `masked_lm_weights`, are concatenated, with the positions offset by the
+    start of their example.
+  * all the other features, e.g. labels, must have one value per example. They
+    are stacked into a [max_sequences_per_pack] tensor.
+"""
+
+from typing import Mapping, Optional, Sequence
+
+import tensorflow as tf, tf_keras
+
+_INPUT_MASK = 'input_mask'
+_MASKED_LM_POSITIONS = 'masked_lm_positions'
+_MASKED_LM_WEIGHTS = 'masked_lm_weights'
+
+
+def _first_fit(lengths: tf.Tensor, num_predictions: tf.Tensor,
+               seq_length: int, max_predictions_per_pack: int,
+               max_sequences_per_pack: int):
+  """Assigns every example to the first sequence it fits in.
+
+  Args:
+    lengths: the number of tokens of the examples, an int32 [n] tensor.
+    num_predictions: the number of predictions of the examples, an int32 [n]
+      tensor.
+    seq_length: the length of the sequences.
+    max_predictions_per_pack: the maximum number of predictions per sequence.
+    max_sequences_per_pack: the maximum number of examples per sequence.
+
+  Returns:
+    The sequence of every example, the offset of the example in the tokens
+    and in the predictions of the sequence, and its index in the sequence.
+  """
+  n = tf.shape(lengths)[0]
+  # There are at most as many sequences as examples.
+  sequence_indices = tf.range(n)
+
+  def body(i, free_tokens, free_predictions, num_sequences, assignments):
+    fits = ((free_tokens >= lengths[i]) &
+            (free_predictions >= num_predictions[i]) &
+            (num_sequences < max_sequences_per_pack))
+    sequence = tf.reduce_min(tf.where(fits, sequence_indices, n))
+    assignment = tf.stack([
+        sequence, seq_length - free_tokens[sequence],
+        max_predictions_per_pack - free_predictions[sequence],
+        num_sequences[sequence]
+    ])
+    index = [[sequence]]
+    return (i + 1,
+            tf.tensor_scatter_nd_sub(free_tokens, index, lengths[i:i + 1]),
+            tf.tensor_scatter_nd_sub(free_predictions, index,
+                                     num_predictions[i:i + 1]),
+            tf.tensor_scatter_nd_add(num_sequences, index, [1]),
+            assignments.write(i, assignment))
+
+  _, _, _, _, assignments = tf.while_loop(
+      lambda i, *_: i < n, body,
+      (0, tf.fill([n], seq_length), tf.fill([n], max_predictions_per_pack),
+       tf.zeros([n], tf.int32), tf.TensorArray(tf.int32, size=n)))
+  assignments = assignments.stack()
+  return tf.unstack(tf.reshape(assignments, [n, 4]), axis=1)
+
+
+def _pack_window(examples: Mapping[str, tf.Tensor], seq_length: int,
+                 token_keys: Sequence[str], prediction_keys: Sequence[str],
+                 max_predictions_per_pack: int, max_sequences_per_pack: int):
+  """Packs a batch of examples into sequences."""
+  lengths = tf.reduce_sum(tf.cast(examples[_INPUT_MASK], tf.int32), axis=1)
+  if prediction_keys:
+    num_predictions = tf.math.count_nonzero(
+        examples[_MASKED_LM_WEIGHTS], axis=1, dtype=tf.int32)
+  else:
+    num_predictions = tf.zeros_like(lengths)
+  sequences, offsets, prediction_offsets, slots = _first_fit(
+      lengths, num_predictions, seq_length, max_predictions_per_pack,
+      max_sequences_per_pack)
+  num_packs = tf.reduce_max(sequences) + 1
+
+  def scatter(values, valid, sequence_offsets, width):
+    """Scatters the valid [n, m] values at their offset in the sequences."""
+    m = tf.shape(values)[1]
+    indices = tf.stack([
+        tf.broadcast_to(sequences[:, None], [tf.shape(values)[0], m]),
+        sequence_offsets[:, None] + tf.range(m)[None, :]
+    ], axis=-1)
+    return tf.scatter_nd(
+        tf.boolean_mask(indices, valid), tf.boolean_mask(values, valid),
+        [num_packs, width])
+
+  packed = {}
+  positions = tf.broadcast_to(
+      tf.range(seq_length)[None, :], tf.shape(examples[_INPUT_MASK]))
+  token_valid = positions < lengths[:, None]
+  for key in token_keys:
+    packed[key] = scatter(examples[key], token_valid, offsets, seq_length)
+  packed['position_ids'] = scatter(positions, token_valid, offsets, seq_length)
+  packed['packed_example_ids'] = scatter(
+      tf.broadcast_to(slots[:, None] + 1, tf.shape(positions)), token_valid,
+      offsets, seq_length)
+
+  if prediction_keys:
+    max_predictions = tf.shape(examples[_MASKED_LM_WEIGHTS])[1]
+    prediction_valid = (
+        tf.range(max_predictions)[None, :] < num_predictions[:, None])
+    for key in prediction_keys:
+      values = examples[key]
+      if key == _MASKED_LM_POSITIONS:
+        values += tf.cast(offsets[:, None], values.dtype)
+      packed[key] = scatter(values, prediction_valid, prediction_offsets,
+                            max_predictions_per_pack)
+
+  example_indices = tf.stack([sequences, slots], axis=-1)
+  num_examples = tf.shape(lengths)[0]
+  example_values = dict(
+      packed_example_positions=offsets,
+      packed_example_weights=tf.ones([num_examples], tf.float32))
+  for key, value in examples.items():
+    if key not in token_keys and key not in prediction_keys:
+      example_values[key] = tf.reshape(value, [num_examples])
+  for key, value in example_values.items():
+    packed[key] = tf.scatter_nd(example_indices, value,
+                                [num_packs, max_sequences_per_pack])
+  return packed
+
+
+def pack_dataset(dataset: tf.data.Dataset,
+                 seq_length: int,
+                 token_keys: Sequence[str],
+                 prediction_keys: Sequence[str] = (),
+                 max_predictions_per_pack: Optional[int] = None,
+                 max_sequences_per_pack: int = 8,
+                 window_size: int = 1000) -> tf.data.Dataset:
+  """Packs the examples of an unbatched dataset into sequences.
+
+  The examples are packed window by window, in order: every example goes to
+  the first sequence of its window with enough free tokens, predictions and
+  examples. See the module docstring for the packed features.
+
+  Args:
+    dataset: a dataset of dictionaries of [seq_length] token features,
+      including `input_mask`, whose ones must be a prefix, optional
+      [max_predictions_per_seq] prediction features and one value features.
+    seq_length: the length of the token features.
+    token_keys: the keys of the token features.
+    prediction_keys: the keys of the prediction features, which must include
+      `masked_lm_positions` and `masked_lm_weights`.
+    max_predictions_per_pack: the length of the packed prediction features. It
+      must be at least the length of the prediction features.
+    max_sequences_per_pack: the maximum number of examples per sequence.
+    window_size: the number of examples packed together. Larger windows pack
+      more tightly.
+
+  Returns:
+    A dataset of packed sequences.
+  """
+  if _INPUT_MASK not in token_keys:
+    raise ValueError('`token_keys` must include `%s`.' % _INPUT_MASK)
+  if prediction_keys and not (_MASKED_LM_POSITIONS in prediction_keys and
+                              _MASKED_LM_WEIGHTS in prediction_keys):
+    raise ValueError('`prediction_keys` must include `%s` and `%s`.' %
+                     (_MASKED_LM_POSITIONS, _MASKED_LM_WEIGHTS))
+  if prediction_keys and max_predictions_per_pack is None:
+    raise ValueError('`max_predictions_per_pack` is required to pack '
+                     'prediction features.')
+  max_predictions_per_pack = max_predictions_per_pack or 0
+
+  def pack_window(examples):
+    return _pack_window(examples, seq_length, token_keys, prediction_keys,
+                        max_predictions_per_pack, max_sequences_per_pack)
+
+  return dataset.batch(window_size).map(
+      pack_window,
+      num_parallel_calls=tf.data.experimental.AUTOTUNE).unbatch()
@@ -0,0 +1,122 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for official.nlp.data.sequence_packing."""
+import numpy as np
+import tensorflow as tf, tf_keras
+
+from official.nlp.data import sequence_packing
+
+
+def _create_dataset(lengths, num_predictions, seq_length=8,
+                    max_predictions_per_seq=3):
+  """Creates examples whose word ids are 10 * (index + 1) + position."""
+  features = {
+      'input_word_ids': [], 'input_mask': [], 'masked_lm_positions': [],
+      'masked_lm_ids': [], 'masked_lm_weights': [], 'label_ids': []
+  }
+  for index, (length, predictions) in enumerate(
+      zip(lengths, num_predictions)):
+    mask = np.arange(seq_length) < length
+    features['input_word_ids'].append(
+        np.where(mask, 10 * (index + 1) + np.arange(seq_length), 0))
+    features['input_mask'].append(mask.astype(np.int32))
+    prediction_mask = np.arange(max_predictions_per_seq) < predictions
+    features['masked_lm_positions'].append(
+        np.where(prediction_mask, np.arange(max_predictions_per_seq) + 1, 0))
+    features['masked_lm_ids'].append(
+        np.where(prediction_mask, index + 1, 0))
+    features['masked_lm_weights'].append(prediction_mask.astype(np.float32))
+    features['label_ids'].append(index)
+  return tf.data.Dataset.from_tensor_slices(
+      {k: np.array(v) for k, v in features.items()})
+
+
+class SequencePackingTest(tf.test.TestCase):
+
+  def test_pack_tokens(self):
+    dataset = _create_dataset(lengths=[3, 6, 4, 2], num_predictions=[0] * 4)
+    dataset = dataset.map(lambda x: {
+        k: v for k, v in x.items() if not k.startswith('masked_lm')
+    })
+    packed = list(
+        sequence_packing.pack_dataset(
+            dataset,
+            seq_length=8,
+            token_keys=('input_word_ids', 'input_mask'),
+            max_sequences_per_pack=3).as_numpy_iterator())
+
+    # First fit: [3, 4], [6, 2].
+    self.assertLen(packed, 2)
+    self.assertAllEqual(packed[0]['input_word_ids'],
+                        [10, 11, 12, 30, 31, 32, 33, 0])
+    self.assertAllEqual(packed[0]['input_mask'], [1, 1, 1, 1, 1, 1, 1, 0])
+    self.assertAllEqual(packed[0]['position_ids'], [0, 1, 2, 0, 1, 2, 3, 0])
+    self.assertAllEqual(packed[0]['packed_example_ids'],
+                        [1, 1, 1, 2, 2, 2, 2, 0])
+    self.assertAllEqual(packed[0]['packed_example_positions'], [0, 3, 0])
+    self.assertAllEqual(packed[0]['packed_example_weights'], [1., 1., 0.])
+    self.assertAllEqual(packed[0]['label_ids'], [0, 2, 0])
+    self.assertAllEqual(packed[1]['input_word_ids'],
+                        [20, 21, 22, 23, 24, 25, 40, 41])
+    self.assertAllEqual(packed[1]['label_ids'], [1, 3, 0])
+
+  def test_pack_predictions(self):
+    dataset = _create_dataset(lengths=[3, 3, 2], num_predictions=[2, 2, 1])
+    packed = list(
+        sequence_packing.pack_dataset(
+            dataset,
+            seq_length=8,
+            token_keys=('input_word_ids', 'input_mask'),
+            prediction_keys=('masked_lm_positions', 'masked_lm_ids',
+                             'masked_lm_weights'),
+            max_predictions_per_pack=3,
+            max_sequences_per_pack=3).as_numpy_iterator())
+
+    # The second example does not fit the predictions of the first sequence.
+    self.assertLen(packed, 2)
+    self.assertAllEqual(packed[0]['packed_example_ids'],
+                        [1, 1, 1, 2, 2, 0, 0, 0])
+    self.assertAllEqual(packed[0]['masked_lm_positions'], [1, 2, 4])
+    self.assertAllEqual(packed[0]['masked_lm_ids'], [1, 1, 3])
+    self.assertAllEqual(packed[0]['masked_lm_weights'], [1., 1., 1.])
+    self.assertAllEqual(packed[1]['masked_lm_positions'], [1, 2, 0])
+    self.assertAllEqual(packed[1]['masked_lm_weights'], [1., 1., 0.])
+
+  def test_max_sequences_per_pack(self):
+    dataset = _create_dataset(lengths=[1] * 5, num_predictions=[0] * 5)
+    dataset = dataset.map(lambda x: {
+        k: v for k, v in x.items() if not k.startswith('masked_lm')
+    })
+    packed = list(
+        sequence_packing.pack_dataset(
+            dataset,
+            seq_length=8,
+            token_keys=('input_word_ids', 'input_mask'),
+            max_sequences_per_pack=2,
+            window_size=4).as_numpy_iterator())
+
+    self.assertLen(packed, 3)
+    self.assertAllEqual([p['label_ids'] for p in packed],
+                        [[0, 1], [2, 3], [4, 0]])
+
+  def test_missing_input_mask(self):
+    with self.assertRaisesRegex(ValueError, 'input_mask'):
+      sequence_packing.pack_dataset(
+          _create_dataset([1], [0]), seq_length=8,
+          token_keys=('input_word_ids',))
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -15,11 +15,16 @@
 """Library to process data for SQuAD 1.1 and SQuAD 2.0."""
 # pylint: disable=g-bad-import-order
 import collections
+import contextlib
 import copy
+import functools
+import itertools
 import json
 import math
+import multiprocessing as mp
 import os
 
+import numpy as np
 import six
 
 from absl import logging
@@ -27,6 +32,11 @@ import tensorflow as tf, tf_keras
 
 from official.nlp.tools import tokenization
 
+# The number of examples sent at once to a featurization worker process.
+_FEATURIZATION_CHUNK_SIZE = 64
+# The number of examples sent at once to a postprocessing worker process.
+_POSTPROCESSING_CHUNK_SIZE = 64
+
 
 class SquadExample(object):
   """A single training/test example for simple sequence classification.
@@ -45,6 +55,9 @@ class SquadExample(object):
       context. Only used in SQuAD 2.0.
   """
 
+  __slots__ = ("qas_id", "question_text", "doc_tokens", "orig_answer_text",
+               "start_position", "end_position", "is_impossible")
+
   def __init__(self,
                qas_id,
                question_text,
@@ -79,8 +92,57 @@ class SquadExample(object):
     return s
 
 
+class _PositionMap(collections.abc.Mapping):
+  """A read-only mapping from token positions to values, backed by an array.
+
+  It takes a fraction of the memory of the equivalent dictionary, which holds
+  a Python object per key and value.
+  """
+
+  __slots__ = ("_values", "_value_type")
+
+  _MISSING = -1
+
+  def __init__(self, mapping, length, value_type=int):
+    self._values = np.full([length], self._MISSING, dtype=np.int32)
+    for (position, value) in six.iteritems(mapping):
+      self._values[position] = value
+    self._value_type = value_type
+
+  def __getitem__(self, position):
+    if (not isinstance(position, (int, np.integer)) or
+        not 0 <= position < len(self._values) or
+        self._values[position] == self._MISSING):
+      raise KeyError(position)
+    return self._value_type(self._values[position])
+
+  def __iter__(self):
+    return iter(np.flatnonzero(self._values != self._MISSING).tolist())
+
+  def __len__(self):
+    return int(np.count_nonzero(self._values != self._MISSING))
+
+  def lookup(self, positions, default):
+    """Returns the values at an array of positions, `default` where missing."""
+    positions = np.asarray(positions)
+    in_range = (positions >= 0) & (positions < len(self._values))
+    values = self._values[np.where(in_range, positions, 0)]
+    return np.where(in_range & (values != self._MISSING), values, default)
+
+
 class InputFeatures(object):
-  """A single set of features of data."""
+  """A single set of features of data.
+
+  The features are stored compactly, since all the features of the eval set are
+  kept in memory for the predictions: the ids and masks are NumPy arrays, and
+  `token_to_orig_map` and `token_is_max_context` are read-only mappings backed
+  by arrays.
+  """
+
+  __slots__ = ("unique_id", "example_index", "doc_span_index", "tokens",
+               "token_to_orig_map", "token_is_max_context", "input_ids",
+               "input_mask", "segment_ids", "start_position", "end_position",
+               "is_impossible", "paragraph_mask", "class_index")
 
   def __init__(self,
                unique_id,
@@ -100,16 +162,18 @@ class InputFeatures(object):
     self.unique_id = unique_id
     self.example_index = example_index
     self.doc_span_index = doc_span_index
-    self.tokens = tokens
-    self.token_to_orig_map = token_to_orig_map
-    self.token_is_max_context = token_is_max_context
-    self.input_ids = input_ids
-    self.input_mask = input_mask
-    self.segment_ids = segment_ids
+    self.tokens = tuple(tokens)
+    self.token_to_orig_map = _PositionMap(token_to_orig_map, len(input_ids))
+    self.token_is_max_context = _PositionMap(
+        token_is_max_context, len(input_ids), value_type=bool)
+    self.input_ids = np.asarray(input_ids, dtype=np.int32)
+    self.input_mask = np.asarray(input_mask, dtype=np.int8)
+    self.segment_ids = np.asarray(segment_ids, dtype=np.int8)
     self.start_position = start_position
     self.end_position = end_position
     self.is_impossible = is_impossible
-    self.paragraph_mask = paragraph_mask
+    self.paragraph_mask = (None if paragraph_mask is None else
+                           np.asarray(paragraph_mask, dtype=np.int8))
     self.class_index = class_index
 
 
@@ -128,8 +192,9 @@ class FeatureWriter(object):
     self.num_features += 1
 
     def create_int_feature(values):
+      # `tolist` converts NumPy arrays to Python ints in a single call.
       feature = tf.train.Feature(
-          int64_list=tf.train.Int64List(value=list(values)))
+          int64_list=tf.train.Int64List(value=np.asarray(values).tolist()))
       return feature
 
     features = collections.OrderedDict()
@@ -249,6 +314,222 @@ def read_squad_examples(input_file, is_training,
   return examples
 
 
+def _convert_example_to_features(example_index, example, tokenizer,
+                                max_seq_length, doc_stride, max_query_length,
+                                is_training, xlnet_format):
+  """Returns the features of the doc spans of an example.
+
+  The `unique_id` of the features is left as None, it is assigned by
+  `convert_examples_to_features` in the order of the features.
+  """
+  features = []
+  query_tokens = tokenizer.tokenize(example.question_text)
+
+  if len(query_tokens) > max_query_length:
+    query_tokens = query_tokens[0:max_query_length]
+
+  tok_to_orig_index = []
+  orig_to_tok_index = []
+  all_doc_tokens = []
+  for (i, sub_tokens) in enumerate(
+      tokenizer.tokenize_batch(example.doc_tokens)):
+    orig_to_tok_index.append(len(all_doc_tokens))
+    for sub_token in sub_tokens:
+      tok_to_orig_index.append(i)
+      all_doc_tokens.append(sub_token)
+
+  tok_start_position = None
+  tok_end_position = None
+  if is_training and example.is_impossible:
+    tok_start_position = -1
+    tok_end_position = -1
+  if is_training and not example.is_impossible:
+    tok_start_position = orig_to_tok_index[example.start_position]
+    if example.end_position < len(example.doc_tokens) - 1:
+      tok_end_position = orig_to_tok_index[example.end_position + 1] - 1
+    else:
+      tok_end_position = len(all_doc_tokens) - 1
+    (tok_start_position, tok_end_position) = _improve_answer_span(
+        all_doc_tokens, tok_start_position, tok_end_position, tokenizer,
+        example.orig_answer_text)
+
+  # The -3 accounts for [CLS], [SEP] and [SEP]
+  max_tokens_for_doc = max_seq_length - len(query_tokens) - 3
+
+  # We can have documents that are longer than the maximum sequence length.
+  # To deal with this we do a sliding window approach, where we take chunks
+  # of the up to our max length with a stride of `doc_stride`.
+  _DocSpan = collections.namedtuple(  # pylint: disable=invalid-name
+      "DocSpan", ["start", "length"])
+  doc_spans = []
+  start_offset = 0
+  while start_offset < len(all_doc_tokens):
+    length = len(all_doc_tokens) - start_offset
+    if length > max_tokens_for_doc:
+      length = max_tokens_for_doc
+    doc_spans.append(_DocSpan(start=start_offset, length=length))
+    if start_offset + length == len(all_doc_tokens):
+      break
+    start_offset += min(length, doc_stride)
+
+  for (doc_span_index, doc_span) in enumerate(doc_spans):
+    tokens = []
+    token_to_orig_map = {}
+    token_is_max_context = {}
+    segment_ids = []
+
+    # Paragraph mask used in XLNet.
+    # 1 represents paragraph and class tokens.
+    # 0 represents query and other special tokens.
+    paragraph_mask = []
+
+    # pylint: disable=cell-var-from-loop
+    def process_query(seg_q):
+      for token in query_tokens:
+        tokens.append(token)
+        segment_ids.append(seg_q)
+        paragraph_mask.append(0)
+      tokens.append("[SEP]")
+      segment_ids.append(seg_q)
+      paragraph_mask.append(0)
+
+    def process_paragraph(seg_p):
+      for i in range(doc_span.length):
+        split_token_index = doc_span.start + i
+        token_to_orig_map[len(tokens)] = tok_to_orig_index[split_token_index]
+
+        is_max_context = _check_is_max_context(doc_spans, doc_span_index,
+                                               split_token_index)
+        token_is_max_context[len(tokens)] = is_max_context
+        tokens.append(all_doc_tokens[split_token_index])
+        segment_ids.append(seg_p)
+        paragraph_mask.append(1)
+      tokens.append("[SEP]")
+      segment_ids.append(seg_p)
+      paragraph_mask.append(0)
+
+    def process_class(seg_class):
+      class_index = len(segment_ids)
+      tokens.append("[CLS]")
+      segment_ids.append(seg_class)
+      paragraph_mask.append(1)
+      return class_index
+
+    if xlnet_format:
+      seg_p, seg_q, seg_class, seg_pad = 0, 1, 2, 3
+      process_paragraph(seg_p)
+      process_query(seg_q)
+      class_index = process_class(seg_class)
+    else:
+      seg_p, seg_q, seg_class, seg_pad = 1, 0, 0, 0
+      class_index = process_class(seg_class)
+      process_query(seg_q)
+      process_paragraph(seg_p)
+
+    input_ids = tokenizer.convert_tokens_to_ids(tokens)
+
+    # The mask has 1 for real tokens and 0 for padding tokens. Only real
+    # tokens are attended to.
+    input_mask = [1] * len(input_ids)
+
+    # Zero-pad up to the sequence length.
+    while len(input_ids) < max_seq_length:
+      input_ids.append(0)
+      input_mask.append(0)
+      segment_ids.append(seg_pad)
+      paragraph_mask.append(0)
+
+    assert len(input_ids) == max_seq_length
+    assert len(input_mask) == max_seq_length
+    assert len(segment_ids) == max_seq_length
+    assert len(paragraph_mask) == max_seq_length
+
+    start_position = 0
+    end_position = 0
+    span_contains_answer = False
+
+    if is_training and not example.is_impossible:
+      # For training, if our document chunk does not contain an annotation
+      # we throw it out, since there is nothing to predict.
+      doc_start = doc_span.start
+      doc_end = doc_span.start + doc_span.length - 1
+      span_contains_answer = (tok_start_position >= doc_start and
+                              tok_end_position <= doc_end)
+      if span_contains_answer:
+        doc_offset = 0 if xlnet_format else len(query_tokens) + 2
+        start_position = tok_start_position - doc_start + doc_offset
+        end_position = tok_end_position - doc_start + doc_offset
+
+    features.append(
+        InputFeatures(
+            unique_id=None,
+            example_index=example_index,
+            doc_span_index=doc_span_index,
+            tokens=tokens,
+            paragraph_mask=paragraph_mask,
+            class_index=class_index,
+            token_to_orig_map=token_to_orig_map,
+            token_is_max_context=token_is_max_context,
+            input_ids=input_ids,
+            input_mask=input_mask,
+            segment_ids=segment_ids,
+            start_position=start_position,
+            end_position=end_position,
+            is_impossible=not span_contains_answer))
+  return features
+
+
+def _log_feature(feature, is_training):
+  """Logs the content of a feature."""
+  logging.info("*** Example ***")
+  logging.info("unique_id: %s", (feature.unique_id))
+  logging.info("example_index: %s", (feature.example_index))
+  logging.info("doc_span_index: %s", (feature.doc_span_index))
+  logging.info("tokens: %s", " ".join(
+      [tokenization.printable_text(x) for x in feature.tokens]))
+  logging.info(
+      "token_to_orig_map: %s", " ".join([
+          "%d:%d" % (x, y)
+          for (x, y) in six.iteritems(feature.token_to_orig_map)
+      ]))
+  logging.info(
+      "token_is_max_context: %s", " ".join([
+          "%d:%s" % (x, y)
+          for (x, y) in six.iteritems(feature.token_is_max_context)
+      ]))
+  logging.info("input_ids: %s", " ".join([str(x) for x in feature.input_ids]))
+  logging.info("input_mask: %s", " ".join(
+      [str(x) for x in feature.input_mask]))
+  logging.info("segment_ids: %s", " ".join(
+      [str(x) for x in feature.segment_ids]))
+  logging.info("paragraph_mask: %s", " ".join(
+      [str(x) for x in feature.paragraph_mask]))
+  logging.info("class_index: %d", feature.class_index)
+  if is_training:
+    if not feature.is_impossible:
+      answer_text = " ".join(
+          feature.tokens[feature.start_position:(feature.end_position + 1)])
+      logging.info("start_position: %d", (feature.start_position))
+      logging.info("end_position: %d", (feature.end_position))
+      logging.info("answer: %s", tokenization.printable_text(answer_text))
+    else:
+      logging.info("document span doesn't contain answer")
+
+
+# The example featurization function of the worker processes of
+# `convert_examples_to_features`, set by `_init_featurization_worker`.
+_worker_convert_example_fn = None
+
+
+def _init_featurization_worker(convert_example_fn):
+  global _worker_convert_example_fn
+  _worker_convert_example_fn = convert_example_fn
+
+
+def _convert_example_in_worker(index_and_example):
+  return _worker_convert_example_fn(*index_and_example)
+
+
 def convert_examples_to_features(examples,
                                  tokenizer,
                                  max_seq_length,
@@ -257,204 +538,73 @@ def convert_examples_to_features(examples,
                                  is_training,
                                  output_fn,
                                  xlnet_format=False,
-                                 batch_size=None):
-  """Loads a data file into a list of `InputBatch`s."""
-
+                                 batch_size=None,
+                                 num_processes=0):
+  """Loads a data file into a list of `InputBatch`s.
+
+  The features are passed to `output_fn` as they are created, e.g. to the
+  `process_feature` method of a `FeatureWriter`, so they are not all kept in
+  memory. When featurizing in several processes, the examples are featurized
+  in parallel but the features are passed to `output_fn` in the same order and
+  with the same unique ids as in a single process.
+
+  Args:
+    examples: the `SquadExample`s to featurize.
+    tokenizer: the tokenizer of the examples. It must be picklable to featurize
+      in several processes.
+    max_seq_length: the length of the features.
+    doc_stride: the stride between the doc spans of a long document.
+    max_query_length: the maximum number of tokens of the question.
+    is_training: whether the features are for training.
+    output_fn: the function called with every feature, and with `is_padding`
+      for evaluation features.
+    xlnet_format: whether to order the tokens as in XLNet.
+    batch_size: the eval batch size, to pad the eval features to a multiple of.
+    num_processes: the number of processes featurizing the examples. If None,
+      uses `os.cpu_count()`. If 0, featurizes in this process.
+
+  Returns:
+    The number of features, including the padding features.
+  """
+  convert_example_fn = functools.partial(
+      _convert_example_to_features,
+      tokenizer=tokenizer,
+      max_seq_length=max_seq_length,
+      doc_stride=doc_stride,
+      max_query_length=max_query_length,
+      is_training=is_training,
+      xlnet_format=xlnet_format)
   base_id = 1000000000
   unique_id = base_id
   feature = None
-  for (example_index, example) in enumerate(examples):
-    query_tokens = tokenizer.tokenize(example.question_text)
-
-    if len(query_tokens) > max_query_length:
-      query_tokens = query_tokens[0:max_query_length]
-
-    tok_to_orig_index = []
-    orig_to_tok_index = []
-    all_doc_tokens = []
-    for (i, token) in enumerate(example.doc_tokens):
-      orig_to_tok_index.append(len(all_doc_tokens))
-      sub_tokens = tokenizer.tokenize(token)
-      for sub_token in sub_tokens:
-        tok_to_orig_index.append(i)
-        all_doc_tokens.append(sub_token)
-
-    tok_start_position = None
-    tok_end_position = None
-    if is_training and example.is_impossible:
-      tok_start_position = -1
-      tok_end_position = -1
-    if is_training and not example.is_impossible:
-      tok_start_position = orig_to_tok_index[example.start_position]
-      if example.end_position < len(example.doc_tokens) - 1:
-        tok_end_position = orig_to_tok_index[example.end_position + 1] - 1
-      else:
-        tok_end_position = len(all_doc_tokens) - 1
-      (tok_start_position, tok_end_position) = _improve_answer_span(
-          all_doc_tokens, tok_start_position, tok_end_position, tokenizer,
-          example.orig_answer_text)
-
-    # The -3 accounts for [CLS], [SEP] and [SEP]
-    max_tokens_for_doc = max_seq_length - len(query_tokens) - 3
-
-    # We can have documents that are longer than the maximum sequence length.
-    # To deal with this we do a sliding window approach, where we take chunks
-    # of the up to our max length with a stride of `doc_stride`.
-    _DocSpan = collections.namedtuple(  # pylint: disable=invalid-name
-        "DocSpan", ["start", "length"])
-    doc_spans = []
-    start_offset = 0
-    while start_offset < len(all_doc_tokens):
-      length = len(all_doc_tokens) - start_offset
-      if length > max_tokens_for_doc:
-        length = max_tokens_for_doc
-      doc_spans.append(_DocSpan(start=start_offset, length=length))
-      if start_offset + length == len(all_doc_tokens):
-        break
-      start_offset += min(length, doc_stride)
-
-    for (doc_span_index, doc_span) in enumerate(doc_spans):
-      tokens = []
-      token_to_orig_map = {}
-      token_is_max_context = {}
-      segment_ids = []
-
-      # Paragraph mask used in XLNet.
-      # 1 represents paragraph and class tokens.
-      # 0 represents query and other special tokens.
-      paragraph_mask = []
-
-      # pylint: disable=cell-var-from-loop
-      def process_query(seg_q):
-        for token in query_tokens:
-          tokens.append(token)
-          segment_ids.append(seg_q)
-          paragraph_mask.append(0)
-        tokens.append("[SEP]")
-        segment_ids.append(seg_q)
-        paragraph_mask.append(0)
-
-      def process_paragraph(seg_p):
-        for i in range(doc_span.length):
-          split_token_index = doc_span.start + i
-          token_to_orig_map[len(tokens)] = tok_to_orig_index[split_token_index]
-
-          is_max_context = _check_is_max_context(doc_spans, doc_span_index,
-                                                 split_token_index)
-          token_is_max_context[len(tokens)] = is_max_context
-          tokens.append(all_doc_tokens[split_token_index])
-          segment_ids.append(seg_p)
-          paragraph_mask.append(1)
-        tokens.append("[SEP]")
-        segment_ids.append(seg_p)
-        paragraph_mask.append(0)
+  with contextlib.ExitStack() as stack:
+    if num_processes is None or num_processes > 0:
+      # The pool is terminated on exit, including when `output_fn` failed.
+      pool = stack.enter_context(
+          mp.Pool(
+              processes=num_processes,
+              initializer=_init_featurization_worker,
+              initargs=(convert_example_fn,)))
+      all_features = pool.imap(
+          _convert_example_in_worker,
+          enumerate(examples),
+          chunksize=_FEATURIZATION_CHUNK_SIZE)
+    else:
+      all_features = itertools.starmap(convert_example_fn, enumerate(examples))
 
-      def process_class(seg_class):
-        class_index = len(segment_ids)
-        tokens.append("[CLS]")
-        segment_ids.append(seg_class)
-        paragraph_mask.append(1)
-        return class_index
+    for features in all_features:
+      for feature in features:
+        feature.unique_id = unique_id
+        if feature.example_index < 20:
+          _log_feature(feature, is_training)
 
-      if xlnet_format:
-        seg_p, seg_q, seg_class, seg_pad = 0, 1, 2, 3
-        process_paragraph(seg_p)
-        process_query(seg_q)
-        class_index = process_class(seg_class)
-      else:
-        seg_p, seg_q, seg_class, seg_pad = 1, 0, 0, 0
-        class_index = process_class(seg_class)
-        process_query(seg_q)
-        process_paragraph(seg_p)
-
-      input_ids = tokenizer.convert_tokens_to_ids(tokens)
-
-      # The mask has 1 for real tokens and 0 for padding tokens. Only real
-      # tokens are attended to.
-      input_mask = [1] * len(input_ids)
-
-      # Zero-pad up to the sequence length.
-      while len(input_ids) < max_seq_length:
-        input_ids.append(0)
-        input_mask.append(0)
-        segment_ids.append(seg_pad)
-        paragraph_mask.append(0)
-
-      assert len(input_ids) == max_seq_length
-      assert len(input_mask) == max_seq_length
-      assert len(segment_ids) == max_seq_length
-      assert len(paragraph_mask) == max_seq_length
-
-      start_position = 0
-      end_position = 0
-      span_contains_answer = False
-
-      if is_training and not example.is_impossible:
-        # For training, if our document chunk does not contain an annotation
-        # we throw it out, since there is nothing to predict.
-        doc_start = doc_span.start
-        doc_end = doc_span.start + doc_span.length - 1
-        span_contains_answer = (tok_start_position >= doc_start and
-                                tok_end_position <= doc_end)
-        if span_contains_answer:
-          doc_offset = 0 if xlnet_format else len(query_tokens) + 2
-          start_position = tok_start_position - doc_start + doc_offset
-          end_position = tok_end_position - doc_start + doc_offset
-
-      if example_index < 20:
-        logging.info("*** Example ***")
-        logging.info("unique_id: %s", (unique_id))
-        logging.info("example_index: %s", (example_index))
-        logging.info("doc_span_index: %s", (doc_span_index))
-        logging.info("tokens: %s",
-                     " ".join([tokenization.printable_text(x) for x in tokens]))
-        logging.info(
-            "token_to_orig_map: %s", " ".join([
-                "%d:%d" % (x, y) for (x, y) in six.iteritems(token_to_orig_map)
-            ]))
-        logging.info(
-            "token_is_max_context: %s", " ".join([
-                "%d:%s" % (x, y)
-                for (x, y) in six.iteritems(token_is_max_context)
-            ]))
-        logging.info("input_ids: %s", " ".join([str(x) for x in input_ids]))
-        logging.info("input_mask: %s", " ".join([str(x) for x in input_mask]))
-        logging.info("segment_ids: %s", " ".join([str(x) for x in segment_ids]))
-        logging.info("paragraph_mask: %s", " ".join(
-            [str(x) for x in paragraph_mask]))
-        logging.info("class_index: %d", class_index)
+        # Run callback
         if is_training:
-          if span_contains_answer:
-            answer_text = " ".join(tokens[start_position:(end_position + 1)])
-            logging.info("start_position: %d", (start_position))
-            logging.info("end_position: %d", (end_position))
-            logging.info("answer: %s", tokenization.printable_text(answer_text))
-          else:
-            logging.info("document span doesn't contain answer")
-
-      feature = InputFeatures(
-          unique_id=unique_id,
-          example_index=example_index,
-          doc_span_index=doc_span_index,
-          tokens=tokens,
-          paragraph_mask=paragraph_mask,
-          class_index=class_index,
-          token_to_orig_map=token_to_orig_map,
-          token_is_max_context=token_is_max_context,
-          input_ids=input_ids,
-          input_mask=input_mask,
-          segment_ids=segment_ids,
-          start_position=start_position,
-          end_position=end_position,
-          is_impossible=not span_contains_answer)
+          output_fn(feature)
+        else:
+          output_fn(feature, is_padding=False)
 
-      # Run callback
-      if is_training:
-        output_fn(feature)
-      else:
-        output_fn(feature, is_padding=False)
-
-      unique_id += 1
+        unique_id += 1
 
   if not is_training and feature:
     assert batch_size
@@ -591,8 +741,30 @@ def postprocess_output(all_examples,
                        version_2_with_negative=False,
                        null_score_diff_threshold=0.0,
                        xlnet_format=False,
-                       verbose=False):
-  """Postprocess model output, to form predicton results."""
+                       verbose=False,
+                       num_processes=0):
+  """Postprocess model output, to form predicton results.
+
+  Args:
+    all_examples: the `SquadExample`s.
+    all_features: the `InputFeatures` of the examples.
+    all_results: the model outputs of the features, with a `unique_id`.
+    n_best_size: the number of n-best predictions per example.
+    max_answer_length: the maximum number of tokens of an answer.
+    do_lower_case: whether the tokenizer lower cases the text.
+    version_2_with_negative: whether examples may have no answer.
+    null_score_diff_threshold: the threshold of the null score difference
+      above which no answer is predicted.
+    xlnet_format: whether the results are in the XLNet format.
+    verbose: whether to log the failures of `get_final_text`.
+    num_processes: the number of processes postprocessing the examples. If
+      None, uses `os.cpu_count()`. If 0, postprocesses in this process. The
+      predictions are the same either way.
+
+  Returns:
+    The predictions, n-best predictions and null score differences, each a
+    dictionary keyed by question id.
+  """
 
   example_index_to_features = collections.defaultdict(list)
   for feature in all_features:
@@ -601,188 +773,227 @@ def postprocess_output(all_examples,
   for result in all_results:
     unique_id_to_result[result.unique_id] = result
 
-  _PrelimPrediction = collections.namedtuple(  # pylint: disable=invalid-name
-      "PrelimPrediction",
-      ["feature_index", "start_index", "end_index", "start_logit", "end_logit"])
-
+  def tasks():
+    for (example_index, example) in enumerate(all_examples):
+      features = example_index_to_features[example_index]
+      results = []
+      for feature in features:
+        if feature.unique_id not in unique_id_to_result:
+          logging.info("Skip eval example %s, not in pred.", feature.unique_id)
+        results.append(unique_id_to_result.get(feature.unique_id))
+      yield example, features, results
+
+  postprocess_example_fn = functools.partial(
+      _postprocess_example,
+      n_best_size=n_best_size,
+      max_answer_length=max_answer_length,
+      do_lower_case=do_lower_case,
+      version_2_with_negative=version_2_with_negative,
+      null_score_diff_threshold=null_score_diff_threshold,
+      xlnet_format=xlnet_format,
+      verbose=verbose)
   all_predictions = collections.OrderedDict()
   all_nbest_json = collections.OrderedDict()
   scores_diff_json = collections.OrderedDict()
+  with contextlib.ExitStack() as stack:
+    if num_processes is None or num_processes > 0:
+      # The pool is terminated on exit, including when a worker failed.
+      pool = stack.enter_context(mp.Pool(processes=num_processes))
+      outputs = pool.imap(
+          functools.partial(_apply, postprocess_example_fn),
+          tasks(),
+          chunksize=_POSTPROCESSING_CHUNK_SIZE)
+    else:
+      outputs = itertools.starmap(postprocess_example_fn, tasks())
 
-  for (example_index, example) in enumerate(all_examples):
-    features = example_index_to_features[example_index]
-
-    prelim_predictions = []
-    # keep track of the minimum score of null start+end of position 0
-    score_null = 1000000  # large and positive
-    min_null_feature_index = 0  # the paragraph slice with min mull score
-    null_start_logit = 0  # the start logit at the slice with min null score
-    null_end_logit = 0  # the end logit at the slice with min null score
-    for (feature_index, feature) in enumerate(features):
-      if feature.unique_id not in unique_id_to_result:
-        logging.info("Skip eval example %s, not in pred.", feature.unique_id)
-        continue
-      result = unique_id_to_result[feature.unique_id]
-
-      # if we could have irrelevant answers, get the min score of irrelevant
+    for example, (prediction, nbest_json, score_diff) in zip(
+        all_examples, outputs):
+      all_predictions[example.qas_id] = prediction
+      all_nbest_json[example.qas_id] = nbest_json
       if version_2_with_negative:
-        if xlnet_format:
-          feature_null_score = result.class_logits
-        else:
-          feature_null_score = result.start_logits[0] + result.end_logits[0]
-        if feature_null_score < score_null:
-          score_null = feature_null_score
-          min_null_feature_index = feature_index
-          null_start_logit = result.start_logits[0]
-          null_end_logit = result.end_logits[0]
-      for (start_index, start_logit,
-           end_index, end_logit) in _get_best_indexes_and_logits(
-               result=result,
-               n_best_size=n_best_size,
-               xlnet_format=xlnet_format):
-        # We could hypothetically create invalid predictions, e.g., predict
-        # that the start of the span is in the question. We throw out all
-        # invalid predictions.
-        if start_index >= len(feature.tokens):
-          continue
-        if end_index >= len(feature.tokens):
-          continue
-        if start_index not in feature.token_to_orig_map:
-          continue
-        if end_index not in feature.token_to_orig_map:
-          continue
-        if not feature.token_is_max_context.get(start_index, False):
-          continue
-        if end_index < start_index:
-          continue
-        length = end_index - start_index + 1
-        if length > max_answer_length:
-          continue
-        prelim_predictions.append(
-            _PrelimPrediction(
-                feature_index=feature_index,
-                start_index=start_index,
-                end_index=end_index,
-                start_logit=start_logit,
-                end_logit=end_logit))
-
-    if version_2_with_negative and not xlnet_format:
-      prelim_predictions.append(
-          _PrelimPrediction(
-              feature_index=min_null_feature_index,
-              start_index=0,
-              end_index=0,
-              start_logit=null_start_logit,
-              end_logit=null_end_logit))
-    prelim_predictions = sorted(
-        prelim_predictions,
-        key=lambda x: (x.start_logit + x.end_logit),
-        reverse=True)
-
-    _NbestPrediction = collections.namedtuple(  # pylint: disable=invalid-name
-        "NbestPrediction", ["text", "start_logit", "end_logit"])
-
-    seen_predictions = {}
-    nbest = []
-    for pred in prelim_predictions:
-      if len(nbest) >= n_best_size:
-        break
-      feature = features[pred.feature_index]
-      if pred.start_index > 0 or xlnet_format:  # this is a non-null prediction
-        tok_tokens = feature.tokens[pred.start_index:(pred.end_index + 1)]
-        orig_doc_start = feature.token_to_orig_map[pred.start_index]
-        orig_doc_end = feature.token_to_orig_map[pred.end_index]
-        orig_tokens = example.doc_tokens[orig_doc_start:(orig_doc_end + 1)]
-        tok_text = " ".join(tok_tokens)
-
-        # De-tokenize WordPieces that have been split off.
-        tok_text = tok_text.replace(" ##", "")
-        tok_text = tok_text.replace("##", "")
-
-        # Clean whitespace
-        tok_text = tok_text.strip()
-        tok_text = " ".join(tok_text.split())
-        orig_text = " ".join(orig_tokens)
-
-        final_text = get_final_text(
-            tok_text, orig_text, do_lower_case, verbose=verbose)
-        if final_text in seen_predictions:
-          continue
-
-        seen_predictions[final_text] = True
-      else:
-        final_text = ""
-        seen_predictions[final_text] = True
+        scores_diff_json[example.qas_id] = score_diff
 
-      nbest.append(
-          _NbestPrediction(
-              text=final_text,
-              start_logit=pred.start_logit,
-              end_logit=pred.end_logit))
-
-    # if we didn't include the empty option in the n-best, include it
-    if version_2_with_negative and not xlnet_format:
-      if "" not in seen_predictions:
-        nbest.append(
-            _NbestPrediction(
-                text="", start_logit=null_start_logit,
-                end_logit=null_end_logit))
-    # In very rare edge cases we could have no valid predictions. So we
-    # just create a nonce prediction in this case to avoid failure.
-    if not nbest:
-      nbest.append(
-          _NbestPrediction(text="empty", start_logit=0.0, end_logit=0.0))
+  return all_predictions, all_nbest_json, scores_diff_json
 
-    assert len(nbest) >= 1
 
-    total_scores = []
-    best_non_null_entry = None
-    for entry in nbest:
-      total_scores.append(entry.start_logit + entry.end_logit)
-      if not best_non_null_entry:
-        if entry.text:
-          best_non_null_entry = entry
+def _apply(fn, args):
+  return fn(*args)
 
-    probs = _compute_softmax(total_scores)
 
-    nbest_json = []
-    for (i, entry) in enumerate(nbest):
-      output = collections.OrderedDict()
-      output["text"] = entry.text
-      output["probability"] = probs[i]
-      output["start_logit"] = entry.start_logit
-      output["end_logit"] = entry.end_logit
-      nbest_json.append(output)
+_PrelimPrediction = collections.namedtuple(  # pylint: disable=invalid-name
+    "PrelimPrediction",
+    ["feature_index", "start_index", "end_index", "start_logit", "end_logit"])
 
-    assert len(nbest_json) >= 1
+_NbestPrediction = collections.namedtuple(  # pylint: disable=invalid-name
+    "NbestPrediction", ["text", "start_logit", "end_logit"])
 
-    if not version_2_with_negative:
-      all_predictions[example.qas_id] = nbest_json[0]["text"]
-    else:
-      # pytype: disable=attribute-error
-      # predict "" iff the null score - the score of best non-null > threshold
-      if best_non_null_entry is not None:
-        if xlnet_format:
-          score_diff = score_null
-          scores_diff_json[example.qas_id] = score_diff
-          all_predictions[example.qas_id] = best_non_null_entry.text
-        else:
-          score_diff = score_null - best_non_null_entry.start_logit - (
-              best_non_null_entry.end_logit)
-          scores_diff_json[example.qas_id] = score_diff
-          if score_diff > null_score_diff_threshold:
-            all_predictions[example.qas_id] = ""
-          else:
-            all_predictions[example.qas_id] = best_non_null_entry.text
+
+def _postprocess_example(example, features, results, n_best_size,
+                         max_answer_length, do_lower_case,
+                         version_2_with_negative, null_score_diff_threshold,
+                         xlnet_format, verbose):
+  """Returns the prediction, n-best and null score difference of an example.
+
+  Args:
+    example: the `SquadExample`.
+    features: the `InputFeatures` of the example.
+    results: the model output of each feature, or None for features without
+      predictions.
+    n_best_size: see `postprocess_output`.
+    max_answer_length: see `postprocess_output`.
+    do_lower_case: see `postprocess_output`.
+    version_2_with_negative: see `postprocess_output`.
+    null_score_diff_threshold: see `postprocess_output`.
+    xlnet_format: see `postprocess_output`.
+    verbose: see `postprocess_output`.
+  """
+  prelim_predictions = []
+  # keep track of the minimum score of null start+end of position 0
+  score_null = 1000000  # large and positive
+  min_null_feature_index = 0  # the paragraph slice with min mull score
+  null_start_logit = 0  # the start logit at the slice with min null score
+  null_end_logit = 0  # the end logit at the slice with min null score
+  for (feature_index, (feature, result)) in enumerate(zip(features, results)):
+    if result is None:
+      continue
+
+    # if we could have irrelevant answers, get the min score of irrelevant
+    if version_2_with_negative:
+      if xlnet_format:
+        feature_null_score = result.class_logits
       else:
-        logging.warning("best_non_null_entry is None")
-        scores_diff_json[example.qas_id] = score_null
-        all_predictions[example.qas_id] = ""
-      # pytype: enable=attribute-error
+        feature_null_score = result.start_logits[0] + result.end_logits[0]
+      if feature_null_score < score_null:
+        score_null = feature_null_score
+        min_null_feature_index = feature_index
+        null_start_logit = result.start_logits[0]
+        null_end_logit = result.end_logits[0]
+    for (start_index, start_logit, end_index,
+         end_logit) in _get_valid_spans_and_logits(
+             result=result,
+             feature=feature,
+             n_best_size=n_best_size,
+             max_answer_length=max_answer_length,
+             xlnet_format=xlnet_format):
+      prelim_predictions.append(
+          _PrelimPrediction(
+              feature_index=feature_index,
+              start_index=start_index,
+              end_index=end_index,
+              start_logit=start_logit,
+              end_logit=end_logit))
+
+  if version_2_with_negative and not xlnet_format:
+    prelim_predictions.append(
+        _PrelimPrediction(
+            feature_index=min_null_feature_index,
+            start_index=0,
+            end_index=0,
+            start_logit=null_start_logit,
+            end_logit=null_end_logit))
+  prelim_predictions = sorted(
+      prelim_predictions,
+      key=lambda x: (x.start_logit + x.end_logit),
+      reverse=True)
+
+  seen_predictions = {}
+  nbest = []
+  for pred in prelim_predictions:
+    if len(nbest) >= n_best_size:
+      break
+    feature = features[pred.feature_index]
+    if pred.start_index > 0 or xlnet_format:  # this is a non-null prediction
+      tok_tokens = feature.tokens[pred.start_index:(pred.end_index + 1)]
+      orig_doc_start = feature.token_to_orig_map[pred.start_index]
+      orig_doc_end = feature.token_to_orig_map[pred.end_index]
+      orig_tokens = example.doc_tokens[orig_doc_start:(orig_doc_end + 1)]
+      tok_text = " ".join(tok_tokens)
+
+      # De-tokenize WordPieces that have been split off.
+      tok_text = tok_text.replace(" ##", "")
+      tok_text = tok_text.replace("##", "")
+
+      # Clean whitespace
+      tok_text = tok_text.strip()
+      tok_text = " ".join(tok_text.split())
+      orig_text = " ".join(orig_tokens)
+
+      final_text = get_final_text(
+          tok_text, orig_text, do_lower_case, verbose=verbose)
+      if final_text in seen_predictions:
+        continue
 
-    all_nbest_json[example.qas_id] = nbest_json
+      seen_predictions[final_text] = True
+    else:
+      final_text = ""
+      seen_predictions[final_text] = True
+
+    nbest.append(
+        _NbestPrediction(
+            text=final_text,
+            start_logit=pred.start_logit,
+            end_logit=pred.end_logit))
+
+  # if we didn't include the empty option in the n-best, include it
+  if version_2_with_negative and not xlnet_format:
+    if "" not in seen_predictions:
+      nbest.append(
+          _NbestPrediction(
+              text="", start_logit=null_start_logit,
+              end_logit=null_end_logit))
+  # In very rare edge cases we could have no valid predictions. So we
+  # just create a nonce prediction in this case to avoid failure.
+  if not nbest:
+    nbest.append(
+        _NbestPrediction(text="empty", start_logit=0.0, end_logit=0.0))
+
+  assert len(nbest) >= 1
+
+  total_scores = []
+  best_non_null_entry = None
+  for entry in nbest:
+    total_scores.append(entry.start_logit + entry.end_logit)
+    if not best_non_null_entry:
+      if entry.text:
+        best_non_null_entry = entry
+
+  probs = _compute_softmax(total_scores)
+
+  nbest_json = []
+  for (i, entry) in enumerate(nbest):
+    output = collections.OrderedDict()
+    output["text"] = entry.text
+    output["probability"] = probs[i]
+    output["start_logit"] = entry.start_logit
+    output["end_logit"] = entry.end_logit
+    nbest_json.append(output)
+
+  assert len(nbest_json) >= 1
+
+  score_diff = None
+  if not version_2_with_negative:
+    prediction = nbest_json[0]["text"]
+  else:
+    # pytype: disable=attribute-error
+    # predict "" iff the null score - the score of best non-null > threshold
+    if best_non_null_entry is not None:
+      if xlnet_format:
+        score_diff = score_null
+        prediction = best_non_null_entry.text
+      else:
+        score_diff = score_null - best_non_null_entry.start_logit - (
+            best_non_null_entry.end_logit)
+        if score_diff > null_score_diff_threshold:
+          prediction = ""
+        else:
+          prediction = best_non_null_entry.text
+    else:
+      logging.warning("best_non_null_entry is None")
+      score_diff = score_null
+      prediction = ""
+    # pytype: enable=attribute-error
 
-  return all_predictions, all_nbest_json, scores_diff_json
+  return prediction, nbest_json, score_diff
 
 
 def write_to_json_files(json_records, json_file):
@@ -885,29 +1096,69 @@ def get_final_text(pred_text, orig_text, do_lower_case, verbose=False):
   return output_text
 
 
-def _get_best_indexes_and_logits(result,
-                                 n_best_size,
-                                 xlnet_format=False):
-  """Generates the n-best indexes and logits from a list."""
+def _lookup(mapping, positions, default):
+  """Returns the values of `mapping` at an array of positions."""
+  if isinstance(mapping, _PositionMap):
+    return mapping.lookup(positions, default)
+  return np.array([mapping.get(p, default) for p in positions.ravel().tolist()
+                  ]).reshape(positions.shape)
+
+
+def _get_valid_spans_and_logits(result, feature, n_best_size,
+                                max_answer_length, xlnet_format=False):
+  """Generates the valid spans among the n-best indexes, and their logits.
+
+  The spans are generated in the order of their start index in the n-best,
+  then of their end index in the n-best, i.e. by decreasing logits with ties
+  in index order. All the n-best x n-best candidate spans are checked at once
+  with NumPy.
+
+  Args:
+    result: the model output of the feature.
+    feature: the `InputFeatures`.
+    n_best_size: the number of n-best start and end indexes.
+    max_answer_length: the maximum number of tokens of a span.
+    xlnet_format: whether the result is in the XLNet format, i.e. already has
+      the n-best start indexes and the n-best end indexes of each of them.
+
+  Yields:
+    The (start_index, start_logit, end_index, end_logit) of the valid spans.
+  """
   if xlnet_format:
-    for i in range(n_best_size):
-      for j in range(n_best_size):
-        j_index = i * n_best_size + j
-        yield (result.start_indexes[i], result.start_logits[i],
-               result.end_indexes[j_index], result.end_logits[j_index])
+    # The positions of the n-best indexes in the logits of the result.
+    start_positions = np.arange(n_best_size)
+    end_positions = np.arange(n_best_size * n_best_size).reshape(
+        [n_best_size, n_best_size])
+    start_indexes = np.asarray(result.start_indexes)[start_positions]
+    end_indexes = np.asarray(result.end_indexes)[end_positions]
   else:
-    start_index_and_score = sorted(enumerate(result.start_logits),
-                                   key=lambda x: x[1], reverse=True)
-    end_index_and_score = sorted(enumerate(result.end_logits),
-                                 key=lambda x: x[1], reverse=True)
-    for i in range(len(start_index_and_score)):
-      if i >= n_best_size:
-        break
-      for j in range(len(end_index_and_score)):
-        if j >= n_best_size:
-          break
-        yield (start_index_and_score[i][0], start_index_and_score[i][1],
-               end_index_and_score[j][0], end_index_and_score[j][1])
+    # A stable sort keeps the order of `sorted` for equal logits.
+    start_positions = np.argsort(
+        -np.asarray(result.start_logits), kind="stable")[:n_best_size]
+    end_positions = np.argsort(
+        -np.asarray(result.end_logits), kind="stable")[:n_best_size]
+    start_indexes = start_positions
+    end_positions = np.broadcast_to(end_positions,
+                                    [len(start_positions), len(end_positions)])
+    end_indexes = end_positions
+
+  # We could hypothetically create invalid predictions, e.g., predict
+  # that the start of the span is in the question. We throw out all
+  # invalid predictions.
+  start_indexes = start_indexes[:, np.newaxis]
+  num_tokens = len(feature.tokens)
+  valid = (start_indexes < num_tokens) & (end_indexes < num_tokens)
+  valid &= _lookup(feature.token_to_orig_map, start_indexes, -1) != -1
+  valid &= _lookup(feature.token_to_orig_map, end_indexes, -1) != -1
+  valid &= _lookup(feature.token_is_max_context, start_indexes, False) != 0
+  valid &= end_indexes >= start_indexes
+  valid &= end_indexes - start_indexes + 1 <= max_answer_length
+
+  for i, j in zip(*np.nonzero(valid)):
+    start_position = int(start_positions[i])
+    end_position = int(end_positions[i, j])
+    yield (int(start_indexes[i, 0]), result.start_logits[start_position],
+           int(end_indexes[i, j]), result.end_logits[end_position])
 
 
 def _compute_softmax(scores):
@@ -942,7 +1193,8 @@ def generate_tf_record_from_json_file(input_file_path,
                                       max_query_length=64,
                                       doc_stride=128,
                                       version_2_with_negative=False,
-                                      xlnet_format=False):
+                                      xlnet_format=False,
+                                      num_processes=0):
   """Generates and saves training data into a tf record file."""
   train_examples = read_squad_examples(
       input_file=input_file_path,
@@ -960,7 +1212,8 @@ def generate_tf_record_from_json_file(input_file_path,
       max_query_length=max_query_length,
       is_training=True,
       output_fn=train_writer.process_feature,
-      xlnet_format=xlnet_format)
+      xlnet_format=xlnet_format,
+      num_processes=num_processes)
   train_writer.close()
 
   meta_data = {
@@ -0,0 +1,202 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for official.nlp.data.squad_lib."""
+
+import collections
+import copy
+import os
+
+import numpy as np
+import tensorflow as tf, tf_keras
+
+from official.nlp.data import squad_lib
+from official.nlp.tools import tokenization
+
+_RawResult = collections.namedtuple(
+    "_RawResult", ["unique_id", "start_logits", "end_logits"])
+
+
+def _top_indexes(logits, n):
+  return sorted(range(len(logits)), key=lambda i: logits[i], reverse=True)[:n]
+
+
+def _create_examples(num_examples, seed=0):
+  rng = np.random.RandomState(seed)
+  words = ["the", "cat", "sat", "on", "mat", "running", "jumped", "quickly"]
+  examples = []
+  for i in range(num_examples):
+    doc_tokens = rng.choice(words, size=rng.randint(1, 60)).tolist()
+    start = rng.randint(len(doc_tokens))
+    end = min(len(doc_tokens) - 1, start + rng.randint(3))
+    examples.append(
+        squad_lib.SquadExample(
+            qas_id="q%d" % i,
+            question_text=" ".join(rng.choice(words, size=4)),
+            doc_tokens=doc_tokens,
+            orig_answer_text=" ".join(doc_tokens[start:end + 1]),
+            start_position=start,
+            end_position=end))
+  return examples
+
+
+class InputFeaturesTest(tf.test.TestCase):
+
+  def test_compact_features(self):
+    feature = squad_lib.InputFeatures(
+        unique_id=1,
+        example_index=0,
+        doc_span_index=0,
+        tokens=["[CLS]", "q", "[SEP]", "d1", "d2", "[SEP]"],
+        token_to_orig_map={3: 0, 4: 0},
+        token_is_max_context={3: True, 4: False},
+        input_ids=[1, 2, 3, 4, 5, 3, 0, 0],
+        input_mask=[1, 1, 1, 1, 1, 1, 0, 0],
+        segment_ids=[0, 0, 0, 1, 1, 1, 0, 0])
+
+    self.assertEqual(dict(feature.token_to_orig_map), {3: 0, 4: 0})
+    self.assertEqual(dict(feature.token_is_max_context), {3: True, 4: False})
+    self.assertNotIn(2, feature.token_to_orig_map)
+    self.assertNotIn(100, feature.token_to_orig_map)
+    self.assertIs(feature.token_is_max_context.get(3, False), True)
+    self.assertIs(feature.token_is_max_context.get(2, False), False)
+    with self.assertRaises(KeyError):
+      _ = feature.token_to_orig_map[-1]
+    self.assertEqual(feature.tokens[3:5], ("d1", "d2"))
+
+    padding = copy.deepcopy(feature)
+    padding.unique_id = 2
+    self.assertEqual(feature.unique_id, 1)
+
+  def test_feature_writer(self):
+    filename = self.create_tempfile().full_path
+    writer = squad_lib.FeatureWriter(filename, is_training=True)
+    writer.process_feature(
+        squad_lib.InputFeatures(
+            unique_id=1,
+            example_index=0,
+            doc_span_index=0,
+            tokens=["[CLS]", "[SEP]"],
+            token_to_orig_map={},
+            token_is_max_context={},
+            input_ids=[1, 3, 0],
+            input_mask=[1, 1, 0],
+            segment_ids=[0, 0, 0],
+            paragraph_mask=[1, 0, 0],
+            class_index=0,
+            start_position=0,
+            end_position=0,
+            is_impossible=True))
+    writer.close()
+
+    example = tf.train.Example.FromString(
+        next(iter(tf.data.TFRecordDataset(filename))).numpy())
+    features = example.features.feature
+    self.assertEqual(features["input_ids"].int64_list.value, [1, 3, 0])
+    self.assertEqual(features["paragraph_mask"].int64_list.value, [1, 0, 0])
+    self.assertEqual(features["is_impossible"].int64_list.value, [1])
+
+
+class ConvertExamplesToFeaturesTest(tf.test.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    vocab_file = os.path.join(self.get_temp_dir(), "vocab.txt")
+    with tf.io.gfile.GFile(vocab_file, "w") as f:
+      f.write("\n".join([
+          "[PAD]", "[UNK]", "[CLS]", "[SEP]", "the", "cat", "sat", "on", "mat",
+          "run", "##ning", "jump", "##ed", "quick", "##ly"
+      ]))
+    self._tokenizer = tokenization.FullTokenizer(vocab_file)
+
+  def _convert(self, examples, is_training, **kwargs):
+    features = []
+
+    def output_fn(feature, is_padding=False):
+      features.append((feature, is_padding))
+
+    num_features = squad_lib.convert_examples_to_features(
+        examples,
+        self._tokenizer,
+        max_seq_length=32,
+        doc_stride=8,
+        max_query_length=8,
+        is_training=is_training,
+        output_fn=output_fn,
+        batch_size=None if is_training else 4,
+        **kwargs)
+    self.assertLen(features, num_features)
+    return [(f.unique_id, f.example_index, f.doc_span_index, f.tokens,
+             dict(f.token_to_orig_map), dict(f.token_is_max_context),
+             f.input_ids.tolist(), f.segment_ids.tolist(), f.start_position,
+             f.end_position, f.is_impossible, is_padding)
+            for f, is_padding in features]
+
+  def test_multiple_processes(self):
+    examples = _create_examples(50)
+    for is_training in (True, False):
+      features = self._convert(examples, is_training)
+      self.assertGreater(len(features), len(examples))
+      self.assertEqual(
+          self._convert(examples, is_training, num_processes=2), features)
+
+  def test_postprocess_output(self):
+    examples = _create_examples(50)
+    all_features = []
+    squad_lib.convert_examples_to_features(
+        examples,
+        self._tokenizer,
+        max_seq_length=32,
+        doc_stride=8,
+        max_query_length=8,
+        is_training=False,
+        output_fn=lambda f, is_padding: all_features.append(f),
+        batch_size=1)
+    rng = np.random.RandomState(0)
+    # Rounded logits, so that there are ties.
+    all_results = [
+        _RawResult(f.unique_id,
+                   np.round(rng.randn(32), 1).tolist(),
+                   np.round(rng.randn(32), 1).tolist()) for f in all_features
+    ]
+
+    predictions, nbest, _ = squad_lib.postprocess_output(
+        examples, all_features, all_results, n_best_size=4,
+        max_answer_length=5, do_lower_case=True)
+    parallel_predictions, parallel_nbest, _ = squad_lib.postprocess_output(
+        examples, all_features, all_results, n_best_size=4,
+        max_answer_length=5, do_lower_case=True, num_processes=2)
+    self.assertEqual(parallel_predictions, predictions)
+    self.assertEqual(parallel_nbest, nbest)
+
+    # The spans are the valid spans of the n-best start and end logits, in
+    # the order of the original loops.
+    for feature, result in zip(all_features, all_results):
+      expected = [
+          (s, result.start_logits[s], e, result.end_logits[e])
+          for s in _top_indexes(result.start_logits, 4)
+          for e in _top_indexes(result.end_logits, 4)
+          if s in feature.token_to_orig_map and
+          e in feature.token_to_orig_map and
+          feature.token_is_max_context.get(s, False) and s <= e < s + 5
+      ]
+      self.assertEqual(
+          list(
+              squad_lib._get_valid_spans_and_logits(
+                  result, feature, n_best_size=4, max_answer_length=5)),
+          expected)
+
+
+if __name__ == "__main__":
+  tf.test.main()
@@ -0,0 +1,144 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Bucketizes variable length examples and batches them under a token budget.
+
+With a fixed batch size, the batches of the short buckets underuse the
+accelerator while the batches of the long buckets may run out of memory. With
+a token budget of `max_tokens`, the batches of the bucket of length `L` have
+`max_tokens // L` examples instead, so that all the batches have about the
+same number of tokens.
+
+In distributed training, `group_by_bucket_across_replicas` makes all the
+replicas get batches of the same bucket at each step, so that they have the
+same shapes and do about the same amount of work.
+"""
+
+from typing import Callable, List, Mapping, Optional, Sequence
+
+import tensorflow as tf, tf_keras
+
+
+def get_bucket_batch_sizes(bucket_lengths: Sequence[int],
+                           max_tokens: int) -> List[int]:
+  """Returns the batch size of every bucket under a token budget.
+
+  Args:
+    bucket_lengths: the padded sequence length of every bucket.
+    max_tokens: the maximum number of tokens per batch, padding included.
+
+  Returns:
+    The batch size of every bucket, `max_tokens // bucket_length`.
+
+  Raises:
+    ValueError: if the token budget is too small for a bucket.
+  """
+  batch_sizes = [int(max_tokens) // length for length in bucket_lengths]
+  if any(batch_size <= 0 for batch_size in batch_sizes):
+    raise ValueError(
+        'The token budget, %d, is too small for the bucket lengths %s.' %
+        (max_tokens, list(bucket_lengths)))
+  return batch_sizes
+
+
+def group_by_bucket_across_replicas(
+    dataset: tf.data.Dataset,
+    key_func: Callable[[Mapping[str, tf.Tensor]], tf.Tensor],
+    input_context: Optional[tf.distribute.InputContext] = None,
+    window_scale: int = 1) -> tf.data.Dataset:
+  """Groups consecutive batches of the same bucket, one for every replica.
+
+  Args:
+    dataset: a dataset of per replica batches.
+    key_func: a function returning the bucket of a batch, e.g. its sequence
+      length.
+    input_context: the input context. The dataset is returned unchanged
+      without one.
+    window_scale: scales the number of batches grouped together, to leave
+      room for replicas reading faster than others, e.g. from a tf.data
+      service without round robin reads.
+
+  Returns:
+    The dataset of batches, in groups of `num_replicas_in_sync` batches of the
+    same bucket.
+  """
+  if not input_context:
+    return dataset
+  window_size = input_context.num_replicas_in_sync * window_scale
+  dataset = dataset.apply(
+      tf.data.experimental.group_by_window(
+          key_func=lambda example: tf.cast(key_func(example), tf.int64),
+          reduce_func=lambda _, x: tf.data.Dataset.from_tensors(x),
+          window_size=window_size))
+  return dataset.flat_map(lambda x: x)
+
+
+def bucketize_and_batch(
+    dataset: tf.data.Dataset,
+    length_key: str,
+    bucket_lengths: Sequence[int],
+    batch_size: Optional[int] = None,
+    max_tokens: Optional[int] = None,
+    drop_remainder: bool = False,
+    input_context: Optional[tf.distribute.InputContext] = None,
+    window_scale: int = 1) -> tf.data.Dataset:
+  """Bucketizes examples by length and pads them to their bucket length.
+
+  Exactly one of `batch_size` and `max_tokens` must be set. Both are global,
+  i.e. divided between the replicas of `input_context`.
+
+  Args:
+    dataset: a dataset of unbatched examples, whose variable length features
+      are no longer than the longest bucket.
+    length_key: the key of the feature giving the length of the examples.
+    bucket_lengths: the increasing padded lengths of the buckets.
+    batch_size: the fixed global batch size.
+    max_tokens: the global token budget, see `get_bucket_batch_sizes`.
+    drop_remainder: whether to drop the last batch of every bucket if it is
+      smaller than the bucket batch size.
+    input_context: the input context.
+    window_scale: see `group_by_bucket_across_replicas`.
+
+  Returns:
+    A dataset of per replica batches.
+  """
+  if (batch_size is None) == (max_tokens is None):
+    raise ValueError('Exactly one of `batch_size` and `max_tokens` must be '
+                     'set.')
+  if max_tokens is not None:
+    per_replica_max_tokens = input_context.get_per_replica_batch_size(
+        max_tokens) if input_context else max_tokens
+    bucket_batch_sizes = get_bucket_batch_sizes(bucket_lengths,
+                                                per_replica_max_tokens)
+  else:
+    per_replica_batch_size = input_context.get_per_replica_batch_size(
+        batch_size) if input_context else batch_size
+    bucket_batch_sizes = [per_replica_batch_size] * len(bucket_lengths)
+  # `bucket_by_sequence_length` has a last bucket for the examples longer than
+  # the last boundary, which is never used when padding to the boundaries.
+  bucket_batch_sizes.append(bucket_batch_sizes[-1])
+  bucket_boundaries = [length + 1 for length in bucket_lengths]
+
+  dataset = dataset.apply(
+      tf.data.experimental.bucket_by_sequence_length(
+          lambda example: tf.shape(example[length_key])[0],
+          bucket_boundaries,
+          bucket_batch_sizes,
+          pad_to_bucket_boundary=True,
+          drop_remainder=drop_remainder))
+  return group_by_bucket_across_replicas(
+      dataset,
+      lambda example: tf.shape(example[length_key])[1],
+      input_context,
+      window_scale=window_scale)
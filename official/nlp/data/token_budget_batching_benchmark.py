@@ -0,0 +1,126 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+r"""Benchmarks fixed size and token budget batching of variable length data.
+
+Batches random examples with log-normally distributed lengths by padding to
+the maximum length, by bucketing with a fixed batch size and by bucketing
+under a token budget, see `token_budget_batching`. Every batch goes through a
+small feed-forward layer standing for the model. Reports the number of real,
+i.e. non padding, tokens per second, the fraction of padding tokens and the
+largest batch in tokens, which bounds the memory use.
+
+Usage:
+
+  python -m official.nlp.data.token_budget_batching_benchmark \
+    --num_examples=20000 --batch_size=32 --max_tokens=4096
+"""
+
+import time
+
+from absl import app
+from absl import flags
+from absl import logging
+import numpy as np
+import tensorflow as tf, tf_keras
+
+from official.nlp.data import token_budget_batching
+
+_NUM_EXAMPLES = flags.DEFINE_integer('num_examples', 20000,
+                                     'Number of examples to batch.')
+_MAX_LENGTH = flags.DEFINE_integer('max_length', 512,
+                                   'Maximum length of the examples.')
+_MEAN_LENGTH = flags.DEFINE_integer('mean_length', 100,
+                                    'Median length of the examples.')
+_BATCH_SIZE = flags.DEFINE_integer(
+    'batch_size', 32, 'Batch size of the fixed size batching modes.')
+_MAX_TOKENS = flags.DEFINE_integer(
+    'max_tokens', None,
+    'Token budget of the token budget batching mode. Defaults to the number '
+    'of tokens of a fixed size batch of the median length.')
+_BUCKET_LENGTHS = flags.DEFINE_list('bucket_lengths',
+                                    ['64', '128', '256', '512'],
+                                    'Padded lengths of the buckets.')
+_HIDDEN_SIZE = flags.DEFINE_integer(
+    'hidden_size', 256, 'Hidden size of the layer run on every batch.')
+
+
+def _create_dataset(lengths):
+  return tf.data.Dataset.from_tensor_slices(
+      tf.RaggedTensor.from_row_lengths(
+          tf.ones([int(np.sum(lengths))], tf.int32), lengths)).map(
+              lambda ids: {'input_word_ids': ids})
+
+
+def _run(name, dataset, num_tokens, hidden_size):
+  """Runs the batches of `dataset` through a feed-forward layer."""
+  embeddings = tf.random.normal([2, hidden_size])
+  kernel = tf.random.normal([hidden_size, 4 * hidden_size])
+
+  @tf.function(reduce_retracing=True)
+  def step(input_word_ids):
+    x = tf.nn.embedding_lookup(embeddings, input_word_ids)
+    return tf.reduce_sum(tf.nn.relu(tf.einsum('bld,dh->blh', x, kernel)))
+
+  dataset = dataset.cache()
+  # Warms up the cache and the traces of the step function.
+  for batch in dataset:
+    step(batch['input_word_ids'])
+
+  padded_tokens = []
+  start = time.perf_counter()
+  for batch in dataset:
+    step(batch['input_word_ids']).numpy()
+    padded_tokens.append(int(np.prod(batch['input_word_ids'].shape)))
+  elapsed = time.perf_counter() - start
+  logging.info(
+      '%-24s %8d batches %12.0f tokens/sec %8.1f%% padding %8d max tokens',
+      name, len(padded_tokens), num_tokens / elapsed,
+      100.0 * (1.0 - num_tokens / sum(padded_tokens)), max(padded_tokens))
+
+
+def main(_):
+  rng = np.random.default_rng(0)
+  max_length = _MAX_LENGTH.value
+  lengths = np.clip(
+      rng.lognormal(np.log(_MEAN_LENGTH.value), 0.7, _NUM_EXAMPLES.value), 1,
+      max_length).astype(np.int64)
+  num_tokens = int(np.sum(lengths))
+  bucket_lengths = [int(length) for length in _BUCKET_LENGTHS.value]
+  batch_size = _BATCH_SIZE.value
+  max_tokens = _MAX_TOKENS.value or batch_size * _MEAN_LENGTH.value
+
+  benchmarks = [
+      ('padded to max length',
+       _create_dataset(lengths).padded_batch(
+           batch_size, padded_shapes={'input_word_ids': [max_length]})),
+      ('bucketed, batch size',
+       token_budget_batching.bucketize_and_batch(
+           _create_dataset(lengths),
+           length_key='input_word_ids',
+           bucket_lengths=bucket_lengths,
+           batch_size=batch_size)),
+      ('bucketed, token budget',
+       token_budget_batching.bucketize_and_batch(
+           _create_dataset(lengths),
+           length_key='input_word_ids',
+           bucket_lengths=bucket_lengths,
+           max_tokens=max_tokens)),
+  ]
+  for name, dataset in benchmarks:
+    _run(name, dataset, num_tokens, _HIDDEN_SIZE.value)
+
+
+if __name__ == '__main__':
+  app.run(main)
@@ -0,0 +1,84 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for official.nlp.data.token_budget_batching."""
+import tensorflow as tf, tf_keras
+
+from official.nlp.data import token_budget_batching
+
+
+def _create_dataset(lengths):
+  return tf.data.Dataset.from_generator(
+      lambda: ({'input_word_ids': [1] * length, 'label': i}
+               for i, length in enumerate(lengths)),
+      output_signature={
+          'input_word_ids': tf.TensorSpec([None], tf.int32),
+          'label': tf.TensorSpec([], tf.int32)
+      })
+
+
+class TokenBudgetBatchingTest(tf.test.TestCase):
+
+  def test_get_bucket_batch_sizes(self):
+    self.assertEqual(
+        token_budget_batching.get_bucket_batch_sizes([4, 8, 16], 32),
+        [8, 4, 2])
+    with self.assertRaisesRegex(ValueError, 'too small'):
+      token_budget_batching.get_bucket_batch_sizes([4, 64], 32)
+
+  def test_bucketize_and_batch_with_token_budget(self):
+    dataset = token_budget_batching.bucketize_and_batch(
+        _create_dataset([2] * 8 + [7] * 4),
+        length_key='input_word_ids',
+        bucket_lengths=[4, 8],
+        max_tokens=16,
+        drop_remainder=True)
+    shapes = sorted(
+        tuple(batch['input_word_ids'].shape) for batch in dataset)
+    self.assertEqual(shapes, [(2, 8), (2, 8), (4, 4), (4, 4)])
+
+  def test_bucketize_and_batch_with_batch_size(self):
+    dataset = token_budget_batching.bucketize_and_batch(
+        _create_dataset([2, 2, 7, 7]),
+        length_key='input_word_ids',
+        bucket_lengths=[4, 8],
+        batch_size=2)
+    shapes = sorted(
+        tuple(batch['input_word_ids'].shape) for batch in dataset)
+    self.assertEqual(shapes, [(2, 4), (2, 8)])
+
+  def test_bucketize_and_batch_requires_one_batch_size(self):
+    with self.assertRaisesRegex(ValueError, 'Exactly one'):
+      token_budget_batching.bucketize_and_batch(
+          _create_dataset([2]),
+          length_key='input_word_ids',
+          bucket_lengths=[4],
+          batch_size=2,
+          max_tokens=16)
+
+  def test_group_by_bucket_across_replicas(self):
+    # Alternating buckets, which consecutive replicas must not mix.
+    dataset = tf.data.Dataset.range(8).map(
+        lambda i: {'input_word_ids': tf.zeros([1, 4 * (i % 2 + 1)])})
+    input_context = tf.distribute.InputContext(num_replicas_in_sync=2)
+    dataset = token_budget_batching.group_by_bucket_across_replicas(
+        dataset, lambda x: tf.shape(x['input_word_ids'])[1], input_context)
+    lengths = [batch['input_word_ids'].shape[1] for batch in dataset]
+    self.assertLen(lengths, 8)
+    for step in range(0, 8, 2):
+      self.assertEqual(lengths[step], lengths[step + 1])
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -30,6 +30,9 @@ Batching scheme
 
    This batching scheme decreases the fraction of padding tokens per training
    batch, thus improving the training speed significantly.
+
+   With `group_batches_across_replicas`, the batches are further grouped so
+   that all the replicas get batches of the same group at every step.
 """
 from typing import Dict, Optional
 
@@ -40,6 +43,7 @@ from official.core import config_definitions as cfg
 from official.core import input_reader
 from official.nlp.data import data_loader
 from official.nlp.data import data_loader_factory
+from official.nlp.data import token_budget_batching
 
 # Example grouping constants. Defines length boundaries for each group.
 # These values are the defaults used in Tensor2Tensor.
@@ -86,7 +90,7 @@ def _create_min_max_boundaries(max_length,
   return buckets_min, buckets_max
 
 
-def _batch_examples(dataset, batch_size, max_length):
+def _batch_examples(dataset, batch_size, max_length, input_context=None):
   """Group examples by similar lengths, and return batched dataset.
 
   Each batch of similar-length examples are padded to the same length, and may
@@ -100,6 +104,8 @@ def _batch_examples(dataset, batch_size, max_length):
     dataset: Dataset of unbatched examples.
     batch_size: Max number of tokens per batch of examples.
     max_length: Max number of tokens in an example input or target sequence.
+    input_context: If set, `num_replicas_in_sync` consecutive batches are from
+      the same group, so that all the replicas get batches of similar lengths.
 
   Returns:
     Dataset of batched examples with similar lengths.
@@ -123,17 +129,28 @@ def _batch_examples(dataset, batch_size, max_length):
   # bucket_id will be a tensor, so convert this list to a tensor as well.
   bucket_batch_sizes = tf.constant(bucket_batch_sizes, dtype=tf.int64)
 
+  def length_to_bucket_id(seq_length):
+    conditions_c = tf.logical_and(
+        tf.less_equal(buckets_min, seq_length), tf.less(seq_length,
+                                                        buckets_max))
+    bucket_id = tf.reduce_min(tf.where(conditions_c))
+    return bucket_id
+
   def example_to_bucket_id(example):
     """Return int64 bucket id for this example, calculated based on length."""
     example_input = example['inputs']
     example_target = example['targets']
     seq_length = _get_example_length((example_input, example_target))
+    return length_to_bucket_id(seq_length)
 
-    conditions_c = tf.logical_and(
-        tf.less_equal(buckets_min, seq_length), tf.less(seq_length,
-                                                        buckets_max))
-    bucket_id = tf.reduce_min(tf.where(conditions_c))
-    return bucket_id
+  def batch_to_bucket_id(batch):
+    """Return int64 bucket id for a batch, calculated based on its length."""
+    # The examples of a batch are padded to the longest one, which is in the
+    # same bucket.
+    seq_length = tf.maximum(
+        tf.shape(batch['inputs'])[1],
+        tf.shape(batch['targets'])[1])
+    return length_to_bucket_id(seq_length)
 
   def window_size_fn(bucket_id):
     """Return number of examples to be grouped when given a bucket id."""
@@ -152,12 +169,14 @@ def _batch_examples(dataset, batch_size, max_length):
     ])
     return grouped_dataset.padded_batch(bucket_batch_size, padded_shapes)
 
-  return dataset.apply(
+  dataset = dataset.apply(
       tf.data.experimental.group_by_window(
           key_func=example_to_bucket_id,
           reduce_func=batching_fn,
           window_size=None,
           window_size_func=window_size_fn))
+  return token_budget_batching.group_by_bucket_across_replicas(
+      dataset, batch_to_bucket_id, input_context)
 
 
 @dataclasses.dataclass
@@ -170,6 +189,9 @@ class WMTDataConfig(cfg.DataConfig):
   tgt_lang: str = ''
   transform_and_batch: bool = True
   has_unique_id: bool = False
+  # Whether all the replicas get batches of the same length bucket at every
+  # step, see `token_budget_batching`. Only used without `static_batch`.
+  group_batches_across_replicas: bool = False
 
 
 @data_loader_factory.register_data_loader_cls(WMTDataConfig)
@@ -266,8 +288,11 @@ class WMTDataLoader(data_loader.DataLoader):
           drop_remainder=True)
     else:
       # Group and batch such that each batch has examples of similar length.
-      dataset = _batch_examples(dataset, per_replica_batch_size,
-                                self._max_seq_length)
+      dataset = _batch_examples(
+          dataset, per_replica_batch_size, self._max_seq_length,
+          input_context=(input_context
+                         if self._params.group_batches_across_replicas else
+                         None))
     # Prefetch the next element to improve speed of input pipeline.
     dataset = dataset.prefetch(buffer_size=tf.data.experimental.AUTOTUNE)
     return dataset
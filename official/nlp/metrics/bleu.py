@@ -18,7 +18,6 @@ Source:
 https://github.com/tensorflow/tensor2tensor/blob/master/tensor2tensor/utils/bleu_hook.py
 """
 
-import collections
 import math
 import re
 import sys
@@ -84,66 +83,72 @@ def bleu_wrapper(ref_filename, hyp_filename, case_sensitive=False):
   return bleu_on_list(ref_lines, hyp_lines, case_sensitive)
 
 
-def _get_ngrams_with_counter(segment, max_order):
-  """Extracts all n-grams up to a given maximum order from an input segment.
+def _ngram_statistics(reference_corpus, translation_corpus, max_order):
+  """Counts the clipped n-gram matches of the translations with numpy.
 
-  Args:
-    segment: text segment from which n-grams will be extracted.
-    max_order: maximum length in tokens of the n-grams returned by this methods.
-
-  Returns:
-    The Counter containing all n-grams upto max_order in segment
-    with a count of how many times each n-gram occurred.
-  """
-  ngram_counts = collections.Counter()
-  for order in range(1, max_order + 1):
-    for i in range(0, len(segment) - order + 1):
-      ngram = tuple(segment[i:i + order])
-      ngram_counts[ngram] += 1
-  return ngram_counts
-
-
-def compute_bleu(reference_corpus,
-                 translation_corpus,
-                 max_order=4,
-                 use_bp=True):
-  """Computes BLEU score of translated segments against one or more references.
+  The tokens are replaced with their rank among the tokens of the corpus, and
+  every n-gram with the rank of its (n-1)-gram prefix and last token, so the
+  n-grams of all the segments are counted with a few `np.unique` calls.
 
   Args:
-    reference_corpus: list of references for each translation. Each reference
-      should be tokenized into a list of tokens.
-    translation_corpus: list of translations to score. Each translation should
-      be tokenized into a list of tokens.
-    max_order: Maximum n-gram order to use when computing BLEU score.
-    use_bp: boolean, whether to apply brevity penalty.
+    reference_corpus: list of references, each a sequence of tokens.
+    translation_corpus: list of translations, each a sequence of tokens.
+    max_order: Maximum n-gram order.
 
   Returns:
-    BLEU score.
+    The number of n-gram matches and of translation n-grams by order, as
+    lists of `max_order` ints.
   """
-  reference_length = 0
-  translation_length = 0
-  bp = 1.0
-  geo_mean = 0
-
+  segments = list(reference_corpus) + list(translation_corpus)
+  lengths = np.array([len(segment) for segment in segments], np.int64)
   matches_by_order = [0] * max_order
   possible_matches_by_order = [0] * max_order
-  precisions = []
-
-  for (references, translations) in zip(reference_corpus, translation_corpus):
-    reference_length += len(references)
-    translation_length += len(translations)
-    ref_ngram_counts = _get_ngrams_with_counter(references, max_order)
-    translation_ngram_counts = _get_ngrams_with_counter(translations, max_order)
-
-    overlap = dict((ngram, min(count, translation_ngram_counts[ngram]))
-                   for ngram, count in ref_ngram_counts.items())
-
-    for ngram in overlap:
-      matches_by_order[len(ngram) - 1] += overlap[ngram]
-    for ngram in translation_ngram_counts:
-      possible_matches_by_order[len(ngram) -
-                                1] += translation_ngram_counts[ngram]
-
+  if not lengths.sum():
+    return matches_by_order, possible_matches_by_order
+  _, tokens = np.unique(
+      np.concatenate([np.asarray(segment) for segment in segments if
+                      len(segment)]),
+      return_inverse=True)
+  tokens = tokens.reshape(-1).astype(np.int64)
+  num_tokens = len(tokens)
+  segment_ids = np.repeat(np.arange(len(segments)), lengths)
+  segment_ends = np.repeat(np.cumsum(lengths), lengths)
+  is_translation = segment_ids >= len(reference_corpus)
+  # References and translations of the same sentence share their key.
+  sentence_ids = np.where(is_translation, segment_ids - len(reference_corpus),
+                          segment_ids)
+  codes = tokens
+  for order in range(1, max_order + 1):
+    if order > 1:
+      # The codes of the n-grams starting in the last n-1 positions are unused.
+      _, codes = np.unique(
+          codes[:-1] * num_tokens + tokens[order - 1:], return_inverse=True)
+      codes = codes.reshape(-1)
+    is_valid = np.arange(len(codes)) + order <= segment_ends[:len(codes)]
+    keys = sentence_ids[:len(codes)] * (len(codes) + 1) + codes
+    is_valid_translation = is_valid & is_translation[:len(codes)]
+    translation_keys, translation_counts = np.unique(
+        keys[is_valid_translation], return_counts=True)
+    reference_keys, reference_counts = np.unique(
+        keys[is_valid & ~is_translation[:len(codes)]], return_counts=True)
+    _, translation_indices, reference_indices = np.intersect1d(
+        translation_keys,
+        reference_keys,
+        assume_unique=True,
+        return_indices=True)
+    matches_by_order[order - 1] = int(
+        np.minimum(translation_counts[translation_indices],
+                   reference_counts[reference_indices]).sum())
+    possible_matches_by_order[order - 1] = int(is_valid_translation.sum())
+  return matches_by_order, possible_matches_by_order
+
+
+def _bleu_from_statistics(matches_by_order, possible_matches_by_order,
+                          reference_length, translation_length, max_order,
+                          use_bp):
+  """Computes the BLEU score from the n-gram statistics of a corpus."""
+  bp = 1.0
+  geo_mean = 0
   precisions = [0] * max_order
   smooth = 1.0
 
@@ -171,6 +176,81 @@ def compute_bleu(reference_corpus,
   return np.float32(bleu)
 
 
+class CorpusBleu(object):
+  """Accumulates the BLEU statistics of a corpus, one batch at a time.
+
+  The segments are sequences of tokens, e.g. the outputs of `bleu_tokenize`
+  or integer ids. Only the n-gram statistics are kept, so the translations can
+  be scored while they are decoded:
+
+    corpus_bleu = CorpusBleu()
+    for references, translations in batches:
+      corpus_bleu.update(references, translations)
+    score = corpus_bleu.result()
+  """
+
+  def __init__(self, max_order=4, use_bp=True):
+    self.max_order = max_order
+    self.use_bp = use_bp
+    self.reset()
+
+  def reset(self):
+    self.reference_length = 0
+    self.translation_length = 0
+    self.matches_by_order = [0] * self.max_order
+    self.possible_matches_by_order = [0] * self.max_order
+
+  def update(self, reference_corpus, translation_corpus):
+    """Adds the statistics of a batch of segments.
+
+    Args:
+      reference_corpus: list of references for each translation, each a
+        sequence of tokens.
+      translation_corpus: list of translations, each a sequence of tokens.
+    """
+    # As `zip`, ignores the segments without a counterpart.
+    num_segments = min(len(reference_corpus), len(translation_corpus))
+    reference_corpus = reference_corpus[:num_segments]
+    translation_corpus = translation_corpus[:num_segments]
+    self.reference_length += sum(len(x) for x in reference_corpus)
+    self.translation_length += sum(len(x) for x in translation_corpus)
+    matches_by_order, possible_matches_by_order = _ngram_statistics(
+        reference_corpus, translation_corpus, self.max_order)
+    for i in range(self.max_order):
+      self.matches_by_order[i] += matches_by_order[i]
+      self.possible_matches_by_order[i] += possible_matches_by_order[i]
+
+  def result(self):
+    """Returns the BLEU score of the segments added so far."""
+    return _bleu_from_statistics(self.matches_by_order,
+                                 self.possible_matches_by_order,
+                                 self.reference_length,
+                                 self.translation_length, self.max_order,
+                                 self.use_bp)
+
+
+def compute_bleu(reference_corpus,
+                 translation_corpus,
+                 max_order=4,
+                 use_bp=True):
+  """Computes BLEU score of translated segments against one or more references.
+
+  Args:
+    reference_corpus: list of references for each translation. Each reference
+      should be tokenized into a list of tokens.
+    translation_corpus: list of translations to score. Each translation should
+      be tokenized into a list of tokens.
+    max_order: Maximum n-gram order to use when computing BLEU score.
+    use_bp: boolean, whether to apply brevity penalty.
+
+  Returns:
+    BLEU score.
+  """
+  corpus_bleu = CorpusBleu(max_order=max_order, use_bp=use_bp)
+  corpus_bleu.update(list(reference_corpus), list(translation_corpus))
+  return corpus_bleu.result()
+
+
 def bleu_on_list(ref_lines, hyp_lines, case_sensitive=False):
   """Compute BLEU for two list of strings (reference and hypothesis)."""
   if len(ref_lines) != len(hyp_lines):
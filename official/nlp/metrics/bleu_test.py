@@ -14,8 +14,10 @@
 
 """Test functions in compute_blue.py."""
 
+import collections
 import tempfile
 
+import numpy as np
 import tensorflow as tf, tf_keras
 
 from official.nlp.metrics import bleu
@@ -67,6 +69,53 @@ class ComputeBleuTest(tf.test.TestCase):
     self.assertEqual(uncased_score, 100)
     self.assertLess(cased_score, 100)
 
+  def test_compute_bleu_matches_ngram_counters(self):
+
+    def ngram_counts(segment):
+      return collections.Counter(
+          tuple(segment[i:i + order])
+          for order in range(1, 5)
+          for i in range(len(segment) - order + 1))
+
+    rng = np.random.RandomState(0)
+    references = [rng.randint(4, size=rng.randint(8)) for _ in range(20)]
+    translations = [rng.randint(4, size=rng.randint(8)) for _ in range(20)]
+    matches_by_order, possible_matches_by_order = [0] * 4, [0] * 4
+    for reference, translation in zip(references, translations):
+      reference_counts = ngram_counts(list(reference))
+      for ngram, count in ngram_counts(list(translation)).items():
+        matches_by_order[len(ngram) - 1] += min(count,
+                                                reference_counts[ngram])
+        possible_matches_by_order[len(ngram) - 1] += count
+    expected = bleu._bleu_from_statistics(
+        matches_by_order, possible_matches_by_order,
+        sum(len(x) for x in references), sum(len(x) for x in translations),
+        max_order=4, use_bp=True)
+    self.assertEqual(bleu.compute_bleu(references, translations), expected)
+    self.assertEqual(
+        bleu.compute_bleu([[str(x) for x in reference]
+                           for reference in references],
+                          [[str(x) for x in translation]
+                           for translation in translations]), expected)
+
+  def test_corpus_bleu_streaming(self):
+    references = [
+        bleu.bleu_tokenize(x)
+        for x in ["a cat sat on the mat", "more tests!", "one two three four"]
+    ]
+    translations = [
+        bleu.bleu_tokenize(x)
+        for x in ["the cat sat on a mat", "more tests", "one two three"]
+    ]
+    corpus_bleu = bleu.CorpusBleu()
+    for i in range(len(references)):
+      corpus_bleu.update(references[i:i + 1], translations[i:i + 1])
+    self.assertEqual(corpus_bleu.result(),
+                     bleu.compute_bleu(references, translations))
+    corpus_bleu.reset()
+    corpus_bleu.update(references, references)
+    self.assertEqual(corpus_bleu.result(), 1.0)
+
 
 if __name__ == "__main__":
   tf.test.main()
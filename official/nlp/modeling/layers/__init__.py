@@ -47,6 +47,7 @@ from official.nlp.modeling.layers.moe import MoeLayerWithBackbone
 from official.nlp.modeling.layers.multi_channel_attention import *
 from official.nlp.modeling.layers.multi_query_attention import MultiHeadAttention as MultiQueryAttention
 from official.nlp.modeling.layers.on_device_embedding import OnDeviceEmbedding
+from official.nlp.modeling.layers.pack_optimization import get_packed_attention_mask
 from official.nlp.modeling.layers.pack_optimization import PackBertEmbeddings
 from official.nlp.modeling.layers.pack_optimization import StridedReZeroTransformer
 from official.nlp.modeling.layers.pack_optimization import StridedTransformerEncoderBlock
@@ -27,11 +27,46 @@ class CachedAttention(tf_keras.layers.MultiHeadAttention):
   """Attention layer with cache used for autoregressive decoding.
 
   Arguments are the same as `tf_keras.layers.MultiHeadAttention` layer.
+
+  If the cache has `row_indices`, an int tensor with shape [batch_size,
+  length], the new key and value of every sequence are written in place, at
+  `decode_loop_step` of full-length caches or appended otherwise, and the keys
+  and values of position `j` of sequence `b` are read from row
+  `row_indices[b, j]` of the cache. This lets beam search reorder the beams
+  without reordering the cache, see `beam_search.ROW_INDICES_KEY`. In this
+  mode, `decode_loop_step` may also be an int tensor with shape [batch_size],
+  to decode every sequence at its own position, and the query may have several
+  positions, written from `decode_loop_step` on.
   """
 
   def _update_cache(self, key, value, cache, decode_loop_step):
     """Updates cache states and gets full-length key/value tensors."""
     # Combines cached keys and values with new keys and values.
+    if "row_indices" in cache:
+      if decode_loop_step is not None:
+        # Writes the new keys and values of every sequence from its position.
+        key_shape = tf.shape(key)
+        rows = tf.broadcast_to(tf.range(key_shape[0])[:, None], key_shape[:2])
+        write_positions = tf.broadcast_to(
+            decode_loop_step, key_shape[:1])[:, None] + tf.range(key_shape[1])
+        write_indices = tf.stack([rows, write_positions], axis=-1)
+        cache["key"] = tf.tensor_scatter_nd_update(
+            cache["key"], write_indices, tf.cast(key, cache["key"].dtype))
+        cache["value"] = tf.tensor_scatter_nd_update(
+            cache["value"], write_indices,
+            tf.cast(value, cache["value"].dtype))
+      else:
+        cache["key"] = tf.concat(
+            [cache["key"], tf.cast(key, cache["key"].dtype)], axis=1)
+        cache["value"] = tf.concat(
+            [cache["value"], tf.cast(value, cache["value"].dtype)], axis=1)
+      row_indices = cache["row_indices"]
+      positions = tf.broadcast_to(
+          tf.range(tf.shape(row_indices)[1]), tf.shape(row_indices))
+      read_indices = tf.stack([row_indices, positions], axis=-1)
+      key = tf.cast(tf.gather_nd(cache["key"], read_indices), key.dtype)
+      value = tf.cast(tf.gather_nd(cache["value"], read_indices), value.dtype)
+      return key, value
     if decode_loop_step is not None:
       # TPU special case.
       key_seq_dim = cache["key"].shape.as_list()[1]
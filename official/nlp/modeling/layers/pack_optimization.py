@@ -22,6 +22,25 @@ from official.nlp.modeling.layers import transformer_encoder_block
 from official.nlp.modeling.layers import transformer_scaffold
 
 
+def get_packed_attention_mask(attention_mask: tf.Tensor,
+                              packed_example_ids: tf.Tensor) -> tf.Tensor:
+  """Restricts an attention mask to the tokens of the same packed example.
+
+  Args:
+    attention_mask: a [batch_size, seq_len, seq_len] attention mask.
+    packed_example_ids: a [batch_size, seq_len] tensor with the index of the
+      packed example of every token, as created by
+      `official.nlp.data.sequence_packing`.
+
+  Returns:
+    The block-diagonal attention mask.
+  """
+  same_example = tf.equal(
+      tf.expand_dims(packed_example_ids, 2),
+      tf.expand_dims(packed_example_ids, 1))
+  return attention_mask * tf.cast(same_example, attention_mask.dtype)
+
+
 @tf_keras.utils.register_keras_serializable(package='Text')
 class PackBertEmbeddings(tf_keras.layers.Layer):
   """Performs packing tricks for BERT inputs to improve TPU utilization."""
@@ -83,7 +83,23 @@ class PositionEmbedding(tf_keras.layers.Layer):
 
     super().build(input_shape)
 
-  def call(self, inputs):
+  def call(self, inputs, position_ids=None):
+    """Returns the position embeddings of `inputs`.
+
+    Args:
+      inputs: the input tensor.
+      position_ids: optional positions of the inputs, e.g. for packed
+        sequences whose positions restart at every packed sequence. Only
+        supported with `seq_axis` 1, they have shape [batch, seq_length].
+
+    Returns:
+      A tensor of the shape of `inputs`.
+    """
+    if position_ids is not None:
+      if self._seq_axis != 1:
+        raise ValueError("`position_ids` requires `seq_axis` 1, got %d." %
+                         self._seq_axis)
+      return tf.gather(self._position_embeddings, position_ids)
     input_shape = tf.shape(inputs)
     actual_seq_len = input_shape[self._seq_axis]
     position_embeddings = self._position_embeddings[:actual_seq_len, :]
@@ -50,6 +50,11 @@ class BertClassifier(tf_keras.Model):
       It should take in the output from network and produce the final logits.
       If set, the arguments ('num_classes', 'initializer', 'dropout_rate',
       'use_encoder_pooler', 'head_name') will be ignored.
+
+  When the network inputs pack several sequences, i.e. have
+  `packed_example_positions`, the logits have shape [batch_size,
+  max_sequences_per_pack, num_classes]. Without the encoder pooler, the head
+  is then applied to the first token of every packed sequence.
   """
 
   def __init__(self,
@@ -70,6 +75,7 @@ class BertClassifier(tf_keras.Model):
     # Model. To do this, we need to keep a handle to the network inputs for use
     # when we construct the Model object at the end of init.
     inputs = network.inputs
+    packed_example_positions = None
 
     if use_encoder_pooler:
       # Because we have a copy of inputs to create this Model object, we can
@@ -86,6 +92,12 @@ class BertClassifier(tf_keras.Model):
         cls_inputs = outputs[0]
       else:
         cls_inputs = outputs['sequence_output']
+      if isinstance(inputs, dict) and 'packed_example_positions' in inputs:
+        packed_example_positions = inputs['packed_example_positions']
+        # The first tokens of the packed sequences, as one token sequences.
+        cls_inputs = tf.gather(
+            cls_inputs, packed_example_positions, batch_dims=1)
+        cls_inputs = tf.reshape(cls_inputs, [-1, 1, cls_inputs.shape[-1]])
 
     if cls_head:
       classifier = cls_head
@@ -98,6 +110,13 @@ class BertClassifier(tf_keras.Model):
           name=head_name)
 
     predictions = classifier(cls_inputs)
+    if packed_example_positions is not None and not use_encoder_pooler:
+      predictions = tf.reshape(
+          predictions,
+          tf.concat([
+              tf.shape(packed_example_positions),
+              tf.shape(predictions)[1:]
+          ], axis=0))
 
     # b/164516224
     # Once we've created the network using the Functional API, we call
@@ -174,7 +174,11 @@ class BertPretrainerV2(tf_keras.Model):
     mlm_initializer: The initializer (if any) to use in the masked LM. Default
       to a Glorot uniform initializer.
     classification_heads: A list of optional head layers to transform on encoder
-      sequence outputs.
+      sequence outputs. When the inputs pack several sequences, i.e. have
+      `packed_example_positions`, every head is applied to the first token of
+      every packed sequence, as a [batch_size * max_sequences_per_pack, 1,
+      hidden_size] sequence output, and its outputs have shape [batch_size,
+      max_sequences_per_pack, ...]. The heads must then pool the first token.
     customized_masked_lm: A customized masked_lm layer. If None, will create
       a standard layer from `layers.MaskedLM`; if not None, will use the
       specified masked_lm layer. Above arguments `mlm_activation` and
@@ -256,8 +260,25 @@ class BertPretrainerV2(tf_keras.Model):
       masked_lm_positions = inputs['masked_lm_positions']
       outputs['mlm_logits'] = self.masked_lm(
           sequence_output, masked_positions=masked_lm_positions)
+    cls_inputs = sequence_output
+    packed_example_positions = inputs.get('packed_example_positions')
+    if packed_example_positions is not None:
+      cls_inputs = tf.gather(
+          sequence_output, packed_example_positions, batch_dims=1)
+      cls_inputs = tf.reshape(cls_inputs, [-1, 1, cls_inputs.shape[-1]])
+
+      def unpack(cls_output):
+        return tf.reshape(
+            cls_output,
+            tf.concat([
+                tf.shape(packed_example_positions),
+                tf.shape(cls_output)[1:]
+            ], axis=0))
+
     for cls_head in self.classification_heads:
-      cls_outputs = cls_head(sequence_output)
+      cls_outputs = cls_head(cls_inputs)
+      if packed_example_positions is not None:
+        cls_outputs = tf.nest.map_structure(unpack, cls_outputs)
       if isinstance(cls_outputs, dict):
         outputs.update(cls_outputs)
       else:
@@ -204,6 +204,34 @@ class BertPretrainerV2Test(tf.test.TestCase, parameterized.TestCase):
     self.assertEqual(outputs['foo'].shape.as_list(), [None, 2])
     self.assertEqual(outputs['bar'].shape.as_list(), [None, 3])
 
+  def test_packed_cls_outputs(self):
+    """Validate the classification outputs of packed sequences."""
+    sequence_length = 16
+    test_network = networks.BertEncoderV2(
+        vocab_size=100,
+        num_layers=2,
+        hidden_size=48,
+        max_sequence_length=sequence_length,
+        pack_multiple_sequences=True)
+    bert_trainer_model = bert_pretrainer.BertPretrainerV2(
+        encoder_network=test_network,
+        classification_heads=[layers.MultiClsHeads(
+            inner_dim=5, cls_list=[('foo', 2), ('bar', 3)])])
+    inputs = dict(
+        input_word_ids=tf.ones([2, sequence_length], tf.int32),
+        input_mask=tf.ones([2, sequence_length], tf.int32),
+        input_type_ids=tf.zeros([2, sequence_length], tf.int32),
+        position_ids=tf.tile(tf.range(4)[None, :], [2, 4]),
+        packed_example_ids=tf.repeat(tf.range(1, 5)[None, :], 4, axis=1) *
+        tf.ones([2, 1], tf.int32),
+        packed_example_positions=tf.constant([[0, 4, 8, 12]] * 2),
+        masked_lm_positions=tf.constant([[1, 5, 9]] * 2))
+
+    outputs = bert_trainer_model(inputs)
+    self.assertEqual(outputs['foo'].shape.as_list(), [2, 4, 2])
+    self.assertEqual(outputs['bar'].shape.as_list(), [2, 4, 3])
+    self.assertEqual(outputs['mlm_logits'].shape.as_list(), [2, 3, 100])
+
   def test_v2_serialize_deserialize(self):
     """Validate that the BERT trainer can be serialized and deserialized."""
     # Build a transformer network to use within the BERT trainer.
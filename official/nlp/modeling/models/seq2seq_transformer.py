@@ -51,6 +51,7 @@ class Seq2SeqTransformer(tf_keras.Model):
                encoder_layer=None,
                decoder_layer=None,
                eos_id=EOS_ID,
+               in_place_cache=False,
                **kwargs):
     """Initialize layers to build Transformer model.
 
@@ -67,6 +68,9 @@ class Seq2SeqTransformer(tf_keras.Model):
       encoder_layer: An initialized encoder layer.
       decoder_layer: An initialized decoder layer.
       eos_id: Id of end of sentence token.
+      in_place_cache: Whether beam search writes the decoder self-attention
+        cache in place and reads it through row indices, rather than gathering
+        it for the new beams at every step. See `beam_search.ROW_INDICES_KEY`.
       **kwargs: other keyword arguments.
     """
     super().__init__(**kwargs)
@@ -79,6 +83,7 @@ class Seq2SeqTransformer(tf_keras.Model):
     self._beam_size = beam_size
     self._alpha = alpha
     self._eos_id = eos_id
+    self._in_place_cache = in_place_cache
     self.embedding_lookup = layers.OnDeviceEmbedding(
         vocab_size=self._vocab_size,
         embedding_width=self._embedding_width,
@@ -103,6 +108,7 @@ class Seq2SeqTransformer(tf_keras.Model):
         "extra_decode_length": self._extra_decode_length,
         "beam_size": self._beam_size,
         "alpha": self._alpha,
+        "in_place_cache": self._in_place_cache,
         "encoder_layer": self.encoder_layer,
         "decoder_layer": self.decoder_layer,
     }
@@ -254,7 +260,8 @@ class Seq2SeqTransformer(tf_keras.Model):
           max_decode_length=max_decode_length,
           eos_id=self._eos_id,
           padded_decode=self._padded_decode,
-          dtype=self.compute_dtype)
+          dtype=self.compute_dtype,
+          in_place_cache=self._in_place_cache)
 
       # Get the top sequence for each batch element
       top_decoded_ids = decoded_ids[:, 0, 1:]
@@ -342,6 +349,15 @@ class Seq2SeqTransformer(tf_keras.Model):
       attention_mask = cache.get("encoder_decoder_attention_mask")
       attention_mask = tf.tile(attention_mask, [1, decoder_length, 1])
 
+      if self._in_place_cache:
+        # The self-attention layers read the cache through the row indices.
+        row_indices = cache.pop(beam_search.ROW_INDICES_KEY)
+        if not self._padded_decode:
+          # The caches only have the positions decoded so far.
+          row_indices = row_indices[:, :i + 1]
+        for layer in range(self.decoder_layer.num_layers):
+          cache[str(layer)]["row_indices"] = row_indices
+
       decoder_outputs = self.decoder_layer(
           decoder_input,
           cache.get("encoder_outputs"),
@@ -349,6 +365,9 @@ class Seq2SeqTransformer(tf_keras.Model):
           cross_attention_mask=attention_mask,
           cache=cache,
           decode_loop_step=i if self._padded_decode else None)
+      if self._in_place_cache:
+        for layer in range(self.decoder_layer.num_layers):
+          cache[str(layer)].pop("row_indices")
 
       decoder_outputs = tf.cast(decoder_outputs, dtype=self.compute_dtype)
       logits = self._embedding_linear(self.embedding_lookup.embeddings,
@@ -609,7 +628,9 @@ class TransformerDecoder(tf_keras.layers.Layer):
                    "v": A tensor with shape `(batch_size, i, value_channels)`},
                      ...}
       decode_loop_step: An integer, the step number of the decoding loop. Used
-        only for autoregressive inference on TPU.
+        only for autoregressive inference on TPU, or with full-length caches
+        read through `row_indices`, see `CachedAttention`, where it may also
+        be an int tensor with shape `(batch_size,)`.
       return_all_decoder_outputs: Return all decoder layer outputs.
         Note that the outputs are layer normed.
         This is useful when introducing per layer auxiliary loss.
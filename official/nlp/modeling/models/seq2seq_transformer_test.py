@@ -34,6 +34,7 @@ class Seq2SeqTransformerTest(tf.test.TestCase, parameterized.TestCase):
       embedding_width,
       self_attention_cls=None,
       cross_attention_cls=None,
+      in_place_cache=False,
   ):
     num_layers = 1
     num_attention_heads = 2
@@ -66,7 +67,8 @@ class Seq2SeqTransformerTest(tf.test.TestCase, parameterized.TestCase):
         beam_size=4,
         alpha=0.6,
         encoder_layer=encoder_layer,
-        decoder_layer=decoder_layer)
+        decoder_layer=decoder_layer,
+        in_place_cache=in_place_cache)
 
   @combinations.generate(
       combinations.combine(
@@ -201,6 +203,25 @@ class Seq2SeqTransformerTest(tf.test.TestCase, parameterized.TestCase):
             ))
     tf.saved_model.save(save_module, self.get_temp_dir(), signatures=signatures)
 
+  @parameterized.parameters(True, False)
+  def test_in_place_cache(self, padded_decode):
+    decode_max_length = 10
+    embedding_width = 16
+    inputs = tf.constant(
+        np.random.RandomState(0).randint(2, 100, size=(4, decode_max_length)),
+        tf.int32)
+    model = self._build_model(padded_decode, decode_max_length,
+                              embedding_width)
+    in_place_model = self._build_model(
+        padded_decode, decode_max_length, embedding_width, in_place_cache=True)
+    outputs = model(dict(inputs=inputs))
+    in_place_model(dict(inputs=inputs))
+    in_place_model.set_weights(model.get_weights())
+
+    in_place_outputs = tf.function(in_place_model.call)(dict(inputs=inputs))
+    self.assertAllEqual(outputs["outputs"], in_place_outputs["outputs"])
+    self.assertAllClose(outputs["scores"], in_place_outputs["scores"])
+
 
 if __name__ == "__main__":
   tf.test.main()
@@ -634,15 +634,16 @@ class MultiHeadAttention(Module):
     """Updates cache states and gets full-length key/value tensors."""
     # Combines cached keys and values with new keys and values.
     # TPU one-hot handling.
+    # A scalar `decode_position` is broadcast over the batch.
     key_seq_dim = cache["key"].shape.as_list()[1]
     indices = tf.reshape(
         tf.one_hot(decode_position, key_seq_dim, dtype=key.dtype),
-        [1, key_seq_dim, 1, 1])
+        [-1, key_seq_dim, 1, 1])
     key = cache["key"] + key * indices
     value_seq_dim = cache["value"].shape.as_list()[1]
     indices = tf.reshape(
         tf.one_hot(decode_position, value_seq_dim, dtype=value.dtype),
-        [1, value_seq_dim, 1, 1])
+        [-1, value_seq_dim, 1, 1])
     value = cache["value"] + value * indices
 
     # Update cache
@@ -670,7 +671,8 @@ class MultiHeadAttention(Module):
       cache: If not None, cache["key"] and cache["value"] are Tensors of shape
         (bs, klen, n_heads, d_kv).
       decode_position: If not None, which position of the sequence we are
-        decoding for. Ranges from 0 to klen - 1.
+        decoding for. Ranges from 0 to klen - 1. Either a scalar or an int
+        tensor of shape (bs,), to decode every sequence at its own position.
       training: Effects the behavior of dropout.
 
     Returns:
@@ -697,7 +699,14 @@ class MultiHeadAttention(Module):
     if position_bias is not None:
       # If position_bias is None, the input embedings should already include
       # position embeddings.
-      if use_cache:
+      if use_cache and tf.convert_to_tensor(decode_position).shape.rank == 1:
+        # (bs, n_heads, 1, klen)
+        position_bias = tf.expand_dims(
+            tf.transpose(
+                tf.gather(position_bias[0], decode_position, axis=1),
+                [1, 0, 2]),
+            axis=2)
+      elif use_cache:
         bias_shape = position_bias.shape.as_list()
         position_bias = tf.slice(
             position_bias, [0, 0, decode_position, 0],
@@ -1312,7 +1321,8 @@ class Decoder(Module):
       decoder_mask: the decoder self-attention mask.
       encoder_decoder_mask: the cross-attention mask.
       decode: Whether to perform autoregressive decoding.
-      decode_position: integer, the position to decode.
+      decode_position: integer, the position to decode, or an int tensor of
+        shape (batch_size,) with the position of every sequence.
       cache: The cache dictionary of key, value tensors.
       max_decode_len: An optional integer specifying the maximum decoding
         length. Note that this is only used for defining the relative position
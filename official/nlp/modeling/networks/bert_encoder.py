@@ -81,6 +81,13 @@ class BertEncoderV2(tf_keras.layers.Layer):
       num_attention_heads, seq_dim, seq_dim].
     return_word_embeddings: If true, also return the input word embedding
       sequence in the bert inference output.
+    pack_multiple_sequences: Whether the inputs pack several sequences, as
+      created by `official.nlp.data.sequence_packing`. The encoder then also
+      takes `position_ids`, `packed_example_ids` and `packed_example_positions`
+      inputs: the tokens only attend to the tokens of their sequence, and the
+      pooled output is computed for every packed sequence, with shape
+      [batch_size, max_sequences_per_pack, hidden_size]. These inputs are used
+      when present even if this is False, which only affects `inputs`.
   """
 
   def __init__(
@@ -104,6 +111,7 @@ class BertEncoderV2(tf_keras.layers.Layer):
       with_dense_inputs: bool = False,
       return_attention_scores: bool = False,
       return_word_embeddings: bool = False,
+      pack_multiple_sequences: bool = False,
       **kwargs):
     # Pops kwargs that are used in V1 implementation.
     if 'dict_outputs' in kwargs:
@@ -212,6 +220,7 @@ class BertEncoderV2(tf_keras.layers.Layer):
         'with_dense_inputs': with_dense_inputs,
         'return_attention_scores': return_attention_scores,
         'return_word_embeddings': return_word_embeddings,
+        'pack_multiple_sequences': pack_multiple_sequences,
     }
     if with_dense_inputs:
       self.inputs = dict(
@@ -228,6 +237,12 @@ class BertEncoderV2(tf_keras.layers.Layer):
           input_word_ids=tf_keras.Input(shape=(None,), dtype=tf.int32),
           input_mask=tf_keras.Input(shape=(None,), dtype=tf.int32),
           input_type_ids=tf_keras.Input(shape=(None,), dtype=tf.int32))
+    if pack_multiple_sequences:
+      self.inputs.update(
+          position_ids=tf_keras.Input(shape=(None,), dtype=tf.int32),
+          packed_example_ids=tf_keras.Input(shape=(None,), dtype=tf.int32),
+          packed_example_positions=tf_keras.Input(
+              shape=(None,), dtype=tf.int32))
 
   def call(self, inputs):
     word_embeddings = None
@@ -240,6 +255,10 @@ class BertEncoderV2(tf_keras.layers.Layer):
       dense_inputs = inputs.get('dense_inputs', None)
       dense_mask = inputs.get('dense_mask', None)
       dense_type_ids = inputs.get('dense_type_ids', None)
+
+      position_ids = inputs.get('position_ids', None)
+      packed_example_ids = inputs.get('packed_example_ids', None)
+      packed_example_positions = inputs.get('packed_example_positions', None)
     else:
       raise ValueError('Unexpected inputs type to %s.' % self.__class__)
 
@@ -250,7 +269,8 @@ class BertEncoderV2(tf_keras.layers.Layer):
       mask = tf.concat([mask, dense_mask], axis=1)
 
     embeddings = self._get_embeddings(word_ids, type_ids, word_embeddings,
-                                      dense_inputs, dense_type_ids)
+                                      dense_inputs, dense_type_ids,
+                                      position_ids)
     embeddings = self._embedding_norm_layer(embeddings)
     embeddings = self._embedding_dropout(embeddings)
 
@@ -258,6 +278,9 @@ class BertEncoderV2(tf_keras.layers.Layer):
       embeddings = self._embedding_projection(embeddings)
 
     attention_mask = self._attention_mask_layer(embeddings, mask)
+    if packed_example_ids is not None:
+      attention_mask = layers.get_packed_attention_mask(
+          attention_mask, packed_example_ids)
 
     encoder_outputs = []
     attention_outputs = []
@@ -273,7 +296,12 @@ class BertEncoderV2(tf_keras.layers.Layer):
       encoder_outputs.append(x)
 
     last_encoder_output = encoder_outputs[-1]
-    first_token_tensor = last_encoder_output[:, 0, :]
+    if packed_example_positions is not None:
+      # The first token of every packed sequence.
+      first_token_tensor = tf.gather(
+          last_encoder_output, packed_example_positions, batch_dims=1)
+    else:
+      first_token_tensor = last_encoder_output[:, 0, :]
     pooled_output = self._pooler_layer(first_token_tensor)
 
     output = dict(
@@ -320,10 +348,16 @@ class BertEncoderV2(tf_keras.layers.Layer):
 
     return cls(**config)
 
-  def _get_embeddings(self, word_ids: tf.Tensor, type_ids: tf.Tensor,
-                      word_embeddings: Optional[tf.Tensor],
-                      dense_inputs: Optional[tf.Tensor],
-                      dense_type_ids: Optional[tf.Tensor]) -> tf.Tensor:
+  def _get_embeddings(
+      self,
+      word_ids: tf.Tensor,
+      type_ids: tf.Tensor,
+      word_embeddings: Optional[tf.Tensor],
+      dense_inputs: Optional[tf.Tensor],
+      dense_type_ids: Optional[tf.Tensor],
+      position_ids: Optional[tf.Tensor] = None) -> tf.Tensor:
+    if position_ids is not None and dense_inputs is not None:
+      raise ValueError('`position_ids` are not supported with dense inputs.')
     if word_embeddings is None:
       word_embeddings = self._embedding_layer(word_ids)
 
@@ -335,7 +369,8 @@ class BertEncoderV2(tf_keras.layers.Layer):
     type_embeddings = self._type_embedding_layer(type_ids)
 
     # absolute position embeddings.
-    position_embeddings = self._position_embedding_layer(word_embeddings)
+    position_embeddings = self._position_embedding_layer(
+        word_embeddings, position_ids=position_ids)
     return word_embeddings + position_embeddings + type_embeddings
 
 
@@ -321,6 +321,40 @@ class BertEncoderTest(tf.test.TestCase, parameterized.TestCase):
     self.assertAllEqual(tf.float32, all_encoder_outputs[-1].dtype)
     self.assertAllEqual(tf.float32, pooled.dtype)
 
+  def test_packed_sequences(self):
+    hidden_size = 32
+    test_network = bert_encoder.BertEncoderV2(
+        vocab_size=100,
+        hidden_size=hidden_size,
+        num_attention_heads=2,
+        num_layers=2,
+        pack_multiple_sequences=True)
+    self.assertIn("packed_example_ids", test_network.inputs)
+
+    # Packs [1, 2, 3] and [4, 5] into a sequence of length 6.
+    packed_outputs = test_network(
+        dict(
+            input_word_ids=tf.constant([[1, 2, 3, 4, 5, 0]]),
+            input_mask=tf.constant([[1, 1, 1, 1, 1, 0]]),
+            input_type_ids=tf.zeros([1, 6], tf.int32),
+            position_ids=tf.constant([[0, 1, 2, 0, 1, 0]]),
+            packed_example_ids=tf.constant([[1, 1, 1, 2, 2, 0]]),
+            packed_example_positions=tf.constant([[0, 3]])))
+    outputs = test_network(
+        dict(
+            input_word_ids=tf.constant([[1, 2, 3], [4, 5, 0]]),
+            input_mask=tf.constant([[1, 1, 1], [1, 1, 0]]),
+            input_type_ids=tf.zeros([2, 3], tf.int32)))
+
+    self.assertAllEqual([1, 2, hidden_size],
+                        packed_outputs["pooled_output"].shape)
+    self.assertAllClose(packed_outputs["pooled_output"][0],
+                        outputs["pooled_output"], atol=1e-5)
+    self.assertAllClose(packed_outputs["sequence_output"][0, :3],
+                        outputs["sequence_output"][0], atol=1e-5)
+    self.assertAllClose(packed_outputs["sequence_output"][0, 3:5],
+                        outputs["sequence_output"][1, :2], atol=1e-5)
+
   def test_serialize_deserialize(self):
     # Create a network object that sets all of its config options.
     kwargs = dict(
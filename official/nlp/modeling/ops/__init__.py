@@ -18,3 +18,4 @@ from official.nlp.modeling.ops.beam_search import SequenceBeamSearch
 from official.nlp.modeling.ops.sampling_module import SamplingModule
 from official.nlp.modeling.ops.segment_extractor import get_next_sentence_labels
 from official.nlp.modeling.ops.segment_extractor import get_sentence_order_labels
+from official.nlp.modeling.ops.speculative_sampling_module import SpeculativeSamplingModule
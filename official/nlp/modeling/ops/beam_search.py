@@ -17,6 +17,16 @@
 import numpy as np
 import tensorflow as tf, tf_keras
 
+# With `in_place_cache`, the cache passed to `symbols_to_logits_fn` has an
+# int32 tensor under this key, with shape [batch_size * beam_size,
+# max_decode_length]: the row of the flattened cache holding the decoder state
+# of every position of each sequence. The cache is then not reordered with the
+# beams: at step `i`, the function must write the decoder state of position
+# `i` to the row of every sequence, and read the states of the previous
+# positions through these indices. The other cache values must be the same
+# for all the beams of a batch item, e.g. the encoder outputs.
+ROW_INDICES_KEY = "row_indices"
+
 
 def inf(dtype):
   """Returns a value close to infinity, but is still finite in `dtype`.
@@ -57,6 +67,10 @@ class _StateKeys(object):
   # the encoder output, attention bias, and the decoder attention output from
   # the previous iteration.
   ALIVE_CACHE = "ALIVE_CACHE"
+  # With `in_place_cache`, the rows of the flattened cache holding the decoder
+  # states of each alive sequence, see `ROW_INDICES_KEY`.
+  # Has shape [batch_size, beam_size, max_decode_length]
+  ALIVE_ROW_INDICES = "ALIVE_ROW_INDICES"
 
   # Top finished sequences for each batch item.
   # Has shape [batch_size, beam_size, CUR_INDEX + 1]. Sequences that are
@@ -114,6 +128,7 @@ class SequenceBeamSearch(tf.Module):
       dtype=tf.float32,
       noise_multiplier: float = 0.0,
       decoding_name=None,
+      in_place_cache: bool = False,
   ):
     """Initialize sequence beam search.
 
@@ -138,6 +153,8 @@ class SequenceBeamSearch(tf.Module):
         tf.float32.
       noise_multiplier: The amount of noise.
       decoding_name: an optional name for the decoding loop tensors.
+      in_place_cache: Whether the cache is updated in place rather than
+        gathered for the new beams at every step, see `ROW_INDICES_KEY`.
     """
     self.symbols_to_logits_fn = symbols_to_logits_fn
     self.vocab_size = vocab_size
@@ -152,6 +169,7 @@ class SequenceBeamSearch(tf.Module):
     self.dtype = tf.as_dtype(dtype)
     self.decoding_name = decoding_name
     self.noise_multiplier = noise_multiplier
+    self.in_place_cache = in_place_cache
 
   def search(self, initial_ids, initial_cache, constraint_mask=None):
     """Beam search for sequences with highest scores.
@@ -167,7 +185,13 @@ class SequenceBeamSearch(tf.Module):
 
     Returns:
       finished_seq and finished_scores.
+
+    Raises:
+      ValueError: if `in_place_cache` is set and `initial_cache` is not a
+        dictionary.
     """
+    if self.in_place_cache and not isinstance(initial_cache, dict):
+      raise ValueError("`in_place_cache` requires a dictionary cache.")
     batch_size = (
         initial_ids.shape.as_list()[0]
         if self.padded_decode else tf.shape(initial_ids)[0])
@@ -189,7 +213,12 @@ class SequenceBeamSearch(tf.Module):
         Tuple of
         (Top 2*beam_size sequences [batch_size, 2 * beam_size, cur_index + 1],
          Scores of returned sequences [batch_size, 2 * beam_size],
-         New alive cache, for each of the 2 * beam_size sequences)
+         Ids appended to the returned sequences [batch_size, 2 * beam_size],
+         New alive cache, for each of the 2 * beam_size sequences, or the
+         cache updated in place with `in_place_cache`,
+         Row indices of the returned sequences with `in_place_cache`, else
+         None,
+         Constraint mask)
       """
       i = state[_StateKeys.CUR_INDEX]
       alive_seq = state[_StateKeys.ALIVE_SEQ]
@@ -207,9 +236,23 @@ class SequenceBeamSearch(tf.Module):
       else:
         flat_ids = flatten_beam_dim(alive_seq)  # [batch_size * beam_size]
       flat_cache = tf.nest.map_structure(flatten_beam_dim, alive_cache)
+      if self.in_place_cache:
+        # The decoder state of the current position of every sequence is
+        # written to its own row.
+        flat_row_indices = flatten_beam_dim(
+            state[_StateKeys.ALIVE_ROW_INDICES])
+        rows = tf.range(tf.shape(flat_row_indices)[0])
+        positions = tf.range(tf.shape(flat_row_indices)[1])
+        flat_row_indices = tf.where(positions[tf.newaxis, :] >= i,
+                                    rows[:, tf.newaxis], flat_row_indices)
+        flat_cache[ROW_INDICES_KEY] = flat_row_indices
 
       flat_logits, flat_cache = self.symbols_to_logits_fn(
           flat_ids, i, flat_cache)
+      if self.in_place_cache:
+        flat_cache = {
+            k: v for k, v in flat_cache.items() if k != ROW_INDICES_KEY
+        }
 
       if _StateKeys.CONSTRAINT_MASK in state:
         constraint_mask = state[_StateKeys.CONSTRAINT_MASK]
@@ -257,9 +300,18 @@ class SequenceBeamSearch(tf.Module):
       # Extract the alive sequences that generate the highest log probabilities
       # after being extended.
       topk_beam_indices = topk_indices // self.vocab_size
-      topk_seq, new_cache = self._gather_beams([alive_seq, new_cache],
-                                               topk_beam_indices, batch_size,
-                                               beams_to_keep)
+      if self.in_place_cache:
+        # Only the row indices are reordered, the cache stays in place.
+        row_indices = _unflatten_beam_dim(flat_row_indices, batch_size,
+                                          self.beam_size)
+        topk_seq, topk_row_indices = self._gather_beams(
+            [alive_seq, row_indices], topk_beam_indices, batch_size,
+            beams_to_keep)
+      else:
+        topk_seq, new_cache = self._gather_beams([alive_seq, new_cache],
+                                                 topk_beam_indices, batch_size,
+                                                 beams_to_keep)
+        topk_row_indices = None
 
       # Append the most probable IDs to the topk sequences
       topk_ids = topk_indices % self.vocab_size
@@ -272,10 +324,11 @@ class SequenceBeamSearch(tf.Module):
       else:
         topk_seq = tf.concat(
             [topk_seq, tf.expand_dims(topk_ids, axis=2)], axis=2)
-      return topk_seq, topk_log_probs, topk_ids, new_cache, constraint_mask
+      return (topk_seq, topk_log_probs, topk_ids, new_cache, topk_row_indices,
+              constraint_mask)
 
     def _get_new_alive_state(new_seq, new_log_probs, new_finished_flags,
-                             new_cache):
+                             new_cache, new_row_indices=None):
       """Gather the top k sequences that are still alive.
 
       Args:
@@ -285,13 +338,17 @@ class SequenceBeamSearch(tf.Module):
           shape [batch_size, beam_size]
         new_finished_flags: A boolean Tensor indicates which sequences are live
           inside the beam.
-        new_cache: Dict of cached values for each sequence.
+        new_cache: Dict of cached values for each sequence, or the cache
+          updated in place with `in_place_cache`.
+        new_row_indices: The row indices of the new sequences with
+          `in_place_cache`.
 
       Returns:
         Dictionary with alive keys from _StateKeys:
           {Top beam_size sequences that are still alive (don't end with eos_id)
            Log probabilities of top alive sequences
-           Dict cache storing decoder states for top alive sequences}
+           Dict cache storing decoder states for top alive sequences
+           Row indices of the top alive sequences with `in_place_cache`}
       """
       # To prevent finished sequences from being considered, set log probs to
       # -inf.
@@ -299,6 +356,17 @@ class SequenceBeamSearch(tf.Module):
                                self.dtype) * -inf(self.dtype)
 
       _, topk_indexes = tf.nn.top_k(new_log_probs, k=self.beam_size)
+      if new_row_indices is not None:
+        top_alive_seq, top_alive_log_probs, top_alive_row_indices = (
+            self._gather_beams([new_seq, new_log_probs, new_row_indices],
+                               topk_indexes, batch_size, self.beam_size))
+        return {
+            _StateKeys.ALIVE_SEQ: top_alive_seq,
+            _StateKeys.ALIVE_LOG_PROBS: top_alive_log_probs,
+            _StateKeys.ALIVE_CACHE: new_cache,
+            _StateKeys.ALIVE_ROW_INDICES: top_alive_row_indices
+        }
+
       top_alive_seq, top_alive_log_probs, top_alive_cache = (
           self._gather_beams([new_seq, new_log_probs, new_cache],
                              topk_indexes, batch_size, self.beam_size))
@@ -385,9 +453,8 @@ class SequenceBeamSearch(tf.Module):
         new state dictionary.
       """
       # Grow alive sequences by one token.
-      new_seq, new_log_probs, topk_ids, new_cache, constraint_mask = (
-          _grow_alive_seq(state)
-      )
+      (new_seq, new_log_probs, topk_ids, new_cache, new_row_indices,
+       constraint_mask) = _grow_alive_seq(state)
       new_finished_flags = tf.equal(topk_ids, self.eos_id[0])
       for eos_id in self.eos_id[1:]:
         one_finished_flags = tf.equal(topk_ids, eos_id)
@@ -396,7 +463,8 @@ class SequenceBeamSearch(tf.Module):
         )
       # Collect top beam_size alive sequences
       alive_state = _get_new_alive_state(new_seq, new_log_probs,
-                                         new_finished_flags, new_cache)
+                                         new_finished_flags, new_cache,
+                                         new_row_indices)
 
       # Combine newly finished sequences with existing finished sequences, and
       # collect the top k scoring sequences.
@@ -496,6 +564,13 @@ class SequenceBeamSearch(tf.Module):
     }
     if constraint_mask is not None:
       state[_StateKeys.CONSTRAINT_MASK] = constraint_mask
+    if self.in_place_cache:
+      # Every sequence starts with its own row.
+      rows = tf.reshape(
+          tf.range(batch_size * self.beam_size),
+          [batch_size, self.beam_size, 1])
+      state[_StateKeys.ALIVE_ROW_INDICES] = tf.tile(
+          rows, [1, 1, self.max_decode_length])
 
     # Create state invariants for each value in the state dictionary. Each
     # dimension must be a constant or None. A None dimension means either:
@@ -543,6 +618,11 @@ class SequenceBeamSearch(tf.Module):
       state_shape_invariants[_StateKeys.CONSTRAINT_MASK] = tf.TensorShape(
           [self.vocab_size]
       )
+    if self.in_place_cache:
+      state_shape_invariants[_StateKeys.ALIVE_ROW_INDICES] = (
+          state[_StateKeys.ALIVE_ROW_INDICES].get_shape()
+          if self.padded_decode else tf.TensorShape(
+              [None, self.beam_size, None]))
 
     return state, state_shape_invariants
 
@@ -649,6 +729,7 @@ def sequence_beam_search(
     noise_multiplier: float = 0.0,
     decoding_name=None,
     constraint_mask=None,
+    in_place_cache: bool = False,
 ):
   """Search for sequence of subtoken ids with the largest probability.
 
@@ -678,6 +759,10 @@ def sequence_beam_search(
     decoding_name: an optional name for the decoding loop tensors.
     constraint_mask: The BS will only constraint the next token to where the
       mask is 1.
+    in_place_cache: Whether the cache is updated in place rather than gathered
+      for the new beams at every step, see `ROW_INDICES_KEY`. The rows of the
+      batch items whose search has finished still go through
+      `symbols_to_logits_fn` until the search of the whole batch stops.
 
   Returns:
     Top decoded sequences [batch_size, beam_size, max_decode_length]
@@ -694,6 +779,7 @@ def sequence_beam_search(
       dtype,
       noise_multiplier,
       decoding_name,
+      in_place_cache,
   )
   return sbs.search(initial_ids, initial_cache, constraint_mask=constraint_mask)
 
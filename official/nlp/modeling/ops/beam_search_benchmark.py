@@ -0,0 +1,115 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+r"""Benchmarks beam search decoding with and without an in place cache.
+
+Decodes random inputs with a randomly initialized `Seq2SeqTransformer`, by
+default of the size of the WMT Transformer base model, once gathering the
+decoder cache for every beam reordering and once updating it in place, see
+`in_place_cache` of `SequenceBeamSearch`. Reports the decoding time per batch
+for every beam size and decoding length.
+
+Usage:
+
+  python -m official.nlp.modeling.ops.beam_search_benchmark \
+    --beam_sizes=1,4,8 --decode_lengths=32,64,128 --padded_decode
+"""
+
+import time
+
+from absl import app
+from absl import flags
+from absl import logging
+import numpy as np
+import tensorflow as tf, tf_keras
+
+from official.nlp.modeling.models import seq2seq_transformer
+
+_BATCH_SIZE = flags.DEFINE_integer('batch_size', 16, 'Batch size.')
+_INPUT_LENGTH = flags.DEFINE_integer('input_length', 32,
+                                     'Length of the inputs.')
+_BEAM_SIZES = flags.DEFINE_list('beam_sizes', ['1', '4', '8'],
+                                'Beam sizes to benchmark.')
+_DECODE_LENGTHS = flags.DEFINE_list('decode_lengths', ['32', '64', '128'],
+                                    'Maximum decoding lengths to benchmark.')
+_PADDED_DECODE = flags.DEFINE_boolean(
+    'padded_decode', False, 'Whether to decode with static shapes.')
+_NUM_LAYERS = flags.DEFINE_integer('num_layers', 6,
+                                   'Number of encoder and decoder layers.')
+_HIDDEN_SIZE = flags.DEFINE_integer('hidden_size', 512, 'Hidden size.')
+_NUM_HEADS = flags.DEFINE_integer('num_heads', 8,
+                                  'Number of attention heads.')
+_VOCAB_SIZE = flags.DEFINE_integer('vocab_size', 33708, 'Vocabulary size.')
+_NUM_ITERATIONS = flags.DEFINE_integer(
+    'num_iterations', 3, 'Number of timed batches of every configuration.')
+
+
+def _build_model(beam_size, decode_length, in_place_cache):
+  kwargs = dict(
+      num_layers=_NUM_LAYERS.value,
+      num_attention_heads=_NUM_HEADS.value,
+      intermediate_size=4 * _HIDDEN_SIZE.value,
+      activation='relu',
+      dropout_rate=0.0,
+      attention_dropout_rate=0.0,
+      intermediate_dropout=0.0)
+  return seq2seq_transformer.Seq2SeqTransformer(
+      vocab_size=_VOCAB_SIZE.value,
+      embedding_width=_HIDDEN_SIZE.value,
+      dropout_rate=0.0,
+      padded_decode=_PADDED_DECODE.value,
+      decode_max_length=decode_length,
+      beam_size=beam_size,
+      alpha=0.6,
+      # An end of sequence id which is never decoded, so that every batch is
+      # decoded up to the maximum length.
+      eos_id=-1,
+      encoder_layer=seq2seq_transformer.TransformerEncoder(**kwargs),
+      decoder_layer=seq2seq_transformer.TransformerDecoder(**kwargs),
+      in_place_cache=in_place_cache)
+
+
+def _run(inputs, beam_size, decode_length, in_place_cache):
+  """Returns the decoding time per batch, in milliseconds."""
+  model = _build_model(beam_size, decode_length, in_place_cache)
+  decode = tf.function(lambda inputs: model(dict(inputs=inputs)))
+  # Builds the model and traces the decoding function.
+  decode(inputs)['outputs'].numpy()
+
+  start = time.perf_counter()
+  for _ in range(_NUM_ITERATIONS.value):
+    decode(inputs)['outputs'].numpy()
+  return 1000.0 * (time.perf_counter() - start) / _NUM_ITERATIONS.value
+
+
+def main(_):
+  rng = np.random.default_rng(0)
+  inputs = tf.constant(
+      rng.integers(
+          2,
+          _VOCAB_SIZE.value,
+          size=(_BATCH_SIZE.value, _INPUT_LENGTH.value)),
+      tf.int32)
+  for beam_size in _BEAM_SIZES.value:
+    for decode_length in _DECODE_LENGTHS.value:
+      gathered = _run(inputs, int(beam_size), int(decode_length), False)
+      in_place = _run(inputs, int(beam_size), int(decode_length), True)
+      logging.info(
+          'beam size %2s, length %4s: %10.1f ms gathered cache, %10.1f ms in '
+          'place cache, %5.2fx', beam_size, decode_length, gathered, in_place,
+          gathered / in_place)
+
+
+if __name__ == '__main__':
+  app.run(main)
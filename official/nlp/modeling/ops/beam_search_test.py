@@ -198,6 +198,44 @@ class BeamSearchTests(tf.test.TestCase, parameterized.TestCase):
     else:
       self.assertAllEqual([[[0, 0, 0, 1], [0, 0, 1, 2]]], predictions)
 
+  @parameterized.named_parameters([
+      ('padded_decode_true', True),
+      ('padded_decode_false', False),
+  ])
+  def test_sequence_beam_search_in_place_cache(self, padded_decode):
+    # batch_size*beam_size, max_decode_length, vocab_size
+    probabilities = tf.constant([[[0.2, 0.7, 0.1], [0.5, 0.3, 0.2],
+                                  [0.1, 0.8, 0.1]],
+                                 [[0.1, 0.8, 0.1], [0.3, 0.4, 0.3],
+                                  [0.2, 0.1, 0.7]]])
+    # batch_size, max_decode_length, num_heads, embed_size per head
+    x = tf.zeros([1, 3, 2, 32], dtype=tf.float32)
+    cache = {'layer_%d' % layer: {'k': x, 'v': x} for layer in range(2)}
+    row_indices_shapes = []
+
+    def symbols_to_logits_fn(_, i, cache):
+      row_indices = cache.pop(beam_search.ROW_INDICES_KEY)
+      row_indices_shapes.append(row_indices.shape.as_list())
+      logits = tf.cast(probabilities[:, i, :], tf.float32)
+      return logits, cache
+
+    predictions, _ = beam_search.sequence_beam_search(
+        symbols_to_logits_fn=symbols_to_logits_fn,
+        initial_ids=tf.zeros([1], dtype=tf.int32),
+        initial_cache=cache,
+        vocab_size=3,
+        beam_size=2,
+        alpha=0.6,
+        max_decode_length=3,
+        eos_id=9,
+        padded_decode=padded_decode,
+        dtype=tf.float32,
+        in_place_cache=True,
+    )
+    self.assertAllEqual([[[0, 1, 0, 1], [0, 1, 1, 2]]], predictions)
+    # batch_size*beam_size, max_decode_length
+    self.assertEqual(row_indices_shapes[0], [2, 3])
+
 
 if __name__ == '__main__':
   tf.test.main()
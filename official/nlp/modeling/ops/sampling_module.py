@@ -224,19 +224,7 @@ class SamplingModule(decoding_module.DecodingModule, metaclass=abc.ABCMeta):
     if self.enable_greedy:
       topk_log_probs, topk_ids = greedy(original_log_probs)
     else:
-      temperature_fn = sample_logits_with_temperature
-      sampled_logits = tf.cond(
-          self.sample_temperature > 0.0,
-          lambda: temperature_fn(new_logits, self.sample_temperature),
-          lambda: new_logits)
-      sampled_logits = tf.cond(
-          self.top_k > 0,
-          lambda: sample_top_k(sampled_logits, self.top_k),
-          lambda: sampled_logits)
-      sampled_logits = tf.cond(
-          self.top_p < 1,
-          lambda: sample_top_p(sampled_logits, self.top_p),
-          lambda: sampled_logits)
+      sampled_logits = self._sampling_logits(new_logits)
       topk_ids = tf.random.categorical(
           sampled_logits, dtype=tf.int32, num_samples=1)
       topk_log_probs = tf.gather(
@@ -250,6 +238,23 @@ class SamplingModule(decoding_module.DecodingModule, metaclass=abc.ABCMeta):
       topk_seq = tf.concat([alive_seq, topk_ids], axis=-1)
     return topk_seq, topk_log_probs, topk_ids, new_cache
 
+  def _sampling_logits(self, logits: tf.Tensor) -> tf.Tensor:
+    """Applies the sampling temperature, top_k and top_p to [batch, vocab]."""
+    temperature_fn = sample_logits_with_temperature
+    sampled_logits = tf.cond(
+        self.sample_temperature > 0.0,
+        lambda: temperature_fn(logits, self.sample_temperature),
+        lambda: logits)
+    sampled_logits = tf.cond(
+        self.top_k > 0,
+        lambda: sample_top_k(sampled_logits, self.top_k),
+        lambda: sampled_logits)
+    sampled_logits = tf.cond(
+        self.top_p < 1,
+        lambda: sample_top_p(sampled_logits, self.top_p),
+        lambda: sampled_logits)
+    return sampled_logits
+
   def _create_initial_state(
       self,
       initial_ids: tf.Tensor,
@@ -0,0 +1,164 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+r"""Benchmarks speculative decoding against decoding with the target model.
+
+Decodes a batch of random inputs with a `Seq2SeqTransformer` target model and
+a shallower draft model, and reports the latency per generated token and the
+mean number of tokens generated per call of the target model. Randomly
+initialized models keep repeating the same token, so all the proposals are
+accepted and the benchmark measures the best case of speculative decoding;
+pass checkpoints of trained models to measure the actual acceptance rate.
+
+Usage:
+
+  python -m official.nlp.modeling.ops.speculative_sampling_benchmark \
+    --num_layers=6 --draft_num_layers=1 --num_draft_tokens=4 \
+    --target_checkpoint=/path/to/target --draft_checkpoint=/path/to/draft
+"""
+
+import time
+
+from absl import app
+from absl import flags
+from absl import logging
+import numpy as np
+import tensorflow as tf, tf_keras
+
+from official.nlp.modeling.models import seq2seq_transformer
+from official.nlp.modeling.ops import sampling_module
+from official.nlp.modeling.ops import speculative_sampling_module
+from official.nlp.serving import generation_engine
+
+_BATCH_SIZE = flags.DEFINE_integer('batch_size', 1, 'Batch size.')
+_INPUT_LENGTH = flags.DEFINE_integer('input_length', 64, 'Input length.')
+_MAX_DECODE_LENGTH = flags.DEFINE_integer('max_decode_length', 64,
+                                          'Maximum decoding length.')
+_NUM_DRAFT_TOKENS = flags.DEFINE_integer(
+    'num_draft_tokens', 4, 'Number of tokens proposed at every step.')
+_NUM_LAYERS = flags.DEFINE_integer('num_layers', 6,
+                                   'Number of layers of the target model.')
+_DRAFT_NUM_LAYERS = flags.DEFINE_integer(
+    'draft_num_layers', 1, 'Number of layers of the draft model.')
+_HIDDEN_SIZE = flags.DEFINE_integer('hidden_size', 512, 'Hidden size.')
+_VOCAB_SIZE = flags.DEFINE_integer('vocab_size', 8000, 'Vocabulary size.')
+_TOP_K = flags.DEFINE_integer(
+    'top_k', 0, 'If positive, samples from the top k tokens, else decodes '
+    'greedily.')
+_TARGET_CHECKPOINT = flags.DEFINE_string(
+    'target_checkpoint', None, 'Optional checkpoint of the target model.')
+_DRAFT_CHECKPOINT = flags.DEFINE_string(
+    'draft_checkpoint', None, 'Optional checkpoint of the draft model.')
+_NUM_RUNS = flags.DEFINE_integer('num_runs', 5, 'Number of timed runs.')
+
+
+def _build_model(num_layers, checkpoint):
+  kwargs = dict(
+      num_layers=num_layers,
+      num_attention_heads=8,
+      intermediate_size=4 * _HIDDEN_SIZE.value)
+  model = seq2seq_transformer.Seq2SeqTransformer(
+      vocab_size=_VOCAB_SIZE.value,
+      embedding_width=_HIDDEN_SIZE.value,
+      encoder_layer=seq2seq_transformer.TransformerEncoder(**kwargs),
+      decoder_layer=seq2seq_transformer.TransformerDecoder(**kwargs))
+  model(dict(inputs=tf.ones([1, 2], tf.int32), targets=tf.ones([1, 2],
+                                                                 tf.int32)))
+  if checkpoint:
+    tf.train.Checkpoint(model=model).read(checkpoint).expect_partial()
+  return model
+
+
+def _initial_cache(decoder, inputs):
+  cache = decoder.initial_state(inputs.shape[0], inputs.shape[1])
+  cache.update(decoder.encode(inputs))
+  return cache
+
+
+def _time(decode_fn, inputs):
+  """Returns the median latency of `decode_fn` and its outputs."""
+  outputs = decode_fn(inputs)
+  latencies = []
+  for _ in range(_NUM_RUNS.value):
+    start = time.perf_counter()
+    outputs = decode_fn(inputs)
+    np.asarray(outputs[0])
+    latencies.append(time.perf_counter() - start)
+  return np.median(latencies), outputs
+
+
+def main(_):
+  num_draft_tokens = _NUM_DRAFT_TOKENS.value
+  max_decode_length = _MAX_DECODE_LENGTH.value
+  cache_length = max_decode_length + num_draft_tokens + 1
+  target = generation_engine.Seq2SeqTransformerDecoder(
+      _build_model(_NUM_LAYERS.value, _TARGET_CHECKPOINT.value), cache_length)
+  draft = generation_engine.Seq2SeqTransformerDecoder(
+      _build_model(_DRAFT_NUM_LAYERS.value, _DRAFT_CHECKPOINT.value),
+      cache_length)
+  inputs = tf.constant(
+      np.random.RandomState(0).randint(
+          2, _VOCAB_SIZE.value,
+          size=(_BATCH_SIZE.value, _INPUT_LENGTH.value)), tf.int32)
+  initial_ids = tf.zeros([_BATCH_SIZE.value], tf.int32)
+  kwargs = dict(
+      vocab_size=_VOCAB_SIZE.value,
+      max_decode_length=max_decode_length,
+      # An end of sequence id which is never decoded.
+      eos_id=-1,
+      padded_decode=True,
+      top_k=_TOP_K.value,
+      sample_temperature=1.0,
+      enable_greedy=_TOP_K.value <= 0)
+
+  def symbols_to_logits_fn(ids, i, cache):
+    logits, cache = target.decode(cache, ids,
+                                  tf.fill([tf.shape(ids)[0]], i))
+    return logits[:, 0], cache
+
+  baseline = sampling_module.SamplingModule(
+      symbols_to_logits_fn=symbols_to_logits_fn, **kwargs)
+  baseline_latency, _ = _time(
+      tf.function(lambda x: baseline.generate(
+          initial_ids, _initial_cache(target, x))), inputs)
+
+  num_target_calls = tf.Variable(0)
+
+  def target_logits_fn(ids, positions, cache):
+    num_target_calls.assign_add(1)
+    return target.decode(cache, ids, positions)
+
+  speculative = speculative_sampling_module.SpeculativeSamplingModule(
+      symbols_to_logits_fn=target_logits_fn,
+      draft_symbols_to_logits_fn=(
+          lambda ids, positions, cache: draft.decode(cache, ids, positions)),
+      num_draft_tokens=num_draft_tokens,
+      **kwargs)
+  speculative_latency, _ = _time(
+      tf.function(lambda x: speculative.generate(
+          initial_ids,
+          _initial_cache(target, x),
+          draft_initial_cache=_initial_cache(draft, x))), inputs)
+
+  tokens_per_call = max_decode_length * (_NUM_RUNS.value + 1) / int(
+      num_target_calls.numpy())
+  logging.info('target model           %8.2f ms/token',
+               1000 * baseline_latency / max_decode_length)
+  logging.info('speculative decoding   %8.2f ms/token  %.2f tokens per '
+               'target call', 1000 * speculative_latency / max_decode_length,
+               tokens_per_call)
+
+
+if __name__ == '__main__':
+  app.run(main)
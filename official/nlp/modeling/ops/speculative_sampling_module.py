@@ -0,0 +1,349 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Speculative decoding for greedy, top_k and top_p decoding.
+
+A cheap draft model proposes `num_draft_tokens` tokens, one at a time, and the
+target model scores all of them in one call. The proposals are accepted with
+probability `min(1, p(x) / q(x))`, where `p` and `q` are the target and draft
+sampling distributions, and the first rejected token is resampled from the
+normalized `max(0, p - q)`. The decoded sequences then have exactly the
+distribution of sampling from the target model alone, see "Fast Inference
+from Transformers via Speculative Decoding", Leviathan et al., 2023. With
+greedy decoding, the proposals are accepted while they match the target
+model's argmax, so the outputs are those of greedy decoding with the target
+model.
+"""
+
+from typing import Any, Callable, Dict, Optional, Tuple
+
+import tensorflow as tf, tf_keras
+
+from official.nlp.modeling.ops import decoding_module
+from official.nlp.modeling.ops import sampling_module
+
+# The number of tokens of every sequence, starting with the initial id.
+_LENGTHS = "LENGTHS"
+# The cache of the draft model.
+_DRAFT_CACHE = "DRAFT_CACHE"
+
+# (ids, positions, cache) -> (logits, cache), see `SpeculativeSamplingModule`.
+PositionalSymbolsToLogitsFn = Callable[
+    [tf.Tensor, tf.Tensor, Dict[str, Any]], Tuple[tf.Tensor, Dict[str, Any]]]
+
+
+class SpeculativeSamplingModule(sampling_module.SamplingModule):
+  """Speculative decoding with a draft model.
+
+  Every decoding step runs the draft model `num_draft_tokens + 1` times and
+  the target model once, and adds between 1 and `num_draft_tokens + 1` tokens
+  to every sequence. As the sequences of a batch grow at different speeds,
+  the model functions get the position of every sequence:
+
+    logits, cache = symbols_to_logits_fn(ids, positions, cache)
+
+  where `ids` is an int tensor with shape [batch_size, length], the tokens of
+  every sequence from position `positions[b]` on, and `logits` is a float
+  tensor with shape [batch_size, length, vocab_size], the logits of the tokens
+  following every token of `ids`. The functions must write the decoder states
+  of these positions into the cache and attend to the positions up to their
+  own: the states of the positions after them are stale, from rejected
+  proposals. The caches therefore have a fixed length, of at least
+  `max_decode_length + num_draft_tokens + 1` positions, see e.g. the in place
+  updates of `CachedAttention`.
+  """
+
+  def __init__(self,
+               symbols_to_logits_fn: PositionalSymbolsToLogitsFn,
+               draft_symbols_to_logits_fn: PositionalSymbolsToLogitsFn,
+               num_draft_tokens: int,
+               vocab_size: int,
+               max_decode_length: int,
+               eos_id: int,
+               padded_decode: bool,
+               length_normalization_fn: Optional[Callable[[int, tf.DType],
+                                                          float]] = None,
+               top_k=0,
+               top_p=1.0,
+               sample_temperature=0.0,
+               enable_greedy: bool = True,
+               dtype: tf.DType = tf.float32,
+               decoding_name: Optional[str] = None):
+    """Initializes the speculative sampling module.
+
+    Args:
+      symbols_to_logits_fn: the function of the target model, see the class
+        docstring.
+      draft_symbols_to_logits_fn: the function of the draft model.
+      num_draft_tokens: the number of tokens proposed by the draft model at
+        every step.
+      vocab_size: the size of the vocabulary.
+      max_decode_length: the maximum number of decoded tokens.
+      eos_id: the end of sequence id.
+      padded_decode: whether the outputs have `max_decode_length + 1`
+        positions, rather than the length of the longest sequence.
+      length_normalization_fn: see `SamplingModule`.
+      top_k: see `SamplingModule`.
+      top_p: see `SamplingModule`.
+      sample_temperature: see `SamplingModule`.
+      enable_greedy: see `SamplingModule`.
+      dtype: see `SamplingModule`.
+      decoding_name: see `SamplingModule`.
+    """
+    if num_draft_tokens < 1:
+      raise ValueError("`num_draft_tokens` must be positive, got %d." %
+                       num_draft_tokens)
+    super().__init__(
+        symbols_to_logits_fn=symbols_to_logits_fn,
+        vocab_size=vocab_size,
+        max_decode_length=max_decode_length,
+        eos_id=eos_id,
+        padded_decode=padded_decode,
+        length_normalization_fn=length_normalization_fn,
+        top_k=top_k,
+        top_p=top_p,
+        sample_temperature=sample_temperature,
+        enable_greedy=enable_greedy,
+        dtype=dtype,
+        decoding_name=decoding_name)
+    self.draft_symbols_to_logits_fn = draft_symbols_to_logits_fn
+    self.num_draft_tokens = num_draft_tokens
+
+  def generate(  # pytype: disable=signature-mismatch
+      self,
+      initial_ids: tf.Tensor,
+      initial_cache: Dict[str, tf.Tensor],
+      initial_log_probs: Optional[tf.Tensor] = None,
+      draft_initial_cache: Optional[Dict[str, tf.Tensor]] = None
+  ) -> decoding_module.Output:
+    """Decodes with speculative decoding.
+
+    Args:
+      initial_ids: initial ids, int tensor with shape [batch_size].
+      initial_cache: the cache of the target model.
+      initial_log_probs: optional initial log probs with shape [batch_size,
+        1].
+      draft_initial_cache: the cache of the draft model.
+
+    Returns:
+      Tuple of tensors representing
+        finished_sequence: shape [batch, max_seq_length]
+        finished_scores: [batch, 1]
+    """
+    if draft_initial_cache is None:
+      raise ValueError("Speculative decoding needs `draft_initial_cache`.")
+    batch_size = (
+        initial_ids.shape.as_list()[0]
+        if self.padded_decode else tf.shape(initial_ids)[0])
+    # Room for the tokens written past `max_decode_length` by the last step.
+    buffer_length = self.max_decode_length + self.num_draft_tokens + 2
+    alive_seq = tf.pad(
+        tf.expand_dims(initial_ids, -1), [[0, 0], [0, buffer_length - 1]])
+    if initial_log_probs is None:
+      initial_log_probs = tf.zeros([batch_size, 1], self.dtype)
+
+    state = {
+        decoding_module.StateKeys.CUR_INDEX: tf.constant(0),
+        decoding_module.StateKeys.ALIVE_SEQ: alive_seq,
+        decoding_module.StateKeys.ALIVE_LOG_PROBS: initial_log_probs,
+        decoding_module.StateKeys.ALIVE_CACHE: initial_cache,
+        decoding_module.StateKeys.FINISHED_FLAGS: tf.zeros([batch_size, 1],
+                                                           tf.bool),
+        _LENGTHS: tf.ones([batch_size], tf.int32),
+        _DRAFT_CACHE: draft_initial_cache,
+    }
+    state_shapes = tf.nest.map_structure(lambda x: x.get_shape(), state)
+    if not self.padded_decode:
+      for key in (decoding_module.StateKeys.ALIVE_SEQ,
+                  decoding_module.StateKeys.ALIVE_LOG_PROBS,
+                  decoding_module.StateKeys.FINISHED_FLAGS, _LENGTHS):
+        state_shapes[key] = tf.TensorShape([None] + state_shapes[key][1:])
+
+    final_state = tf.nest.map_structure(
+        tf.stop_gradient,
+        tf.while_loop(
+            self._continue_speculating,
+            lambda state: [self._speculate(state)],
+            loop_vars=[state],
+            shape_invariants=[state_shapes],
+            parallel_iterations=1,
+            name=self.decoding_name))[0]
+    return self._process_speculative_state(final_state)
+
+  def _next_draft_ids(self, logits: tf.Tensor) -> Tuple[tf.Tensor, tf.Tensor]:
+    """Returns the proposed ids and their sampling distribution."""
+    if self.enable_greedy:
+      return tf.argmax(logits, axis=-1, output_type=tf.int32), None
+    sampling_logits = self._sampling_logits(logits)
+    ids = tf.random.categorical(sampling_logits, 1, dtype=tf.int32)[:, 0]
+    return ids, tf.nn.softmax(sampling_logits)
+
+  def _verify(self, draft_ids: tf.Tensor, draft_probs: Optional[tf.Tensor],
+              target_logits: tf.Tensor) -> Tuple[tf.Tensor, tf.Tensor]:
+    """Accepts a prefix of the proposals.
+
+    Args:
+      draft_ids: the proposed ids, [batch_size, num_draft_tokens].
+      draft_probs: the draft sampling distributions, [batch_size,
+        num_draft_tokens, vocab_size], or None for greedy decoding.
+      target_logits: the target logits of the positions of the proposals and
+        of the next one, [batch_size, num_draft_tokens + 1, vocab_size].
+
+    Returns:
+      The number of accepted proposals of every sequence and the id following
+      them, sampled from the residual distribution or, if all the proposals
+      are accepted, from the target distribution.
+    """
+    num_draft_tokens = self.num_draft_tokens
+    if self.enable_greedy:
+      target_ids = tf.argmax(target_logits, axis=-1, output_type=tf.int32)
+      accepted = tf.equal(draft_ids, target_ids[:, :num_draft_tokens])
+    else:
+      target_shape = tf.shape(target_logits)
+      target_probs = tf.reshape(
+          tf.nn.softmax(
+              self._sampling_logits(
+                  tf.reshape(target_logits, [-1, target_shape[-1]]))),
+          target_shape)
+      p = tf.gather(
+          target_probs[:, :num_draft_tokens], draft_ids, batch_dims=2)
+      q = tf.gather(draft_probs, draft_ids, batch_dims=2)
+      # Accepts with probability min(1, p / q).
+      accepted = tf.random.uniform(tf.shape(q)) * q < p
+    num_accepted = tf.reduce_sum(
+        tf.math.cumprod(tf.cast(accepted, tf.int32), axis=1), axis=1)
+    if self.enable_greedy:
+      return num_accepted, tf.gather(target_ids, num_accepted, batch_dims=1)
+
+    # After `num_draft_tokens` accepted proposals, `q` is zero.
+    residual_probs = tf.gather(
+        tf.nn.relu(target_probs -
+                   tf.pad(draft_probs, [[0, 0], [0, 1], [0, 0]])),
+        num_accepted,
+        batch_dims=1)
+    next_target_probs = tf.gather(target_probs, num_accepted, batch_dims=1)
+    residual_probs = tf.where(
+        tf.reduce_sum(residual_probs, axis=-1, keepdims=True) > 0,
+        residual_probs, next_target_probs)
+    next_ids = tf.random.categorical(
+        tf.math.log(residual_probs), 1, dtype=tf.int32)[:, 0]
+    return num_accepted, next_ids
+
+  def _speculate(self, state: Dict[str, Any]) -> Dict[str, Any]:
+    """Proposes, verifies and appends the tokens of one decoding step."""
+    alive_seq = state[decoding_module.StateKeys.ALIVE_SEQ]
+    lengths = state[_LENGTHS]
+    finished_flags = state[decoding_module.StateKeys.FINISHED_FLAGS][:, 0]
+    draft_cache = state[_DRAFT_CACHE]
+    num_draft_tokens = self.num_draft_tokens
+    positions = lengths - 1
+    last_ids = tf.gather(alive_seq, positions, batch_dims=1)
+
+    # The draft model also runs on its last proposal, so that its cache is
+    # complete when all the proposals are accepted.
+    ids = last_ids
+    draft_ids, draft_probs = [], []
+    for i in range(num_draft_tokens + 1):
+      draft_logits, draft_cache = self.draft_symbols_to_logits_fn(
+          ids[:, None], positions + i, draft_cache)
+      if i == num_draft_tokens:
+        break
+      ids, probs = self._next_draft_ids(tf.cast(draft_logits[:, 0],
+                                                tf.float32))
+      draft_ids.append(ids)
+      draft_probs.append(probs)
+    draft_ids = tf.stack(draft_ids, axis=1)
+    draft_probs = None if self.enable_greedy else tf.stack(draft_probs, axis=1)
+
+    target_logits, target_cache = self.symbols_to_logits_fn(
+        tf.concat([last_ids[:, None], draft_ids], axis=1), positions,
+        state[decoding_module.StateKeys.ALIVE_CACHE])
+    target_logits = tf.cast(target_logits, tf.float32)
+    num_accepted, next_ids = self._verify(draft_ids, draft_probs,
+                                          target_logits)
+
+    steps = tf.range(num_draft_tokens + 1)[None, :]
+    new_ids = tf.where(steps < num_accepted[:, None],
+                       tf.pad(draft_ids, [[0, 0], [0, 1]]), next_ids[:, None])
+    num_new = tf.minimum(num_accepted + 1, self.max_decode_length + 1 - lengths)
+    is_eos = tf.logical_and(
+        tf.equal(new_ids, self.eos_id), steps < num_new[:, None])
+    has_eos = tf.reduce_any(is_eos, axis=1)
+    num_new = tf.where(
+        has_eos,
+        tf.argmax(tf.cast(is_eos, tf.int32), axis=1, output_type=tf.int32) + 1,
+        num_new)
+    num_new = tf.where(finished_flags, 0, num_new)
+
+    new_log_probs = tf.gather(
+        decoding_module.log_prob_from_logits(target_logits),
+        new_ids,
+        batch_dims=2)
+    new_log_probs = tf.reduce_sum(
+        tf.where(steps < num_new[:, None], new_log_probs,
+                 tf.zeros_like(new_log_probs)),
+        axis=1)
+    # Writes all the candidates, only the first `num_new` ones are kept.
+    write_positions = lengths[:, None] + steps
+    write_indices = tf.stack(
+        [tf.broadcast_to(tf.range(tf.shape(lengths)[0])[:, None],
+                         tf.shape(write_positions)), write_positions],
+        axis=-1)
+    return {
+        decoding_module.StateKeys.CUR_INDEX:
+            state[decoding_module.StateKeys.CUR_INDEX] + 1,
+        decoding_module.StateKeys.ALIVE_SEQ:
+            tf.tensor_scatter_nd_update(alive_seq, write_indices, new_ids),
+        decoding_module.StateKeys.ALIVE_LOG_PROBS:
+            state[decoding_module.StateKeys.ALIVE_LOG_PROBS] +
+            tf.cast(new_log_probs[:, None], self.dtype),
+        decoding_module.StateKeys.ALIVE_CACHE:
+            target_cache,
+        decoding_module.StateKeys.FINISHED_FLAGS:
+            tf.logical_or(finished_flags, has_eos)[:, None],
+        _LENGTHS:
+            lengths + num_new,
+        _DRAFT_CACHE:
+            draft_cache,
+    }
+
+  def _continue_speculating(self, state: Dict[str, Any]) -> tf.Tensor:
+    alive = tf.logical_and(
+        tf.logical_not(state[decoding_module.StateKeys.FINISHED_FLAGS][:, 0]),
+        state[_LENGTHS] <= self.max_decode_length)
+    return tf.reduce_any(alive)
+
+  def _process_speculative_state(
+      self, state: Dict[str, Any]) -> decoding_module.Output:
+    """Returns the decoded sequences, padded with 0s, and their scores."""
+    lengths = state[_LENGTHS]
+    if self.padded_decode:
+      output_length = self.max_decode_length + 1
+    else:
+      output_length = tf.reduce_max(lengths)
+    seq = state[decoding_module.StateKeys.ALIVE_SEQ][:, :output_length]
+    seq *= tf.cast(
+        tf.range(output_length)[None, :] < lengths[:, None], seq.dtype)
+    scores = state[decoding_module.StateKeys.ALIVE_LOG_PROBS]
+    if self.length_normalization_fn is not None:
+      # As in `SamplingModule`, the unfinished sequences are normalized with
+      # `max_decode_length + 1`.
+      finished_flags = state[decoding_module.StateKeys.FINISHED_FLAGS]
+      length_norm = tf.where(
+          finished_flags,
+          self.length_normalization_fn(lengths[:, None] - 1, self.dtype),
+          self.length_normalization_fn(self.max_decode_length + 1,
+                                       self.dtype))
+      scores /= length_norm
+    return seq, scores
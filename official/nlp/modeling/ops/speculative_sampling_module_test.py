@@ -0,0 +1,160 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for speculative_sampling_module."""
+
+from absl.testing import parameterized
+import numpy as np
+import tensorflow as tf, tf_keras
+
+from official.nlp.modeling.ops import sampling_module
+from official.nlp.modeling.ops import speculative_sampling_module
+
+_VOCAB_SIZE = 6
+_NUM_DRAFT_TOKENS = 2
+
+
+def length_normalization(length, dtype):
+  return tf.pow(((5. + tf.cast(length, dtype)) / 6.), 0.6)
+
+
+def _bigram_logits(seed, noise=None, noise_seed=None):
+  """Returns the logits of a model of the next token given the last one."""
+  logits = np.random.RandomState(seed).normal(
+      size=(_VOCAB_SIZE, _VOCAB_SIZE)) * 2
+  if noise:
+    logits += np.random.RandomState(noise_seed).normal(
+        size=logits.shape) * noise
+  return tf.constant(logits, tf.float32)
+
+
+def _positional_logits_fn(table):
+  """Returns a speculative model function of a bigram model.
+
+  Like the caches of the decoders, the cache has a fixed length and the ids are
+  written at their positions.
+
+  Args:
+    table: the bigram logits.
+  """
+
+  def logits_fn(ids, positions, cache):
+    write_positions = positions[:, None] + tf.range(tf.shape(ids)[1])
+    rows = tf.broadcast_to(
+        tf.range(tf.shape(ids)[0])[:, None], tf.shape(write_positions))
+    cache = dict(
+        ids=tf.tensor_scatter_nd_update(
+            cache["ids"], tf.stack([rows, write_positions], axis=-1),
+            tf.cast(ids, tf.float32)))
+    return tf.gather(table, ids), cache
+
+  return logits_fn
+
+
+def _cache(batch_size, max_decode_length):
+  return dict(
+      ids=tf.zeros([batch_size, max_decode_length + _NUM_DRAFT_TOKENS + 1]))
+
+
+class SpeculativeSamplingModuleTest(tf.test.TestCase, parameterized.TestCase):
+
+  @parameterized.parameters(True, False)
+  def test_greedy_matches_sampling_module(self, padded_decode):
+    batch_size, max_decode_length, eos_id = 16, 7, 3
+    target = _bigram_logits(0)
+    draft = _bigram_logits(0, noise=3.0, noise_seed=1)
+    initial_ids = tf.range(batch_size) % _VOCAB_SIZE
+
+    def symbols_to_logits_fn(ids, i, cache):
+      del i
+      return tf.gather(target, ids[:, -1]), cache
+
+    expected_seq, expected_scores = sampling_module.SamplingModule(
+        symbols_to_logits_fn=symbols_to_logits_fn,
+        vocab_size=_VOCAB_SIZE,
+        max_decode_length=max_decode_length,
+        eos_id=eos_id,
+        padded_decode=False,
+        length_normalization_fn=length_normalization).generate(
+            initial_ids, _cache(batch_size, max_decode_length))
+
+    decoder = speculative_sampling_module.SpeculativeSamplingModule(
+        symbols_to_logits_fn=_positional_logits_fn(target),
+        draft_symbols_to_logits_fn=_positional_logits_fn(draft),
+        num_draft_tokens=_NUM_DRAFT_TOKENS,
+        vocab_size=_VOCAB_SIZE,
+        max_decode_length=max_decode_length,
+        eos_id=eos_id,
+        padded_decode=padded_decode,
+        length_normalization_fn=length_normalization)
+    seq, scores = tf.function(decoder.generate)(
+        initial_ids,
+        _cache(batch_size, max_decode_length),
+        draft_initial_cache=_cache(batch_size, max_decode_length))
+
+    if padded_decode:
+      expected_seq = tf.pad(
+          expected_seq,
+          [[0, 0], [0, max_decode_length + 1 - expected_seq.shape[1]]])
+    self.assertAllEqual(seq, expected_seq)
+    self.assertAllClose(scores, expected_scores)
+
+  @parameterized.named_parameters(("top_k", 3, 1.0), ("top_p", 0, 0.7))
+  def test_sampling_distribution(self, top_k, top_p):
+    batch_size, max_decode_length = 20000, 3
+    target = _bigram_logits(2)
+    draft = _bigram_logits(2, noise=2.0, noise_seed=3)
+    decoder = speculative_sampling_module.SpeculativeSamplingModule(
+        symbols_to_logits_fn=_positional_logits_fn(target),
+        draft_symbols_to_logits_fn=_positional_logits_fn(draft),
+        num_draft_tokens=_NUM_DRAFT_TOKENS,
+        vocab_size=_VOCAB_SIZE,
+        max_decode_length=max_decode_length,
+        # Never decoded.
+        eos_id=-1,
+        padded_decode=True,
+        top_k=top_k,
+        top_p=top_p,
+        sample_temperature=1.0,
+        enable_greedy=False)
+    tf.random.set_seed(0)
+    seq, _ = tf.function(decoder.generate)(
+        tf.zeros([batch_size], tf.int32),
+        _cache(batch_size, max_decode_length),
+        draft_initial_cache=_cache(batch_size, max_decode_length))
+
+    # The sampling distributions of the target model given the last token.
+    transitions = tf.nn.softmax(decoder._sampling_logits(target)).numpy()
+    expected = transitions[0]
+    for i in range(1, max_decode_length + 1):
+      frequencies = np.bincount(
+          seq[:, i].numpy(), minlength=_VOCAB_SIZE) / batch_size
+      self.assertAllClose(frequencies, expected, atol=0.015)
+      expected = expected @ transitions
+
+  def test_requires_draft_cache(self):
+    decoder = speculative_sampling_module.SpeculativeSamplingModule(
+        symbols_to_logits_fn=_positional_logits_fn(_bigram_logits(0)),
+        draft_symbols_to_logits_fn=_positional_logits_fn(_bigram_logits(1)),
+        num_draft_tokens=_NUM_DRAFT_TOKENS,
+        vocab_size=_VOCAB_SIZE,
+        max_decode_length=4,
+        eos_id=1,
+        padded_decode=False)
+    with self.assertRaisesRegex(ValueError, "draft_initial_cache"):
+      decoder.generate(tf.zeros([2], tf.int32), _cache(2, 4))
+
+
+if __name__ == "__main__":
+  tf.test.main()
@@ -0,0 +1,560 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""A local generation engine with continuous batching.
+
+The `serve_text` function of the `Translation` export module decodes a fixed
+batch until all its sequences are finished, so the finished sequences and the
+requests arriving in the meantime wait for the longest one. The
+`GenerationEngine` instead decodes a fixed number of slots, one token at a
+time, and at every step it evicts the finished sequences and admits the
+waiting requests into the free slots.
+
+Every slot decodes at its own position, see `SlotDecoder`. Decoding is greedy.
+
+Example:
+
+```
+engine = generation_engine.GenerationEngine(
+    generation_engine.Seq2SeqTransformerDecoder(model, max_decode_length=64),
+    num_slots=32, max_input_length=64, eos_id=1)
+engine.start()
+output_ids = engine.submit([5, 6, 7, 1]).result()
+# Or, from a coroutine:
+output_ids = await engine.generate([5, 6, 7, 1])
+```
+"""
+
+import abc
+import asyncio
+import collections
+import concurrent.futures
+import dataclasses
+import http.server
+import json
+import threading
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from absl import logging
+import numpy as np
+import tensorflow as tf, tf_keras
+
+from official.nlp.modeling.models import seq2seq_transformer
+from official.nlp.modeling.models import t5
+
+
+class SlotDecoder(metaclass=abc.ABCMeta):
+  """Decodes a batch of independent sequences, each at its own position.
+
+  The decoding state is a dictionary of tensors, whose first dimension is the
+  slot. Admitting a sequence into a slot writes the encoded inputs of the
+  sequence to the slot and zeros the other state tensors of the slot.
+  """
+
+  @property
+  @abc.abstractmethod
+  def max_decode_length(self) -> int:
+    """The maximum number of decoded tokens of a sequence."""
+
+  @abc.abstractmethod
+  def initial_state(self, num_slots: int,
+                    max_input_length: int) -> Dict[str, tf.Tensor]:
+    """Returns the initial decoding state of all the slots."""
+
+  @abc.abstractmethod
+  def encode(self, inputs: tf.Tensor) -> Dict[str, tf.Tensor]:
+    """Encodes the inputs of the sequences admitted into slots.
+
+    Args:
+      inputs: int tensor with shape [batch_size, max_input_length], padded
+        with 0.
+
+    Returns:
+      The state of the admitted sequences, for a subset of the keys of
+      `initial_state`.
+    """
+
+  @abc.abstractmethod
+  def step(self, state: Dict[str, tf.Tensor], ids: tf.Tensor,
+           positions: tf.Tensor) -> Tuple[tf.Tensor, Dict[str, tf.Tensor]]:
+    """Decodes one token of every slot.
+
+    Args:
+      state: the decoding state.
+      ids: int tensor with shape [num_slots], the last token of every slot.
+      positions: int tensor with shape [num_slots], the position of `ids`.
+
+    Returns:
+      The logits of the next token, a float tensor with shape [num_slots,
+      vocab_size], and the new decoding state.
+    """
+
+
+class Seq2SeqTransformerDecoder(SlotDecoder):
+  """Decodes with a `Seq2SeqTransformer`.
+
+  The self-attention caches have `max_decode_length` positions and are
+  updated in place at the position of every slot, see `CachedAttention`.
+  """
+
+  def __init__(self, model: seq2seq_transformer.Seq2SeqTransformer,
+               max_decode_length: int):
+    self._model = model
+    self._max_decode_length = max_decode_length
+    self._timing_signal = tf.cast(
+        model.position_embedding(inputs=None, length=max_decode_length),
+        model.compute_dtype)
+
+  @property
+  def max_decode_length(self) -> int:
+    return self._max_decode_length
+
+  def initial_state(self, num_slots, max_input_length):
+    decoder_layer = self._model.decoder_layer
+    num_heads = decoder_layer.num_attention_heads
+    embedding_width = self._model.embedding_lookup.embedding_width
+    dtype = self._model.compute_dtype
+    cache_shape = [
+        num_slots, self._max_decode_length, num_heads,
+        embedding_width // num_heads
+    ]
+    state = {
+        "encoder_outputs":
+            tf.zeros([num_slots, max_input_length, embedding_width], dtype),
+        "input_mask":
+            tf.zeros([num_slots, max_input_length], dtype),
+    }
+    for layer in range(decoder_layer.num_layers):
+      state["key_%d" % layer] = tf.zeros(cache_shape, dtype)
+      state["value_%d" % layer] = tf.zeros(cache_shape, dtype)
+    return state
+
+  def encode(self, inputs):
+    model = self._model
+    boolean_mask = tf.not_equal(inputs, 0)
+    embedded_inputs = model.embedding_lookup(inputs)
+    embedded_inputs *= tf.expand_dims(
+        tf.cast(boolean_mask, embedded_inputs.dtype), -1)
+    pos_encoding = tf.cast(
+        model.position_embedding(embedded_inputs), embedded_inputs.dtype)
+    attention_mask = tf.cast(
+        tf.expand_dims(boolean_mask, axis=1), inputs.dtype) * tf.ones_like(
+            tf.expand_dims(inputs, axis=-1))
+    encoder_outputs = model.encoder_layer(
+        embedded_inputs + pos_encoding, attention_mask=attention_mask)
+    return {
+        "encoder_outputs": tf.cast(encoder_outputs, model.compute_dtype),
+        "input_mask": tf.cast(boolean_mask, model.compute_dtype),
+    }
+
+  def step(self, state, ids, positions):
+    logits, state = self.decode(state, ids[:, None], positions)
+    return logits[:, 0], state
+
+  def decode(
+      self, state: Dict[str, tf.Tensor], ids: tf.Tensor,
+      positions: tf.Tensor) -> Tuple[tf.Tensor, Dict[str, tf.Tensor]]:
+    """Decodes several consecutive tokens of every slot in one pass.
+
+    Args:
+      state: the decoding state.
+      ids: int tensor with shape [num_slots, length], the tokens of every slot
+        from its position on.
+      positions: int tensor with shape [num_slots], the position of the first
+        token of `ids`.
+
+    Returns:
+      The logits of the tokens following `ids`, a float tensor with shape
+      [num_slots, length, vocab_size], and the new decoding state.
+    """
+    model = self._model
+    state = dict(state)
+    num_slots = tf.shape(ids)[0]
+    length = tf.shape(ids)[1]
+    token_positions = positions[:, None] + tf.range(length)
+    decoder_input = model.embedding_lookup(ids)
+    decoder_input += tf.gather(self._timing_signal, token_positions)
+    # Every token attends to the positions of its slot up to its own.
+    self_attention_mask = tf.cast(
+        tf.range(self._max_decode_length)[None, None, :] <=
+        token_positions[:, :, None], model.compute_dtype)
+    cross_attention_mask = tf.tile(state["input_mask"][:, None, :],
+                                   [1, length, 1])
+    # The caches are not reordered: every slot reads its own row.
+    row_indices = tf.tile(
+        tf.range(num_slots)[:, None], [1, self._max_decode_length])
+    cache = {}
+    for layer in range(model.decoder_layer.num_layers):
+      cache[str(layer)] = {
+          "key": state["key_%d" % layer],
+          "value": state["value_%d" % layer],
+          "row_indices": row_indices,
+      }
+    decoder_outputs = model.decoder_layer(
+        decoder_input,
+        state["encoder_outputs"],
+        self_attention_mask=self_attention_mask,
+        cross_attention_mask=cross_attention_mask,
+        cache=cache,
+        decode_loop_step=positions)
+    for layer in range(model.decoder_layer.num_layers):
+      state["key_%d" % layer] = cache[str(layer)]["key"]
+      state["value_%d" % layer] = cache[str(layer)]["value"]
+    embeddings = tf.cast(model.embedding_lookup.embeddings,
+                         model.compute_dtype)
+    logits = tf.einsum("bld,vd->blv",
+                       tf.cast(decoder_outputs, model.compute_dtype),
+                       embeddings)
+    return tf.cast(logits, tf.float32), state
+
+
+class T5TransformerDecoder(SlotDecoder):
+  """Decodes with a `T5Transformer`."""
+
+  def __init__(self, model: t5.T5Transformer, max_decode_length: int):
+    self._model = model
+    self._max_decode_length = max_decode_length
+
+  @property
+  def max_decode_length(self) -> int:
+    return self._max_decode_length
+
+  def initial_state(self, num_slots, max_input_length):
+    config = self._model.decoder_cfg
+    dtype = self._model.compute_dtype
+    cache_shape = [
+        num_slots, self._max_decode_length, config.num_heads, config.d_kv
+    ]
+    state = {
+        "encoded":
+            tf.zeros([num_slots, max_input_length, config.d_model], dtype),
+        "encoder_input_tokens":
+            tf.zeros([num_slots, max_input_length], tf.int32),
+    }
+    for layer in range(config.num_decoder_layers):
+      state["key_%d" % layer] = tf.zeros(cache_shape, dtype)
+      state["value_%d" % layer] = tf.zeros(cache_shape, dtype)
+    return state
+
+  def encode(self, inputs):
+    encoded = self._model.encode(encoder_input_tokens=inputs)
+    if self._model.config.return_attention_scores:
+      encoded, _ = encoded
+    return {
+        "encoded": tf.cast(encoded, self._model.compute_dtype),
+        "encoder_input_tokens": tf.cast(inputs, tf.int32),
+    }
+
+  def step(self, state, ids, positions):
+    model = self._model
+    state = dict(state)
+    dtype = model.compute_dtype
+    # Every slot attends to the positions it has decoded so far.
+    decoder_mask = tf.cast(
+        tf.range(self._max_decode_length)[None, :] <= positions[:, None],
+        dtype)
+    encoder_decoder_mask = tf.cast(
+        tf.not_equal(state["encoder_input_tokens"], 0), dtype)
+    cache = {}
+    for layer in range(model.decoder_cfg.num_decoder_layers):
+      cache[layer] = {
+          "key": state["key_%d" % layer],
+          "value": state["value_%d" % layer],
+      }
+    outputs = model.decoder(
+        ids[:, None],
+        state["encoded"],
+        decoder_mask=(1.0 - decoder_mask[:, None, None, :]) * -1e9,
+        encoder_decoder_mask=(
+            1.0 - encoder_decoder_mask[:, None, None, :]) * -1e9,
+        decode_position=positions,
+        cache=cache,
+        max_decode_len=self._max_decode_length,
+        decode=True)
+    for layer, layer_cache in outputs["cache"].items():
+      state["key_%d" % layer] = layer_cache["key"]
+      state["value_%d" % layer] = layer_cache["value"]
+    return tf.cast(outputs["logits"][:, 0], tf.float32), state
+
+
+@dataclasses.dataclass
+class _Request:
+  input_ids: List[int]
+  max_new_tokens: int
+  future: concurrent.futures.Future
+  output_ids: List[int] = dataclasses.field(default_factory=list)
+
+
+class GenerationEngine:
+  """Generates sequences with continuous batching.
+
+  `step` admits the waiting requests into the free slots, decodes one token of
+  every slot and completes the finished requests. `start` runs the steps in a
+  background thread, while `submit` and `generate` may be called from any
+  thread.
+  """
+
+  def __init__(self,
+               decoder: SlotDecoder,
+               num_slots: int,
+               max_input_length: int,
+               eos_id: int,
+               start_id: int = 0,
+               continuous_batching: bool = True):
+    """Initializes the engine.
+
+    Args:
+      decoder: the `SlotDecoder` of the model.
+      num_slots: the number of sequences decoded together.
+      max_input_length: the maximum length of the inputs.
+      eos_id: the id of the end of sequence token.
+      start_id: the id of the first decoder input token.
+      continuous_batching: whether to admit requests at every step. Otherwise
+        requests are only admitted once all the slots are free, as with
+        static batches, which is useful as a baseline.
+    """
+    self._decoder = decoder
+    self._num_slots = num_slots
+    self._max_input_length = max_input_length
+    self._eos_id = eos_id
+    self._start_id = start_id
+    self._continuous_batching = continuous_batching
+
+    self._state = decoder.initial_state(num_slots, max_input_length)
+    self._ids = np.full([num_slots], start_id, np.int32)
+    self._positions = np.zeros([num_slots], np.int32)
+    self._slots: List[Optional[_Request]] = [None] * num_slots
+    self._waiting: Deque[_Request] = collections.deque()
+    self._condition = threading.Condition()
+    self._thread = None
+    self._stopped = False
+    self._admit_fn = tf.function(self._admit, reduce_retracing=True)
+    self._step_fn = tf.function(self._step)
+
+  @property
+  def num_active(self) -> int:
+    """The number of slots decoding a sequence."""
+    return sum(request is not None for request in self._slots)
+
+  def submit(self,
+             input_ids: Sequence[int],
+             max_new_tokens: Optional[int] = None) -> concurrent.futures.Future:
+    """Submits a request.
+
+    Args:
+      input_ids: the input token ids, usually ending with `eos_id`.
+      max_new_tokens: the maximum number of tokens to generate. Defaults to
+        the `max_decode_length` of the decoder.
+
+    Returns:
+      A future of the generated token ids, without the end of sequence token.
+
+    Raises:
+      ValueError: if the request does not fit into a slot.
+    """
+    if not input_ids or len(input_ids) > self._max_input_length:
+      raise ValueError("The number of input ids must be between 1 and %d, got "
+                       "%d." % (self._max_input_length, len(input_ids)))
+    max_decode_length = self._decoder.max_decode_length
+    max_new_tokens = max_new_tokens or max_decode_length
+    if max_new_tokens > max_decode_length:
+      raise ValueError("`max_new_tokens`, %d, must not be larger than the "
+                       "maximum decoding length, %d." %
+                       (max_new_tokens, max_decode_length))
+    future = concurrent.futures.Future()
+    with self._condition:
+      self._waiting.append(
+          _Request(list(input_ids), max_new_tokens, future))
+      self._condition.notify()
+    return future
+
+  async def generate(self,
+                     input_ids: Sequence[int],
+                     max_new_tokens: Optional[int] = None) -> List[int]:
+    """Generates the token ids of a request, see `submit`."""
+    return await asyncio.wrap_future(self.submit(input_ids, max_new_tokens))
+
+  def start(self):
+    """Starts decoding the requests in a background thread."""
+    if self._thread is not None:
+      raise ValueError("The engine is already started.")
+    self._stopped = False
+    self._thread = threading.Thread(target=self._run, daemon=True)
+    self._thread.start()
+
+  def stop(self):
+    """Stops the background thread, once the current step is done."""
+    with self._condition:
+      self._stopped = True
+      self._condition.notify()
+    if self._thread is not None:
+      self._thread.join()
+      self._thread = None
+
+  def step(self) -> int:
+    """Runs one decoding step.
+
+    Returns:
+      The number of slots decoded at this step.
+    """
+    self._admit_waiting()
+    num_active = self.num_active
+    if not num_active:
+      return 0
+    next_ids, self._state = self._step_fn(self._state, self._ids,
+                                          self._positions)
+    next_ids = next_ids.numpy()
+    for slot, request in enumerate(self._slots):
+      if request is None:
+        continue
+      next_id = int(next_ids[slot])
+      self._ids[slot] = next_id
+      self._positions[slot] += 1
+      if next_id != self._eos_id:
+        request.output_ids.append(next_id)
+      if (next_id == self._eos_id or
+          len(request.output_ids) >= request.max_new_tokens):
+        # The free slots are still decoded, from a valid position.
+        self._slots[slot] = None
+        self._positions[slot] = 0
+        request.future.set_result(request.output_ids)
+    return num_active
+
+  def _admit(self, state, slots, inputs):
+    encoded = self._decoder.encode(inputs)
+    indices = slots[:, None]
+    new_state = {}
+    for key, value in state.items():
+      updates = encoded.get(key)
+      if updates is None:
+        updates = tf.zeros(
+            tf.concat([tf.shape(slots), tf.shape(value)[1:]], axis=0),
+            value.dtype)
+      new_state[key] = tf.tensor_scatter_nd_update(
+          value, indices, tf.cast(updates, value.dtype))
+    return new_state
+
+  def _step(self, state, ids, positions):
+    logits, state = self._decoder.step(state, ids, positions)
+    return tf.argmax(logits, axis=-1, output_type=tf.int32), state
+
+  def _admit_waiting(self):
+    """Moves the waiting requests into the free slots."""
+    free_slots = [
+        slot for slot, request in enumerate(self._slots) if request is None
+    ]
+    if not self._continuous_batching and len(free_slots) < self._num_slots:
+      return
+    admitted = []
+    with self._condition:
+      while free_slots and self._waiting:
+        request = self._waiting.popleft()
+        if request.future.set_running_or_notify_cancel():
+          admitted.append((free_slots.pop(0), request))
+    if not admitted:
+      return
+    slots = np.array([slot for slot, _ in admitted], np.int32)
+    inputs = np.zeros([len(admitted), self._max_input_length], np.int32)
+    for i, (slot, request) in enumerate(admitted):
+      inputs[i, :len(request.input_ids)] = request.input_ids
+      self._slots[slot] = request
+    self._state = self._admit_fn(self._state, slots, inputs)
+    self._ids[slots] = self._start_id
+    self._positions[slots] = 0
+
+  def _run(self):
+    """Runs the decoding steps until the engine is stopped."""
+    while True:
+      with self._condition:
+        while not (self._stopped or self._waiting or self.num_active):
+          self._condition.wait()
+        if self._stopped:
+          return
+      try:
+        self.step()
+      except Exception as e:  # pylint: disable=broad-except
+        logging.exception("Decoding step failed.")
+        self._fail_all(e)
+
+  def _fail_all(self, error: Exception):
+    """Fails the active and waiting requests."""
+    with self._condition:
+      requests = [request for request in self._slots if request is not None]
+      requests.extend(self._waiting)
+      self._waiting.clear()
+    self._slots = [None] * self._num_slots
+    for request in requests:
+      if not request.future.done():
+        request.future.set_exception(error)
+
+
+def create_http_server(engine: GenerationEngine,
+                       host: str = "localhost",
+                       port: int = 0,
+                       tokenizer: Optional[Any] = None
+                      ) -> http.server.ThreadingHTTPServer:
+  """Creates a local HTTP server of the engine, e.g. for load testing.
+
+  The server answers POST requests to `/generate` with a JSON body with either
+  `input_ids`, a list of ints, or `text`, a string tokenized with `tokenizer`,
+  and optionally `max_new_tokens`. The response has the generated
+  `output_ids` and, for `text` requests, the detokenized `text`.
+
+  Args:
+    engine: the started engine.
+    host: the host name.
+    port: the port, or 0 for any free port, see `server.server_address`.
+    tokenizer: an optional tokenizer with the `tokenize` and `detokenize`
+      methods of `tensorflow_text` tokenizers, e.g. the SentencePiece
+      tokenizer of the `Translation` export module.
+
+  Returns:
+    The server. Call `serve_forever` to serve the requests.
+  """
+
+  class Handler(http.server.BaseHTTPRequestHandler):
+    """Handles the generation requests."""
+
+    def do_POST(self):  # pylint: disable=invalid-name
+      if self.path != "/generate":
+        self.send_error(404)
+        return
+      try:
+        request = json.loads(
+            self.rfile.read(int(self.headers.get("Content-Length", 0))))
+        if "text" in request:
+          if tokenizer is None:
+            raise ValueError("The server has no tokenizer.")
+          input_ids = tokenizer.tokenize(request["text"]).numpy().tolist()
+        else:
+          input_ids = request["input_ids"]
+        future = engine.submit(input_ids, request.get("max_new_tokens"))
+      except (KeyError, TypeError, ValueError) as e:
+        self.send_error(400, str(e))
+        return
+      response = {"output_ids": future.result()}
+      if "text" in request:
+        response["text"] = tokenizer.detokenize(
+            response["output_ids"]).numpy().decode("utf-8")
+      body = json.dumps(response).encode("utf-8")
+      self.send_response(200)
+      self.send_header("Content-Type", "application/json")
+      self.send_header("Content-Length", str(len(body)))
+      self.end_headers()
+      self.wfile.write(body)
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+      logging.debug(format, *args)
+
+  return http.server.ThreadingHTTPServer((host, port), Handler)
@@ -0,0 +1,164 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+r"""Load tests the generation engine with a synthetic request stream.
+
+Sends requests with Poisson arrivals to a `GenerationEngine` of a randomly
+initialized `Seq2SeqTransformer`, once with static batches and once with
+continuous batching, either through the async API or through the local HTTP
+server. The number of generated tokens of every request is drawn from a
+log-normal distribution, as the random model has no meaningful end of
+sequence. Reports the p50 and p99 latencies and the throughput.
+
+Usage:
+
+  python -m official.nlp.serving.generation_engine_benchmark \
+    --num_requests=200 --request_rate=20 --num_slots=16
+"""
+
+import asyncio
+import json
+import threading
+import time
+import urllib.request
+
+from absl import app
+from absl import flags
+from absl import logging
+import numpy as np
+import tensorflow as tf, tf_keras
+
+from official.nlp.modeling.models import seq2seq_transformer
+from official.nlp.serving import generation_engine
+
+_NUM_REQUESTS = flags.DEFINE_integer('num_requests', 200,
+                                     'Number of requests.')
+_REQUEST_RATE = flags.DEFINE_float('request_rate', 20.0,
+                                   'Mean number of requests per second.')
+_NUM_SLOTS = flags.DEFINE_integer('num_slots', 16,
+                                  'Number of sequences decoded together.')
+_MAX_INPUT_LENGTH = flags.DEFINE_integer('max_input_length', 64,
+                                         'Maximum length of the inputs.')
+_MAX_DECODE_LENGTH = flags.DEFINE_integer('max_decode_length', 64,
+                                          'Maximum decoding length.')
+_MEAN_OUTPUT_LENGTH = flags.DEFINE_integer(
+    'mean_output_length', 16, 'Median number of generated tokens.')
+_NUM_LAYERS = flags.DEFINE_integer('num_layers', 2,
+                                   'Number of encoder and decoder layers.')
+_HIDDEN_SIZE = flags.DEFINE_integer('hidden_size', 256, 'Hidden size.')
+_VOCAB_SIZE = flags.DEFINE_integer('vocab_size', 8000, 'Vocabulary size.')
+_USE_HTTP = flags.DEFINE_boolean(
+    'use_http', False, 'Whether to send the requests to the HTTP server.')
+
+
+def _build_model():
+  kwargs = dict(
+      num_layers=_NUM_LAYERS.value,
+      num_attention_heads=8,
+      intermediate_size=4 * _HIDDEN_SIZE.value)
+  return seq2seq_transformer.Seq2SeqTransformer(
+      vocab_size=_VOCAB_SIZE.value,
+      embedding_width=_HIDDEN_SIZE.value,
+      encoder_layer=seq2seq_transformer.TransformerEncoder(**kwargs),
+      decoder_layer=seq2seq_transformer.TransformerDecoder(**kwargs))
+
+
+def _create_requests(rng):
+  """Returns the arrival times, inputs and output lengths of the requests."""
+  num_requests = _NUM_REQUESTS.value
+  arrival_times = np.cumsum(
+      rng.exponential(1.0 / _REQUEST_RATE.value, num_requests))
+  input_lengths = rng.integers(1, _MAX_INPUT_LENGTH.value + 1, num_requests)
+  inputs = [
+      rng.integers(2, _VOCAB_SIZE.value, length).tolist()
+      for length in input_lengths
+  ]
+  output_lengths = np.clip(
+      rng.lognormal(np.log(_MEAN_OUTPUT_LENGTH.value), 0.8, num_requests), 1,
+      _MAX_DECODE_LENGTH.value).astype(np.int64)
+  return arrival_times, inputs, output_lengths.tolist()
+
+
+def _post(url, input_ids, max_new_tokens):
+  request = urllib.request.Request(
+      url,
+      data=json.dumps(
+          dict(input_ids=input_ids, max_new_tokens=max_new_tokens)).encode(
+              'utf-8'))
+  with urllib.request.urlopen(request) as response:
+    return json.load(response)['output_ids']
+
+
+async def _send_requests(engine, url, requests):
+  """Sends the requests at their arrival times and returns the latencies."""
+  start = time.perf_counter()
+  loop = asyncio.get_running_loop()
+
+  async def send(arrival_time, input_ids, max_new_tokens):
+    await asyncio.sleep(arrival_time - (time.perf_counter() - start))
+    sent = time.perf_counter()
+    if url:
+      await loop.run_in_executor(None, _post, url, input_ids, max_new_tokens)
+    else:
+      await engine.generate(input_ids, max_new_tokens)
+    return time.perf_counter() - sent
+
+  latencies = await asyncio.gather(*[send(*r) for r in zip(*requests)])
+  return latencies, time.perf_counter() - start
+
+
+def _run(name, model, requests, continuous_batching):
+  """Serves the requests and logs the latencies and the throughput."""
+  engine = generation_engine.GenerationEngine(
+      generation_engine.Seq2SeqTransformerDecoder(model,
+                                                  _MAX_DECODE_LENGTH.value),
+      num_slots=_NUM_SLOTS.value,
+      max_input_length=_MAX_INPUT_LENGTH.value,
+      # An end of sequence id which is never decoded.
+      eos_id=-1,
+      continuous_batching=continuous_batching)
+  # Traces the decoding functions.
+  engine.submit([2], max_new_tokens=1)
+  engine.step()
+  engine.start()
+  url = None
+  if _USE_HTTP.value:
+    server = generation_engine.create_http_server(engine)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = 'http://localhost:%d/generate' % server.server_address[1]
+  try:
+    latencies, elapsed = asyncio.run(_send_requests(engine, url, requests))
+  finally:
+    if url:
+      server.shutdown()
+    engine.stop()
+  num_tokens = sum(requests[2])
+  logging.info(
+      '%-20s p50 %8.1f ms  p99 %8.1f ms  %8.1f requests/sec  %10.1f '
+      'tokens/sec', name, 1000 * np.percentile(latencies, 50),
+      1000 * np.percentile(latencies, 99), len(latencies) / elapsed,
+      num_tokens / elapsed)
+
+
+def main(_):
+  model = _build_model()
+  model(dict(inputs=tf.ones([1, 2], tf.int32), targets=tf.ones([1, 2],
+                                                                 tf.int32)))
+  requests = _create_requests(np.random.default_rng(0))
+  _run('static batching', model, requests, continuous_batching=False)
+  _run('continuous batching', model, requests, continuous_batching=True)
+
+
+if __name__ == '__main__':
+  app.run(main)
@@ -0,0 +1,172 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for official.nlp.serving.generation_engine."""
+
+import asyncio
+import json
+import threading
+import urllib.request
+
+from absl.testing import parameterized
+import numpy as np
+import tensorflow as tf, tf_keras
+
+from official.nlp.modeling.models import seq2seq_transformer
+from official.nlp.modeling.models import t5
+from official.nlp.serving import generation_engine
+
+_VOCAB_SIZE = 20
+_EOS_ID = 1
+_MAX_DECODE_LENGTH = 8
+
+
+def _create_requests(num_requests, max_input_length):
+  rng = np.random.RandomState(0)
+  return [
+      rng.randint(2, _VOCAB_SIZE, size=rng.randint(1, max_input_length + 1))
+      .tolist() for _ in range(num_requests)
+  ]
+
+
+def _greedy_decode(next_token_fn, max_new_tokens):
+  """Decodes one sequence greedily, without cache."""
+  output_ids = []
+  for _ in range(max_new_tokens):
+    next_id = next_token_fn(output_ids)
+    if next_id == _EOS_ID:
+      break
+    output_ids.append(next_id)
+  return output_ids
+
+
+def _build_seq2seq_transformer():
+  kwargs = dict(num_layers=2, num_attention_heads=2, intermediate_size=32)
+  return seq2seq_transformer.Seq2SeqTransformer(
+      vocab_size=_VOCAB_SIZE,
+      embedding_width=16,
+      encoder_layer=seq2seq_transformer.TransformerEncoder(**kwargs),
+      decoder_layer=seq2seq_transformer.TransformerDecoder(**kwargs),
+      eos_id=_EOS_ID)
+
+
+class GenerationEngineTest(tf.test.TestCase, parameterized.TestCase):
+
+  @parameterized.parameters(True, False)
+  def test_seq2seq_transformer(self, continuous_batching):
+    model = _build_seq2seq_transformer()
+    requests = _create_requests(7, max_input_length=6)
+
+    def next_token_fn(input_ids, output_ids):
+      logits = model(
+          dict(
+              inputs=tf.constant([input_ids]),
+              targets=tf.constant([output_ids + [0]])))
+      return int(tf.argmax(logits[0, len(output_ids)]))
+
+    engine = generation_engine.GenerationEngine(
+        generation_engine.Seq2SeqTransformerDecoder(model, _MAX_DECODE_LENGTH),
+        num_slots=3,
+        max_input_length=6,
+        eos_id=_EOS_ID,
+        continuous_batching=continuous_batching)
+    futures = [engine.submit(input_ids) for input_ids in requests]
+    while engine.step():
+      pass
+
+    for input_ids, future in zip(requests, futures):
+      expected = _greedy_decode(
+          lambda output_ids, x=input_ids: next_token_fn(x, output_ids),
+          _MAX_DECODE_LENGTH)
+      self.assertEqual(future.result(), expected)
+
+  def test_t5_transformer(self):
+    config = t5.T5TransformerParams(
+        num_layers=2,
+        d_model=8,
+        d_kv=4,
+        num_heads=2,
+        d_ff=16,
+        vocab_size=_VOCAB_SIZE,
+        shared_embedding=True)
+    model = t5.T5Transformer(config)
+    requests = _create_requests(5, max_input_length=6)
+
+    def next_token_fn(input_ids, output_ids):
+      outputs = model(
+          encoder_input_tokens=tf.constant([input_ids]),
+          decoder_input_tokens=tf.constant([[0] + output_ids]),
+          decoder_target_tokens=tf.ones([1, len(output_ids) + 1], tf.int32))
+      return int(tf.argmax(outputs["logits"][0, -1]))
+
+    engine = generation_engine.GenerationEngine(
+        generation_engine.T5TransformerDecoder(model, _MAX_DECODE_LENGTH),
+        num_slots=2,
+        max_input_length=6,
+        eos_id=_EOS_ID)
+    futures = [engine.submit(input_ids, max_new_tokens=5)
+               for input_ids in requests]
+    while engine.step():
+      pass
+
+    for input_ids, future in zip(requests, futures):
+      expected = _greedy_decode(
+          lambda output_ids, x=input_ids: next_token_fn(x, output_ids), 5)
+      self.assertEqual(future.result(), expected)
+
+  def test_submit_validation(self):
+    engine = generation_engine.GenerationEngine(
+        generation_engine.Seq2SeqTransformerDecoder(
+            _build_seq2seq_transformer(), _MAX_DECODE_LENGTH),
+        num_slots=2,
+        max_input_length=4,
+        eos_id=_EOS_ID)
+    with self.assertRaisesRegex(ValueError, "number of input ids"):
+      engine.submit([2] * 5)
+    with self.assertRaisesRegex(ValueError, "max_new_tokens"):
+      engine.submit([2], max_new_tokens=_MAX_DECODE_LENGTH + 1)
+
+  def test_async_and_http(self):
+    engine = generation_engine.GenerationEngine(
+        generation_engine.Seq2SeqTransformerDecoder(
+            _build_seq2seq_transformer(), _MAX_DECODE_LENGTH),
+        num_slots=2,
+        max_input_length=6,
+        eos_id=_EOS_ID)
+    engine.start()
+    self.addCleanup(engine.stop)
+    requests = _create_requests(4, max_input_length=6)
+
+    async def generate_all():
+      return await asyncio.gather(
+          *[engine.generate(input_ids, 4) for input_ids in requests])
+
+    outputs = asyncio.run(generate_all())
+    self.assertLen(outputs, 4)
+    for output_ids in outputs:
+      self.assertLessEqual(len(output_ids), 4)
+
+    server = generation_engine.create_http_server(engine)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    self.addCleanup(server.shutdown)
+    request = urllib.request.Request(
+        "http://localhost:%d/generate" % server.server_address[1],
+        data=json.dumps(
+            dict(input_ids=requests[0], max_new_tokens=4)).encode("utf-8"))
+    with urllib.request.urlopen(request) as response:
+      self.assertEqual(json.load(response)["output_ids"], outputs[0])
+
+
+if __name__ == "__main__":
+  tf.test.main()
@@ -23,6 +23,7 @@ import tensorflow_text as tf_text
 from official.core import export_base
 from official.modeling.hyperparams import base_config
 from official.nlp.data import sentence_prediction_dataloader
+from official.nlp.serving import generation_engine
 
 
 def features_to_int32(features: Dict[str, tf.Tensor]) -> Dict[str, tf.Tensor]:
@@ -445,6 +446,40 @@ class Translation(export_base.ExportModule):
     return self._sp_tokenizer.detokenize(
         self.serve({"inputs": tokenized})["outputs"])
 
+  @property
+  def tokenizer(self) -> tf_text.SentencepieceTokenizer:
+    return self._sp_tokenizer
+
+  def create_generation_engine(
+      self,
+      num_slots: int,
+      max_input_length: int,
+      max_decode_length: int,
+      continuous_batching: bool = True) -> generation_engine.GenerationEngine:
+    """Creates a continuous batching engine for online greedy translation.
+
+    Unlike `serve_text`, which decodes fixed batches with beam search, the
+    engine admits new requests into the decoding batch at every step, see
+    `generation_engine.GenerationEngine`. Serve it over HTTP with
+    `generation_engine.create_http_server(engine, tokenizer=self.tokenizer)`.
+
+    Args:
+      num_slots: the number of sequences decoded together.
+      max_input_length: the maximum number of input tokens.
+      max_decode_length: the maximum number of decoded tokens.
+      continuous_batching: see `generation_engine.GenerationEngine`.
+
+    Returns:
+      The engine, which is not started yet.
+    """
+    return generation_engine.GenerationEngine(
+        generation_engine.Seq2SeqTransformerDecoder(self.model,
+                                                    max_decode_length),
+        num_slots=num_slots,
+        max_input_length=max_input_length,
+        eos_id=self._eos_id,
+        continuous_batching=continuous_batching)
+
   def get_inference_signatures(self, function_keys: Dict[Text, Text]):
     signatures = {}
     valid_keys = ("serve_text")
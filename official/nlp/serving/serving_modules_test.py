@@ -14,7 +14,10 @@
 
 """Tests for nlp.serving.serving_modules."""
 
+import json
 import os
+import threading
+import urllib.request
 
 from absl.testing import parameterized
 import tensorflow as tf, tf_keras
@@ -23,6 +26,7 @@ from sentencepiece import SentencePieceTrainer
 from official.core import export_base
 from official.nlp.configs import bert
 from official.nlp.configs import encoders
+from official.nlp.serving import generation_engine
 from official.nlp.serving import serving_modules
 from official.nlp.tasks import masked_lm
 from official.nlp.tasks import question_answering
@@ -386,6 +390,37 @@ class ServingModulesTest(tf.test.TestCase, parameterized.TestCase):
     out = infer(text=tf.constant(["abcd", "ef gh"]))
     self.assertLen(out["output_0"], 2)
 
+  def test_translation_generation_engine(self):
+    sp_path = _make_sentencepeice(self.get_temp_dir())
+    encdecoder = translation.EncDecoder(
+        num_attention_heads=4, intermediate_size=64)
+    config = translation.TranslationConfig(
+        model=translation.ModelConfig(
+            encoder=encdecoder, decoder=encdecoder, embedding_width=32),
+        sentencepiece_model_path=sp_path,
+    )
+    model = translation.TranslationTask(config).build_model()
+    export_module = serving_modules.Translation(
+        params=serving_modules.Translation.Params(
+            sentencepiece_model_path=sp_path),
+        model=model)
+    engine = export_module.create_generation_engine(
+        num_slots=2, max_input_length=16, max_decode_length=8)
+    engine.start()
+    self.addCleanup(engine.stop)
+    server = generation_engine.create_http_server(
+        engine, tokenizer=export_module.tokenizer)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    self.addCleanup(server.shutdown)
+
+    request = urllib.request.Request(
+        "http://localhost:%d/generate" % server.server_address[1],
+        data=json.dumps(dict(text="abcd")).encode("utf-8"))
+    with urllib.request.urlopen(request) as response:
+      outputs = json.load(response)
+    self.assertLessEqual(len(outputs["output_ids"]), 8)
+    self.assertIsInstance(outputs["text"], str)
+
 
 if __name__ == "__main__":
   tf.test.main()
@@ -94,9 +94,16 @@ class MaskedLMTask(base_task.Task):
         sentence_labels = labels['next_sentence_labels']
         sentence_outputs = tf.cast(
             model_outputs['next_sentence'], dtype=tf.float32)
-        sentence_loss = tf.reduce_mean(
-            tf_keras.losses.sparse_categorical_crossentropy(
-                sentence_labels, sentence_outputs, from_logits=True))
+        sentence_losses = tf_keras.losses.sparse_categorical_crossentropy(
+            sentence_labels, sentence_outputs, from_logits=True)
+        if 'packed_example_weights' in labels:
+          # Packed batches have padding examples, with a weight of 0.
+          sentence_weights = labels['packed_example_weights']
+          sentence_loss = tf.math.divide_no_nan(
+              tf.reduce_sum(sentence_losses * sentence_weights),
+              tf.reduce_sum(sentence_weights))
+        else:
+          sentence_loss = tf.reduce_mean(sentence_losses)
         metrics['next_sentence_loss'].update_state(sentence_loss)
         total_loss = mlm_loss + sentence_loss
       else:
@@ -153,7 +160,8 @@ class MaskedLMTask(base_task.Task):
             labels['masked_lm_weights'])
       if 'next_sentence_accuracy' in metrics:
         metrics['next_sentence_accuracy'].update_state(
-            labels['next_sentence_labels'], model_outputs['next_sentence'])
+            labels['next_sentence_labels'], model_outputs['next_sentence'],
+            labels.get('packed_example_weights'))
 
   def train_step(self, inputs, model: tf_keras.Model,
                  optimizer: tf_keras.optimizers.Optimizer, metrics):
@@ -14,6 +14,7 @@
 
 """Tests for official.nlp.tasks.masked_lm."""
 
+import numpy as np
 import tensorflow as tf, tf_keras
 
 from official.nlp.configs import bert
@@ -56,6 +57,57 @@ class MLMTaskTest(tf.test.TestCase):
     ckpt.save(config.init_checkpoint)
     task.initialize(model)
 
+  def test_packed_next_sentence_losses_and_metrics(self):
+    config = masked_lm.MaskedLMConfig(
+        model=bert.PretrainerConfig(
+            encoder=encoders.EncoderConfig(
+                bert=encoders.BertEncoderConfig(vocab_size=30522,
+                                                num_layers=1)),
+            cls_heads=[
+                bert.ClsHeadConfig(
+                    inner_dim=10, num_classes=2, name="next_sentence")
+            ]),
+        train_data=pretrain_dataloader.BertPretrainDataConfig(
+            input_path="dummy",
+            max_predictions_per_seq=4,
+            seq_length=128,
+            global_batch_size=2))
+    task = masked_lm.MaskedLMTask(config)
+    random_state = np.random.RandomState(0)
+    # Two packed sequences of up to 3 examples, with 2 and 1 examples.
+    weights = np.array([[1, 1, 0], [1, 0, 0]], np.float32)
+    mlm_labels = {
+        "masked_lm_ids": np.array([[1, 2, 3, 0], [4, 0, 0, 0]], np.int32),
+        "masked_lm_weights": np.array([[1, 1, 1, 0], [1, 0, 0, 0]],
+                                      np.float32),
+    }
+    mlm_logits = random_state.normal(size=(2, 4, 5)).astype(np.float32)
+    sentence_labels = np.array([[0, 1, 1], [1, 0, 0]], np.int32)
+    sentence_logits = random_state.normal(size=(2, 3, 2)).astype(np.float32)
+    packed_labels = dict(
+        mlm_labels,
+        next_sentence_labels=sentence_labels,
+        packed_example_weights=weights)
+    packed_outputs = {
+        "mlm_logits": mlm_logits,
+        "next_sentence": sentence_logits,
+    }
+    unpacked_labels = dict(
+        mlm_labels, next_sentence_labels=sentence_labels[weights > 0])
+    unpacked_outputs = {
+        "mlm_logits": mlm_logits,
+        "next_sentence": sentence_logits[weights > 0],
+    }
+
+    results = []
+    for labels, outputs in ((packed_labels, packed_outputs),
+                            (unpacked_labels, unpacked_outputs)):
+      metrics = task.build_metrics()
+      loss = task.build_losses(labels, outputs, metrics)
+      task.process_metrics(metrics, labels, outputs)
+      results.append([loss] + [metric.result() for metric in metrics])
+    self.assertAllClose(results[0], results[1])
+
 
 if __name__ == "__main__":
   tf.test.main()
@@ -55,6 +55,9 @@ class QuestionAnsweringConfig(cfg.TaskConfig):
   n_best_size: int = 20
   max_answer_length: int = 30
   null_score_diff_threshold: float = 0.0
+  # The number of processes featurizing and postprocessing the validation
+  # examples with WordPiece tokenization. If 0, uses the current process.
+  num_processes: int = 0
   model: ModelConfig = dataclasses.field(default_factory=ModelConfig)
   train_data: cfg.DataConfig = dataclasses.field(default_factory=cfg.DataConfig)
   validation_data: cfg.DataConfig = dataclasses.field(
@@ -129,6 +132,12 @@ class QuestionAnsweringTask(base_task.Task):
     loss = (tf.reduce_mean(start_loss) + tf.reduce_mean(end_loss)) / 2
     return loss
 
+  def _squad_lib_kwargs(self):
+    """Returns the arguments only the WordPiece `squad_lib` accepts."""
+    if self.squad_lib is squad_lib_wp:
+      return dict(num_processes=self.task_config.num_processes)
+    return {}
+
   def _preprocess_eval_data(self, params):
     eval_examples = self.squad_lib.read_squad_examples(
         input_file=params.input_path,
@@ -174,7 +183,8 @@ class QuestionAnsweringTask(base_task.Task):
     else:
       raise ValueError('Unexpected tokenization: %s' % params.tokenization)
 
-    eval_dataset_size = self.squad_lib.convert_examples_to_features(**kwargs)
+    eval_dataset_size = self.squad_lib.convert_examples_to_features(
+        **kwargs, **self._squad_lib_kwargs())
     eval_writer.close()
 
     logging.info('***** Evaluation input stats *****')
@@ -294,7 +304,8 @@ class QuestionAnsweringTask(base_task.Task):
             null_score_diff_threshold=(
                 self.task_config.null_score_diff_threshold),
             xlnet_format=self.task_config.validation_data.xlnet_format,
-            verbose=False))
+            verbose=False,
+            **self._squad_lib_kwargs()))
 
     with tf.io.gfile.GFile(self.task_config.validation_data.input_path,
                            'r') as reader:
@@ -498,5 +509,6 @@ def predict(task: QuestionAnsweringTask, params: cfg.DataConfig,
           version_2_with_negative=(params.version_2_with_negative),
           null_score_diff_threshold=task.task_config.null_score_diff_threshold,
           xlnet_format=task.task_config.validation_data.xlnet_format,
-          verbose=False))
+          verbose=False,
+          **task._squad_lib_kwargs()))  # pylint: disable=protected-access
   return all_predictions, all_nbest, scores_diff
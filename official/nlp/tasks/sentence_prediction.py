@@ -69,6 +69,10 @@ class SentencePredictionTask(base_task.Task):
     if params.metric_type not in METRIC_TYPES:
       raise ValueError('Invalid metric_type: {}'.format(params.metric_type))
     self.metric_type = params.metric_type
+    if (getattr(params.validation_data, 'pack_sequences', False) and
+        self.metric_type != 'accuracy'):
+      raise ValueError('Only the `accuracy` metric_type supports packed '
+                       'validation data.')
     if hasattr(params.train_data, 'label_field'):
       self.label_field = params.train_data.label_field
     else:
@@ -98,8 +102,33 @@ class SentencePredictionTask(base_task.Task):
               stddev=encoder_cfg.initializer_range),
           use_encoder_pooler=self.task_config.model.use_encoder_pooler)
 
-  def build_losses(self, labels, model_outputs, aux_losses=None) -> tf.Tensor:
+  def _get_labels_outputs_and_weights(self, labels, model_outputs):
+    """Returns the labels, model outputs and example weights of a batch.
+
+    Packed batches, see `sequence_packing`, have [batch_size,
+    max_sequences_per_pack] labels. They are flattened along with the model
+    outputs, and the weights are 0 for the padding examples. The weights are
+    None for unpacked batches.
+
+    Args:
+      labels: the labels of the batch.
+      model_outputs: the outputs of the model.
+
+    Returns:
+      A tuple of (label_ids, model_outputs, weights).
+    """
     label_ids = labels[self.label_field]
+    weights = labels.get('packed_example_weights')
+    if weights is None:
+      return label_ids, model_outputs, None
+    num_classes = self.task_config.model.num_classes
+    return (tf.reshape(label_ids, [-1, 1]),
+            tf.reshape(model_outputs, [-1, num_classes]),
+            tf.reshape(weights, [-1]))
+
+  def build_losses(self, labels, model_outputs, aux_losses=None) -> tf.Tensor:
+    label_ids, model_outputs, weights = self._get_labels_outputs_and_weights(
+        labels, model_outputs)
     if self.task_config.model.num_classes == 1:
       loss = tf_keras.losses.mean_squared_error(label_ids, model_outputs)
     else:
@@ -108,6 +137,9 @@ class SentencePredictionTask(base_task.Task):
 
     if aux_losses:
       loss += tf.add_n(aux_losses)
+    if weights is not None:
+      return tf.math.divide_no_nan(
+          tf.reduce_sum(loss * weights), tf.reduce_sum(weights))
     return tf_utils.safe_mean(loss)
 
   def build_inputs(self, params, input_context=None):
@@ -152,17 +184,22 @@ class SentencePredictionTask(base_task.Task):
     return metrics
 
   def process_metrics(self, metrics, labels, model_outputs):
+    label_ids, model_outputs, weights = self._get_labels_outputs_and_weights(
+        labels, model_outputs)
     for metric in metrics:
       if metric.name == 'auc':
         # Convert the logit to probability and extract the probability of True..
         metric.update_state(
-            labels[self.label_field],
-            tf.expand_dims(tf.nn.softmax(model_outputs)[:, 1], axis=1))
+            label_ids,
+            tf.expand_dims(tf.nn.softmax(model_outputs)[:, 1], axis=1),
+            weights)
       if metric.name == 'cls_accuracy':
-        metric.update_state(labels[self.label_field], model_outputs)
+        metric.update_state(label_ids, model_outputs, weights)
 
   def process_compiled_metrics(self, compiled_metrics, labels, model_outputs):
-    compiled_metrics.update_state(labels[self.label_field], model_outputs)
+    label_ids, model_outputs, weights = self._get_labels_outputs_and_weights(
+        labels, model_outputs)
+    compiled_metrics.update_state(label_ids, model_outputs, weights)
 
   def validation_step(self, inputs, model: tf_keras.Model, metrics=None):
     features, labels = inputs, inputs
@@ -161,6 +161,42 @@ class SentencePredictionTaskTest(tf.test.TestCase, parameterized.TestCase):
     else:
       self.assertLess(loss, 1.0)
 
+  def test_packed_losses_and_metrics(self):
+    num_classes = 3
+    config = sentence_prediction.SentencePredictionConfig(
+        model=self.get_model_config(num_classes),
+        train_data=self._train_data_config)
+    task = sentence_prediction.SentencePredictionTask(config)
+    # Two packed sequences of up to 3 examples, with 2 and 1 examples.
+    weights = np.array([[1, 1, 0], [1, 0, 0]], np.float32)
+    label_ids = np.array([[0, 2, 1], [1, 0, 0]], np.int32)
+    logits = np.random.RandomState(0).normal(
+        size=(2, 3, num_classes)).astype(np.float32)
+    packed_labels = {
+        "label_ids": tf.constant(label_ids),
+        "packed_example_weights": tf.constant(weights),
+    }
+    unpacked_labels = {"label_ids": tf.constant(label_ids[weights > 0])}
+    unpacked_logits = tf.constant(logits[weights > 0])
+    logits = tf.constant(logits)
+
+    self.assertAllClose(
+        task.build_losses(packed_labels, logits),
+        task.build_losses(unpacked_labels, unpacked_logits))
+
+    results = []
+    for labels, outputs in ((packed_labels, logits),
+                            (unpacked_labels, unpacked_logits)):
+      metrics = task.build_metrics()
+      task.process_metrics(metrics, labels, outputs)
+      model = tf_keras.Sequential([tf_keras.layers.Dense(num_classes)])
+      model.compile(metrics=[tf_keras.metrics.SparseCategoricalAccuracy()])
+      task.process_compiled_metrics(model.compiled_metrics, labels, outputs)
+      results.append(
+          [metric.result() for metric in metrics] +
+          [metric.result() for metric in model.compiled_metrics.metrics])
+    self.assertAllClose(results[0], results[1])
+
   @parameterized.parameters(("matthews_corrcoef", 2),
                             ("pearson_spearman_corr", 1),
                             ("f1", 2))
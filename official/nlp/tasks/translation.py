@@ -18,6 +18,7 @@ import os
 from typing import Optional
 
 from absl import logging
+import numpy as np
 import sacrebleu
 import tensorflow as tf, tf_keras
 import tensorflow_text as tftxt
@@ -202,6 +203,8 @@ class TranslationTask(base_task.Task):
         params.validation_data.tfds_name) and self._logging_dir:
       self._references, self._tf_record_input_path = write_test_record(
           params.validation_data, self.logging_dir)
+    # The BLEU tokens of the references, computed at the first evaluation.
+    self._reference_tokens = None
 
   def build_model(self) -> tf_keras.Model:
     """Creates model architecture.
@@ -324,46 +327,70 @@ class TranslationTask(base_task.Task):
     logs.update(outputs)
     return logs
 
+  def _trim_and_decode(self, ids):
+    """Trims a batch of ids after EOS and decodes them to strings."""
+    is_eos = np.equal(ids, self._eos_id)
+    lengths = np.where(
+        is_eos.any(axis=1), is_eos.argmax(axis=1), ids.shape[1])
+    texts = self._sp_tokenizer.detokenize(
+        tf.RaggedTensor.from_tensor(ids, lengths=lengths))
+    return [text.decode() for text in texts.numpy()]
+
   def aggregate_logs(self, state=None, step_outputs=None):
-    """Aggregates over logs returned from a validation step."""
+    """Aggregates over logs returned from a validation step.
+
+    The translations are decoded and added to the BLEU statistics one batch at
+    a time, so that little work is left after the last validation step.
+
+    Args:
+      state: the aggregated logs of the previous steps.
+      step_outputs: the outputs of a validation step.
+
+    Returns:
+      The aggregated logs.
+    """
     if state is None:
-      state = {}
+      state = {"translations": {}, "sources": {}, "bleu": bleu.CorpusBleu()}
+    if self._reference_tokens is None:
+      self._reference_tokens = [
+          bleu.bleu_tokenize(x.lower()) for x in self._references
+      ]
 
     for in_token_ids, out_token_ids, unique_ids in zip(
         step_outputs["inputs"],
         step_outputs["outputs"],
         step_outputs["unique_ids"]):
-      for in_ids, out_ids, u_id in zip(
-          in_token_ids.numpy(), out_token_ids.numpy(), unique_ids.numpy()):
-        state[u_id] = (in_ids, out_ids)
+      # Skips the padding examples and the examples seen before.
+      new_ids, indices = [], []
+      for index, u_id in enumerate(unique_ids.numpy()):
+        if (u_id < len(self._references) and
+            u_id not in state["translations"] and u_id not in new_ids):
+          new_ids.append(u_id)
+          indices.append(index)
+      if not indices:
+        continue
+      translations = self._trim_and_decode(out_token_ids.numpy()[indices])
+      state["translations"].update(zip(new_ids, translations))
+      if self.task_config.print_translations:
+        # Deccoding the in_ids to reflect what the model sees.
+        state["sources"].update(
+            zip(new_ids, self._trim_and_decode(in_token_ids.numpy()[indices])))
+      state["bleu"].update(
+          [self._reference_tokens[u_id] for u_id in new_ids],
+          [bleu.bleu_tokenize(x.lower()) for x in translations])
     return state
 
   def reduce_aggregated_logs(self, aggregated_logs, global_step=None):
-
-    def _decode(ids):
-      return self._sp_tokenizer.detokenize(ids).numpy().decode()
-
-    def _trim_and_decode(ids):
-      """Trim EOS and PAD tokens from ids, and decode to return a string."""
-      try:
-        index = list(ids).index(self._eos_id)
-        return _decode(ids[:index])
-      except ValueError:  # No EOS found in sequence
-        return _decode(ids)
-
     translations = []
-    for u_id in sorted(aggregated_logs):
-      if u_id >= len(self._references):
-        continue
-      src = _trim_and_decode(aggregated_logs[u_id][0])
-      translation = _trim_and_decode(aggregated_logs[u_id][1])
+    for u_id in sorted(aggregated_logs["translations"]):
+      translation = aggregated_logs["translations"][u_id]
       translations.append(translation)
       if self.task_config.print_translations:
-        # Deccoding the in_ids to reflect what the model sees.
         logging.info("Translating:\n\tInput: %s\n\tOutput: %s\n\tReference: %s",
-                     src, translation, self._references[u_id])
+                     aggregated_logs["sources"][u_id], translation,
+                     self._references[u_id])
     sacrebleu_score = sacrebleu.corpus_bleu(
         translations, [self._references]).score
-    bleu_score = bleu.bleu_on_list(self._references, translations)
+    bleu_score = aggregated_logs["bleu"].result() * 100
     return {"sacrebleu_score": sacrebleu_score,
             "bleu_score": bleu_score}
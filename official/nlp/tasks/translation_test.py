@@ -21,6 +21,7 @@ import tensorflow as tf, tf_keras
 
 from sentencepiece import SentencePieceTrainer
 from official.nlp.data import wmt_dataloader
+from official.nlp.metrics import bleu
 from official.nlp.tasks import translation
 
 
@@ -165,7 +166,12 @@ class TranslationTaskTest(tf.test.TestCase):
       aggregated = task.aggregate_logs(state=aggregated, step_outputs=outputs)
     metrics = task.reduce_aggregated_logs(aggregated)
     self.assertIn("sacrebleu_score", metrics)
-    self.assertIn("bleu_score", metrics)
+    translations = [
+        aggregated["translations"][u_id]
+        for u_id in sorted(aggregated["translations"])
+    ]
+    self.assertAllClose(metrics["bleu_score"],
+                        bleu.bleu_on_list(task._references, translations))
 
 if __name__ == "__main__":
   tf.test.main()
@@ -30,6 +30,10 @@ import sentencepiece as spm
 
 SPIECE_UNDERLINE = "▁"
 
+# The key marking the end of a vocab token in a trie node. It cannot collide
+# with a character, since characters are never empty.
+_TRIE_END = ""
+
 
 def validate_case_matches_checkpoint(do_lower_case, init_checkpoint):
   """Checks whether the casing config is consistent with the checkpoint name."""
@@ -182,6 +186,10 @@ class FullTokenizer(object):
 
     return split_tokens
 
+  def tokenize_batch(self, texts):
+    """Tokenizes a list of texts, returning a list of lists of tokens."""
+    return [self.tokenize(text) for text in texts]
+
   def convert_tokens_to_ids(self, tokens):
     return convert_by_vocab(self.vocab, tokens)
 
@@ -311,13 +319,43 @@ class BasicTokenizer(object):
     return "".join(output)
 
 
+def _build_trie(tokens):
+  """Builds a character trie of `tokens`, as nested dictionaries."""
+  root = {}
+  for key, token in tokens:
+    node = root
+    for char in key:
+      node = node.setdefault(char, {})
+    node[_TRIE_END] = token
+  return root
+
+
 class WordpieceTokenizer(object):
   """Runs WordPiece tokenziation."""
 
-  def __init__(self, vocab, unk_token="[UNK]", max_input_chars_per_word=400):
+  def __init__(self, vocab, unk_token="[UNK]", max_input_chars_per_word=400,
+               cache_size=100000):
+    """Inits WordpieceTokenizer.
+
+    Args:
+      vocab: A dictionary mapping the word pieces to their ids. The vocab should
+        not be modified afterwards.
+      unk_token: The token of the words which cannot be tokenized.
+      max_input_chars_per_word: The words longer than this are tokenized as
+        `unk_token`.
+      cache_size: The number of most recently tokenized words to keep the word
+        pieces of. If 0, no words are cached.
+    """
     self.vocab = vocab
     self.unk_token = unk_token
     self.max_input_chars_per_word = max_input_chars_per_word
+    self.cache_size = cache_size
+    self._cache = collections.OrderedDict()
+    # The pieces starting a word, and the pieces continuing a word, i.e. the
+    # ones prefixed by "##" in the vocab, without their prefix.
+    self._prefix_trie = _build_trie((token, token) for token in vocab)
+    self._suffix_trie = _build_trie(
+        (token[2:], token) for token in vocab if token.startswith("##"))
 
   def tokenize(self, text):
     """Tokenizes a piece of text into its word pieces.
@@ -341,36 +379,51 @@ class WordpieceTokenizer(object):
 
     output_tokens = []
     for token in whitespace_tokenize(text):
-      chars = list(token)
-      if len(chars) > self.max_input_chars_per_word:
-        output_tokens.append(self.unk_token)
-        continue
+      output_tokens.extend(self._tokenize_word_cached(token))
+    return output_tokens
 
-      is_bad = False
-      start = 0
-      sub_tokens = []
-      while start < len(chars):
-        end = len(chars)
-        cur_substr = None
-        while start < end:
-          substr = "".join(chars[start:end])
-          if start > 0:
-            substr = "##" + substr
-          if substr in self.vocab:
-            cur_substr = substr
-            break
-          end -= 1
-        if cur_substr is None:
-          is_bad = True
+  def tokenize_batch(self, texts):
+    """Tokenizes a list of texts, returning a list of lists of word pieces."""
+    return [self.tokenize(text) for text in texts]
+
+  def _tokenize_word_cached(self, token):
+    """Tokenizes a word, using the cache of the most recent words."""
+    pieces = self._cache.get(token)
+    if pieces is not None:
+      self._cache.move_to_end(token)
+      return pieces
+    pieces = self._tokenize_word(token)
+    if self.cache_size:
+      self._cache[token] = pieces
+      if len(self._cache) > self.cache_size:
+        self._cache.popitem(last=False)
+    return pieces
+
+  def _tokenize_word(self, token):
+    """Tokenizes a word with the longest matches found by walking the tries."""
+    if len(token) > self.max_input_chars_per_word:
+      return (self.unk_token,)
+
+    pieces = []
+    trie = self._prefix_trie
+    start = 0
+    while start < len(token):
+      node = trie
+      piece = None
+      end = start
+      for i in range(start, len(token)):
+        node = node.get(token[i])
+        if node is None:
           break
-        sub_tokens.append(cur_substr)
-        start = end
-
-      if is_bad:
-        output_tokens.append(self.unk_token)
-      else:
-        output_tokens.extend(sub_tokens)
-    return output_tokens
+        if _TRIE_END in node:
+          piece = node[_TRIE_END]
+          end = i + 1
+      if piece is None:
+        return (self.unk_token,)
+      pieces.append(piece)
+      start = end
+      trie = self._suffix_trie
+    return tuple(pieces)
 
 
 def _is_whitespace(char):
@@ -532,6 +585,10 @@ class FullSentencePieceTokenizer(object):
     """Tokenizes text into pieces."""
     return encode_pieces(self.sp_model, text)
 
+  def tokenize_batch(self, texts):
+    """Tokenizes a list of texts, returning a list of lists of pieces."""
+    return [self.tokenize(text) for text in texts]
+
   def convert_tokens_to_ids(self, tokens):
     """Converts a list of tokens to a list of ids."""
     return [self.sp_model.PieceToId(printable_text(token)) for token in tokens]
@@ -13,6 +13,7 @@
 # limitations under the License.
 
 import os
+import random
 import tempfile
 
 import six
@@ -109,6 +110,59 @@ class TokenizationTest(tf.test.TestCase):
     self.assertAllEqual(
         tokenizer.tokenize("unwantedX running"), ["[UNK]", "runn", "##ing"])
 
+  def test_wordpiece_tokenizer_matches_slicing(self):
+
+    def slicing_tokenize(vocab, token):
+      # The greedy longest-match-first algorithm of the original BERT code.
+      start = 0
+      sub_tokens = []
+      while start < len(token):
+        end = len(token)
+        cur_substr = None
+        while start < end:
+          substr = token[start:end]
+          if start > 0:
+            substr = "##" + substr
+          if substr in vocab:
+            cur_substr = substr
+            break
+          end -= 1
+        if cur_substr is None:
+          return ["[UNK]"]
+        sub_tokens.append(cur_substr)
+        start = end
+      return sub_tokens
+
+    rng = random.Random(0)
+    alphabet = "ab\u00e9\u4e2d#"
+    vocab_tokens = ["[UNK]", "##", "###", "##a#"] + [
+        prefix + "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 4)))
+        for prefix in ["", "##"] * 100
+    ]
+    vocab = {token: i for i, token in enumerate(vocab_tokens)}
+    tokenizer = tokenization.WordpieceTokenizer(vocab=vocab, cache_size=10)
+    for _ in range(1000):
+      word = "".join(rng.choice(alphabet) for _ in range(rng.randint(1, 12)))
+      self.assertEqual(
+          tokenizer.tokenize(word), slicing_tokenize(vocab, word), msg=word)
+    self.assertLen(tokenizer._cache, 10)
+
+  def test_tokenize_batch(self):
+    vocab_tokens = ["[UNK]", "[CLS]", "[SEP]", "want", "##want", "##ed", "wa",
+                    "un", "runn", "##ing", ","]
+    with tempfile.NamedTemporaryFile(delete=False) as vocab_writer:
+      vocab_writer.write("".join([x + "\n" for x in vocab_tokens
+                                 ]).encode("utf-8"))
+      vocab_file = vocab_writer.name
+
+    tokenizer = tokenization.FullTokenizer(vocab_file)
+    os.unlink(vocab_file)
+
+    texts = [u"UNwant\u00E9d,running", u"", u"running unwanted"]
+    self.assertAllEqual(
+        tokenizer.tokenize_batch(texts),
+        [tokenizer.tokenize(text) for text in texts])
+
   def test_convert_tokens_to_ids(self):
     vocab_tokens = [
         "[UNK]", "[CLS]", "[SEP]", "want", "##want", "##ed", "wa", "un", "runn",
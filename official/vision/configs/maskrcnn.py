@@ -252,6 +252,12 @@ class MaskRCNNTask(cfg.TaskConfig):
   allowed_mask_class_ids: Optional[List[int]] = None
   # If set, the COCO metrics will be computed.
   use_coco_metrics: bool = True
+  # If set, the COCO metrics are computed per image as the eval batches arrive
+  # instead of over all the predictions kept in memory until the end.
+  streaming_coco_eval: bool = False
+  # Number of processes to run the per-image COCO matching with. 0 or 1 runs
+  # it in the evaluation process.
+  coco_eval_num_processes: int = 0
   # If set, the Waymo Open Dataset evaluator would be used.
   use_wod_metrics: bool = False
   # If set, use instance metrics (AP, mask AP, etc.) computed by an efficient
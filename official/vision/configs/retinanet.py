@@ -141,7 +141,7 @@ class DetectionGenerator(hyperparams.Config):
   pre_nms_score_threshold: float = 0.05
   nms_iou_threshold: float = 0.5
   max_num_detections: int = 100
-  nms_version: str = 'v2'  # `v2`, `v1`, `batched`, or `tflite`.
+  nms_version: str = 'v2'  # `v2`, `v1`, `v4`, `batched`, or `tflite`.
   use_cpu_nms: bool = False
   soft_nms_sigma: Optional[float] = None  # Only works when nms_version='v1'.
 
@@ -210,6 +210,12 @@ class RetinaNetTask(cfg.TaskConfig):
   export_config: ExportConfig = dataclasses.field(default_factory=ExportConfig)
   # If set, the COCO metrics will be computed.
   use_coco_metrics: bool = True
+  # If set, the COCO metrics are computed per image as the eval batches arrive
+  # instead of over all the predictions kept in memory until the end.
+  streaming_coco_eval: bool = False
+  # Number of processes to run the per-image COCO matching with. 0 or 1 runs
+  # it in the evaluation process.
+  coco_eval_num_processes: int = 0
   # If set, the Waymo Open Dataset evaluator would be used.
   use_wod_metrics: bool = False
 
@@ -75,6 +75,10 @@ _NUM_PROCESSES = flags.DEFINE_integer(
     'num_processes', None,
     ('Number of parallel processes to use. '
      'If set to 0, disables multi-processing.'))
+_RESUME = flags.DEFINE_boolean(
+    'resume', False,
+    'Whether to resume an interrupted conversion to the same '
+    '`output_file_prefix` and `num_shards`, skipping the written shards.')
 
 
 FLAGS = flags.FLAGS
@@ -530,9 +534,10 @@ def _create_tf_record_from_coco_annotations(images_info_file,
       include_panoptic_masks=include_panoptic_masks,
       include_masks=include_masks)
 
-  num_skipped = tfrecord_lib.write_tf_record_dataset(
+  num_skipped = tfrecord_lib.write_sharded_tf_record_dataset(
       output_path, coco_annotations_iter, create_tf_example, num_shards,
-      multiple_processes=_NUM_PROCESSES.value)
+      multiple_processes=_NUM_PROCESSES.value, resume=_RESUME.value,
+      num_annotations=len(images))
 
   logging.info('Finished writing, skipped %d annotations.', num_skipped)
 
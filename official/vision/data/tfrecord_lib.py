@@ -17,6 +17,10 @@
 import hashlib
 import io
 import itertools
+import json
+import os
+import threading
+import time
 
 from absl import logging
 import numpy as np
@@ -28,6 +32,10 @@ import multiprocessing as mp
 
 LOG_EVERY = 100
 
+# The number of shards in flight per process in
+# `write_sharded_tf_record_dataset`.
+_MAX_PENDING_SHARDS_PER_PROCESS = 2
+
 
 def convert_to_feature(value, value_type=None):
   """Converts the given python object to a tf.train.Feature.
@@ -182,6 +190,183 @@ def write_tf_record_dataset(output_path, annotation_iterator,
   return total_num_annotations_skipped
 
 
+def _shard_path(output_path, shard_index, num_shards):
+  return output_path + '-%05d-of-%05d.tfrecord' % (shard_index, num_shards)
+
+
+def _write_shard(args):
+  """Processes the annotations of a shard and writes it, in a worker process.
+
+  Args:
+    args: a tuple of (process_func, unpack_arguments, output_path, shard_index,
+      num_shards, annotations).
+
+  Returns:
+    A tuple of (shard index, number of examples, number of skipped annotations).
+  """
+  (process_func, unpack_arguments, output_path, shard_index, num_shards,
+   annotations) = args
+  path = _shard_path(output_path, shard_index, num_shards)
+  # Writes to a temporary file first, so that an interrupted conversion never
+  # leaves a partial shard behind.
+  tmp_path = path + '.tmp'
+  num_examples = 0
+  num_skipped = 0
+  with tf.io.TFRecordWriter(tmp_path) as writer:
+    for annotation in annotations:
+      if unpack_arguments:
+        tf_example, num_annotations_skipped = process_func(*annotation)
+      else:
+        tf_example, num_annotations_skipped = process_func(annotation)
+      writer.write(tf_example.SerializeToString())
+      num_examples += 1
+      num_skipped += num_annotations_skipped
+  tf.io.gfile.rename(tmp_path, path, overwrite=True)
+  return shard_index, num_examples, num_skipped
+
+
+class _ShardManifest:
+  """Records the completed shards of a conversion, to resume it."""
+
+  def __init__(self, path, num_shards, resume):
+    self._path = path
+    self._shards = {}
+    if resume and tf.io.gfile.exists(path):
+      with tf.io.gfile.GFile(path, 'r') as f:
+        manifest = json.load(f)
+      if manifest['num_shards'] != num_shards:
+        raise ValueError(
+            'Cannot resume a conversion to %d shards with %d shards.' %
+            (manifest['num_shards'], num_shards))
+      self._shards = {int(k): v for k, v in manifest['shards'].items()}
+    self._num_shards = num_shards
+
+  def __contains__(self, shard_index):
+    return shard_index in self._shards
+
+  @property
+  def num_skipped(self):
+    return sum(shard['num_skipped'] for shard in self._shards.values())
+
+  def record(self, shard_index, num_examples, num_skipped):
+    self._shards[shard_index] = {
+        'num_examples': num_examples,
+        'num_skipped': num_skipped,
+    }
+    tmp_path = self._path + '.tmp'
+    with tf.io.gfile.GFile(tmp_path, 'w') as f:
+      json.dump({'num_shards': self._num_shards,
+                 'shards': {str(k): v for k, v in self._shards.items()}}, f)
+    tf.io.gfile.rename(tmp_path, self._path, overwrite=True)
+
+
+def write_sharded_tf_record_dataset(output_path, annotation_iterator,
+                                    process_func, num_shards,
+                                    multiple_processes=None,
+                                    unpack_arguments=True,
+                                    resume=False,
+                                    num_annotations=None):
+  """Iterates over annotations, processes them and writes into TFRecords.
+
+  Same as `write_tf_record_dataset`, but every shard holds a contiguous range
+  of the annotations and is processed and written by a single worker process,
+  instead of sending the serialized examples back to the parent process. The
+  annotations of a shard are only read from `annotation_iterator` when a worker
+  is available for it, and at most a few shards per process are in flight, so
+  that the memory usage does not grow with the size of the dataset.
+
+  Every shard is recorded as soon as it is written in a manifest next to the
+  shards, at `<output_path>-manifest.json`, so that an interrupted conversion
+  can be resumed with `resume=True`.
+
+  Args:
+    output_path: The prefix path to create TF record files.
+    annotation_iterator: An iterator of tuples containing details about the
+      dataset.
+    process_func: A function which takes the elements from the tuples of
+      annotation_iterator as arguments and returns a tuple of (tf.train.Example,
+      int). The integer indicates the number of annotations that were skipped.
+    num_shards: int, the number of shards to write for the dataset.
+    multiple_processes: integer, the number of multiple parallel processes to
+      use.  If None, uses multi-processing with number of processes equal to
+      `os.cpu_count()`, which is Python's default behavior. If set to 0,
+      multi-processing is disabled.
+    unpack_arguments:
+      Whether to unpack the tuples from annotation_iterator as individual
+        arguments to the process func or to pass the returned value as it is.
+    resume: Whether to skip the shards completed by a previous call with the
+      same `output_path` and `num_shards`.
+    num_annotations: The number of annotations of `annotation_iterator`, which
+      determines the range of every shard. Defaults to
+      `len(annotation_iterator)`.
+
+  Returns:
+    num_skipped: The total number of skipped annotations.
+
+  Raises:
+    ValueError: If `num_annotations` is not given and `annotation_iterator` has
+      no length.
+  """
+  if num_annotations is None:
+    if not hasattr(annotation_iterator, '__len__'):
+      raise ValueError('`num_annotations` is required for an '
+                       '`annotation_iterator` without length.')
+    num_annotations = len(annotation_iterator)
+  annotation_iterator = iter(annotation_iterator)
+  manifest = _ShardManifest(output_path + '-manifest.json', num_shards, resume)
+  num_remaining_shards = sum(i not in manifest for i in range(num_shards))
+  if num_remaining_shards < num_shards:
+    logging.info('Resuming, %d of %d shards are already written.',
+                 num_shards - num_remaining_shards, num_shards)
+
+  use_pool = multiple_processes is None or multiple_processes > 0
+  # Bounds the number of shards whose annotations are queued for the workers.
+  num_processes = (multiple_processes or os.cpu_count()) if use_pool else 1
+  pending = threading.Semaphore(_MAX_PENDING_SHARDS_PER_PROCESS * num_processes)
+
+  def shard_tasks():
+    for shard_index in range(num_shards):
+      shard_size = ((shard_index + 1) * num_annotations // num_shards -
+                    shard_index * num_annotations // num_shards)
+      if shard_index in manifest:
+        for _ in itertools.islice(annotation_iterator, shard_size):
+          pass
+        continue
+      pending.acquire()
+      annotations = list(itertools.islice(annotation_iterator, shard_size))
+      yield (process_func, unpack_arguments, output_path, shard_index,
+             num_shards, annotations)
+
+  pool = mp.Pool(processes=multiple_processes) if use_pool else None
+  try:
+    if use_pool:
+      results = pool.imap_unordered(_write_shard, shard_tasks())
+    else:
+      results = map(_write_shard, shard_tasks())
+
+    start = time.time()
+    total_num_examples = 0
+    for num_done, (shard_index, num_examples, num_skipped) in enumerate(
+        results, 1):
+      pending.release()
+      manifest.record(shard_index, num_examples, num_skipped)
+      total_num_examples += num_examples
+      logging.info('Wrote shard %d (%d examples), %d/%d shards done, '
+                   '%.1f examples/sec.', shard_index, num_examples, num_done,
+                   num_remaining_shards,
+                   total_num_examples / (time.time() - start))
+  finally:
+    if pool is not None:
+      pool.terminate()
+      pool.join()
+
+  total_num_annotations_skipped = manifest.num_skipped
+  logging.info('Finished writing %d examples in %.1f secs, skipped %d '
+               'annotations.', total_num_examples, time.time() - start,
+               total_num_annotations_skipped)
+  return total_num_annotations_skipped
+
+
 def check_and_make_dir(directory):
   """Creates the directory if it doesn't exist."""
   if not tf.io.gfile.isdir(directory):
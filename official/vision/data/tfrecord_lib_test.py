@@ -14,6 +14,8 @@
 
 """Tests for tfrecord_lib."""
 
+import json
+import multiprocessing as mp
 import os
 
 from absl import flags
@@ -32,6 +34,24 @@ def process_sample(x):
   return tf.train.Example(features=tf.train.Features(feature=d)), 0
 
 
+def process_sample_or_fail(x):
+  if x.int64_list.value[0] == 5:
+    raise ValueError('Invalid sample.')
+  return process_sample(x)
+
+
+def process_sample_or_exit(x):
+  # Kills the process, as an interrupted conversion would be.
+  if x.int64_list.value[0] == 12:
+    os._exit(1)  # pylint: disable=protected-access
+  return process_sample(x)
+
+
+def write_sharded_tf_record_dataset_and_exit(path, data):
+  tfrecord_lib.write_sharded_tf_record_dataset(
+      path, data, process_sample_or_exit, 3, multiple_processes=0)
+
+
 def parse_function(example_proto):
 
   feature_description = {
@@ -59,6 +79,122 @@ class TfrecordLibTest(parameterized.TestCase):
     read_values = set(d['x'] for d in dataset.as_numpy_iterator())
     self.assertSetEqual(read_values, set(range(17)))
 
+  @parameterized.parameters(0, 2)
+  def test_write_sharded_tf_record_dataset(self, multiple_processes):
+    data = [(tfrecord_lib.convert_to_feature(i),) for i in range(17)]
+    path = os.path.join(FLAGS.test_tmpdir, 'sharded%d' % multiple_processes,
+                        'train')
+    tf.io.gfile.makedirs(os.path.dirname(path))
+
+    tfrecord_lib.write_sharded_tf_record_dataset(
+        path, data, process_sample, 3, multiple_processes=multiple_processes)
+    tfrecord_files = sorted(tf.io.gfile.glob(path + '*.tfrecord'))
+
+    self.assertLen(tfrecord_files, 3)
+    # Every shard holds a contiguous range of the annotations.
+    dataset = tf.data.TFRecordDataset(tfrecord_files[1]).map(parse_function)
+    self.assertEqual([d['x'] for d in dataset.as_numpy_iterator()],
+                     list(range(5, 11)))
+
+  def test_write_sharded_tf_record_dataset_reads_annotations_per_shard(self):
+    path = os.path.join(self.create_tempdir().full_path, 'train')
+    events = []
+
+    def annotation_iterator():
+      for i in range(17):
+        events.append(('read', i))
+        yield (tfrecord_lib.convert_to_feature(i),)
+
+    def process_and_record(x):
+      events.append(('process', x.int64_list.value[0]))
+      return process_sample(x)
+
+    with self.assertRaisesRegex(ValueError, 'num_annotations'):
+      tfrecord_lib.write_sharded_tf_record_dataset(
+          path, annotation_iterator(), process_and_record, 3,
+          multiple_processes=0)
+    tfrecord_lib.write_sharded_tf_record_dataset(
+        path, annotation_iterator(), process_and_record, 3,
+        multiple_processes=0, num_annotations=17)
+    # The annotations of a shard are only read once the previous shard is
+    # written.
+    expected_events = []
+    for shard in (range(0, 5), range(5, 11), range(11, 17)):
+      expected_events += [('read', i) for i in shard]
+      expected_events += [('process', i) for i in shard]
+    self.assertEqual(events, expected_events)
+
+  def test_write_sharded_tf_record_dataset_worker_failure(self):
+    data = [(tfrecord_lib.convert_to_feature(i),) for i in range(17)]
+    path = os.path.join(self.create_tempdir().full_path, 'train')
+    with self.assertRaisesRegex(ValueError, 'Invalid sample'):
+      tfrecord_lib.write_sharded_tf_record_dataset(
+          path, data, process_sample_or_fail, 3, multiple_processes=2)
+    # The sample 5 belongs to the shard 1, which is not left behind partially
+    # written.
+    self.assertFalse(tf.io.gfile.exists(path + '-00001-of-00003.tfrecord'))
+
+  def test_write_sharded_tf_record_dataset_resume(self):
+    data = [(tfrecord_lib.convert_to_feature(i),) for i in range(17)]
+    path = os.path.join(FLAGS.test_tmpdir, 'resume', 'train')
+    tf.io.gfile.makedirs(os.path.dirname(path))
+    tfrecord_lib.write_sharded_tf_record_dataset(
+        path, data, process_sample, 3, multiple_processes=0)
+
+    # Simulates a conversion interrupted before the shard 1 completed.
+    manifest_path = path + '-manifest.json'
+    with tf.io.gfile.GFile(manifest_path, 'r') as f:
+      manifest = json.load(f)
+    del manifest['shards']['1']
+    with tf.io.gfile.GFile(manifest_path, 'w') as f:
+      json.dump(manifest, f)
+    tf.io.gfile.remove(path + '-00001-of-00003.tfrecord')
+
+    processed = []
+
+    def process_and_record(x):
+      processed.append(x.int64_list.value[0])
+      return process_sample(x)
+
+    tfrecord_lib.write_sharded_tf_record_dataset(
+        path, data, process_and_record, 3, multiple_processes=0, resume=True)
+    self.assertEqual(processed, list(range(5, 11)))
+    dataset = tf.data.TFRecordDataset(
+        tf.io.gfile.glob(path + '*.tfrecord')).map(parse_function)
+    self.assertCountEqual([d['x'] for d in dataset.as_numpy_iterator()],
+                          range(17))
+
+    with self.assertRaisesRegex(ValueError, 'shards'):
+      tfrecord_lib.write_sharded_tf_record_dataset(
+          path, data, process_sample, 4, multiple_processes=0, resume=True)
+
+  def test_write_sharded_tf_record_dataset_resume_after_kill(self):
+    data = [(tfrecord_lib.convert_to_feature(i),) for i in range(17)]
+    path = os.path.join(self.create_tempdir().full_path, 'train')
+    process = mp.get_context('fork').Process(
+        target=write_sharded_tf_record_dataset_and_exit, args=(path, data))
+    process.start()
+    process.join()
+    self.assertEqual(process.exitcode, 1)
+
+    # The process was killed while writing the shard 2, after the shards 0 and
+    # 1 were written.
+    with tf.io.gfile.GFile(path + '-manifest.json', 'r') as f:
+      self.assertCountEqual(json.load(f)['shards'], ['0', '1'])
+    processed = []
+
+    def process_and_record(x):
+      processed.append(x.int64_list.value[0])
+      return process_sample(x)
+
+    tfrecord_lib.write_sharded_tf_record_dataset(
+        path, data, process_and_record, 3, multiple_processes=0, resume=True)
+    self.assertEqual(processed, list(range(11, 17)))
+    dataset = tf.data.TFRecordDataset(
+        tf.io.gfile.glob(path + '*.tfrecord')).map(parse_function)
+    self.assertCountEqual([d['x'] for d in dataset.as_numpy_iterator()],
+                          range(17))
+
   def test_convert_to_feature_float(self):
 
     proto = tfrecord_lib.convert_to_feature(0.0)
@@ -23,10 +23,17 @@ The following snippet demonstrates the use of interfaces:
       evaluator.update_state(groundtruths, predictions)
     evaluator.result()  # finish one full eval and reset states.
 
+With `streaming=True`, detections are matched to the ground-truths image by
+image inside `update_state`, so only the small per-image matching results are
+kept in memory and `result()` merely accumulates them into the final metrics.
+
 See also: https://github.com/cocodataset/cocoapi/
 """
 
 import atexit
+import contextlib
+import copy
+import io
 import tempfile
 # Import libraries
 from absl import logging
@@ -35,6 +42,7 @@ from pycocotools import cocoeval
 import six
 import tensorflow as tf, tf_keras
 
+from official.vision.evaluation import coco_parallel_eval
 from official.vision.evaluation import coco_utils
 
 
@@ -49,7 +57,9 @@ class COCOEvaluator(object):
                need_rescale_keypoints=False,
                per_category_metrics=False,
                max_num_eval_detections=100,
-               kpt_oks_sigmas=None):
+               kpt_oks_sigmas=None,
+               streaming=False,
+               num_processes=0):
     """Constructs COCO evaluation class.
 
     The class provides the interface to COCO metrics_fn. The
@@ -75,6 +85,14 @@ class COCOEvaluator(object):
       kpt_oks_sigmas: The sigmas used to calculate keypoint OKS. See
         http://cocodataset.org/#keypoints-eval. When None, it will use the
         defaults in COCO.
+      streaming: If True, detections are matched to the ground-truths per image
+        as batches arrive in `update_state`, and only the per-image matching
+        results are kept instead of all predictions and ground-truths.
+        `result()` then only runs the COCO accumulation and returns the same
+        metrics as the default mode.
+      num_processes: Number of processes to shard the per-image COCO matching
+        of `evaluate()` across. 0 or 1 runs it in the current process. Has no
+        effect in the streaming mode, which matches one batch at a time.
     Raises:
       ValueError: if max_num_eval_detections is not an integer.
     """
@@ -93,6 +111,8 @@ class COCOEvaluator(object):
     self._annotation_file = annotation_file
     self._include_mask = include_mask
     self._include_keypoint = include_keypoint
+    self._streaming = streaming
+    self._num_processes = num_processes
     self._per_category_metrics = per_category_metrics
     if max_num_eval_detections is None or not isinstance(
         max_num_eval_detections, int):
@@ -128,6 +148,11 @@ class COCOEvaluator(object):
       self._required_prediction_fields.extend(['detection_keypoints'])
       self._required_groundtruth_fields.extend(['keypoints'])
       self._kpt_oks_sigmas = kpt_oks_sigmas
+    self._iou_types = ['bbox']
+    if self._include_mask:
+      self._iou_types.append('segm')
+    if self._include_keypoint:
+      self._iou_types.append('keypoints')
 
     self.reset_states()
 
@@ -140,6 +165,11 @@ class COCOEvaluator(object):
     self._predictions = {}
     if not self._annotation_file:
       self._groundtruths = {}
+    # States of the streaming mode: the per-image matching results keyed by
+    # (category_id, area_range_index, image_id) for each IoU type.
+    self._eval_imgs = {iou_type: {} for iou_type in self._iou_types}
+    self._image_ids = set()
+    self._category_ids = set()
 
   def result(self):
     """Evaluates detection results, and reset_states."""
@@ -155,48 +185,15 @@ class COCOEvaluator(object):
       coco_metric: float numpy array with shape [24] representing the
         coco-style evaluation metrics (box and mask).
     """
-    if not self._annotation_file:
-      logging.info('There is no annotation_file in COCOEvaluator.')
-      gt_dataset = coco_utils.convert_groundtruths_to_coco_dataset(
-          self._groundtruths)
-      coco_gt = coco_utils.COCOWrapper(
-          eval_type=('mask' if self._include_mask else 'box'),
-          gt_dataset=gt_dataset)
+    if self._streaming:
+      coco_evals = self._reduce_streaming_state()
     else:
-      logging.info('Using annotation file: %s', self._annotation_file)
-      coco_gt = self._coco_gt
-    coco_predictions = coco_utils.convert_predictions_to_coco_annotations(
-        self._predictions)
-    coco_dt = coco_gt.loadRes(predictions=coco_predictions)
-    image_ids = [ann['image_id'] for ann in coco_predictions]
-
-    coco_eval = cocoeval.COCOeval(coco_gt, coco_dt, iouType='bbox')
-    coco_eval.params.imgIds = image_ids
-    coco_eval.params.maxDets[2] = self.max_num_eval_detections
-    coco_eval.evaluate()
-    coco_eval.accumulate()
-    coco_eval.summarize()
-    coco_metrics = coco_eval.stats
-    metrics = coco_metrics
-
-    if self._include_mask:
-      mcoco_eval = cocoeval.COCOeval(coco_gt, coco_dt, iouType='segm')
-      mcoco_eval.params.imgIds = image_ids
-      mcoco_eval.evaluate()
-      mcoco_eval.accumulate()
-      mcoco_eval.summarize()
-      mask_coco_metrics = mcoco_eval.stats
-      metrics = np.hstack((metrics, mask_coco_metrics))
-
-    if self._include_keypoint:
-      kcoco_eval = cocoeval.COCOeval(coco_gt, coco_dt, iouType='keypoints',
-                                     kpt_oks_sigmas=self._kpt_oks_sigmas)
-      kcoco_eval.params.imgIds = image_ids
-      kcoco_eval.evaluate()
-      kcoco_eval.accumulate()
-      kcoco_eval.summarize()
-      keypoint_coco_metrics = kcoco_eval.stats
-      metrics = np.hstack((metrics, keypoint_coco_metrics))
+      coco_evals = self._evaluate_all_images()
+    for coco_eval in coco_evals.values():
+      coco_eval.summarize()
+    coco_eval = coco_evals['bbox']
+    mcoco_eval = coco_evals.get('segm')
+    metrics = np.hstack([coco_evals[x].stats for x in self._iou_types])
 
     metrics_dict = {}
     for i, name in enumerate(self._metric_names):
@@ -216,6 +213,126 @@ class COCOEvaluator(object):
 
     return metrics_dict
 
+  def _build_coco_eval(self, coco_gt, coco_dt, iou_type):
+    """Builds a `cocoeval.COCOeval` configured for the given IoU type."""
+    if iou_type == 'keypoints':
+      coco_eval = cocoeval.COCOeval(coco_gt, coco_dt, iouType=iou_type,
+                                    kpt_oks_sigmas=self._kpt_oks_sigmas)
+    else:
+      coco_eval = cocoeval.COCOeval(coco_gt, coco_dt, iouType=iou_type)
+    if iou_type == 'bbox':
+      coco_eval.params.maxDets[2] = self.max_num_eval_detections
+    # `COCOeval.evaluate` sorts `maxDets`, which the streaming mode does not
+    # call before accumulating, so both modes use the sorted values.
+    coco_eval.params.maxDets = sorted(coco_eval.params.maxDets)
+    return coco_eval
+
+  def _evaluate_all_images(self):
+    """Runs the per-image COCO evaluation over all the aggregated data.
+
+    Returns:
+      A dictionary of accumulated `cocoeval.COCOeval` keyed by IoU type.
+    """
+    if not self._annotation_file:
+      logging.info('There is no annotation_file in COCOEvaluator.')
+      gt_dataset = coco_utils.convert_groundtruths_to_coco_dataset(
+          self._groundtruths)
+      coco_gt = coco_utils.COCOWrapper(
+          eval_type=('mask' if self._include_mask else 'box'),
+          gt_dataset=gt_dataset)
+    else:
+      logging.info('Using annotation file: %s', self._annotation_file)
+      coco_gt = self._coco_gt
+    coco_predictions = coco_utils.convert_predictions_to_coco_annotations(
+        self._predictions)
+    coco_dt = coco_gt.loadRes(predictions=coco_predictions)
+    image_ids = [ann['image_id'] for ann in coco_predictions]
+
+    coco_evals = {}
+    for iou_type in self._iou_types:
+      coco_eval = self._build_coco_eval(coco_gt, coco_dt, iou_type)
+      coco_eval.params.imgIds = image_ids
+      coco_parallel_eval.evaluate(coco_eval, self._num_processes)
+      coco_eval.accumulate()
+      coco_evals[iou_type] = coco_eval
+    return coco_evals
+
+  def _update_streaming_state(self, groundtruths, predictions):
+    """Matches the detections of one batch to the ground-truths per image."""
+    coco_predictions = coco_utils.convert_predictions_to_coco_annotations(
+        {k: [v] for k, v in six.iteritems(predictions)})
+    image_ids = list(np.unique([ann['image_id'] for ann in coco_predictions]))
+    if self._annotation_file:
+      gt_dataset = {
+          'images': self._coco_gt.loadImgs(image_ids),
+          'categories': self._coco_gt.dataset['categories'],
+          'annotations': self._coco_gt.loadAnns(
+              self._coco_gt.getAnnIds(imgIds=image_ids)),
+      }
+    else:
+      gt_dataset = coco_utils.convert_groundtruths_to_coco_dataset(
+          {k: [v] for k, v in six.iteritems(groundtruths)})
+      self._category_ids.update(x['id'] for x in gt_dataset['categories'])
+    self._image_ids.update(image_ids)
+
+    # pycocotools prints progress for every call, which would flood the logs
+    # when invoked once per batch.
+    with contextlib.redirect_stdout(io.StringIO()):
+      coco_gt = coco_utils.COCOWrapper(
+          eval_type=('mask' if self._include_mask else 'box'),
+          gt_dataset=gt_dataset)
+      coco_dt = coco_gt.loadRes(predictions=coco_predictions)
+      # Detections whose category is absent from the ground-truths of this
+      # batch are still matched, as the category may show up in later ones.
+      category_ids = set(coco_gt.getCatIds())
+      category_ids.update(ann['category_id'] for ann in coco_predictions)
+      for iou_type in self._iou_types:
+        coco_eval = self._build_coco_eval(coco_gt, coco_dt, iou_type)
+        coco_eval.params.imgIds = image_ids
+        coco_eval.params.catIds = sorted(category_ids)
+        coco_eval.evaluate()
+        params = coco_eval.params
+        eval_imgs = iter(coco_eval.evalImgs)
+        for category_id in params.catIds:
+          for area_index in range(len(params.areaRng)):
+            for image_id in params.imgIds:
+              eval_img = next(eval_imgs)
+              if eval_img is not None:
+                self._eval_imgs[iou_type][
+                    (category_id, area_index, image_id)] = eval_img
+
+  def _reduce_streaming_state(self):
+    """Accumulates the per-image matching results of the streaming mode.
+
+    Returns:
+      A dictionary of accumulated `cocoeval.COCOeval` keyed by IoU type.
+    """
+    if self._annotation_file:
+      category_ids = sorted(self._coco_gt.getCatIds())
+    else:
+      category_ids = sorted(self._category_ids)
+    image_ids = sorted(self._image_ids)
+
+    coco_evals = {}
+    for iou_type in self._iou_types:
+      coco_eval = self._build_coco_eval(None, None, iou_type)
+      params = coco_eval.params
+      params.imgIds = image_ids
+      params.catIds = category_ids
+      eval_imgs = self._eval_imgs[iou_type]
+      # Restores the [category, area range, image] layout that
+      # `COCOeval.evaluate` produces and `COCOeval.accumulate` expects.
+      coco_eval.evalImgs = [
+          eval_imgs.get((category_id, area_index, image_id))
+          for category_id in category_ids
+          for area_index in range(len(params.areaRng))
+          for image_id in image_ids
+      ]
+      coco_eval._paramsEval = copy.deepcopy(params)  # pylint: disable=protected-access
+      coco_eval.accumulate()
+      coco_evals[iou_type] = coco_eval
+    return coco_evals
+
   def _retrieve_per_category_metrics(self, coco_eval, prefix=''):
     """Retrieves and per-category metrics and retuns them in a dict.
 
@@ -366,6 +483,17 @@ class COCOEvaluator(object):
       self._process_bbox_predictions(predictions)
     if self._need_rescale_keypoints:
       self._process_keypoints_predictions(predictions)
+
+    if self._streaming:
+      if not self._annotation_file:
+        assert groundtruths
+        for k in self._required_groundtruth_fields:
+          if k not in groundtruths:
+            raise ValueError(
+                'Missing the required key `{}` in groundtruths!'.format(k))
+      self._update_streaming_state(groundtruths, predictions)
+      return
+
     for k, v in six.iteritems(predictions):
       if k not in self._predictions:
         self._predictions[k] = [v]
@@ -0,0 +1,124 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for coco_evaluator."""
+
+from absl.testing import parameterized
+import numpy as np
+import tensorflow as tf, tf_keras
+
+from official.vision.evaluation import coco_evaluator
+
+_IMAGE_SIZE = 64
+_MASK_SIZE = 8
+
+
+def _generate_batch(rng, batch_index, batch_size, num_instances, num_classes,
+                    include_mask):
+  """Generates a batch of random ground-truths and matching predictions."""
+  source_id = np.arange(batch_size) + batch_index * batch_size + 1
+  top_left = rng.uniform(0, _IMAGE_SIZE / 2, [batch_size, num_instances, 2])
+  size = rng.uniform(4, _IMAGE_SIZE / 2, [batch_size, num_instances, 2])
+  boxes = np.concatenate([top_left, top_left + size], axis=-1)
+  classes = rng.integers(1, num_classes + 1, [batch_size, num_instances])
+  groundtruths = {
+      'source_id': tf.constant(source_id, tf.int64),
+      'height': tf.constant([_IMAGE_SIZE] * batch_size, tf.int64),
+      'width': tf.constant([_IMAGE_SIZE] * batch_size, tf.int64),
+      'num_detections': tf.constant(
+          rng.integers(1, num_instances + 1, [batch_size]), tf.int64),
+      'boxes': tf.constant(boxes, tf.float32),
+      'classes': tf.constant(classes, tf.int64),
+  }
+
+  # Detections are jittered ground-truths with some of the classes flipped.
+  detection_boxes = boxes + rng.normal(0, 2, boxes.shape)
+  detection_classes = np.where(
+      rng.uniform(size=classes.shape) < 0.2,
+      rng.integers(1, num_classes + 1, classes.shape), classes)
+  predictions = {
+      'source_id': tf.constant(source_id, tf.int64),
+      'num_detections': tf.constant([num_instances] * batch_size, tf.int64),
+      'detection_boxes': tf.constant(detection_boxes, tf.float32),
+      'detection_classes': tf.constant(detection_classes, tf.int64),
+      'detection_scores': tf.constant(
+          rng.uniform(size=classes.shape), tf.float32),
+      'image_info': tf.constant(
+          [[[_IMAGE_SIZE, _IMAGE_SIZE], [_IMAGE_SIZE, _IMAGE_SIZE], [1, 1],
+            [0, 0]]] * batch_size, tf.float32),
+  }
+
+  if include_mask:
+    masks = []
+    for box in boxes.reshape([-1, 4]).astype(np.int32):
+      mask = np.zeros([_IMAGE_SIZE, _IMAGE_SIZE, 1], np.uint8)
+      mask[box[0]:box[2], box[1]:box[3]] = 255
+      masks.append(tf.io.encode_png(mask).numpy())
+    groundtruths['masks'] = tf.constant(
+        np.array(masks, dtype=object).reshape([batch_size, num_instances]))
+    predictions['detection_masks'] = tf.constant(
+        rng.uniform(0.3, 1.0,
+                    [batch_size, num_instances, _MASK_SIZE, _MASK_SIZE]),
+        tf.float32)
+  return groundtruths, predictions
+
+
+class COCOEvaluatorTest(tf.test.TestCase, parameterized.TestCase):
+
+  @parameterized.parameters((False, 100), (True, 100), (False, 5))
+  def test_streaming_matches_default_mode(self, include_mask,
+                                          max_num_eval_detections):
+    rng = np.random.default_rng(0)
+    batches = [
+        _generate_batch(rng, i, batch_size=4, num_instances=6, num_classes=3,
+                        include_mask=include_mask) for i in range(3)
+    ]
+
+    results = []
+    for streaming in (False, True):
+      evaluator = coco_evaluator.COCOEvaluator(
+          annotation_file=None,
+          include_mask=include_mask,
+          need_rescale_bboxes=False,
+          max_num_eval_detections=max_num_eval_detections,
+          streaming=streaming)
+      for groundtruths, predictions in batches:
+        evaluator.update_state(groundtruths, predictions)
+      results.append(evaluator.result())
+
+    self.assertLen(results[1], 24 if include_mask else 12)
+    # `COCOeval.summarize` reports the AP at 100 detections only.
+    if max_num_eval_detections == 100:
+      self.assertGreater(results[0]['AP'], 0.0)
+    self.assertEqual(results[0], results[1])
+
+  def test_streaming_reset_states(self):
+    rng = np.random.default_rng(1)
+    groundtruths, predictions = _generate_batch(
+        rng, 0, batch_size=2, num_instances=3, num_classes=2,
+        include_mask=False)
+    evaluator = coco_evaluator.COCOEvaluator(
+        annotation_file=None,
+        include_mask=False,
+        need_rescale_bboxes=False,
+        streaming=True)
+    evaluator.update_state(groundtruths, predictions)
+    first = evaluator.result()
+    evaluator.update_state(groundtruths, predictions)
+    second = evaluator.result()
+    self.assertEqual(first, second)
+
+
+if __name__ == '__main__':
+  tf.test.main()
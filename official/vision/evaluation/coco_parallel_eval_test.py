@@ -0,0 +1,108 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for coco_parallel_eval."""
+
+from absl.testing import parameterized
+import numpy as np
+from pycocotools import cocoeval
+from pycocotools import mask as mask_api
+import tensorflow as tf, tf_keras
+
+from official.vision.evaluation import coco_parallel_eval
+from official.vision.evaluation import coco_utils
+
+_IMAGE_SIZE = 64
+
+
+def _random_annotation(rng, image_id, category_id):
+  x, y = rng.uniform(0, _IMAGE_SIZE / 2, [2])
+  w, h = rng.uniform(4, _IMAGE_SIZE / 2, [2])
+  mask = np.zeros([_IMAGE_SIZE, _IMAGE_SIZE], np.uint8)
+  mask[int(y):int(y + h), int(x):int(x + w)] = 1
+  return {
+      'image_id': image_id,
+      'category_id': category_id,
+      'bbox': [x, y, w, h],
+      'area': w * h,
+      'iscrowd': int(rng.uniform() < 0.05),
+      'segmentation': mask_api.encode(np.asfortranarray(mask)),
+  }
+
+
+def _build_coco(rng, num_images, num_categories, eval_type):
+  """Builds random ground-truths and detections with pycocotools."""
+  groundtruths = []
+  detections = []
+  for image_id in range(1, num_images + 1):
+    for _ in range(rng.integers(0, 8)):
+      groundtruths.append(_random_annotation(
+          rng, image_id, int(rng.integers(1, num_categories + 1))))
+    for _ in range(rng.integers(0, 12)):
+      detection = _random_annotation(
+          rng, image_id, int(rng.integers(1, num_categories + 1)))
+      detection['score'] = rng.uniform()
+      detections.append(detection)
+  for i, ann in enumerate(groundtruths):
+    ann['id'] = i + 1
+  for i, ann in enumerate(detections):
+    ann['id'] = i + 1
+  coco_gt = coco_utils.COCOWrapper(
+      eval_type=eval_type,
+      gt_dataset={
+          'images': [{'id': i, 'height': _IMAGE_SIZE, 'width': _IMAGE_SIZE}
+                     for i in range(1, num_images + 1)],
+          'categories': [{'id': i} for i in range(1, num_categories + 1)],
+          'annotations': groundtruths,
+      })
+  return coco_gt, coco_gt.loadRes(predictions=detections)
+
+
+class CocoParallelEvalTest(tf.test.TestCase, parameterized.TestCase):
+
+  @parameterized.parameters(('bbox', 'box'), ('segm', 'mask'))
+  def test_matches_single_process(self, iou_type, eval_type):
+    coco_gt, coco_dt = _build_coco(
+        np.random.default_rng(0), num_images=40, num_categories=4,
+        eval_type=eval_type)
+
+    expected = cocoeval.COCOeval(coco_gt, coco_dt, iouType=iou_type)
+    expected.evaluate()
+    expected.accumulate()
+    expected.summarize()
+
+    coco_eval = cocoeval.COCOeval(coco_gt, coco_dt, iouType=iou_type)
+    coco_parallel_eval.evaluate(coco_eval, num_processes=3)
+    coco_eval.accumulate()
+    coco_eval.summarize()
+
+    self.assertGreater(expected.stats[0], 0.0)
+    self.assertAllEqual(expected.stats, coco_eval.stats)
+    self.assertAllEqual(expected.eval['precision'], coco_eval.eval['precision'])
+    self.assertAllEqual(expected.eval['recall'], coco_eval.eval['recall'])
+
+  def test_more_processes_than_images(self):
+    coco_gt, coco_dt = _build_coco(
+        np.random.default_rng(1), num_images=2, num_categories=2,
+        eval_type='box')
+    expected = cocoeval.COCOeval(coco_gt, coco_dt, iouType='bbox')
+    expected.evaluate()
+
+    coco_eval = cocoeval.COCOeval(coco_gt, coco_dt, iouType='bbox')
+    coco_parallel_eval.evaluate(coco_eval, num_processes=8)
+    self.assertLen(coco_eval.evalImgs, len(expected.evalImgs))
+
+
+if __name__ == '__main__':
+  tf.test.main()
@@ -29,6 +29,7 @@ import tensorflow as tf, tf_keras
 
 from official.common import dataset_fn
 from official.vision.dataloaders import tf_example_decoder
+from official.vision.evaluation import mask_rle
 from official.vision.ops import box_ops
 from official.vision.ops import mask_ops
 
@@ -160,17 +161,18 @@ def convert_predictions_to_coco_annotations(predictions):
       ).astype(int)
     for j in range(batch_size):
       if 'detection_masks' in predictions:
-        image_masks = mask_ops.paste_instance_masks(
+        image_height = int(predictions['image_info'][i][j, 0, 0])
+        image_width = int(predictions['image_info'][i][j, 0, 1])
+        # Encodes the masks cropped to their boxes, without pasting them on
+        # full image canvases.
+        cropped_masks, offsets = mask_ops.crop_instance_masks(
             predictions['detection_masks'][i][j],
             mask_boxes[i][j],
-            int(predictions['image_info'][i][j, 0, 0]),
-            int(predictions['image_info'][i][j, 0, 1]),
+            image_height,
+            image_width,
         )
-        binary_masks = (image_masks > 0.0).astype(np.uint8)
-        encoded_masks = [
-            mask_api.encode(np.asfortranarray(binary_mask))
-            for binary_mask in list(binary_masks)
-        ]
+        encoded_masks = mask_rle.encode_cropped(
+            cropped_masks, offsets, image_height, image_width)
       for k in range(max_num_detections):
         ann = {}
         ann['image_id'] = predictions['source_id'][i][j]
@@ -0,0 +1,149 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Batched COCO run-length encoding (RLE) of instance masks.
+
+The functions mirror `pycocotools.mask` and produce identical outputs, but work
+on a whole [N, H, W] batch of masks at once instead of one mask at a time:
+  - `encode` only extracts the runs within the non-zero region of each mask,
+    and leaves the string compression to pycocotools.
+  - `encode_cropped` does the same for masks given as crops of the image.
+
+Only pycocotools and numpy are needed here, so that evaluators outside of
+`official.vision` can use this module as well.
+"""
+
+from typing import Any, Dict, List, Sequence
+
+import numpy as np
+from pycocotools import mask as mask_api
+
+Rle = Dict[str, Any]
+
+
+def _crop_run_starts(crop: np.ndarray, top: int, left: int, height: int,
+                     width: int) -> np.ndarray:
+  """Returns where the runs of a mask start, given its non-zero region.
+
+  Args:
+    crop: a numpy array of shape [crop_height, crop_width] holding the region
+      of the mask that may contain non-zero values.
+    top: the row of the mask where `crop` starts.
+    left: the column of the mask where `crop` starts.
+    height: the height of the mask.
+    width: the width of the mask.
+
+  Returns:
+    A sorted int numpy array with the positions in the column-major flattened
+    mask where the value changes.
+  """
+  crop_height, crop_width = crop.shape
+  # Each column of the crop is surrounded by zeros, so that the runs entering
+  # and leaving the crop are detected as well.
+  padded = np.zeros([crop_width, crop_height + 2], bool)
+  padded[:, 1:-1] = np.transpose(crop > 0)
+  columns, rows = np.nonzero(padded[:, 1:] != padded[:, :-1])
+  run_starts = (left + columns) * height + top + rows
+  if top == 0 and crop_height == height:
+    # A run leaving the bottom of a column and one entering the top of the next
+    # column start at the same position, and only form a run if they differ.
+    run_starts, counts = np.unique(run_starts, return_counts=True)
+    run_starts = run_starts[counts == 1]
+  return run_starts[run_starts < height * width]
+
+
+def _runs_to_rles(run_starts: Sequence[np.ndarray], height: int,
+                  width: int) -> List[Rle]:
+  """Converts the sorted run start positions of each mask to compressed RLEs."""
+  if not run_starts:
+    return []
+  size = height * width
+  uncompressed = []
+  for starts in run_starts:
+    # The first run always counts zeros, and is empty if the mask starts
+    # with a one.
+    boundaries = np.concatenate([[0], starts, [size]])
+    uncompressed.append({
+        'size': [height, width],
+        'counts': np.diff(boundaries).tolist(),
+    })
+  return mask_api.frPyObjects(uncompressed, height, width)
+
+
+def encode(masks: np.ndarray) -> List[Rle]:
+  """Encodes a batch of binary masks to COCO RLEs.
+
+  The non-zero region of every mask is located with one vectorized pass over
+  the batch, and the runs are only extracted within that region.
+
+  Args:
+    masks: a numpy array of shape [N, H, W]. Non-zero values are foreground.
+
+  Returns:
+    A list of N RLEs, identical to calling `pycocotools.mask.encode` on each of
+    the masks.
+  """
+  masks = np.asarray(masks)
+  if masks.ndim != 3:
+    raise ValueError('`masks` must be of rank 3, got shape {}.'.format(
+        masks.shape))
+  num_masks, height, width = masks.shape
+  non_zero_rows = np.any(masks, axis=2)
+  non_zero_columns = np.any(masks, axis=1)
+  run_starts = []
+  for i in range(num_masks):
+    rows = np.nonzero(non_zero_rows[i])[0]
+    if not rows.size:
+      run_starts.append(np.zeros([0], np.int64))
+      continue
+    columns = np.nonzero(non_zero_columns[i])[0]
+    top, bottom = rows[0], rows[-1] + 1
+    left, right = columns[0], columns[-1] + 1
+    run_starts.append(_crop_run_starts(
+        masks[i, top:bottom, left:right], top, left, height, width))
+  return _runs_to_rles(run_starts, height, width)
+
+
+def encode_cropped(cropped_masks: Sequence[np.ndarray], offsets: np.ndarray,
+                   height: int, width: int) -> List[Rle]:
+  """Encodes masks given as crops placed at offsets of an image to COCO RLEs.
+
+  This is the same as pasting every crop onto a zero [height, width] canvas
+  and calling `encode`, without materializing the canvases.
+
+  Args:
+    cropped_masks: a list of N numpy arrays of shape [crop_height, crop_width].
+      Non-zero values are foreground.
+    offsets: an int numpy array of shape [N, 2] with the [y, x] position of the
+      top-left corner of each crop in the image. Crops must lie within the
+      image.
+    height: the height of the image.
+    width: the width of the image.
+
+  Returns:
+    A list of N RLEs.
+  """
+  if len(cropped_masks) != len(offsets):
+    raise ValueError(
+        '`cropped_masks` and `offsets` must have the same length, got {} and '
+        '{}.'.format(len(cropped_masks), len(offsets)))
+  run_starts = []
+  for crop, (top, left) in zip(cropped_masks, offsets):
+    crop = np.asarray(crop)
+    if not crop.size:
+      run_starts.append(np.zeros([0], np.int64))
+      continue
+    run_starts.append(_crop_run_starts(crop, int(top), int(left), height,
+                                       width))
+  return _runs_to_rles(run_starts, height, width)
@@ -0,0 +1,94 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for mask_rle."""
+
+from absl.testing import parameterized
+import numpy as np
+from pycocotools import mask as mask_api
+import tensorflow as tf, tf_keras
+
+from official.vision.evaluation import mask_rle
+
+
+def _random_box_masks(rng, num_masks, height, width):
+  masks = np.zeros([num_masks, height, width], np.uint8)
+  for i in range(num_masks):
+    top, bottom = np.sort(rng.integers(0, height + 1, [2]))
+    left, right = np.sort(rng.integers(0, width + 1, [2]))
+    masks[i, top:bottom, left:right] = 1
+  return masks
+
+
+class MaskRleTest(tf.test.TestCase, parameterized.TestCase):
+
+  @parameterized.parameters(
+      ((12, 37, 53), 0.5),
+      ((12, 37, 53), 0.95),
+      ((4, 1, 1), 0.5),
+      ((4, 3, 1), 0.5),
+      ((4, 1, 5), 0.5),
+      ((0, 8, 8), 0.5),
+  )
+  def test_encode_matches_pycocotools(self, shape, threshold):
+    rng = np.random.default_rng(0)
+    masks = (rng.uniform(size=shape) > threshold).astype(np.uint8)
+    if shape[0]:
+      masks[0] = 1
+      masks[-1] = 0
+    expected = [mask_api.encode(np.asfortranarray(m)) for m in masks]
+    self.assertEqual(mask_rle.encode(masks), expected)
+
+  def test_encode_non_binary_masks(self):
+    masks = np.zeros([2, 6, 6], np.float32)
+    masks[0, 1:3, 2:5] = 0.7
+    masks[1, :, 4:] = 3.0
+    expected = [
+        mask_api.encode(np.asfortranarray((m > 0).astype(np.uint8)))
+        for m in masks
+    ]
+    self.assertEqual(mask_rle.encode(masks), expected)
+
+  def test_encode_invalid_rank(self):
+    with self.assertRaises(ValueError):
+      mask_rle.encode(np.zeros([4, 4], np.uint8))
+
+  @parameterized.parameters(((20, 30),), ((1, 30),), ((20, 1),))
+  def test_encode_cropped_matches_encode(self, image_size):
+    rng = np.random.default_rng(2)
+    height, width = image_size
+    cropped_masks = []
+    offsets = []
+    for _ in range(10):
+      top = rng.integers(0, height)
+      left = rng.integers(0, width)
+      crop_height = rng.integers(0, height - top + 1)
+      crop_width = rng.integers(0, width - left + 1)
+      cropped_masks.append(
+          (rng.uniform(size=[crop_height, crop_width]) > 0.4).astype(np.uint8))
+      offsets.append([top, left])
+    cropped_masks.append(np.ones([height, width], np.uint8))
+    offsets.append([0, 0])
+    offsets = np.array(offsets)
+
+    masks = np.zeros([len(cropped_masks), height, width], np.uint8)
+    for i, (crop, (top, left)) in enumerate(zip(cropped_masks, offsets)):
+      masks[i, top:top + crop.shape[0], left:left + crop.shape[1]] = crop
+    self.assertEqual(
+        mask_rle.encode_cropped(cropped_masks, offsets, height, width),
+        mask_rle.encode(masks))
+
+
+if __name__ == '__main__':
+  tf.test.main()
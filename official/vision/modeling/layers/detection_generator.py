@@ -748,6 +748,86 @@ def _generate_detections_batched(
   return nmsed_boxes, nmsed_scores, nmsed_classes, valid_detections
 
 
+def _generate_detections_v4(
+    boxes: tf.Tensor,
+    scores: tf.Tensor,
+    classes: tf.Tensor,
+    pre_nms_score_threshold: float,
+    nms_iou_threshold: float,
+    max_num_detections: int,
+) -> Tuple[tf.Tensor, tf.Tensor, tf.Tensor, tf.Tensor]:
+  """Generates the detections with one class-aware NMS over the whole batch.
+
+  The candidate boxes of every class are shifted to a disjoint range of
+  coordinates, so that boxes of different classes never overlap, and a single
+  tiled `nms.sorted_non_max_suppression_padded` runs on the candidates of all
+  the classes and images.
+
+  Args:
+    boxes: A `tf.Tensor` with shape `[batch_size, K, 4]` of the decoded
+      candidate boxes, sorted by decreasing score.
+    scores: A `tf.Tensor` with shape `[batch_size, K]` of the candidate scores,
+      sorted in decreasing order.
+    classes: An `int` `tf.Tensor` with shape `[batch_size, K]` of the candidate
+      classes.
+    pre_nms_score_threshold: A `float` representing the threshold for deciding
+      when to remove boxes based on score.
+    nms_iou_threshold: A `float` representing the threshold for deciding whether
+      boxes overlap too much with respect to IOU.
+    max_num_detections: A `scalar` representing maximum number of boxes retained
+      over all classes.
+
+  Returns:
+    nms_boxes: A `float` tf.Tensor of shape [batch_size, max_num_detections, 4]
+      representing top detected boxes in [y1, x1, y2, x2].
+    nms_scores: A `float` tf.Tensor of shape [batch_size, max_num_detections]
+      representing sorted confidence scores for detected boxes. The values are
+      between [0, 1].
+    nms_classes: An `int` tf.Tensor of shape [batch_size, max_num_detections]
+      representing classes for detected boxes.
+    valid_detections: An `int` tf.Tensor of shape [batch_size] only the top
+      `valid_detections` boxes are valid detections.
+  """
+  with tf.name_scope('generate_detections'):
+    is_candidate = tf.greater(scores, pre_nms_score_threshold)
+    # The scores are sorted, so NMS only visits the candidates up to the last
+    # one above the threshold in the batch, and at least `max_num_detections`
+    # boxes to select them from.
+    num_candidates = tf.reduce_max(
+        tf.reduce_sum(tf.cast(is_candidate, tf.int32), axis=1)
+    )
+    num_candidates = tf.maximum(
+        num_candidates, tf.minimum(max_num_detections, tf.shape(scores)[1])
+    )
+    boxes = tf.cast(boxes[:, :num_candidates], tf.float32)
+    scores = tf.cast(scores[:, :num_candidates], tf.float32)
+    classes = classes[:, :num_candidates]
+    is_candidate = is_candidate[:, :num_candidates]
+    # Shifts the boxes to positive coordinates, as NMS ignores the all zero
+    # boxes, and the boxes of every class by more than the range of the
+    # coordinates.
+    min_coordinate = tf.reduce_min(boxes)
+    class_offset = tf.reduce_max(boxes) - min_coordinate + 1.0
+    nms_boxes = (
+        boxes
+        - min_coordinate
+        + 1.0
+        + class_offset * tf.cast(classes[..., tf.newaxis], tf.float32)
+    )
+    nms_boxes *= tf.cast(is_candidate[..., tf.newaxis], tf.float32)
+    indices, valid = nms.sorted_non_max_suppression_padded_indices(
+        nms_boxes, max_num_detections, nms_iou_threshold
+    )
+    nmsed_boxes = tf.gather(boxes, indices, batch_dims=1)
+    nmsed_boxes *= tf.cast(valid[..., tf.newaxis], nmsed_boxes.dtype)
+    nmsed_scores = tf.gather(scores, indices, batch_dims=1)
+    nmsed_scores *= tf.cast(valid, nmsed_scores.dtype)
+    nmsed_classes = tf.gather(classes, indices, batch_dims=1)
+    nmsed_classes *= tf.cast(valid, nmsed_classes.dtype)
+    valid_detections = tf.reduce_sum(tf.cast(valid, tf.int32), axis=1)
+  return nmsed_boxes, nmsed_scores, nmsed_classes, valid_detections
+
+
 def _generate_detections_tflite_implements_signature(
     config: Dict[str, Any]
 ) -> str:
@@ -1160,7 +1240,10 @@ class MultilevelDetectionGenerator(tf_keras.layers.Layer):
       nms_iou_threshold: A `float` in [0, 1], the NMS IoU threshold.
       max_num_detections: An `int` of the final number of total detections to
         generate.
-      nms_version: A string of `batched`, `v1` or `v2` specifies NMS version
+      nms_version: A string of `batched`, `v1`, `v2`, `v3`, `v4` or `tflite`
+        specifies NMS version. `v4` selects the top `pre_nms_top_k` anchor and
+        class pairs of every level before decoding their boxes, and runs one
+        class-aware NMS over the whole batch.
       use_cpu_nms: A `bool` of whether or not enforce NMS to run on CPU.
       soft_nms_sigma: A `float` representing the sigma parameter for Soft NMS.
         When soft_nms_sigma=0.0, we fall back to standard NMS.
@@ -1415,6 +1498,111 @@ class MultilevelDetectionGenerator(tf_keras.layers.Layer):
     boxes: tf.Tensor = boxes  # pytype: disable=annotation-type-mismatch
     return boxes, tf.sigmoid(scores)
 
+  def _select_pre_nms_top_k_and_decode(
+      self,
+      raw_boxes: Mapping[str, tf.Tensor],
+      raw_scores: Mapping[str, tf.Tensor],
+      anchor_boxes: Mapping[str, tf.Tensor],
+      image_shape: Optional[tf.Tensor],
+  ) -> Tuple[tf.Tensor, tf.Tensor, tf.Tensor]:
+    """Selects the top scoring anchor and class pairs and decodes their boxes.
+
+    The pairs are selected on the logits of every level, without sorting them,
+    and only the boxes of the selected anchors are decoded. The candidates of
+    all the levels are then sorted and reduced to `pre_nms_top_k`.
+
+    Args:
+      raw_boxes: A `dict` of the box tensors of shape `[batch, feature_h,
+        feature_w, num_anchors * 4]` of every level.
+      raw_scores: A `dict` of the logit tensors of shape `[batch, feature_h,
+        feature_w, num_anchors * num_classes]` of every level.
+      anchor_boxes: A `dict` of the anchor boxes of every level.
+      image_shape: An optional `tf.Tensor` of shape of [batch_size, 2] to clip
+        the boxes to.
+
+    Returns:
+      boxes: A `tf.Tensor` of shape `[batch, K, 4]` of the decoded boxes of the
+        candidates, sorted by decreasing score.
+      scores: A `tf.Tensor` of shape `[batch, K]` of the candidate scores.
+      classes: An `int` `tf.Tensor` of shape `[batch, K]` of the candidate
+        classes, without the background class.
+    """
+    pre_nms_top_k = self._config_dict['pre_nms_top_k']
+    boxes = []
+    logits = []
+    classes = []
+    for level in sorted(raw_boxes.keys(), key=int):
+      raw_boxes_i = raw_boxes[level]
+      raw_scores_i = raw_scores[level]
+      batch_size = tf.shape(raw_boxes_i)[0]
+      _, feature_h_i, feature_w_i, num_anchors_per_locations_times_4 = (
+          raw_boxes_i.get_shape().as_list()
+      )
+      num_anchors_per_locations = num_anchors_per_locations_times_4 // 4
+      num_anchors = feature_h_i * feature_w_i * num_anchors_per_locations
+      num_classes = (
+          raw_scores_i.get_shape().as_list()[-1] // num_anchors_per_locations
+      )
+
+      # Removes the implicit background class, and selects the top anchor and
+      # class pairs on the logits, as the sigmoid preserves their order. Fewer
+      # than `pre_nms_top_k` anchors have a higher maximum logit than a top
+      # pair, so the top pairs are among the pairs of the `pre_nms_top_k`
+      # anchors with the highest maximum logit.
+      logits_i = tf.reshape(
+          raw_scores_i, [batch_size, num_anchors, num_classes]
+      )[:, :, 1:]
+      _, anchor_indices = tf.nn.top_k(
+          tf.reduce_max(logits_i, axis=2),
+          k=min(pre_nms_top_k, num_anchors),
+          sorted=False,
+      )
+      logits_i = tf.gather(logits_i, anchor_indices, batch_dims=1)
+      logits_i, indices = tf.nn.top_k(
+          tf.reshape(logits_i, [batch_size, -1]),
+          k=min(pre_nms_top_k, num_anchors * (num_classes - 1)),
+          sorted=False,
+      )
+      anchor_indices = tf.gather(
+          anchor_indices, indices // (num_classes - 1), batch_dims=1
+      )
+
+      # Decodes the boxes of the selected anchors only. The anchor boxes are
+      # shared for all data in a batch.
+      raw_boxes_i = tf.gather(
+          tf.reshape(raw_boxes_i, [batch_size, num_anchors, 4]),
+          anchor_indices,
+          batch_dims=1,
+      )
+      anchor_boxes_i = tf.reshape(anchor_boxes[level], [-1, num_anchors, 4])
+      anchor_boxes_i = tf.gather(
+          tf.broadcast_to(anchor_boxes_i, [batch_size, num_anchors, 4]),
+          anchor_indices,
+          batch_dims=1,
+      )
+      boxes_i = box_ops.decode_boxes(
+          raw_boxes_i,
+          anchor_boxes_i,
+          weights=self._config_dict['box_coder_weights'],
+      )
+      if image_shape is not None:
+        boxes_i = box_ops.clip_boxes(
+            boxes_i, tf.expand_dims(image_shape, axis=1)
+        )
+      boxes.append(boxes_i)
+      logits.append(logits_i)
+      classes.append(indices % (num_classes - 1))
+
+    boxes = tf.concat(boxes, axis=1)
+    logits = tf.concat(logits, axis=1)
+    classes = tf.concat(classes, axis=1)
+    logits, indices = tf.nn.top_k(
+        logits, k=min(pre_nms_top_k, logits.get_shape().as_list()[1])
+    )
+    boxes = tf.gather(boxes, indices, batch_dims=1)
+    classes = tf.gather(classes, indices, batch_dims=1)
+    return boxes, tf.sigmoid(logits), classes
+
   def __call__(
       self,
       raw_boxes: Mapping[str, tf.Tensor],
@@ -1487,15 +1675,22 @@ class MultilevelDetectionGenerator(tf_keras.layers.Layer):
           'num_detections': num_detections,
       }
 
-    if self._config_dict['nms_version'] != 'v3':
-      boxes, scores, attributes = self._decode_multilevel_outputs(
-          raw_boxes, raw_scores, anchor_boxes, image_shape, raw_attributes
-      )
-    else:
+    if self._config_dict['nms_version'] == 'v3':
       attributes = None
       boxes, scores = self._decode_multilevel_outputs_and_pre_nms_top_k(
           raw_boxes, raw_scores, anchor_boxes, image_shape
       )
+    elif (
+        self._config_dict['nms_version'] == 'v4'
+        and self._config_dict['apply_nms']
+        and not self._config_dict['return_decoded']
+    ):
+      # NMS v4 only decodes the boxes of the top scoring anchors.
+      boxes, scores, attributes = None, None, None
+    else:
+      boxes, scores, attributes = self._decode_multilevel_outputs(
+          raw_boxes, raw_scores, anchor_boxes, image_shape, raw_attributes
+      )
 
     decoded_results = {
         'decoded_boxes': boxes,
@@ -1582,6 +1777,21 @@ class MultilevelDetectionGenerator(tf_keras.layers.Layer):
         )
         # Set `nmsed_attributes` to None for v3.
         nmsed_attributes = {}
+      elif self._config_dict['nms_version'] == 'v4':
+        (nmsed_boxes, nmsed_scores, nmsed_classes, valid_detections) = (
+            _generate_detections_v4(
+                *self._select_pre_nms_top_k_and_decode(
+                    raw_boxes, raw_scores, anchor_boxes, image_shape
+                ),
+                pre_nms_score_threshold=self._config_dict[
+                    'pre_nms_score_threshold'
+                ],
+                nms_iou_threshold=self._config_dict['nms_iou_threshold'],
+                max_num_detections=self._config_dict['max_num_detections'],
+            )
+        )
+        # Set `nmsed_attributes` to None for v4.
+        nmsed_attributes = {}
       else:
         raise ValueError(
             'NMS version {} not supported.'.format(
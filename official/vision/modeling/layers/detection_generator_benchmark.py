@@ -0,0 +1,104 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+r"""Benchmarks the NMS versions of `MultilevelDetectionGenerator`.
+
+Compares the latency of the detection generator with every NMS version, on
+random RetinaNet outputs, across image sizes, i.e. anchor counts, and class
+counts.
+
+Usage:
+
+  python -m official.vision.modeling.layers.detection_generator_benchmark \
+    --image_sizes=256,512,1024 --num_classes=10,91 --batch_size=8
+"""
+
+import time
+
+from absl import app
+from absl import flags
+from absl import logging
+import numpy as np
+import tensorflow as tf, tf_keras
+
+from official.vision.modeling.layers import detection_generator
+from official.vision.ops import anchor
+
+_IMAGE_SIZES = flags.DEFINE_list('image_sizes', ['256', '512', '1024'],
+                                 'The image heights/widths.')
+_NUM_CLASSES = flags.DEFINE_list('num_classes', ['10', '91'],
+                                 'The numbers of classes.')
+_NMS_VERSIONS = flags.DEFINE_list('nms_versions',
+                                  ['v1', 'v2', 'batched', 'v4'],
+                                  'The NMS versions.')
+_BATCH_SIZE = flags.DEFINE_integer('batch_size', 8, 'Batch size.')
+_PRE_NMS_TOP_K = flags.DEFINE_integer('pre_nms_top_k', 5000,
+                                      'Number of candidates before NMS.')
+_NUM_ITERATIONS = flags.DEFINE_integer('num_iterations', 10,
+                                       'Number of timed iterations.')
+
+
+def _random_outputs(rng, image_size, num_classes):
+  """Returns random box and class outputs, anchor boxes and image shape."""
+  batch_size = _BATCH_SIZE.value
+  anchor_boxes = anchor.build_anchor_generator(
+      min_level=3,
+      max_level=7,
+      num_scales=3,
+      aspect_ratios=[0.5, 1.0, 2.0],
+      anchor_size=4.0)([image_size, image_size])
+  raw_boxes = {}
+  raw_scores = {}
+  for level, boxes in anchor_boxes.items():
+    height, width, num_anchors_times_4 = boxes.shape
+    num_anchors = num_anchors_times_4 // 4
+    raw_boxes[level] = tf.constant(
+        rng.normal(0.0, 0.3, [batch_size, height, width, 4 * num_anchors]),
+        dtype=tf.float32)
+    # Mostly low scores, as for a trained detector.
+    raw_scores[level] = tf.constant(
+        rng.normal(-5.0, 1.5,
+                   [batch_size, height, width, num_classes * num_anchors]),
+        dtype=tf.float32)
+  anchor_boxes = {
+      level: tf.tile(boxes[tf.newaxis], [batch_size, 1, 1, 1])
+      for level, boxes in anchor_boxes.items()
+  }
+  image_shape = tf.fill([batch_size, 2], float(image_size))
+  return raw_boxes, raw_scores, anchor_boxes, image_shape
+
+
+def main(_):
+  rng = np.random.default_rng(0)
+  for image_size in [int(x) for x in _IMAGE_SIZES.value]:
+    for num_classes in [int(x) for x in _NUM_CLASSES.value]:
+      inputs = _random_outputs(rng, image_size, num_classes)
+      num_anchors = sum(
+          np.prod(boxes.shape[1:]) // 4 for boxes in inputs[0].values())
+      for nms_version in _NMS_VERSIONS.value:
+        generator = detection_generator.MultilevelDetectionGenerator(
+            pre_nms_top_k=_PRE_NMS_TOP_K.value, nms_version=nms_version)
+        fn = tf.function(generator)
+        fn(*inputs)['num_detections'].numpy()
+        start = time.perf_counter()
+        for _ in range(_NUM_ITERATIONS.value):
+          fn(*inputs)['num_detections'].numpy()
+        latency = (time.perf_counter() - start) / _NUM_ITERATIONS.value
+        logging.info('image %5d  anchors %7d  classes %3d  %-8s %9.2f ms',
+                     image_size, num_anchors, num_classes, nms_version,
+                     latency * 1000)
+
+
+if __name__ == '__main__':
+  app.run(main)
@@ -131,6 +131,8 @@ class MultilevelDetectionGeneratorTest(
       ('batched', False, False, None, None, None),
       ('v3', False, True, None, None, None),
       ('v3', False, False, None, None, None),
+      ('v4', False, True, None, None, None),
+      ('v4', False, False, None, None, None),
       ('v2', False, True, None, None, None),
       ('v2', False, False, None, None, None),
       ('v2', False, False, None, None, True),
@@ -267,6 +269,93 @@ class MultilevelDetectionGeneratorTest(
           self.assertEqual(att.numpy().shape,
                            (batch_size, max_num_detections, 1))
 
+  @parameterized.parameters(1, 2)
+  def test_nms_v4_matches_batched_nms(self, batch_size):
+    num_classes = 5
+    anchor_boxes = anchor.build_anchor_generator(
+        min_level=3,
+        max_level=5,
+        num_scales=2,
+        aspect_ratios=[0.5, 1.0, 2.0],
+        anchor_size=4.0)([128, 128])
+    rng = np.random.RandomState(0)
+    raw_boxes = {}
+    raw_scores = {}
+    for level, boxes in anchor_boxes.items():
+      height, width, num_anchors_times_4 = boxes.shape
+      raw_boxes[level] = tf.constant(
+          rng.normal(0.0, 0.3, [batch_size, height, width,
+                                num_anchors_times_4]),
+          dtype=tf.float32)
+      raw_scores[level] = tf.constant(
+          rng.normal(-2.0, 2.0, [
+              batch_size, height, width,
+              num_anchors_times_4 // 4 * num_classes
+          ]),
+          dtype=tf.float32)
+    anchor_boxes = {
+        level: tf.tile(boxes[tf.newaxis], [batch_size, 1, 1, 1])
+        for level, boxes in anchor_boxes.items()
+    }
+    image_shape = tf.constant([[128, 128], [100, 120]][:batch_size],
+                              dtype=tf.float32)
+
+    detections = {}
+    for nms_version in ('batched', 'v4'):
+      generator = detection_generator.MultilevelDetectionGenerator(
+          pre_nms_top_k=100000,
+          pre_nms_score_threshold=0.3,
+          nms_iou_threshold=0.5,
+          max_num_detections=50,
+          nms_version=nms_version)
+      detections[nms_version] = generator(raw_boxes, raw_scores, anchor_boxes,
+                                          image_shape)
+
+    expected, actual = detections['batched'], detections['v4']
+    self.assertAllEqual(actual['num_detections'], expected['num_detections'])
+    self.assertAllClose(actual['detection_scores'],
+                        expected['detection_scores'])
+    self.assertAllClose(actual['detection_boxes'], expected['detection_boxes'],
+                        atol=1e-3)
+    self.assertAllEqual(actual['detection_classes'],
+                        expected['detection_classes'])
+
+  def test_nms_v4_pre_nms_top_k(self):
+    generator = detection_generator.MultilevelDetectionGenerator(
+        pre_nms_top_k=3, max_num_detections=4, nms_version='v4')
+    # 2 levels with 1 anchor per location, and a background class and 2
+    # classes.
+    raw_scores = {
+        '1':
+            tf.constant([[[[0, 3, 1], [0, 2, 5]], [[0, 0, 0], [0, 4, 0]]]],
+                        dtype=tf.float32),
+        '2': tf.constant([[[[0, 0, 6]]]], dtype=tf.float32),
+    }
+    raw_boxes = {
+        '1': tf.zeros([1, 2, 2, 4]),
+        '2': tf.zeros([1, 1, 1, 4]),
+    }
+    anchor_boxes = {
+        '1':
+            tf.constant([[[0, 0, 10, 10], [0, 20, 10, 30]],
+                         [[20, 0, 30, 10], [20, 20, 30, 30]]],
+                        dtype=tf.float32),
+        '2': tf.constant([[[20, 20, 30, 30]]], dtype=tf.float32),
+    }
+    boxes, scores, classes = generator._select_pre_nms_top_k_and_decode(
+        raw_boxes, raw_scores, anchor_boxes, image_shape=None)
+    self.assertAllClose(scores, tf.sigmoid([[6.0, 5.0, 4.0]]))
+    self.assertAllEqual(classes, [[1, 1, 0]])
+    self.assertAllClose(
+        boxes, [[[20, 20, 30, 30], [0, 20, 10, 30], [20, 20, 30, 30]]])
+
+    # The same boxes of different classes do not suppress each other.
+    results = generator(raw_boxes, raw_scores, anchor_boxes, None)
+    self.assertAllEqual(results['num_detections'], [3])
+    self.assertAllClose(results['detection_scores'],
+                        [list(tf.sigmoid([6.0, 5.0, 4.0]).numpy()) + [0.0]])
+    self.assertAllEqual(results['detection_classes'][:, :3], [[2, 2, 1]])
+
   def test_decode_multilevel_outputs_and_pre_nms_top_k(self):
     named_params = {
         'apply_nms': True,
@@ -49,6 +49,73 @@ class MaskUtilsTest(tf.test.TestCase):
         np.array(masks > 0.5, dtype=np.uint8),
         1e-5)
 
+  def testPasteInstanceMasksV3(self):
+    rng = np.random.default_rng(0)
+    image_height = 50
+    image_width = 70
+    masks = rng.uniform(size=(16, 14, 14))
+    detected_boxes = np.concatenate(
+        [rng.uniform(-20, 60, (16, 2)), rng.uniform(1, 40, (16, 2))], axis=1)
+
+    expected = mask_ops.paste_instance_masks(
+        masks, detected_boxes, image_height, image_width)
+    image_masks = mask_ops.paste_instance_masks_v3(
+        masks, detected_boxes, image_height, image_width)
+
+    self.assertEqual(image_masks.shape, expected.shape)
+    # Only pixels rounded differently at the threshold may differ.
+    self.assertLessEqual(np.sum(image_masks != expected), 2)
+
+  def testCropInstanceMasks(self):
+    masks = np.ones((2, 4, 4))
+    detected_boxes = np.array([[2.0, 3.0, 4.0, 4.0], [-10.0, -10.0, 4.0, 4.0]])
+
+    cropped_masks, offsets = mask_ops.crop_instance_masks(
+        masks, detected_boxes, 10, 10)
+
+    self.assertAllEqual(offsets, [[2, 1], [0, 0]])
+    self.assertEqual(cropped_masks[0].shape, (7, 7))
+    self.assertEqual(cropped_masks[1].size, 0)
+    image_masks = mask_ops.paste_cropped_masks(cropped_masks, offsets, 10, 10)
+    self.assertAllEqual(
+        image_masks,
+        mask_ops.paste_instance_masks(masks, detected_boxes, 10, 10))
+
+  def testCropInstanceMasksWithMixedBoxSizes(self):
+    rng = np.random.default_rng(0)
+    image_size = 1024
+    # 99 small boxes and one box covering most of the image.
+    masks = rng.uniform(size=(100, 28, 28))
+    detected_boxes = np.concatenate(
+        [rng.uniform(0, 900, (100, 2)), rng.uniform(8, 60, (100, 2))], axis=1)
+    detected_boxes[37] = [10.0, 10.0, 1000.0, 1000.0]
+
+    cropped_masks, offsets = mask_ops.crop_instance_masks(
+        masks, detected_boxes, image_size, image_size)
+
+    expected = mask_ops.paste_instance_masks(
+        masks, detected_boxes, image_size, image_size)
+    image_masks = mask_ops.paste_cropped_masks(
+        cropped_masks, offsets, image_size, image_size)
+    self.assertLessEqual(np.sum(image_masks != expected), 2)
+
+  def testGroupByCropSize(self):
+    heights = np.array([1000, 10, 20, 10, 1000])
+    widths = np.array([1000, 10, 20, 30, 1100])
+
+    groups = mask_ops._group_by_crop_size(heights, widths)
+
+    # The small crops are resized together, and the crops larger than the
+    # limit alone, so that the small crops are not padded to the large ones.
+    self.assertEqual([group.tolist() for group in groups],
+                     [[1, 3, 2], [0], [4]])
+    for group in groups:
+      padded_pixels = (
+          len(group) * np.max(heights[group]) * np.max(widths[group]))
+      self.assertTrue(
+          len(group) == 1 or
+          padded_pixels <= mask_ops._MAX_PIXELS_PER_CROP_GROUP)
+
   def testInstanceMasksOverlap(self):
     boxes = tf.constant([[[0, 0, 4, 4], [1, 1, 5, 5]]])
     masks = tf.constant([[
@@ -159,14 +159,44 @@ def sorted_non_max_suppression_padded(scores,
     nms_proposals: a tensor with a shape of [batch_size, anchors, 4]. It has
       same dtype as input boxes.
   """
+  indices, valid = sorted_non_max_suppression_padded_indices(
+      boxes, max_output_size, iou_threshold)
+  boxes = tf.gather(tf.cast(boxes, tf.float32), indices, batch_dims=1)
+  boxes = boxes * tf.cast(tf.expand_dims(valid, -1), boxes.dtype)
+  scores = tf.gather(tf.cast(scores, tf.float32), indices, batch_dims=1)
+  scores = scores * tf.cast(valid, scores.dtype)
+  return scores, boxes
+
+
+def sorted_non_max_suppression_padded_indices(boxes,
+                                              max_output_size,
+                                              iou_threshold):
+  """Returns the indices of the boxes selected by non-maximum suppression.
+
+  See `sorted_non_max_suppression_padded` for the assumptions on the inputs.
+  The indices allow to gather other per box tensors, e.g. the classes, along
+  with the selected boxes.
+
+  Args:
+    boxes: a tensor with a shape of [batch_size, anchors, 4].
+    max_output_size: a scalar integer `Tensor` representing the maximum number
+      of boxes to be selected by non max suppression.
+    iou_threshold: a float representing the threshold for deciding whether boxes
+      overlap too much with respect to IOU.
+
+  Returns:
+    indices: an int32 tensor with a shape of [batch_size, max_output_size] of
+      the indices of the selected boxes in `boxes`, in decreasing score order.
+    valid: a bool tensor with a shape of [batch_size, max_output_size], True
+      for the selected boxes and False for the padding.
+  """
   batch_size = tf.shape(boxes)[0]
-  num_boxes = tf.shape(boxes)[1]
+  num_unpadded_boxes = tf.shape(boxes)[1]
+  num_boxes = num_unpadded_boxes
   pad = tf.cast(
       tf.math.ceil(tf.cast(num_boxes, tf.float32) / NMS_TILE_SIZE),
       tf.int32) * NMS_TILE_SIZE - num_boxes
   boxes = tf.pad(tf.cast(boxes, tf.float32), [[0, 0], [0, pad], [0, 0]])
-  scores = tf.pad(
-      tf.cast(scores, tf.float32), [[0, 0], [0, pad]], constant_values=-1)
   num_boxes += pad
 
   def _loop_cond(unused_boxes, unused_threshold, output_size, idx):
@@ -185,19 +215,7 @@ def sorted_non_max_suppression_padded(scores,
           tf.cast(tf.reduce_any(selected_boxes > 0, [2]), tf.int32) *
           tf.expand_dims(tf.range(num_boxes, 0, -1), 0), max_output_size)[0],
       tf.int32)
-  idx = tf.minimum(idx, num_boxes - 1)
-  idx = tf.reshape(
-      idx + tf.reshape(tf.range(batch_size) * num_boxes, [-1, 1]), [-1])
-  boxes = tf.reshape(
-      tf.gather(tf.reshape(boxes, [-1, 4]), idx),
-      [batch_size, max_output_size, 4])
-  boxes = boxes * tf.cast(
-      tf.reshape(tf.range(max_output_size), [1, -1, 1]) < tf.reshape(
-          output_size, [-1, 1, 1]), boxes.dtype)
-  scores = tf.reshape(
-      tf.gather(tf.reshape(scores, [-1, 1]), idx),
-      [batch_size, max_output_size])
-  scores = scores * tf.cast(
-      tf.reshape(tf.range(max_output_size), [1, -1]) < tf.reshape(
-          output_size, [-1, 1]), scores.dtype)
-  return scores, boxes
+  idx = tf.minimum(idx, num_unpadded_boxes - 1)
+  valid = tf.reshape(tf.range(max_output_size), [1, -1]) < tf.reshape(
+      output_size, [-1, 1])
+  return idx, valid
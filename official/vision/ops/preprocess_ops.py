@@ -182,7 +182,9 @@ def resize_and_crop_image(
   2. Pad the rescaled image to the padded_size.
 
   Args:
-    image: a `Tensor` of shape [height, width, 3] representing an image.
+    image: a `Tensor` of shape [height, width, 3] representing an image, or
+      of shape [batch, height, width, 3] representing images of the same
+      size, which are resized and padded together.
     desired_size: a `Tensor` or `int` list/tuple of two elements representing
       [height, width] of the desired actual output image size.
     padded_size: a `Tensor` or `int` list/tuple of two elements representing
@@ -201,8 +203,9 @@ def resize_and_crop_image(
       behaviour is to place it at left top corner.
 
   Returns:
-    output_image: `Tensor` of shape [height, width, 3] where [height, width]
-      equals to `output_size`.
+    output_image: `Tensor` of shape [height, width, 3], or [batch, height,
+      width, 3] for a batch of images, where [height, width] equals to
+      `output_size`.
     image_info: a 2D `Tensor` that encodes the information of the image and the
       applied preprocessing. It is in the format of
       [[original_height, original_width], [desired_height, desired_width],
@@ -212,7 +215,7 @@ def resize_and_crop_image(
       scaled dimension / original dimension.
   """
   with tf.name_scope('resize_and_crop_image'):
-    image_size = tf.cast(tf.shape(image)[0:2], tf.float32)
+    image_size = tf.cast(tf.shape(image)[-3:-1], tf.float32)
 
     random_jittering = (
         isinstance(aug_scale_min, tf.Tensor)
@@ -263,6 +266,7 @@ def resize_and_crop_image(
 
     if random_jittering:
       scaled_image = scaled_image[
+          ...,
           offset[0] : offset[0] + desired_size[0],
           offset[1] : offset[1] + desired_size[1],
           :,
@@ -271,7 +275,7 @@ def resize_and_crop_image(
     output_image = scaled_image
     if padded_size is not None:
       if centered_crop:
-        scaled_image_size = tf.cast(tf.shape(scaled_image)[0:2], tf.int32)
+        scaled_image_size = tf.cast(tf.shape(scaled_image)[-3:-1], tf.int32)
         output_image = tf.image.pad_to_bounding_box(
             scaled_image,
             tf.maximum((padded_size[0] - scaled_image_size[0]) // 2, 0),
@@ -14,12 +14,14 @@
 
 """Detection input and model functions for serving/inference."""
 
+import functools
 import math
-from typing import Mapping, Tuple
+from typing import Any, List, Mapping, Optional, Sequence, Tuple
 
 from absl import logging
 import tensorflow as tf, tf_keras
 
+from official.core import config_definitions as cfg
 from official.vision import configs
 from official.vision.modeling import factory
 from official.vision.ops import anchor
@@ -31,17 +33,66 @@ from official.vision.serving import export_base
 class DetectionModule(export_base.ExportModule):
   """Detection Module."""
 
-  @property
-  def _padded_size(self):
+  def __init__(
+      self,
+      params: cfg.ExperimentConfig,
+      *,
+      batched_preprocessing: bool = False,
+      bucket_image_sizes: Optional[Sequence[Sequence[int]]] = None,
+      **kwargs: Any,
+  ):
+    """Initializes a detection module for export.
+
+    Args:
+      params: Experiment params.
+      batched_preprocessing: Whether to normalize, resize and pad the images of
+        a batch together and to embed the anchor boxes as constants computed
+        at export time, instead of preprocessing every image and building its
+        anchor boxes in `tf.map_fn`. Ragged batches of images with different
+        sizes are still preprocessed one image at a time.
+      bucket_image_sizes: Optional [height, width] input image sizes, no
+        larger than `input_image_size`, to serve small images at. Every batch
+        is resized and padded to the smallest of these sizes and
+        `input_image_size` that holds its images, and runs the model with the
+        padded size and anchor boxes of that bucket, instead of always running
+        it at `input_image_size`. Ignored by the `tflite` input type.
+      **kwargs: The arguments of `export_base.ExportModule`.
+    """
+    self._batched_preprocessing = batched_preprocessing
+    # The anchor boxes of every padded size, in batched preprocessing mode.
+    self._anchor_boxes = {}
+    self._bucket_image_sizes = []
+    if bucket_image_sizes:
+      input_image_size = list(kwargs['input_image_size'])
+      for image_size in sorted(bucket_image_sizes, key=lambda s: s[0] * s[1]):
+        if (
+            image_size[0] > input_image_size[0]
+            or image_size[1] > input_image_size[1]
+        ):
+          raise ValueError(
+              'The bucket image size {} is larger than the input image size '
+              '{}.'.format(image_size, input_image_size)
+          )
+        if list(image_size) != input_image_size:
+          self._bucket_image_sizes.append(list(image_size))
+      if self._bucket_image_sizes:
+        self._bucket_image_sizes.append(input_image_size)
+    super().__init__(params, **kwargs)
+
+  def _get_padded_size(self, input_image_size: List[int]) -> List[int]:
     if self.params.task.train_data.parser.pad:
       return preprocess_ops.compute_padded_size(
-          self._input_image_size, 2**self.params.task.model.max_level
+          input_image_size, 2**self.params.task.model.max_level
       )
     else:
-      return self._input_image_size
+      return input_image_size
+
+  @property
+  def _padded_size(self):
+    return self._get_padded_size(self._input_image_size)
 
   def _build_model(self):
-    nms_versions_supporting_dynamic_batch_size = {'batched', 'v2', 'v3'}
+    nms_versions_supporting_dynamic_batch_size = {'batched', 'v2', 'v3', 'v4'}
     nms_version = self.params.task.model.detection_generator.nms_version
     if (
         self._batch_size is None
@@ -54,9 +105,15 @@ class DetectionModule(export_base.ExportModule):
       )
       self.params.task.model.detection_generator.nms_version = 'batched'
 
-    input_specs = tf_keras.layers.InputSpec(
-        shape=[self._batch_size, *self._padded_size, 3]
-    )
+    if self._bucket_image_sizes:
+      # The model runs at the padded size of every bucket.
+      input_specs = tf_keras.layers.InputSpec(
+          shape=[self._batch_size, None, None, 3]
+      )
+    else:
+      input_specs = tf_keras.layers.InputSpec(
+          shape=[self._batch_size, *self._padded_size, 3]
+      )
 
     if isinstance(self.params.task.model, configs.maskrcnn.MaskRCNN):
       model = factory.build_maskrcnn(
@@ -75,7 +132,7 @@ class DetectionModule(export_base.ExportModule):
 
     return model
 
-  def _build_anchor_boxes(self):
+  def _build_anchor_boxes(self, padded_size: Optional[List[int]] = None):
     """Builds and returns anchor boxes."""
     model_params = self.params.task.model
     input_anchor = anchor.build_anchor_generator(
@@ -85,10 +142,51 @@ class DetectionModule(export_base.ExportModule):
         aspect_ratios=model_params.anchor.aspect_ratios,
         anchor_size=model_params.anchor.anchor_size,
     )
-    return input_anchor(image_size=self._padded_size)
+    return input_anchor(image_size=padded_size or self._padded_size)
+
+  def _get_anchor_boxes(self, padded_size: Optional[List[int]] = None):
+    """Returns the anchor boxes, computed once in batched preprocessing mode."""
+    if not self._batched_preprocessing:
+      return self._build_anchor_boxes(padded_size)
+    padded_size = padded_size or self._padded_size
+    key = tuple(padded_size)
+    if key not in self._anchor_boxes:
+      # Computed eagerly, the anchor boxes are captured as constants by the
+      # serving functions.
+      with tf.init_scope():
+        self._anchor_boxes[key] = self._build_anchor_boxes(padded_size)
+    return self._anchor_boxes[key]
+
+  def _build_batched_inputs(
+      self, images, input_image_size: Optional[List[int]] = None
+  ):
+    """Builds detection model inputs for a batch of same-sized images."""
+    input_image_size = input_image_size or self._input_image_size
+    padded_size = self._get_padded_size(input_image_size)
+    images = tf.cast(images, dtype=tf.float32)
+    images = preprocess_ops.normalize_image(
+        images, offset=preprocess_ops.MEAN_RGB, scale=preprocess_ops.STDDEV_RGB
+    )
+    images, image_info = preprocess_ops.resize_and_crop_image(
+        images,
+        input_image_size,
+        padded_size=padded_size,
+        aug_scale_min=1.0,
+        aug_scale_max=1.0,
+        keep_aspect_ratio=self.params.task.train_data.parser.keep_aspect_ratio,
+    )
+    batch_size = tf.shape(images)[0]
+    image_info = tf.tile(image_info[tf.newaxis], [batch_size, 1, 1])
+    anchor_boxes = {
+        level: tf.tile(boxes[tf.newaxis], [batch_size, 1, 1, 1])
+        for level, boxes in self._get_anchor_boxes(padded_size).items()
+    }
+    return images, anchor_boxes, image_info
 
-  def _build_inputs(self, image):
+  def _build_inputs(self, image, input_image_size: Optional[List[int]] = None):
     """Builds detection model inputs for serving."""
+    input_image_size = input_image_size or self._input_image_size
+    padded_size = self._get_padded_size(input_image_size)
 
     if isinstance(image, tf.RaggedTensor):
       image = image.to_tensor()
@@ -101,13 +199,13 @@ class DetectionModule(export_base.ExportModule):
 
     image, image_info = preprocess_ops.resize_and_crop_image(
         image,
-        self._input_image_size,
-        padded_size=self._padded_size,
+        input_image_size,
+        padded_size=padded_size,
         aug_scale_min=1.0,
         aug_scale_max=1.0,
         keep_aspect_ratio=self.params.task.train_data.parser.keep_aspect_ratio,
     )
-    anchor_boxes = self._build_anchor_boxes()
+    anchor_boxes = self._build_anchor_boxes(padded_size)
 
     return image, anchor_boxes, image_info
 
@@ -137,12 +235,14 @@ class DetectionModule(export_base.ExportModule):
     return detections_dict
 
   def preprocess(
-      self, images: tf.Tensor
+      self, images: tf.Tensor, input_image_size: Optional[List[int]] = None
   ) -> Tuple[tf.Tensor, Mapping[str, tf.Tensor], tf.Tensor]:
     """Preprocesses inputs to be suitable for the model.
 
     Args:
       images: The images tensor.
+      input_image_size: Optional [height, width] to resize the images to,
+        `input_image_size` of the module by default.
 
     Returns:
       images: The images tensor cast to float.
@@ -150,11 +250,16 @@ class DetectionModule(export_base.ExportModule):
       image_info: Tensor containing the details of the image resizing.
     """
     model_params = self.params.task.model
+    input_image_size = input_image_size or self._input_image_size
+    padded_size = self._get_padded_size(input_image_size)
     with tf.device('cpu:0'):
+      if self._batched_preprocessing and not isinstance(
+          images, tf.RaggedTensor
+      ):
+        return self._build_batched_inputs(images, input_image_size)
+
       # Tensor Specs for map_fn outputs (images, anchor_boxes, and image_info).
-      images_spec = tf.TensorSpec(
-          shape=self._padded_size + [3], dtype=tf.float32
-      )
+      images_spec = tf.TensorSpec(shape=padded_size + [3], dtype=tf.float32)
 
       num_anchors = (
           model_params.anchor.num_scales
@@ -165,8 +270,8 @@ class DetectionModule(export_base.ExportModule):
       for level in range(model_params.min_level, model_params.max_level + 1):
         anchor_level_spec = tf.TensorSpec(
             shape=[
-                math.ceil(self._padded_size[0] / 2**level),
-                math.ceil(self._padded_size[1] / 2**level),
+                math.ceil(padded_size[0] / 2**level),
+                math.ceil(padded_size[1] / 2**level),
                 num_anchors,
             ],
             dtype=tf.float32,
@@ -178,7 +283,9 @@ class DetectionModule(export_base.ExportModule):
       images, anchor_boxes, image_info = tf.nest.map_structure(
           tf.identity,
           tf.map_fn(
-              self._build_inputs,
+              functools.partial(
+                  self._build_inputs, input_image_size=input_image_size
+              ),
               elems=images,
               fn_output_signature=(
                   images_spec,
@@ -191,6 +298,18 @@ class DetectionModule(export_base.ExportModule):
 
       return images, anchor_boxes, image_info
 
+  def _bucket_index(self, images: tf.Tensor) -> tf.Tensor:
+    """Returns the index of the smallest bucket holding the images."""
+    if isinstance(images, tf.RaggedTensor):
+      shape = images.bounding_shape()
+    else:
+      shape = tf.shape(images)
+    bucket_sizes = tf.constant(self._bucket_image_sizes, dtype=shape.dtype)
+    fits = tf.reduce_all(shape[1:3] <= bucket_sizes, axis=1)
+    # The largest bucket, `input_image_size`, serves the larger images.
+    fits = tf.concat([fits[:-1], [True]], axis=0)
+    return tf.argmax(tf.cast(fits, tf.int32), output_type=tf.int32)
+
   def serve(self, images: tf.Tensor):
     """Casts image to float and runs inference.
 
@@ -200,14 +319,29 @@ class DetectionModule(export_base.ExportModule):
     Returns:
       Tensor holding detection output logits.
     """
+    if not self._bucket_image_sizes or self._input_type == 'tflite':
+      return self._serve(images, self._input_image_size)
+    # Every bucket traces its own model function, with its own anchor boxes.
+    return tf.switch_case(
+        self._bucket_index(images),
+        [
+            functools.partial(self._serve, images, image_size)
+            for image_size in self._bucket_image_sizes
+        ],
+    )
+
+  def _serve(self, images: tf.Tensor, input_image_size: List[int]):
+    """Runs inference on images resized to `input_image_size`."""
 
     # Skip image preprocessing when input_type is tflite so it is compatible
     # with TFLite quantization.
     if self._input_type != 'tflite':
-      images, anchor_boxes, image_info = self.preprocess(images)
+      images, anchor_boxes, image_info = self.preprocess(
+          images, input_image_size
+      )
     else:
       with tf.device('cpu:0'):
-        anchor_boxes = self._build_anchor_boxes()
+        anchor_boxes = self._get_anchor_boxes()
         # image_info is a 3D tensor of shape [batch_size, 4, 2]. It is in the
         # format of [[original_height, original_width],
         # [desired_height, desired_width], [y_scale, x_scale],
@@ -0,0 +1,118 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+r"""Benchmarks the preprocessing of the detection serving module.
+
+Compares the latency of `DetectionModule.preprocess`, or of the whole serving
+function with --include_model, with per image preprocessing in `tf.map_fn`
+and with batched preprocessing and precomputed anchor boxes. With
+--bucket_image_sizes, also compares the latency of the whole serving function
+at `input_image_size` and at the smallest bucket holding the images.
+
+Usage:
+
+  python -m official.vision.serving.detection_benchmark \
+    --experiment=retinanet_resnetfpn_coco --batch_sizes=1,8,64 \
+    --image_size=240,320 --bucket_image_sizes=320x320,480x480
+"""
+
+import time
+
+from absl import app
+from absl import flags
+from absl import logging
+import numpy as np
+import tensorflow as tf, tf_keras
+
+from official.core import exp_factory
+from official.vision import registry_imports  # pylint: disable=unused-import
+from official.vision.serving import detection
+
+_EXPERIMENT = flags.DEFINE_string('experiment', 'retinanet_resnetfpn_coco',
+                                  'The detection experiment.')
+_INPUT_IMAGE_SIZE = flags.DEFINE_list('input_image_size', ['640', '640'],
+                                      'The height,width of the model input.')
+_IMAGE_SIZE = flags.DEFINE_list('image_size', ['480', '640'],
+                                'The height,width of the served images.')
+_BATCH_SIZES = flags.DEFINE_list('batch_sizes', ['1', '8', '64'],
+                                 'The batch sizes.')
+_INCLUDE_MODEL = flags.DEFINE_boolean(
+    'include_model', False,
+    'Whether to time the whole serving function rather than preprocessing.')
+_NUM_RUNS = flags.DEFINE_integer('num_runs', 10, 'Number of timed runs.')
+_BUCKET_IMAGE_SIZES = flags.DEFINE_list(
+    'bucket_image_sizes', [],
+    'The heightxwidth bucket image sizes, e.g. 320x320,480x480.')
+
+
+def _time(fn, images):
+  """Returns the median latency of `fn`, in milliseconds."""
+  tf.nest.map_structure(lambda x: x.numpy(), fn(images))
+  latencies = []
+  for _ in range(_NUM_RUNS.value):
+    start = time.perf_counter()
+    tf.nest.map_structure(lambda x: x.numpy(), fn(images))
+    latencies.append(time.perf_counter() - start)
+  return 1000 * np.median(latencies)
+
+
+def main(_):
+  params = exp_factory.get_exp_config(_EXPERIMENT.value)
+  input_image_size = [int(x) for x in _INPUT_IMAGE_SIZE.value]
+  image_size = [int(x) for x in _IMAGE_SIZE.value]
+  for batch_size in [int(x) for x in _BATCH_SIZES.value]:
+    module = detection.DetectionModule(
+        params, batch_size=batch_size, input_image_size=input_image_size)
+    batched_module = detection.DetectionModule(
+        params,
+        batched_preprocessing=True,
+        batch_size=batch_size,
+        input_image_size=input_image_size,
+        model=module.model)
+    images = tf.constant(
+        np.random.RandomState(0).randint(
+            0, 256, size=[batch_size] + image_size + [3], dtype=np.uint8))
+    latencies = []
+    for m in (module, batched_module):
+      fn = m.serve if _INCLUDE_MODEL.value else m.preprocess
+      latencies.append(_time(tf.function(fn), images))
+    logging.info(
+        'batch size %3d  per image %9.2f ms  batched %9.2f ms  speedup %.1fx',
+        batch_size, latencies[0], latencies[1], latencies[0] / latencies[1])
+
+    if _BUCKET_IMAGE_SIZES.value:
+      bucketed_module = detection.DetectionModule(
+          params,
+          bucket_image_sizes=[[int(x) for x in size.split('x')]
+                              for size in _BUCKET_IMAGE_SIZES.value],
+          batch_size=batch_size,
+          input_image_size=input_image_size)
+      # Shares the weights, as the bucketed model takes any image size.
+      unbucketed_module = detection.DetectionModule(
+          params,
+          batch_size=batch_size,
+          input_image_size=input_image_size,
+          model=bucketed_module.model)
+      latencies = [
+          _time(tf.function(m.serve), images)
+          for m in (unbucketed_module, bucketed_module)
+      ]
+      logging.info(
+          'batch size %3d  unbucketed %9.2f ms  bucketed %9.2f ms  '
+          'speedup %.1fx', batch_size, latencies[0], latencies[1],
+          latencies[0] / latencies[1])
+
+
+if __name__ == '__main__':
+  app.run(main)
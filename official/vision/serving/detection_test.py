@@ -153,6 +153,81 @@ class DetectionExportTest(tf.test.TestCase, parameterized.TestCase):
     self.assertAllEqual(outputs['num_detections'].numpy(),
                         expected_outputs['num_detections'].numpy())
 
+  @parameterized.parameters(
+      ('retinanet_resnetfpn_coco', [480, 320]),
+      ('maskrcnn_resnetfpn_coco', [640, 640]),
+  )
+  def test_batched_preprocessing(self, experiment_name, image_size):
+    params = exp_factory.get_exp_config(experiment_name)
+    params.task.model.backbone.resnet.model_id = 18
+    module = detection.DetectionModule(
+        params, batch_size=2, input_image_size=[384, 384])
+    batched_module = detection.DetectionModule(
+        params,
+        batched_preprocessing=True,
+        batch_size=2,
+        input_image_size=[384, 384],
+        model=module.model)
+    images = tf.constant(
+        np.random.RandomState(0).randint(
+            0, 256, size=[2] + image_size + [3], dtype=np.uint8))
+
+    expected_outputs = module.preprocess(images)
+    outputs = tf.function(batched_module.preprocess)(images)
+    self.assertAllClose(outputs, expected_outputs)
+
+    signatures = batched_module.get_inference_signatures(
+        {'image_tensor': 'serving_default'})
+    expected_detections = module.serve(images)
+    detections = signatures['serving_default'](images)
+    self.assertAllClose(detections['detection_boxes'],
+                        expected_detections['detection_boxes'])
+    self.assertAllEqual(detections['num_detections'],
+                        expected_detections['num_detections'])
+
+  @parameterized.parameters(
+      ('image_tensor', [200, 240], 0),
+      ('image_tensor', [400, 300], 1),
+      ('image_bytes', [240, 480], 2),
+  )
+  def test_bucket_image_sizes(self, input_type, image_size, bucket):
+    params = exp_factory.get_exp_config('retinanet_resnetfpn_coco')
+    params.task.model.backbone.resnet.model_id = 18
+    bucket_image_sizes = [[256, 256], [448, 448], [512, 512]]
+    module = detection.DetectionModule(
+        params,
+        bucket_image_sizes=[[448, 448], [256, 256]],
+        batch_size=1,
+        input_image_size=[512, 512],
+        input_type=input_type)
+    signatures = module.get_inference_signatures(
+        {input_type: 'serving_default'})
+    detections = signatures['serving_default'](
+        tf.constant(self._get_dummy_input(input_type, 1, image_size)))
+
+    bucket_module = detection.DetectionModule(
+        params,
+        batch_size=1,
+        input_image_size=bucket_image_sizes[bucket],
+        model=module.model)
+    expected_detections = bucket_module.serve(
+        tf.zeros([1] + image_size + [3], tf.uint8))
+    self.assertAllEqual(detections['image_info'][0, 1],
+                        expected_detections['image_info'][0, 1])
+    self.assertAllClose(detections['detection_boxes'],
+                        expected_detections['detection_boxes'])
+    self.assertAllClose(detections['detection_scores'],
+                        expected_detections['detection_scores'])
+
+  def test_bucket_image_sizes_larger_than_input_image_size(self):
+    params = exp_factory.get_exp_config('retinanet_resnetfpn_coco')
+    with self.assertRaisesRegex(ValueError, 'is larger than the input image'):
+      detection.DetectionModule(
+          params,
+          bucket_image_sizes=[[256, 768]],
+          batch_size=1,
+          input_image_size=[512, 512])
+
   @parameterized.parameters(('retinanet_resnetfpn_coco',),
                             ('maskrcnn_spinenet_coco',))
   def test_build_model_pass_with_none_batch_size(self, experiment_type):
@@ -104,6 +104,23 @@ _ADD_TPU_FUNCTION_ALIAS = flags.DEFINE_bool(
         ' TPU SavedModel for inference.'
     ),
 )
+_BATCHED_PREPROCESSING = flags.DEFINE_bool(
+    'batched_preprocessing',
+    False,
+    (
+        'Whether to preprocess the images of a batch together. Only supported'
+        ' by detection models.'
+    ),
+)
+_BUCKET_IMAGE_SIZES = flags.DEFINE_list(
+    'bucket_image_sizes',
+    [],
+    (
+        'The heightxwidth input image sizes, no larger than'
+        ' `input_image_size`, to serve small images at, e.g. 320x320,480x480.'
+        ' Only supported by detection models.'
+    ),
+)
 
 
 def main(_):
@@ -151,6 +168,11 @@ def main(_):
       log_model_flops_and_params=_LOG_MODEL_FLOPS_AND_PARAMS.value,
       input_name=_INPUT_NAME.value,
       add_tpu_function_alias=_ADD_TPU_FUNCTION_ALIAS.value,
+      batched_preprocessing=_BATCHED_PREPROCESSING.value,
+      bucket_image_sizes=[
+          [int(x) for x in image_size.split('x')]
+          for image_size in _BUCKET_IMAGE_SIZES.value
+      ],
   )
 
 
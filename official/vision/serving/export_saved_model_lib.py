@@ -47,6 +47,8 @@ def export_inference_graph(
     input_name: Optional[str] = None,
     function_keys: Optional[Union[List[str], Dict[str, str]]] = None,
     add_tpu_function_alias: Optional[bool] = False,
+    batched_preprocessing: bool = False,
+    bucket_image_sizes: Optional[List[List[int]]] = None,
 ):
   """Exports inference graph for the model specified in the exp config.
 
@@ -79,6 +81,15 @@ def export_inference_graph(
       is provided, the values will be used as signature keys.
     add_tpu_function_alias: Whether to add TPU function alias so that it can be
       converted to a TPU compatible saved model later. Default is False.
+    batched_preprocessing: Whether detection models preprocess the images of a
+      batch together, see `detection.DetectionModule`.
+    bucket_image_sizes: Optional [height, width] input image sizes, no larger
+      than `input_image_size`, to serve small images of detection models at,
+      see `detection.DetectionModule`.
+
+  Raises:
+    ValueError: if `batched_preprocessing` or `bucket_image_sizes` is set for a
+      module that is not a `detection.DetectionModule`.
   """
 
   if export_checkpoint_subdir:
@@ -118,6 +129,8 @@ def export_inference_graph(
           input_type=input_type,
           num_channels=num_channels,
           input_name=input_name,
+          batched_preprocessing=batched_preprocessing,
+          bucket_image_sizes=bucket_image_sizes,
       )
     elif isinstance(
         params.task, configs.semantic_segmentation.SemanticSegmentationTask
@@ -146,6 +159,14 @@ def export_inference_graph(
           'Export module not implemented for {} task.'.format(type(params.task))
       )
 
+  if (batched_preprocessing or bucket_image_sizes) and not isinstance(
+      export_module, detection.DetectionModule
+  ):
+    raise ValueError(
+        'batched_preprocessing and bucket_image_sizes are only allowed for'
+        ' detection modules.'
+    )
+
   if add_tpu_function_alias:
     if input_type == 'image_tensor':
       inference_func = export_module.inference_from_image_tensors
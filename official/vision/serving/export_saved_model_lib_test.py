@@ -65,5 +65,40 @@ class WriteModelFlopsAndParamsTest(tf.test.TestCase):
     self.assertModelAnalysisFilesExist()
 
 
+class DetectionExportOptionsTest(tf.test.TestCase):
+
+  def setUp(self):
+    super().setUp()
+    self.tempdir = self.create_tempdir()
+    self.mock_export = self.enter_context(
+        mock.patch.object(export_base, 'export', autospec=True, spec_set=True))
+
+  def _export_model(self, params, **kwargs):
+    export_saved_model_lib.export_inference_graph(
+        input_type='image_tensor',
+        batch_size=1,
+        input_image_size=[64, 64],
+        params=params,
+        checkpoint_path=os.path.join(self.tempdir, 'unused-ckpt'),
+        export_dir=self.tempdir,
+        **kwargs)
+
+  def test_retinanet_task(self):
+    params = configs.retinanet.retinanet_resnetfpn_coco()
+    params.task.model.backbone.resnet.model_id = 18
+    params.task.model.num_classes = 2
+    params.task.model.max_level = 6
+    self._export_model(
+        params, batched_preprocessing=True, bucket_image_sizes=[[32, 32]])
+    export_module = self.mock_export.call_args[0][0]
+    self.assertTrue(export_module._batched_preprocessing)
+    self.assertEqual(export_module._bucket_image_sizes, [[32, 32], [64, 64]])
+
+  def test_image_classification_task(self):
+    params = configs.image_classification.image_classification_imagenet()
+    with self.assertRaisesRegex(ValueError, 'only allowed for detection'):
+      self._export_model(params, batched_preprocessing=True)
+
+
 if __name__ == '__main__':
   tf.test.main()
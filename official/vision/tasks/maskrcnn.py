@@ -308,7 +308,9 @@ class MaskRCNNTask(base_task.Task):
       self.coco_metric = coco_evaluator.COCOEvaluator(
           annotation_file=self._task_config.annotation_file,
           include_mask=self._task_config.model.include_mask,
-          per_category_metrics=self._task_config.per_category_metrics)
+          per_category_metrics=self._task_config.per_category_metrics,
+          streaming=self._task_config.streaming_coco_eval,
+          num_processes=self._task_config.coco_eval_num_processes)
     else:
       # Builds COCO-style annotation file if include_mask is True, and
       # annotation_file isn't provided.
@@ -334,7 +336,9 @@ class MaskRCNNTask(base_task.Task):
       self.coco_metric = coco_evaluator.COCOEvaluator(
           annotation_file=annotation_path,
           include_mask=self._task_config.model.include_mask,
-          per_category_metrics=self._task_config.per_category_metrics)
+          per_category_metrics=self._task_config.per_category_metrics,
+          streaming=self._task_config.streaming_coco_eval,
+          num_processes=self._task_config.coco_eval_num_processes)
 
   def build_metrics(self, training: bool = True):
     """Builds detection metrics."""
@@ -14,6 +14,8 @@
 
 """Provides a `Controller` class for managing the outer training loop."""
 
+import concurrent.futures
+import contextlib
 import pprint
 import time
 
@@ -105,13 +107,16 @@ class Controller:
       steps_per_loop: Optional[Union[int, Callable[[int], int]]] = None,
       checkpoint_manager: Optional[tf.train.CheckpointManager] = None,
       enable_async_checkpointing: bool = False,
+      enable_async_eval: bool = False,
       # Summary related
       summary_interval: Optional[int] = None,
       summary_dir: Optional[str] = None,
       # Evaluation related
       eval_summary_dir: Optional[str] = None,
       summary_manager: Optional[utils.SummaryManagerInterface] = None,
-      eval_summary_manager: Optional[utils.SummaryManagerInterface] = None):
+      eval_summary_manager: Optional[utils.SummaryManagerInterface] = None,
+      # Instrumentation
+      timeline: Optional[utils.Timeline] = None):
     """Initializes a `Controller` instance.
 
     Note that if `checkpoint_manager` is provided and there are checkpoints in
@@ -152,6 +157,13 @@ class Controller:
         automatically save to or restore from checkpoints.
       enable_async_checkpointing: Optional bool indicating whether to enable
         async checkpoint saving.
+      enable_async_eval: Optional bool indicating whether `train_and_evaluate`
+        should finish evaluations in a background thread while training
+        continues. Only the work deferred by the evaluator (see
+        `orbit.runner.DeferredOutput`) is run in the background, followed by
+        the `eval_actions` and the summary writing, which uses the global step
+        of the evaluation. At most one evaluation is in flight: the next one
+        waits for the previous one to finish.
       summary_interval: Step interval for training summaries. Note that this
         argument only applies to `tf.summary` calls inside the `trainer.train`
         function. Summaries written by the `Controller` (specifically
@@ -172,6 +184,13 @@ class Controller:
         `eval_summary_dir` will be ignored. Otherwise the eval summary manager
         will be created internally for TensorBoard summaries by default from the
         `eval_summary_dir`.
+      timeline: An optional `orbit.utils.Timeline` recording the time spent in
+        the trainer and evaluator (including the loop phases of
+        `StandardTrainer` and `StandardEvaluator`), in checkpoint saving and in
+        summary writing. The totals per span are written under `timeline/`,
+        with the train summaries for training and checkpointing spans and with
+        the eval summaries for evaluation spans. The trace is flushed at the end
+        of each training and evaluation.
 
     Raises:
       ValueError: If both `trainer` and `evaluator` are `None`.
@@ -219,6 +238,10 @@ class Controller:
     self._checkpoint_options = tf.train.CheckpointOptions(
         enable_async=enable_async_checkpointing
     )
+    self._enable_async_eval = enable_async_eval
+    self.timeline = timeline
+    self._eval_executor = None
+    self._async_eval_future = None
 
     if self.trainer is not None:
       self.step_timer = None
@@ -287,6 +310,8 @@ class Controller:
       self._maybe_save_checkpoint(check_interval=False)
 
     self._sync_on_async_checkpointing()
+    if self.timeline is not None:
+      self.timeline.flush()
 
   def evaluate(self, steps: int = -1) -> Optional[runner.Output]:
     """Runs evaluation for the given number of steps.
@@ -309,7 +334,24 @@ class Controller:
       ValueError: If `steps` is not a positive value or -1.
     """
     self._require("evaluator", for_method="evaluate")
+    self._wait_for_async_eval()
+    return self._start_evaluation(steps)()
 
+  def _start_evaluation(self, steps: int) -> Callable[..., runner.Output]:
+    """Runs `self.evaluator.evaluate(steps)`.
+
+    Args:
+      steps: The number of evaluation steps to run, or -1.
+
+    Returns:
+      A callable finishing the evaluation: it resolves the evaluator output if
+      it was deferred, applies the `eval_actions`, then logs and writes the
+      summaries. It returns the evaluation results, and accepts an
+      `in_background` keyword argument, set if it runs in a background thread.
+
+    Raises:
+      ValueError: If `steps` is not a positive value or -1.
+    """
     if steps > 0:
       steps_msg = f"running {steps} steps of evaluation..."
     elif steps == -1:
@@ -322,9 +364,27 @@ class Controller:
 
     start = time.time()
     assert isinstance(self.evaluator, runner.AbstractEvaluator)
-    with self.eval_summary_manager.summary_writer().as_default():
+    with self.eval_summary_manager.summary_writer().as_default(), self._span(
+        "evaluate", "eval"):
       steps_tensor = tf.convert_to_tensor(steps, dtype=tf.int32)
       eval_output = self.evaluator.evaluate(steps_tensor)
+    steps_elapsed = time.time() - start
+
+    def finish_evaluation(in_background=False):
+      return self._finish_evaluation(eval_output, steps, current_step, start,
+                                     steps_elapsed, in_background)
+
+    return finish_evaluation
+
+  def _finish_evaluation(self, eval_output, steps, current_step, start,
+                         steps_elapsed, in_background):
+    """Finishes an evaluation started by `_start_evaluation`."""
+    if callable(eval_output):
+      # The global step may have moved on if running in the background, so the
+      # step of the evaluation is used for summaries written by the evaluator.
+      with self.eval_summary_manager.summary_writer().as_default(
+          step=current_step), self._span("evaluate_deferred", "eval"):
+        eval_output = eval_output()
     elapsed = time.time() - start
 
     eval_output = eval_output or {}
@@ -334,7 +394,7 @@ class Controller:
 
     if steps > 0:
       # Only log if steps has been specified.
-      steps_per_second = steps / elapsed
+      steps_per_second = steps / steps_elapsed
       eval_output["steps_per_second"] = steps_per_second
       steps_per_second_log = f"steps/sec: {steps_per_second: 6.1f} | "
     else:
@@ -345,11 +405,49 @@ class Controller:
          f"eval time: {elapsed: 6.1f} sec | "
          f"output: {_format_output(eval_output)}")
 
-    self.eval_summary_manager.write_summaries(eval_output)
-    self.eval_summary_manager.flush()
+    summaries = dict(eval_output)
+    if self.timeline is not None:
+      summaries.update(self.timeline.pop_summaries("eval"))
+    with self._span("write_summaries", "eval"):
+      if in_background:
+        self.eval_summary_manager.write_summaries(summaries, step=current_step)
+      else:
+        self.eval_summary_manager.write_summaries(summaries)
+      self.eval_summary_manager.flush()
+    if self.timeline is not None:
+      self.timeline.flush()
 
     return eval_output
 
+  def _evaluate_async(self, steps: int):
+    """Runs evaluation, and finishes it in a background thread.
+
+    The evaluator runs in the calling thread, so that the evaluation uses the
+    current model variables. What is left to do once the evaluator returns runs
+    in the background, see `enable_async_eval` in `__init__`.
+
+    Args:
+      steps: The number of evaluation steps to run, or -1.
+    """
+    self._wait_for_async_eval()
+    finish_evaluation = self._start_evaluation(steps)
+    if self._eval_executor is None:
+      self._eval_executor = concurrent.futures.ThreadPoolExecutor(
+          max_workers=1, thread_name_prefix="orbit_async_eval")
+    self._async_eval_future = self._eval_executor.submit(
+        finish_evaluation, in_background=True)
+
+  def _wait_for_async_eval(self) -> Optional[runner.Output]:
+    """Waits for the evaluation running in the background, if any.
+
+    Returns:
+      The results of the evaluation, or `None` if there was none in flight.
+    """
+    if self._async_eval_future is None:
+      return None
+    future, self._async_eval_future = self._async_eval_future, None
+    return future.result()
+
   def train_and_evaluate(
       self,
       train_steps: int,
@@ -366,7 +464,8 @@ class Controller:
 
     When async checkpointing is enabled, a sync is triggered at the end of this
     method to make sure any ongoing async checkpoint saving is finished before
-    returning.
+    returning. Likewise, when async evaluation is enabled, this method waits for
+    the final evaluation to finish before returning.
 
     Args:
       train_steps: The global step count to train up to.
@@ -391,9 +490,14 @@ class Controller:
       interval = min(train_steps - current_step, eval_interval)
       num_steps = current_step + interval
       self.train(steps=num_steps, checkpoint_at_completion=False)
-      output = self.evaluate(steps=eval_steps)
+      if self._enable_async_eval:
+        self._evaluate_async(steps=eval_steps)
+      else:
+        output = self.evaluate(steps=eval_steps)
       current_step = self.global_step.numpy()
     self._maybe_save_checkpoint(check_interval=False)
+    if self._enable_async_eval:
+      output = self._wait_for_async_eval() or output
     self._sync_on_async_checkpointing()
     return output
 
@@ -512,7 +616,7 @@ class Controller:
         # Create a predicate to determine when summaries should be written.
         should_record = lambda: (self.global_step % self.summary_interval == 0)
       assert isinstance(self.trainer, runner.AbstractTrainer)
-      with tf.summary.record_if(should_record):
+      with tf.summary.record_if(should_record), self._span("train", "train"):
         num_steps_tensor = tf.convert_to_tensor(num_steps, dtype=tf.int32)
         train_output = self.trainer.train(num_steps_tensor)
 
@@ -537,8 +641,11 @@ class Controller:
          f"output: {_format_output(train_output)}")
 
     train_output["steps_per_second"] = steps_per_second
-    self.summary_manager.write_summaries(train_output)
-    self.summary_manager.flush()
+    if self.timeline is not None:
+      train_output.update(self.timeline.pop_summaries("train"))
+    with self._span("write_summaries", "train"):
+      self.summary_manager.write_summaries(train_output)
+      self.summary_manager.flush()
 
   def _maybe_save_checkpoint(self, check_interval: bool = True):
     """Conditionally saves a checkpoint.
@@ -557,15 +664,28 @@ class Controller:
       A boolean indicating whether a checkpoint was saved.
     """
     if self.checkpoint_manager and self.checkpoint_manager.checkpoint_interval:
-      ckpt_path = self.checkpoint_manager.save(
-          checkpoint_number=self.global_step.numpy(),
-          check_interval=check_interval,
-          options=self._checkpoint_options)
+      with self._span("save_checkpoint", "train"):
+        ckpt_path = self.checkpoint_manager.save(
+            checkpoint_number=self.global_step.numpy(),
+            check_interval=check_interval,
+            options=self._checkpoint_options)
       if ckpt_path is not None:
         _log(f"saved checkpoint to {ckpt_path}.")
         return True
     return False
 
+  def _span(self, name, stream):
+    """Returns a context manager recording a span in `self.timeline`, if set.
+
+    Args:
+      name: The name of the span.
+      stream: The summaries the span is reported with, either `"train"` or
+        `"eval"`.
+    """
+    if self.timeline is None:
+      return contextlib.nullcontext()
+    return self.timeline.span(name, stream)
+
   def _require(self, attribute, for_method):
     """Utility method to raise an error if the given `attribute` is not set."""
     if getattr(self, attribute, None) is None:
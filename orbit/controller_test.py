@@ -119,6 +119,24 @@ class TestRunner(standard_runner.StandardTrainer,
     }
 
 
+class TestRunnerWithDeferredOutput(TestRunner):
+  """Defers the host-side part of the evaluation."""
+
+  def __init__(self):
+    super().__init__()
+    self.deferred_eval_steps = []
+
+  def eval_end(self):
+    eval_loss = self.eval_loss.result()
+    eval_step = self.global_step.numpy()
+
+    def deferred_output():
+      self.deferred_eval_steps.append(eval_step)
+      return {"eval_loss": eval_loss}
+
+    return deferred_output
+
+
 class TestEvaluator(standard_runner.StandardEvaluator):
   """Implements the training and evaluation APIs for the test model."""
 
@@ -619,6 +637,87 @@ class ControllerTest(tf.test.TestCase, parameterized.TestCase):
         summaries_with_matching_keyword(
             "eval_loss", os.path.join(self.model_dir, "summaries")))
 
+  @parameterized.named_parameters(("_sync_eval", False),
+                                  ("_async_eval", True))
+  def test_train_and_evaluate_with_deferred_output(self, enable_async_eval):
+    test_runner = TestRunnerWithDeferredOutput()
+    eval_summary_dir = os.path.join(self.model_dir, "summaries/eval")
+    test_controller = controller.Controller(
+        trainer=test_runner,
+        evaluator=test_runner,
+        global_step=test_runner.global_step,
+        steps_per_loop=2,
+        summary_dir=os.path.join(self.model_dir, "summaries/train"),
+        eval_summary_dir=eval_summary_dir,
+        enable_async_eval=enable_async_eval)
+    output = test_controller.train_and_evaluate(
+        train_steps=10, eval_steps=2, eval_interval=6)
+
+    self.assertIn("eval_loss", output)
+    self.assertEqual(test_runner.deferred_eval_steps, [6, 10])
+    # Summaries are written at the step of each evaluation.
+    steps = []
+    event_paths = tf.io.gfile.glob(os.path.join(eval_summary_dir, "events*"))
+    for event in tf.compat.v1.train.summary_iterator(event_paths[-1]):
+      if any(value.tag == "eval_loss" for value in event.summary.value):
+        steps.append(event.step)
+    self.assertEqual(steps, [6, 10])
+
+  def test_train_and_evaluate_with_timeline(self):
+    test_runner = TestRunner()
+    checkpoint = tf.train.Checkpoint(
+        model=test_runner.model, optimizer=test_runner.optimizer)
+    checkpoint_manager = tf.train.CheckpointManager(
+        checkpoint,
+        self.model_dir,
+        max_to_keep=None,
+        step_counter=test_runner.global_step,
+        checkpoint_interval=2)
+    trace_path = os.path.join(self.model_dir, "trace.json")
+    test_controller = controller.Controller(
+        trainer=test_runner,
+        evaluator=test_runner,
+        global_step=test_runner.global_step,
+        steps_per_loop=2,
+        checkpoint_manager=checkpoint_manager,
+        summary_dir=os.path.join(self.model_dir, "summaries/train"),
+        eval_summary_dir=os.path.join(self.model_dir, "summaries/eval"),
+        timeline=orbit.utils.Timeline(trace_path=trace_path))
+    test_controller.train_and_evaluate(
+        train_steps=4, eval_steps=2, eval_interval=2)
+
+    train_spans = ("train_secs", "train_steps_secs", "train_loop_end_secs",
+                   "save_checkpoint_secs")
+    eval_spans = ("evaluate_secs", "eval_begin_secs", "eval_steps_secs",
+                  "eval_end_secs")
+    train_tags, eval_tags = set(), set()
+    for tags, summary_dir in ((train_tags, "summaries/train"),
+                              (eval_tags, "summaries/eval")):
+      for summary in summaries_with_matching_keyword(
+          "timeline/", os.path.join(self.model_dir, summary_dir)):
+        for value in summary.value:
+          if value.tag.startswith("timeline/"):
+            tags.add(value.tag[len("timeline/"):])
+    # Spans are reported with the next summaries of their stream, so the
+    # checkpoint saved after the first training loop is reported with the
+    # second one. Training and evaluation alternate, but each summary only
+    # holds the spans of its own stream.
+    self.assertContainsSubset(train_spans, train_tags)
+    self.assertContainsSubset(eval_spans, eval_tags)
+    self.assertNoCommonElements(train_tags, eval_spans)
+    self.assertNoCommonElements(eval_tags, train_spans)
+    self.assertTrue(tf.io.gfile.exists(trace_path))
+
+  def test_evaluate_with_deferred_output(self):
+    test_runner = TestRunnerWithDeferredOutput()
+    test_controller = controller.Controller(
+        evaluator=test_runner,
+        global_step=test_runner.global_step,
+        enable_async_eval=True)
+    output = test_controller.evaluate(steps=2)
+    self.assertIn("eval_loss", output)
+    self.assertEqual(test_runner.deferred_eval_steps, [0])
+
   def test_early_stop_on_eval_loss(self):
     test_runner = TestRunner()
 
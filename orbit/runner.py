@@ -16,7 +16,7 @@
 
 import abc
 
-from typing import Dict, Optional, Union
+from typing import Callable, Dict, Optional, Union
 
 import numpy as np
 import tensorflow as tf, tf_keras
@@ -24,6 +24,12 @@ import tensorflow as tf, tf_keras
 
 Output = Dict[str, Union[tf.Tensor, float, np.number, np.ndarray, 'Output']]  # pytype: disable=not-supported-yet
 
+# A callable returning the `Output` of an evaluation. Evaluators can return one
+# from `evaluate` to defer host-side work that does not need the accelerator
+# (e.g. reducing COCO metrics), which the `Controller` may then run in the
+# background while training continues.
+DeferredOutput = Callable[[], Optional[Output]]
+
 
 class AbstractTrainer(tf.Module, metaclass=abc.ABCMeta):
   """An abstract class defining the API required for training."""
@@ -59,7 +65,8 @@ class AbstractEvaluator(tf.Module, metaclass=abc.ABCMeta):
   """An abstract class defining the API required for evaluation."""
 
   @abc.abstractmethod
-  def evaluate(self, num_steps: tf.Tensor) -> Optional[Output]:
+  def evaluate(
+      self, num_steps: tf.Tensor) -> Optional[Union[Output, DeferredOutput]]:
     """Implements `num_steps` steps of evaluation.
 
     This method will by called the `Controller` to perform an evaluation. The
@@ -78,6 +85,9 @@ class AbstractEvaluator(tf.Module, metaclass=abc.ABCMeta):
       Either `None`, or a dictionary mapping names to `Tensor`s or NumPy values.
       If a dictionary is returned, it will be written to logs and as TensorBoard
       summaries. The dictionary may also be nested, which will generate a
-      hierarchy of summary directories.
+      hierarchy of summary directories. It is also possible to return a
+      `DeferredOutput`, i.e. a callable without arguments returning such a
+      dictionary. It must only do work that does not depend on the model
+      variables, since training may continue before it is called.
     """
     pass
@@ -35,12 +35,13 @@ and `AbstractEvaluator` subclasses in these cases.
 
 import abc
 
-from typing import Any, Optional
+from typing import Any, Optional, Union
 
 import dataclasses
 
 from orbit import runner
 from orbit.utils import loop_fns
+from orbit.utils import timeline
 
 import tensorflow as tf, tf_keras
 
@@ -135,7 +136,8 @@ class StandardTrainer(runner.AbstractTrainer, metaclass=abc.ABCMeta):
     Returns:
       The output of `train_loop_end`.
     """
-    self.train_loop_begin()
+    with timeline.timeline_span("train_loop_begin"):
+      self.train_loop_begin()
 
     if self._train_loop_fn is None:
       self._train_loop_fn = self.create_train_loop_fn()
@@ -143,8 +145,13 @@ class StandardTrainer(runner.AbstractTrainer, metaclass=abc.ABCMeta):
     if self._train_iter is None:
       self._train_iter = tf.nest.map_structure(iter, self.train_dataset)
 
-    self._train_loop_fn(self._train_iter, num_steps)
-    return self.train_loop_end()
+    with timeline.timeline_span("train_steps"):
+      train_iter = self._train_iter
+      if not self._train_options.use_tf_function:
+        train_iter = timeline.timed_iterator(train_iter)
+      self._train_loop_fn(train_iter, num_steps)
+    with timeline.timeline_span("train_loop_end"):
+      return self.train_loop_end()
 
   def train_loop_begin(self):
     """Called once at the beginning of the training loop.
@@ -306,7 +313,9 @@ class StandardEvaluator(runner.AbstractEvaluator, metaclass=abc.ABCMeta):
       loop_fn = loop_fns.create_loop_fn(eval_step_fn)
     return loop_fn
 
-  def evaluate(self, num_steps: tf.Tensor) -> Optional[runner.Output]:
+  def evaluate(
+      self, num_steps: tf.Tensor
+  ) -> Optional[Union[runner.Output, runner.DeferredOutput]]:
     """Implements `num_steps` steps of evaluation.
 
     Args:
@@ -325,7 +334,8 @@ class StandardEvaluator(runner.AbstractEvaluator, metaclass=abc.ABCMeta):
       raise ValueError("Looping until exhausted is not supported if "
                        "`options.use_tf_while_loop` is `True`")
 
-    outputs = self.eval_begin()  # pylint: disable=assignment-from-no-return
+    with timeline.timeline_span("eval_begin"):
+      outputs = self.eval_begin()  # pylint: disable=assignment-from-no-return
 
     has_state = outputs is not None
     if self._eval_loop_fn is None:
@@ -340,16 +350,28 @@ class StandardEvaluator(runner.AbstractEvaluator, metaclass=abc.ABCMeta):
     else:
       eval_iter = self._eval_iter
 
-    if self._eval_options.use_tf_while_loop and not has_state:
-      self._eval_loop_fn(eval_iter, num_steps)
-    else:
-      outputs = self._eval_loop_fn(
-          eval_iter, num_steps, state=outputs, reduce_fn=self.eval_reduce)
+    with timeline.timeline_span("eval_steps"):
+      if not self._eval_options.use_tf_function:
+        eval_iter = timeline.timed_iterator(eval_iter)
+      if self._eval_options.use_tf_while_loop and not has_state:
+        self._eval_loop_fn(eval_iter, num_steps)
+      elif self._eval_options.use_tf_while_loop:
+        outputs = self._eval_loop_fn(
+            eval_iter, num_steps, state=outputs, reduce_fn=self.eval_reduce)
+      else:
+        outputs = self._eval_loop_fn(
+            eval_iter, num_steps, state=outputs, reduce_fn=self._eval_reduce)
 
-    if outputs is None:
-      return self.eval_end()
-    else:
-      return self.eval_end(outputs)
+    with timeline.timeline_span("eval_end"):
+      if outputs is None:
+        return self.eval_end()
+      else:
+        return self.eval_end(outputs)
+
+  def _eval_reduce(self, state=None, step_outputs=None):
+    """Calls `eval_reduce`, recording it as a span when run eagerly."""
+    with timeline.timeline_span("eval_reduce"):
+      return self.eval_reduce(state, step_outputs)
 
   def eval_begin(self) -> Any:
     """Called once at the beginning of the evaluation.
@@ -389,7 +411,9 @@ class StandardEvaluator(runner.AbstractEvaluator, metaclass=abc.ABCMeta):
     """
     pass
 
-  def eval_end(self, *args) -> Optional[runner.Output]:
+  def eval_end(
+      self, *args
+  ) -> Optional[Union[runner.Output, runner.DeferredOutput]]:
     """Called at the end of the evaluation.
 
     Called once at the end of evaluation.
@@ -405,7 +429,9 @@ class StandardEvaluator(runner.AbstractEvaluator, metaclass=abc.ABCMeta):
     Returns:
       The function may return a dictionary of `Tensors`, which will be
       written to logs and as TensorBoard summaries. It can also be a
-      nested dictionary, yielding a hierarchy of summary directories.
+      nested dictionary, yielding a hierarchy of summary directories, or a
+      `DeferredOutput` computing such a dictionary (see
+      `AbstractEvaluator.evaluate`).
     """
     pass
 
@@ -147,6 +147,35 @@ class StandardRunnerTest(parameterized.TestCase):
     self.assertEqual(evaluator.evaluate(tf.constant(5)), sum_for_1st_time)
     self.assertEqual(evaluator.evaluate(tf.constant(5)), sum_for_2nd_time)
 
+  @parameterized.named_parameters(("eager", False, True), ("", True, False))
+  def test_trainer_records_input_wait(self, use_tf_function,
+                                      expect_input_wait):
+    options = standard_runner.StandardTrainerOptions(
+        use_tf_function=use_tf_function, use_tf_while_loop=False)
+    trainer = TestTrainer(options)
+    timeline = utils.Timeline()
+    with timeline.span("train", "train"):
+      self.assertEqual(trainer.train(tf.constant(3)), 3)
+    summaries = timeline.pop_summaries("train")
+    self.assertIn("timeline/train_steps_secs", summaries)
+    self.assertEqual("timeline/input_wait_secs" in summaries, expect_input_wait)
+    if expect_input_wait:
+      self.assertLessEqual(summaries["timeline/input_wait_secs"],
+                           summaries["timeline/train_steps_secs"])
+
+  @parameterized.named_parameters(("eager", False, True), ("", True, False))
+  def test_evaluator_records_input_wait(self, use_tf_function,
+                                        expect_input_wait):
+    options = standard_runner.StandardEvaluatorOptions(
+        use_tf_function=use_tf_function, use_tf_while_loop=False)
+    evaluator = TestEvaluator(options)
+    timeline = utils.Timeline()
+    with timeline.span("evaluate", "eval"):
+      self.assertEqual(evaluator.evaluate(tf.constant(3)), 3)
+    summaries = timeline.pop_summaries("eval")
+    self.assertIn("timeline/eval_steps_secs", summaries)
+    self.assertEqual("timeline/input_wait_secs" in summaries, expect_input_wait)
+
 
 if __name__ == "__main__":
   tf.test.main()
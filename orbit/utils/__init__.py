@@ -27,4 +27,8 @@ from orbit.utils.loop_fns import LoopFnWithSummaries
 from orbit.utils.summary_manager import SummaryManager
 from orbit.utils.summary_manager_interface import SummaryManagerInterface
 
+from orbit.utils.timeline import Timeline
+from orbit.utils.timeline import timed_iterator
+from orbit.utils.timeline import timeline_span
+
 from orbit.utils.tpu_summaries import OptionalSummariesFunction
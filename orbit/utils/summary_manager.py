@@ -66,7 +66,7 @@ class SummaryManager(SummaryManagerInterface):
     if self._enabled:
       tf.nest.map_structure(tf.summary.flush, self._summary_writers)
 
-  def write_summaries(self, summary_dict):
+  def write_summaries(self, summary_dict, step=None):
     """Writes summaries for the given dictionary of values.
 
     This recursively creates subdirectories for any nested dictionaries
@@ -97,16 +97,19 @@ class SummaryManager(SummaryManagerInterface):
         name given by the corresponding key. This is performed recursively. Leaf
         values are then summarized using the summary writer instance specific to
         the parent relative path.
+      step: The step to write the summaries at. If `None`, the `global_step`
+        passed to `__init__` is used.
     """
     if not self._enabled:
       return
-    self._write_summaries(summary_dict)
+    self._write_summaries(
+        summary_dict, step=self._global_step if step is None else step)
 
-  def _write_summaries(self, summary_dict, relative_path=""):
+  def _write_summaries(self, summary_dict, step, relative_path=""):
     for name, value in summary_dict.items():
       if isinstance(value, dict):
         self._write_summaries(
-            value, relative_path=os.path.join(relative_path, name))
+            value, step, relative_path=os.path.join(relative_path, name))
       else:
         with self.summary_writer(relative_path).as_default():
-          self._summary_fn(name, value, step=self._global_step)
+          self._summary_fn(name, value, step=step)
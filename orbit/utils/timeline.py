@@ -0,0 +1,195 @@
+# Copyright 2024 The Orbit Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Provides a `Timeline` class recording where the outer loop spends time."""
+
+import collections
+import contextlib
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+import tensorflow as tf, tf_keras
+
+_local = threading.local()
+
+
+def _active_timelines():
+  if not hasattr(_local, "timelines"):
+    _local.timelines = []
+  return _local.timelines
+
+
+class Timeline:
+  """Records the wall-clock time spent in named spans of the train/eval loops.
+
+  A `Timeline` passed to the `Controller` records the time spent in the
+  trainer and evaluator calls, checkpoint saving and summary writing.
+  `StandardTrainer` and `StandardEvaluator` further record their loop phases
+  (e.g. `train_loop_begin`, the `train_step` loop, `train_loop_end`) through
+  `timeline_span`, which records to the timeline of the enclosing span.
+
+  Every span belongs to a stream (e.g. `"train"` or `"eval"`), which nested
+  spans inherit from their enclosing span. The total time of every span of a
+  stream since the last call to `pop_summaries` for that stream is reported as
+  summaries, and the individual spans can optionally be written as a Chrome
+  trace (viewable in `chrome://tracing` or Perfetto).
+
+  Iterators wrapped by `timed_iterator` record the time spent in `next()` as
+  `input_wait`, which is part of the enclosing `train_steps` or `eval_steps`
+  span. This is only possible when the step function runs eagerly: when it is a
+  `tf.function`, the dequeue happens inside the traced function and the input
+  wait is part of the step span.
+  """
+
+  def __init__(self,
+               trace_path: Optional[str] = None,
+               max_trace_events: int = 100000):
+    """Initializes the `Timeline` instance.
+
+    Args:
+      trace_path: Optional path of a Chrome trace JSON file, (re)written by
+        `flush`. If `None`, no trace events are kept.
+      max_trace_events: The maximum number of trace events to keep. Further
+        spans are only added to the summaries.
+    """
+    self._trace_path = trace_path
+    self._max_trace_events = max_trace_events
+    self._totals = collections.defaultdict(
+        lambda: collections.defaultdict(float))
+    self._trace_events = []
+    self._lock = threading.Lock()
+
+  @contextlib.contextmanager
+  def span(self, name: str, stream: Optional[str] = None):
+    """Records the time spent in the body of the `with` statement as `name`.
+
+    Args:
+      name: The name of the span.
+      stream: The stream whose summaries the span is reported with. If `None`,
+        the stream of the enclosing span of this timeline on the current thread
+        is used, if any.
+    """
+    timelines = _active_timelines()
+    if stream is None:
+      for timeline, enclosing_stream in reversed(timelines):
+        if timeline is self:
+          stream = enclosing_stream
+          break
+    timelines.append((self, stream))
+    start = time.time()
+    try:
+      yield
+    finally:
+      end = time.time()
+      timelines.pop()
+      self._record(name, stream, start, end)
+
+  def _record(self, name, stream, start, end):
+    with self._lock:
+      self._totals[stream][name] += end - start
+      if (self._trace_path is not None and
+          len(self._trace_events) < self._max_trace_events):
+        self._trace_events.append({
+            "name": name,
+            "ph": "X",
+            "ts": start * 1e6,
+            "dur": (end - start) * 1e6,
+            "pid": os.getpid(),
+            "tid": threading.get_ident(),
+        })
+
+  def pop_summaries(self, stream: Optional[str] = None) -> Dict[str, float]:
+    """Returns the total seconds spent per span of `stream` since the last call.
+
+    Args:
+      stream: The stream whose spans are returned. Spans of other streams are
+        kept for their own call.
+
+    Returns:
+      A dictionary mapping `timeline/<span name>_secs` to the total number of
+      seconds spent in the span.
+    """
+    with self._lock:
+      totals = self._totals.pop(stream, {})
+    return {f"timeline/{name}_secs": secs for name, secs in totals.items()}
+
+  def flush(self):
+    """Writes the recorded spans to `trace_path`, if set."""
+    if self._trace_path is None:
+      return
+    with self._lock:
+      events = list(self._trace_events)
+    tf.io.gfile.makedirs(os.path.dirname(self._trace_path) or ".")
+    with tf.io.gfile.GFile(self._trace_path, "w") as f:
+      json.dump({"traceEvents": events}, f)
+
+
+def timeline_span(name: str):
+  """Records a span in the `Timeline` of the enclosing span, if any.
+
+  Args:
+    name: The name of the span.
+
+  Returns:
+    A context manager, which is a no-op if no `Timeline` span is active in the
+    current thread.
+  """
+  timelines = _active_timelines()
+  if not timelines:
+    return contextlib.nullcontext()
+  timeline, stream = timelines[-1]
+  return timeline.span(name, stream)
+
+
+class _TimedIterator:
+  """Wraps an iterator to record the time spent in `next()` as a span."""
+
+  def __init__(self, iterator):
+    self._iterator = iterator
+
+  def __iter__(self):
+    return self
+
+  def __next__(self):
+    with timeline_span("input_wait"):
+      return next(self._iterator)
+
+  def get_next(self):
+    with timeline_span("input_wait"):
+      return self._iterator.get_next()
+
+  def __getattr__(self, name):
+    return getattr(self._iterator, name)
+
+
+def timed_iterator(iterator):
+  """Records the time spent fetching from `iterator` as `input_wait` spans.
+
+  The spans are recorded in the `Timeline` of the span enclosing each `next()`
+  call, so this should only wrap iterators consumed eagerly (i.e. not passed to
+  a `tf.function`).
+
+  Args:
+    iterator: A `tf.nest`-compatible structure of iterators.
+
+  Returns:
+    The structure of wrapped iterators if a `Timeline` span is active in the
+    current thread, and `iterator` itself otherwise.
+  """
+  if not _active_timelines():
+    return iterator
+  return tf.nest.map_structure(_TimedIterator, iterator)
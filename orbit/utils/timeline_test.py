@@ -0,0 +1,100 @@
+# Copyright 2024 The Orbit Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+"""Tests for orbit.utils.timeline."""
+
+import json
+import os
+
+from orbit.utils import timeline as timeline_lib
+
+import tensorflow as tf, tf_keras
+
+
+class TimelineTest(tf.test.TestCase):
+
+  def test_spans(self):
+    trace_path = os.path.join(self.get_temp_dir(), "trace.json")
+    timeline = timeline_lib.Timeline(trace_path=trace_path)
+    with timeline.span("outer"):
+      with timeline_lib.timeline_span("inner"):
+        pass
+      with timeline_lib.timeline_span("inner"):
+        pass
+    # No-op outside of a span.
+    with timeline_lib.timeline_span("ignored"):
+      pass
+
+    summaries = timeline.pop_summaries()
+    self.assertCountEqual(summaries,
+                          ["timeline/outer_secs", "timeline/inner_secs"])
+    self.assertGreaterEqual(summaries["timeline/outer_secs"],
+                            summaries["timeline/inner_secs"])
+    self.assertEmpty(timeline.pop_summaries())
+
+    timeline.flush()
+    with tf.io.gfile.GFile(trace_path) as f:
+      events = json.load(f)["traceEvents"]
+    self.assertEqual([event["name"] for event in events],
+                     ["inner", "inner", "outer"])
+
+  def test_streams(self):
+    timeline = timeline_lib.Timeline()
+    with timeline.span("train", "train"):
+      with timeline_lib.timeline_span("train_steps"):
+        pass
+    with timeline.span("evaluate", "eval"):
+      with timeline_lib.timeline_span("eval_steps"):
+        pass
+    with timeline.span("train", "train"):
+      pass
+
+    self.assertCountEqual(
+        timeline.pop_summaries("eval"),
+        ["timeline/evaluate_secs", "timeline/eval_steps_secs"])
+    self.assertCountEqual(
+        timeline.pop_summaries("train"),
+        ["timeline/train_secs", "timeline/train_steps_secs"])
+    self.assertEmpty(timeline.pop_summaries("train"))
+    self.assertEmpty(timeline.pop_summaries())
+
+  def test_timed_iterator(self):
+    iterator = iter([1, 2])
+    # Not wrapped outside of a span.
+    self.assertIs(timeline_lib.timed_iterator(iterator), iterator)
+
+    timeline = timeline_lib.Timeline()
+    with timeline.span("train_steps", "train"):
+      timed_iterator = timeline_lib.timed_iterator({"x": iterator})
+      self.assertEqual(next(timed_iterator["x"]), 1)
+      self.assertEqual(next(timed_iterator["x"]), 2)
+      with self.assertRaises(StopIteration):
+        next(timed_iterator["x"])
+    self.assertCountEqual(
+        timeline.pop_summaries("train"),
+        ["timeline/train_steps_secs", "timeline/input_wait_secs"])
+
+  def test_max_trace_events(self):
+    trace_path = os.path.join(self.get_temp_dir(), "trace.json")
+    timeline = timeline_lib.Timeline(trace_path=trace_path, max_trace_events=2)
+    for _ in range(3):
+      with timeline.span("step"):
+        pass
+    timeline.flush()
+    with tf.io.gfile.GFile(trace_path) as f:
+      self.assertLen(json.load(f)["traceEvents"], 2)
+
+
+if __name__ == "__main__":
+  tf.test.main()
@@ -1126,7 +1126,8 @@ def get_evaluators(eval_config, categories, evaluator_options=None):
         # Create keypoint evaluator for this category.
         evaluators_list.append(EVAL_METRICS_CLASS_DICT[EVAL_KEYPOINT_METRIC](
             category['id'], category_keypoints, class_label,
-            keypoint_metrics.keypoint_label_to_sigmas))
+            keypoint_metrics.keypoint_label_to_sigmas,
+            num_processes=eval_config.coco_eval_num_processes))
   return evaluators_list
 
 
@@ -1194,6 +1195,13 @@ def evaluator_options_from_eval_config(eval_config):
             'skip_predictions_for_unlabeled_class':
                 (eval_config.skip_predictions_for_unlabeled_class)
         })
+      # Per-image COCO evaluation can be sharded across processes.
+      if (eval_metric_fn_key in ('coco_detection_metrics',
+                                 'coco_mask_metrics') and
+          eval_config.coco_eval_num_processes):
+        evaluator_options[eval_metric_fn_key].update({
+            'num_processes': eval_config.coco_eval_num_processes
+        })
       for super_category in eval_config.super_categories:
         if 'super_categories' not in evaluator_options[eval_metric_fn_key]:
           evaluator_options[eval_metric_fn_key]['super_categories'] = {}
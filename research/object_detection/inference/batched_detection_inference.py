@@ -0,0 +1,244 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Batched detection inference with a TF2 SavedModel.
+
+The examples of every input TFRecord are decoded in parallel with tf.data,
+batched and run through the `serving_default` signature of a SavedModel
+exported by `exporter_main_v2.py`. The detections are added to the examples by
+a pool of threads, and the examples of every input TFRecord are written to one
+output shard, which is renamed into place when complete. The output shards
+which exist already are skipped, so that an interrupted run can be resumed.
+"""
+import collections
+from concurrent import futures
+import time
+
+from absl import logging
+import numpy as np
+import tensorflow.compat.v2 as tf
+
+from object_detection.core import standard_fields
+from object_detection.inference import detection_inference
+
+# The input types of `exporter_main_v2.py` which support batches.
+INPUT_TYPES = ('encoded_image_string_tensor', 'tf_example',
+               'float_image_tensor')
+
+_NUM_DETECTIONS = standard_fields.DetectionResultFields.num_detections
+_DETECTION_BOXES = standard_fields.DetectionResultFields.detection_boxes
+_DETECTION_SCORES = standard_fields.DetectionResultFields.detection_scores
+_DETECTION_CLASSES = standard_fields.DetectionResultFields.detection_classes
+
+
+def build_batched_input(tfrecord_path, batch_size, input_type,
+                        image_size=None):
+  """Builds a dataset of batches of the examples of a TFRecord.
+
+  Every batch has `batch_size` examples: the last one is padded by repeating
+  its first example, so that the model is not traced again.
+
+  Args:
+    tfrecord_path: Path to the input TFRecord.
+    batch_size: The number of examples of every batch.
+    input_type: The input type of the SavedModel, one of `INPUT_TYPES`.
+    image_size: Optional [height, width] the images are resized to, for the
+      'float_image_tensor' input type. Required to batch images of different
+      sizes.
+
+  Returns:
+    A dataset of dicts with
+      serialized_example: The serialized examples. String tensor,
+          shape=[batch_size]
+      inputs: The inputs of the model, the serialized examples, their encoded
+          images or the decoded images, shape=[batch_size, height, width, 3]
+      num_valid: The number of examples which are not padding. Int32 scalar
+  """
+  if input_type not in INPUT_TYPES:
+    raise ValueError('Unsupported input type {}, expected one of {}.'.format(
+        input_type, INPUT_TYPES))
+
+  def parse(serialized_example):
+    if input_type == 'tf_example':
+      return serialized_example, serialized_example
+    features = tf.io.parse_single_example(
+        serialized_example,
+        features={
+            standard_fields.TfExampleFields.image_encoded:
+                tf.io.FixedLenFeature([], tf.string),
+        })
+    encoded_image = features[standard_fields.TfExampleFields.image_encoded]
+    if input_type == 'encoded_image_string_tensor':
+      return serialized_example, encoded_image
+    image = tf.image.decode_image(
+        encoded_image, channels=3, expand_animations=False)
+    image = tf.cast(image, tf.float32)
+    if image_size:
+      image = tf.image.resize(image, image_size)
+    return serialized_example, image
+
+  def pad(serialized_examples, inputs):
+    num_valid = tf.shape(serialized_examples)[0]
+
+    def pad_to_batch_size(tensor):
+      return tf.concat(
+          [tensor, tf.repeat(tensor[:1], batch_size - num_valid, axis=0)],
+          axis=0)
+
+    return {
+        'serialized_example': pad_to_batch_size(serialized_examples),
+        'inputs': pad_to_batch_size(inputs),
+        'num_valid': num_valid,
+    }
+
+  dataset = tf.data.TFRecordDataset(tfrecord_path)
+  dataset = dataset.map(parse, num_parallel_calls=tf.data.AUTOTUNE)
+  dataset = dataset.batch(batch_size)
+  dataset = dataset.map(pad, num_parallel_calls=tf.data.AUTOTUNE)
+  return dataset.prefetch(tf.data.AUTOTUNE)
+
+
+def load_detection_fn(saved_model_dir):
+  """Loads the `serving_default` signature of a detection SavedModel.
+
+  Args:
+    saved_model_dir: Path to the SavedModel.
+
+  Returns:
+    A function from a batch of inputs to the dict of detections.
+  """
+  model = tf.saved_model.load(saved_model_dir)
+
+  def detection_fn(inputs):
+    # The signature is looked up on the model, which owns the variables.
+    return model.signatures['serving_default'](input_tensor=inputs)
+
+  return detection_fn
+
+
+def output_shard_path(output_tfrecord_path, shard, num_shards):
+  return '{}-{:05d}-of-{:05d}'.format(output_tfrecord_path, shard, num_shards)
+
+
+def _add_detections_to_batch(serialized_examples, detections, num_valid,
+                             discard_image_pixels):
+  """Returns the serialized examples of a batch augmented with detections."""
+  records = []
+  for i in range(num_valid):
+    num_detections = int(detections[_NUM_DETECTIONS][i])
+    tf_example = tf.train.Example.FromString(serialized_examples[i])
+    detection_inference.add_detections_to_example(
+        tf_example, detections[_DETECTION_BOXES][i, :num_detections],
+        detections[_DETECTION_SCORES][i, :num_detections],
+        detections[_DETECTION_CLASSES][i, :num_detections].astype(np.int64),
+        discard_image_pixels)
+    records.append(tf_example.SerializeToString())
+  return records
+
+
+def _infer_detections_on_shard(detection_fn, dataset, output_path, executor,
+                               max_pending_batches, discard_image_pixels):
+  """Writes the examples of a dataset with detections to a TFRecord.
+
+  Args:
+    detection_fn: The function returned by `load_detection_fn`.
+    dataset: The dataset returned by `build_batched_input`.
+    output_path: Path to the output TFRecord.
+    executor: The executor adding the detections to the examples.
+    max_pending_batches: The maximum number of batches waiting to be written.
+    discard_image_pixels: If true, discards the images from the output.
+
+  Returns:
+    The number of examples.
+  """
+  num_examples = 0
+  pending_batches = collections.deque()
+  temp_path = output_path + '.tmp'
+  with tf.io.TFRecordWriter(temp_path) as writer:
+
+    def write_next_batch():
+      for record in pending_batches.popleft().result():
+        writer.write(record)
+
+    for batch in dataset:
+      detections = detection_fn(batch['inputs'])
+      detections = {
+          key: detections[key].numpy()
+          for key in (_NUM_DETECTIONS, _DETECTION_BOXES, _DETECTION_SCORES,
+                      _DETECTION_CLASSES)
+      }
+      num_valid = int(batch['num_valid'])
+      pending_batches.append(
+          executor.submit(_add_detections_to_batch,
+                          batch['serialized_example'].numpy(), detections,
+                          num_valid, discard_image_pixels))
+      num_examples += num_valid
+      if len(pending_batches) > max_pending_batches:
+        write_next_batch()
+    while pending_batches:
+      write_next_batch()
+  tf.io.gfile.rename(temp_path, output_path, overwrite=True)
+  return num_examples
+
+
+def infer_detections(detection_fn,
+                     input_tfrecord_paths,
+                     output_tfrecord_path,
+                     batch_size,
+                     input_type,
+                     image_size=None,
+                     num_writer_threads=4,
+                     discard_image_pixels=False):
+  """Adds the detections of a model to the examples of TFRecords.
+
+  The examples of the i-th input TFRecord are written, in order, to the
+  output shard `output_shard_path(output_tfrecord_path, i, num_shards)`. The
+  output shards which exist already are skipped.
+
+  Args:
+    detection_fn: The function returned by `load_detection_fn`.
+    input_tfrecord_paths: List of paths to the input TFRecords.
+    output_tfrecord_path: The prefix of the paths of the output shards.
+    batch_size: The number of examples run through the model together.
+    input_type: The input type of the SavedModel, one of `INPUT_TYPES`.
+    image_size: Optional [height, width] the images are resized to, see
+      `build_batched_input`.
+    num_writer_threads: The number of threads adding the detections to the
+      examples.
+    discard_image_pixels: If true, discards the images from the output.
+
+  Returns:
+    The number of examples written.
+  """
+  if input_type == 'float_image_tensor' and batch_size > 1 and not image_size:
+    raise ValueError('image_size is required to batch float images.')
+  num_shards = len(input_tfrecord_paths)
+  num_examples = 0
+  start_time = time.time()
+  with futures.ThreadPoolExecutor(num_writer_threads) as executor:
+    for shard, input_path in enumerate(input_tfrecord_paths):
+      output_path = output_shard_path(output_tfrecord_path, shard, num_shards)
+      if tf.io.gfile.exists(output_path):
+        logging.info('Skipping %s, %s exists.', input_path, output_path)
+        continue
+      dataset = build_batched_input(input_path, batch_size, input_type,
+                                    image_size)
+      num_examples += _infer_detections_on_shard(
+          detection_fn, dataset, output_path, executor,
+          max_pending_batches=2 * num_writer_threads,
+          discard_image_pixels=discard_image_pixels)
+      logging.info('Wrote shard %d of %d, %d images, %.1f images/sec.',
+                   shard + 1, num_shards, num_examples,
+                   num_examples / (time.time() - start_time))
+  return num_examples
@@ -0,0 +1,189 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+"""Tests for batched_detection_inference.py."""
+import io
+import os
+import unittest
+
+from absl.testing import parameterized
+import numpy as np
+from PIL import Image
+import tensorflow.compat.v2 as tf
+
+from object_detection.core import standard_fields
+from object_detection.inference import batched_detection_inference
+from object_detection.utils import dataset_util
+from object_detection.utils import tf_version
+
+_BOXES = [[0, 0.8, 0.7, 1], [0.1, 0.2, 0.8, 0.9], [0.2, 0.3, 0.4, 0.5]]
+
+
+def _encode_image(red, size):
+  image = np.zeros(size + [3], np.uint8)
+  image[:, :, 0] = red
+  output = io.BytesIO()
+  Image.fromarray(image, 'RGB').save(output, format='png')
+  return output.getvalue()
+
+
+def _create_tfrecord(path, reds):
+  """Writes examples whose image has the given red value."""
+  with tf.io.TFRecordWriter(path) as writer:
+    for red in reds:
+      feature_map = {
+          'test_field':
+              dataset_util.float_list_feature([red]),
+          standard_fields.TfExampleFields.image_encoded:
+              dataset_util.bytes_feature(
+                  _encode_image(red, [2 + red % 3, 3])),
+      }
+      writer.write(
+          tf.train.Example(features=tf.train.Features(
+              feature=feature_map)).SerializeToString())
+
+
+class MockDetectionModule(tf.Module):
+  """Detects 2 boxes with the labels red, 2 * red and 3 * red."""
+
+  def _detect(self, images):
+    batch_size = tf.shape(images)[0]
+    red = images[:, 0, 0, 0]
+    return {
+        'num_detections':
+            tf.fill([batch_size], 2.0),
+        'detection_boxes':
+            tf.tile(tf.constant([_BOXES]), [batch_size, 1, 1]),
+        'detection_scores':
+            tf.tile(tf.constant([[0.1, 0.2, 0.3]]), [batch_size, 1]),
+        'detection_classes':
+            red[:, None] * tf.constant([[1.0, 2.0, 3.0]]),
+    }
+
+  @tf.function(input_signature=[tf.TensorSpec([None], tf.string)])
+  def detect_encoded_images(self, input_tensor):
+    # The images of a batch may have different sizes, keeps one pixel.
+    images = tf.map_fn(
+        lambda x: tf.cast(  # pylint: disable=g-long-lambda
+            tf.image.decode_image(x, channels=3, expand_animations=False)[:1,
+                                                                          :1],
+            tf.float32),
+        input_tensor,
+        fn_output_signature=tf.float32)
+    return self._detect(images)
+
+  @tf.function(
+      input_signature=[tf.TensorSpec([None, None, None, 3], tf.float32)])
+  def detect_float_images(self, input_tensor):
+    return self._detect(input_tensor)
+
+
+@unittest.skipIf(tf_version.is_tf1(), 'Skipping TF2.X only test.')
+class BatchedDetectionInferenceTest(tf.test.TestCase, parameterized.TestCase):
+
+  def _save_model(self, input_type):
+    module = MockDetectionModule()
+    signature = (
+        module.detect_float_images
+        if input_type == 'float_image_tensor' else module.detect_encoded_images)
+    saved_model_dir = os.path.join(self.get_temp_dir(), input_type)
+    tf.saved_model.save(module, saved_model_dir, signatures=signature)
+    return saved_model_dir
+
+  def _read_tfrecord(self, path):
+    return [
+        tf.train.Example.FromString(record.numpy())
+        for record in tf.data.TFRecordDataset(path)
+    ]
+
+  @parameterized.parameters('encoded_image_string_tensor',
+                            'float_image_tensor')
+  def test_infer_detections(self, input_type):
+    input_dir = self.create_tempdir().full_path
+    input_paths = [os.path.join(input_dir, 'input-%d' % i) for i in range(2)]
+    _create_tfrecord(input_paths[0], [1, 2, 3])
+    _create_tfrecord(input_paths[1], [4, 5])
+    output_path = os.path.join(input_dir, 'output')
+    detection_fn = batched_detection_inference.load_detection_fn(
+        self._save_model(input_type))
+
+    num_examples = batched_detection_inference.infer_detections(
+        detection_fn,
+        input_paths,
+        output_path,
+        batch_size=2,
+        input_type=input_type,
+        image_size=[4, 4] if input_type == 'float_image_tensor' else None,
+        num_writer_threads=2,
+        discard_image_pixels=True)
+
+    self.assertEqual(num_examples, 5)
+    for shard, reds in enumerate([[1, 2, 3], [4, 5]]):
+      tf_examples = self._read_tfrecord(
+          batched_detection_inference.output_shard_path(output_path, shard, 2))
+      self.assertLen(tf_examples, len(reds))
+      for red, tf_example in zip(reds, tf_examples):
+        feature = tf_example.features.feature
+        self.assertAllEqual(feature['test_field'].float_list.value, [red])
+        self.assertNotIn(standard_fields.TfExampleFields.image_encoded,
+                         feature)
+        self.assertAllEqual(
+            feature[standard_fields.TfExampleFields.detection_class_label]
+            .int64_list.value, [red, 2 * red])
+        self.assertAllClose(
+            feature[standard_fields.TfExampleFields.detection_score]
+            .float_list.value, [0.1, 0.2])
+        self.assertAllClose(
+            feature[standard_fields.TfExampleFields.detection_bbox_xmax]
+            .float_list.value, [1.0, 0.9])
+
+  def test_resumes_from_completed_shards(self):
+    input_dir = self.create_tempdir().full_path
+    input_paths = [os.path.join(input_dir, 'input-%d' % i) for i in range(2)]
+    _create_tfrecord(input_paths[0], [1, 2, 3])
+    _create_tfrecord(input_paths[1], [4, 5])
+    output_path = os.path.join(input_dir, 'output')
+    completed_path = batched_detection_inference.output_shard_path(
+        output_path, 0, 2)
+    with tf.io.TFRecordWriter(completed_path) as writer:
+      writer.write(b'completed')
+    detection_fn = batched_detection_inference.load_detection_fn(
+        self._save_model('encoded_image_string_tensor'))
+
+    num_examples = batched_detection_inference.infer_detections(
+        detection_fn,
+        input_paths,
+        output_path,
+        batch_size=4,
+        input_type='encoded_image_string_tensor')
+
+    self.assertEqual(num_examples, 2)
+    self.assertEqual(
+        [record.numpy() for record in tf.data.TFRecordDataset(completed_path)],
+        [b'completed'])
+    self.assertLen(
+        self._read_tfrecord(
+            batched_detection_inference.output_shard_path(output_path, 1, 2)),
+        2)
+
+  def test_float_images_require_image_size(self):
+    with self.assertRaisesRegex(ValueError, 'image_size'):
+      batched_detection_inference.infer_detections(
+          None, ['input'], 'output', batch_size=2,
+          input_type='float_image_tensor')
+
+
+if __name__ == '__main__':
+  tf.enable_v2_behavior()
+  tf.test.main()
@@ -0,0 +1,97 @@
+# Copyright 2024 The TensorFlow Authors. All Rights Reserved.
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+# ==============================================================================
+r"""Infers detections on TFRecords of TFExamples with a TF2 SavedModel.
+
+Example usage:
+  python batched_infer_detections.py \
+    --input_tfrecord_paths=/path/to/input/tfrecord1,/path/to/input/tfrecord2 \
+    --output_tfrecord_path=/path/to/output/detections.tfrecord \
+    --saved_model_dir=/path/to/exported/saved_model \
+    --input_type=encoded_image_string_tensor \
+    --batch_size=32
+
+This is the TF2 counterpart of infer_detections.py for SavedModels exported by
+exporter_main_v2.py with one of the input types in
+batched_detection_inference.INPUT_TYPES. The examples are run through the model
+in batches, and the examples of the i-th input TFRecord are written to the
+output shard /path/to/output/detections.tfrecord-0000i-of-0000n. Rerunning the
+same command skips the output shards which were completed, so an interrupted
+run can be resumed.
+
+The script can also discard the image pixels in the output. This greatly
+reduces the output size and can potentially accelerate reading data in
+subsequent processing steps that don't require the images (e.g. computing
+metrics).
+"""
+import time
+
+from absl import app
+from absl import flags
+from absl import logging
+import tensorflow.compat.v2 as tf
+
+from object_detection.inference import batched_detection_inference
+
+tf.enable_v2_behavior()
+
+flags.DEFINE_list('input_tfrecord_paths', None,
+                  'A comma separated list of paths to input TFRecords.')
+flags.DEFINE_string('output_tfrecord_path', None,
+                    'The prefix of the paths of the output shards.')
+flags.DEFINE_string('saved_model_dir', None,
+                    'Path to the exported SavedModel.')
+flags.DEFINE_enum('input_type', 'encoded_image_string_tensor',
+                  batched_detection_inference.INPUT_TYPES,
+                  'The input type the SavedModel was exported with.')
+flags.DEFINE_integer('batch_size', 32,
+                     'The number of images run through the model together.')
+flags.DEFINE_list('image_size', None,
+                  'Optional height,width the images are resized to with '
+                  '--input_type=float_image_tensor.')
+flags.DEFINE_integer('num_writer_threads', 4,
+                     'The number of threads adding the detections to the '
+                     'examples.')
+flags.DEFINE_boolean('discard_image_pixels', False,
+                     'Discards the images in the output TFExamples. This'
+                     ' significantly reduces the output size and is useful'
+                     ' if the subsequent tools don\'t need access to the'
+                     ' images (e.g. when computing evaluation measures).')
+
+FLAGS = flags.FLAGS
+
+
+def main(_):
+  logging.info('Reading the model from %s', FLAGS.saved_model_dir)
+  detection_fn = batched_detection_inference.load_detection_fn(
+      FLAGS.saved_model_dir)
+  image_size = [int(x) for x in FLAGS.image_size] if FLAGS.image_size else None
+  start_time = time.time()
+  num_examples = batched_detection_inference.infer_detections(
+      detection_fn,
+      FLAGS.input_tfrecord_paths,
+      FLAGS.output_tfrecord_path,
+      batch_size=FLAGS.batch_size,
+      input_type=FLAGS.input_type,
+      image_size=image_size,
+      num_writer_threads=FLAGS.num_writer_threads,
+      discard_image_pixels=FLAGS.discard_image_pixels)
+  logging.info('Processed %d images, %.1f images/sec.', num_examples,
+               num_examples / (time.time() - start_time))
+
+
+if __name__ == '__main__':
+  flags.mark_flags_as_required(
+      ['input_tfrecord_paths', 'output_tfrecord_path', 'saved_model_dir'])
+  app.run(main)
@@ -118,9 +118,25 @@ def infer_detections_and_add_to_example(
        serialized_example_tensor, detected_boxes_tensor, detected_scores_tensor,
        detected_labels_tensor
    ])
-  detected_boxes = detected_boxes.T
 
   tf_example.ParseFromString(serialized_example)
+  add_detections_to_example(tf_example, detected_boxes, detected_scores,
+                            detected_classes, discard_image_pixels)
+  return tf_example
+
+
+def add_detections_to_example(tf_example, detected_boxes, detected_scores,
+                              detected_classes, discard_image_pixels):
+  """Adds detections to a TF example, in place.
+
+  Args:
+    tf_example: The TF example to augment.
+    detected_boxes: Detected boxes. Float array, shape=[num_detections, 4]
+    detected_scores: Detected scores. Float array, shape=[num_detections]
+    detected_classes: Detected labels. Int64 array, shape=[num_detections]
+    discard_image_pixels: If true, discards the image from the example
+  """
+  detected_boxes = detected_boxes.T
   feature = tf_example.features.feature
   feature[standard_fields.TfExampleFields.
           detection_score].float_list.value[:] = detected_scores
@@ -137,5 +153,3 @@ def infer_detections_and_add_to_example(
 
   if discard_image_pixels:
     del feature[standard_fields.TfExampleFields.image_encoded]
-
-  return tf_example
@@ -36,7 +36,8 @@ class CocoDetectionEvaluator(object_detection_evaluation.DetectionEvaluator):
                include_metrics_per_category=False,
                all_metrics_per_category=False,
                skip_predictions_for_unlabeled_class=False,
-               super_categories=None):
+               super_categories=None,
+               num_processes=0):
     """Constructor.
 
     Args:
@@ -55,6 +56,8 @@ class CocoDetectionEvaluator(object_detection_evaluation.DetectionEvaluator):
         in the label_map).  Metrics are aggregated along these super-categories
         and added to the `per_category_ap` and are associated with the name
           `PerformanceBySuperCategory/<super-category-name>`.
+      num_processes: Number of processes to shard the per-image COCO
+        evaluation across. 0 or 1 runs it in the current process.
     """
     super(CocoDetectionEvaluator, self).__init__(categories)
     # _image_ids is a dictionary that maps unique image ids to Booleans which
@@ -70,6 +73,7 @@ class CocoDetectionEvaluator(object_detection_evaluation.DetectionEvaluator):
     self._skip_predictions_for_unlabeled_class = skip_predictions_for_unlabeled_class
     self._groundtruth_labeled_classes = {}
     self._super_categories = super_categories
+    self._num_processes = num_processes
 
   def clear(self):
     """Clears the state to prepare for a fresh evaluation."""
@@ -300,7 +304,8 @@ class CocoDetectionEvaluator(object_detection_evaluation.DetectionEvaluator):
     coco_wrapped_detections = coco_wrapped_groundtruth.LoadAnnotations(
         self._detection_boxes_list)
     box_evaluator = coco_tools.COCOEvalWrapper(
-        coco_wrapped_groundtruth, coco_wrapped_detections, agnostic_mode=False)
+        coco_wrapped_groundtruth, coco_wrapped_detections, agnostic_mode=False,
+        num_processes=self._num_processes)
     box_metrics, box_per_category_ap = box_evaluator.ComputeMetrics(
         include_metrics_per_category=self._include_metrics_per_category,
         all_metrics_per_category=self._all_metrics_per_category,
@@ -510,7 +515,8 @@ class CocoKeypointEvaluator(CocoDetectionEvaluator):
                category_id,
                category_keypoints,
                class_text,
-               oks_sigmas=None):
+               oks_sigmas=None,
+               num_processes=0):
     """Constructor.
 
     Args:
@@ -522,6 +528,8 @@ class CocoKeypointEvaluator(CocoDetectionEvaluator):
         metrics are to be computed.
       oks_sigmas: A dict of keypoint name to standard deviation values for OKS
         metrics. If not provided, default value of 0.05 will be used.
+      num_processes: Number of processes to shard the per-image COCO
+        evaluation across. 0 or 1 runs it in the current process.
     """
     self._category_id = category_id
     self._category_name = class_text
@@ -543,7 +551,7 @@ class CocoKeypointEvaluator(CocoDetectionEvaluator):
     super(CocoKeypointEvaluator, self).__init__([{
         'id': self._category_id,
         'name': class_text
-    }])
+    }], num_processes=num_processes)
 
   def add_single_ground_truth_image_info(self, image_id, groundtruth_dict):
     """Adds groundtruth for a single image with keypoints.
@@ -735,7 +743,8 @@ class CocoKeypointEvaluator(CocoDetectionEvaluator):
         coco_wrapped_detections,
         agnostic_mode=False,
         iou_type='keypoints',
-        oks_sigmas=self._oks_sigmas)
+        oks_sigmas=self._oks_sigmas,
+        num_processes=self._num_processes)
     keypoint_metrics, _ = keypoint_evaluator.ComputeMetrics(
         include_metrics_per_category=False, all_metrics_per_category=False)
     keypoint_metrics = {
@@ -963,7 +972,8 @@ class CocoMaskEvaluator(object_detection_evaluation.DetectionEvaluator):
   def __init__(self, categories,
                include_metrics_per_category=False,
                all_metrics_per_category=False,
-               super_categories=None):
+               super_categories=None,
+               num_processes=0):
     """Constructor.
 
     Args:
@@ -980,6 +990,8 @@ class CocoMaskEvaluator(object_detection_evaluation.DetectionEvaluator):
         in the label_map).  Metrics are aggregated along these super-categories
         and added to the `per_category_ap` and are associated with the name
           `PerformanceBySuperCategory/<super-category-name>`.
+      num_processes: Number of processes to shard the per-image COCO
+        evaluation across. 0 or 1 runs it in the current process.
     """
     super(CocoMaskEvaluator, self).__init__(categories)
     self._image_id_to_mask_shape_map = {}
@@ -991,6 +1003,7 @@ class CocoMaskEvaluator(object_detection_evaluation.DetectionEvaluator):
     self._include_metrics_per_category = include_metrics_per_category
     self._super_categories = super_categories
     self._all_metrics_per_category = all_metrics_per_category
+    self._num_processes = num_processes
 
   def clear(self):
     """Clears the state to prepare for a fresh evaluation."""
@@ -1181,7 +1194,8 @@ class CocoMaskEvaluator(object_detection_evaluation.DetectionEvaluator):
         self._detection_masks_list)
     mask_evaluator = coco_tools.COCOEvalWrapper(
         coco_wrapped_groundtruth, coco_wrapped_detection_masks,
-        agnostic_mode=False, iou_type='segm')
+        agnostic_mode=False, iou_type='segm',
+        num_processes=self._num_processes)
     mask_metrics, mask_per_category_ap = mask_evaluator.ComputeMetrics(
         include_metrics_per_category=self._include_metrics_per_category,
         super_categories=self._super_categories,
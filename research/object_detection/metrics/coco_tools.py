@@ -59,6 +59,15 @@ import tensorflow.compat.v1 as tf
 
 from object_detection.utils import json_utils
 
+# pylint: disable=g-import-not-at-top
+try:
+  from official.vision.evaluation import coco_parallel_eval
+  from official.vision.evaluation import mask_rle
+except ImportError:
+  coco_parallel_eval = None
+  mask_rle = None
+# pylint: enable=g-import-not-at-top
+
 
 class COCOWrapper(coco.COCO):
   """Wrapper for the pycocotools COCO class."""
@@ -187,7 +196,7 @@ class COCOEvalWrapper(cocoeval.COCOeval):
   """
 
   def __init__(self, groundtruth=None, detections=None, agnostic_mode=False,
-               iou_type='bbox', oks_sigmas=None):
+               iou_type='bbox', oks_sigmas=None, num_processes=0):
     """COCOEvalWrapper constructor.
 
     Note that for the area-based metrics to be meaningful, detection and
@@ -203,6 +212,9 @@ class COCOEvalWrapper(cocoeval.COCOeval):
       iou_type: IOU type to use for evaluation. Supports `bbox', `segm`,
         `keypoints`.
       oks_sigmas: Float numpy array holding the OKS variances for keypoints.
+      num_processes: Number of processes to shard the per-image evaluation
+        across, with `official.vision.evaluation.coco_parallel_eval`. 0 or 1,
+        or `official` not being installed, runs it in the current process.
     """
     cocoeval.COCOeval.__init__(self, groundtruth, detections, iouType=iou_type)
     if oks_sigmas is not None:
@@ -210,6 +222,7 @@ class COCOEvalWrapper(cocoeval.COCOeval):
     if agnostic_mode:
       self.params.useCats = 0
     self._iou_type = iou_type
+    self._num_processes = num_processes
 
   def GetCategory(self, category_id):
     """Fetches dictionary holding category information given category id.
@@ -282,7 +295,13 @@ class COCOEvalWrapper(cocoeval.COCOeval):
     Raises:
       ValueError: If category_stats does not exist.
     """
-    self.evaluate()
+    if coco_parallel_eval is None:
+      if self._num_processes > 1:
+        tf.logging.warning('official.vision is not installed, running the '
+                           'COCO evaluation in the current process.')
+      self.evaluate()
+    else:
+      coco_parallel_eval.evaluate(self, self._num_processes)
     self.accumulate()
     self.summarize()
 
@@ -388,6 +407,27 @@ def _RleCompress(masks):
   return rle
 
 
+def _BatchRleCompress(masks):
+  """Compresses a batch of masks using Run-length encoding.
+
+  Uses the batched encoder of `official.vision.evaluation.mask_rle` when it is
+  available, and pycocotools mask by mask otherwise.
+
+  Args:
+    masks: uint8 numpy array of shape [num_masks, mask_height, mask_width] with
+    values in {0, 1}.
+
+  Returns:
+    A list of pycocotools Run-length encodings of the masks.
+  """
+  if mask_rle is None or not len(masks):  # pylint: disable=g-explicit-length-test
+    return [_RleCompress(m) for m in masks]
+  rles = mask_rle.encode(masks)
+  for rle in rles:
+    rle['counts'] = six.ensure_str(rle['counts'])
+  return rles
+
+
 def ExportSingleImageGroundtruthToCoco(image_id,
                                        next_annotation_id,
                                        category_id_set,
@@ -468,6 +508,8 @@ def ExportSingleImageGroundtruthToCoco(image_id,
     groundtruth_keypoint_visibilities = np.full(
         (num_boxes, groundtruth_keypoints.shape[1]), 2)
   groundtruth_list = []
+  if groundtruth_masks is not None:
+    groundtruth_rles = _BatchRleCompress(groundtruth_masks)
   for i in range(num_boxes):
     if groundtruth_classes[i] in category_id_set:
       iscrowd = groundtruth_is_crowd[i] if has_is_crowd else 0
@@ -490,7 +532,7 @@ def ExportSingleImageGroundtruthToCoco(image_id,
               iscrowd
       }
       if groundtruth_masks is not None:
-        export_dict['segmentation'] = _RleCompress(groundtruth_masks[i])
+        export_dict['segmentation'] = groundtruth_rles[i]
       if has_keypoints:
         keypoints = groundtruth_keypoints[i]
         visibilities = np.reshape(groundtruth_keypoint_visibilities[i], [-1])
@@ -726,12 +768,13 @@ def ExportSingleImageDetectionMasksToCoco(image_id,
                          detection_scores.shape[0]
                      ))
   detections_list = []
+  detection_rles = _BatchRleCompress(detection_masks)
   for i in range(num_boxes):
     if detection_classes[i] in category_id_set:
       detections_list.append({
           'image_id': image_id,
           'category_id': int(detection_classes[i]),
-          'segmentation': _RleCompress(detection_masks[i]),
+          'segmentation': detection_rles[i],
           'score': float(detection_scores[i])
       })
   return detections_list
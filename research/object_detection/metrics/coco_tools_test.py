@@ -78,6 +78,14 @@ class CocoToolsTest(tf.test.TestCase):
     summary_metrics, _ = evaluator.ComputeMetrics()
     self.assertAlmostEqual(1.0, summary_metrics['Precision/mAP'])
 
+  def testCocoWrappersWithMultipleProcesses(self):
+    groundtruth = coco_tools.COCOWrapper(self._groundtruth_dict)
+    detections = groundtruth.LoadAnnotations(self._detections_list)
+    evaluator = coco_tools.COCOEvalWrapper(groundtruth, detections,
+                                           num_processes=2)
+    summary_metrics, _ = evaluator.ComputeMetrics()
+    self.assertAlmostEqual(1.0, summary_metrics['Precision/mAP'])
+
   def testExportGroundtruthToCOCO(self):
     image_ids = ['first', 'second']
     groundtruth_boxes = [np.array([[100, 100, 200, 200]], float),